@@ -11,6 +11,7 @@ from datetime import datetime, timezone, timedelta
 import gspread
 from google.oauth2.service_account import Credentials
 
+from handlers import codec
 from handlers.normalizers import entry as entry_mod  # ✅ единый entry.py
 from handlers.parsing import matcher
 
@@ -164,7 +165,7 @@ def _load_goods_list(log_file: Optional[Path] = None) -> List[Dict[str, Any]]:
     goods_list: List[Dict[str, Any]] = []
     try:
         if GOODS_FILE.exists():
-            raw = json.loads(GOODS_FILE.read_text(encoding="utf-8"))
+            raw = codec.decode(GOODS_FILE.read_bytes())
             if isinstance(raw, dict) and isinstance(raw.get("items"), list):
                 goods_list = raw["items"]
             elif isinstance(raw, dict) and isinstance(raw.get("parsed_pool"), list):
@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import os
-import json
+import copy
 import asyncio
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
+from handlers import persist_utils
+
 # =====================================================
 #              AUTH (JSON): роли и доступы
 # =====================================================
@@ -19,6 +21,8 @@ DATA_DIR = PROJECT_ROOT / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 AUTH_FILE = DATA_DIR / "auth_users.json"
+# изменения (загрузка -> правка -> сохранение) идут целиком под локом;
+# чтение — из реестра в памяти без блокировок, наружу отдаются копии записей
 AUTH_LOCK = asyncio.Lock()
 
 # Черновики для редактирования роли в "Активные пользователи"
@@ -100,141 +104,184 @@ def _normalize_access(access: dict | None, role: str | None = None) -> dict:
     return access
 
 
+# ---------- реестр пользователей в памяти ----------
+# doc — разобранный auth_users.json (пользователи уже нормализованы), sig — (mtime_ns, size)
+# файла на момент загрузки. Файл перечитывается только при внешней правке.
+_REGISTRY: dict = {"doc": None, "sig": None}
+
+
+def _auth_file_sig():
+    try:
+        st = AUTH_FILE.stat()
+        return (int(st.st_mtime_ns), int(st.st_size))
+    except OSError:
+        return None
+
+
+def _normalize_user(u: dict) -> bool:
+    """Нормализация записи пользователя на месте. True — запись поменялась и её стоит сохранить."""
+    changed = False
+    u["access"] = _normalize_access(u.get("access"), u.get("role"))
+    if "sources_mode" not in u:
+        if "use_default_sources" in u:
+            u["sources_mode"] = "default" if u.get("use_default_sources") else "own"
+        else:
+            u["sources_mode"] = _default_sources_mode()
+        changed = True
+    return changed
+
+
+def _registry_doc() -> dict:
+    doc = _REGISTRY["doc"]
+    if doc is not None and persist_utils.has_pending(AUTH_FILE):
+        return doc  # наша запись ещё в очереди — память актуальнее файла
+    sig = _auth_file_sig()
+    if doc is not None and sig == _REGISTRY["sig"]:
+        return doc
+
+    if sig is None:
+        new_doc = doc if doc is not None else _auth_default()
+    else:
+        new_doc = persist_utils.read_json(AUTH_FILE, None)
+        if not isinstance(new_doc, dict):
+            print(f"⚠️ Ошибка чтения {AUTH_FILE}")
+            new_doc = doc if doc is not None else _auth_default()
+
+    users = new_doc.setdefault("users", {})
+    dirty = False
+    for u in users.values():
+        if isinstance(u, dict):
+            dirty = _normalize_user(u) or dirty
+
+    _REGISTRY["doc"] = new_doc
+    _REGISTRY["sig"] = sig
+    if dirty:
+        persist_utils.write_json(AUTH_FILE, new_doc)
+    return new_doc
+
+
+def _user_copy(u: Any) -> Optional[dict]:
+    # копия: правка результата снаружи не должна менять реестр в обход AUTH_LOCK
+    return copy.deepcopy(u) if isinstance(u, dict) else None
+
+
+def auth_get_cached(user_id: int) -> Optional[dict]:
+    """Синхронный lookup пользователя (для модулей без event loop: channel_updater, telethon_manager)."""
+    try:
+        u = _registry_doc().get("users", {}).get(str(int(user_id)))
+    except Exception:
+        return None
+    return _user_copy(u)
+
+
 async def auth_load() -> dict:
-    async with AUTH_LOCK:
-        if not AUTH_FILE.exists():
-            return _auth_default()
-        try:
-            with AUTH_FILE.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️ Ошибка чтения {AUTH_FILE}: {e}")
-            return _auth_default()
+    """Копия реестра (для правок — _update_user / auth_save)."""
+    return copy.deepcopy(_registry_doc())
+
+
+def _save_locked(doc: dict) -> None:
+    # вызывается под AUTH_LOCK; запись уходит фоновому писателю, реестр в памяти уже новый
+    _REGISTRY["doc"] = doc
+    persist_utils.write_json(AUTH_FILE, doc)
 
 
 async def auth_save(doc: dict) -> None:
     async with AUTH_LOCK:
-        tmp = str(AUTH_FILE) + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(doc, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, AUTH_FILE)
+        _save_locked(doc)
+
+
+async def _update_user(user_id: int, fn) -> Optional[dict]:
+    """
+    Правка записи под AUTH_LOCK: загрузка реестра -> fn(запись) -> сохранение.
+    None — пользователя нет. Возвращает копию записи.
+    """
+    async with AUTH_LOCK:
+        doc = _registry_doc()
+        u = doc.setdefault("users", {}).get(str(int(user_id)))
+        if not isinstance(u, dict):
+            return None
+        fn(u)
+        _save_locked(doc)
+        return _user_copy(u)
 
 
 async def auth_upsert_user(tg_user: Any, role_if_new: str = "pending") -> dict:
     """
     tg_user: aiogram.types.User (или объект с полями id/username/first_name/last_name)
     """
-    doc = await auth_load()
     uid = str(int(tg_user.id))
-    users = doc.setdefault("users", {})
-
-    if uid not in users:
-        users[uid] = {
-            "id": int(tg_user.id),
-            "username": getattr(tg_user, "username", None),
-            "first_name": getattr(tg_user, "first_name", None),
-            "last_name": getattr(tg_user, "last_name", None),
-            "role": role_if_new,  # pending/user/admin/rejected
-            "paid_account": None,
-        "access": _default_access(role_if_new),
-            "sources_mode": _default_sources_mode(),
-        }
-        await auth_save(doc)
-        return users[uid]
-
-    u = users[uid]
-    # обновляем профильные поля (роль не трогаем)
-    u["username"] = getattr(tg_user, "username", None)
-    u["first_name"] = getattr(tg_user, "first_name", None)
-    u["last_name"] = getattr(tg_user, "last_name", None)
-    u.setdefault("paid_account", None)
-    u["access"] = _normalize_access(u.get("access"), u.get("role"))
-    u.setdefault("sources_mode", _default_sources_mode())
-    await auth_save(doc)
-    return u
+    async with AUTH_LOCK:
+        doc = _registry_doc()
+        users = doc.setdefault("users", {})
+
+        if uid not in users:
+            users[uid] = {
+                "id": int(tg_user.id),
+                "username": getattr(tg_user, "username", None),
+                "first_name": getattr(tg_user, "first_name", None),
+                "last_name": getattr(tg_user, "last_name", None),
+                "role": role_if_new,  # pending/user/admin/rejected
+                "paid_account": None,
+                "access": _default_access(role_if_new),
+                "sources_mode": _default_sources_mode(),
+            }
+            _save_locked(doc)
+            return _user_copy(users[uid])
+
+        u = users[uid]
+        before = repr(u)
+        # обновляем профильные поля (роль не трогаем)
+        u["username"] = getattr(tg_user, "username", None)
+        u["first_name"] = getattr(tg_user, "first_name", None)
+        u["last_name"] = getattr(tg_user, "last_name", None)
+        u.setdefault("paid_account", None)
+        u["access"] = _normalize_access(u.get("access"), u.get("role"))
+        u.setdefault("sources_mode", _default_sources_mode())
+        if repr(u) != before:  # /start без изменений профиля не пишет файл
+            _save_locked(doc)
+        return _user_copy(u)
 
 
 async def auth_set_paid_account(user_id: int, paid_account: dict | None) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    users = doc.setdefault("users", {})
-    if uid not in users:
-        return None
-    users[uid]["paid_account"] = paid_account
-    await auth_save(doc)
-    return users[uid]
+    def _set(u: dict) -> None:
+        u["paid_account"] = copy.deepcopy(paid_account)
+    return await _update_user(user_id, _set)
 
 
 async def auth_set_access(user_id: int, access: dict) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    users = doc.setdefault("users", {})
-    if uid not in users:
-        return None
-    users[uid]["access"] = access
-    await auth_save(doc)
-    return users[uid]
+    def _set(u: dict) -> None:
+        u["access"] = dict(access)
+    return await _update_user(user_id, _set)
 
 
 async def auth_toggle_access(user_id: int, key: str) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    users = doc.setdefault("users", {})
-    if uid not in users:
-        return None
-    role = users[uid].get("role")
-    access = users[uid].setdefault("access", _default_access(role))
-    access[key] = not bool(access.get(key))
-    await auth_save(doc)
-    return users[uid]
+    def _toggle(u: dict) -> None:
+        access = u.setdefault("access", _default_access(u.get("role")))
+        access[key] = not bool(access.get(key))
+    return await _update_user(user_id, _toggle)
 
 async def auth_set_sources_mode(user_id: int, mode: str) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    users = doc.setdefault("users", {})
-    if uid not in users:
-        return None
-    users[uid]["sources_mode"] = mode
-    await auth_save(doc)
-    return users[uid]
+    def _set(u: dict) -> None:
+        u["sources_mode"] = mode
+    return await _update_user(user_id, _set)
 
 
 async def auth_get(user_id: int) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    u = doc.get("users", {}).get(uid)
-    if not u:
-        return None
-    changed = False
-    u["access"] = _normalize_access(u.get("access"), u.get("role"))
-    if "sources_mode" not in u:
-        if "use_default_sources" in u:
-            u["sources_mode"] = "default" if u.get("use_default_sources") else "own"
-        else:
-            u["sources_mode"] = _default_sources_mode()
-        changed = True
-    if changed:
-        await auth_save(doc)
-    return u
+    # записи нормализуются один раз при загрузке реестра — здесь только lookup
+    return auth_get_cached(user_id)
 
 
 async def auth_set_role(user_id: int, role: str) -> Optional[dict]:
-    doc = await auth_load()
-    uid = str(int(user_id))
-    users = doc.setdefault("users", {})
-    if uid not in users:
-        return None
-    users[uid]["role"] = role
-    if role == "paid_user":
-        users[uid]["access"] = _default_access("paid_user")
-    await auth_save(doc)
-    return users[uid]
+    def _set(u: dict) -> None:
+        u["role"] = role
+        if role == "paid_user":
+            u["access"] = _default_access("paid_user")
+    return await _update_user(user_id, _set)
 
 
 async def auth_list_by_role(role: str) -> List[dict]:
-    doc = await auth_load()
-    arr = list(doc.get("users", {}).values())
-    return [u for u in arr if u.get("role") == role]
+    arr = list(_registry_doc().get("users", {}).values())
+    return [_user_copy(u) for u in arr if isinstance(u, dict) and u.get("role") == role]
 
 
 def display_user(u: dict) -> str:
@@ -0,0 +1,206 @@
+# handlers/auto_replies/event_log.py
+# Журналы автоответчика (matched / unmatched / spam) как append-only JSONL:
+#   - запись события = одна дописанная строка (никакого read-modify-write всего файла);
+#   - дедуп по unique_keys — через индекс в памяти (последняя строка с ключом побеждает);
+#   - окно хранения (keep_window) применяется фоновой компакцией: файл переписывается
+#     атомарно только свежими записями, раз в COMPACT_EVERY_SEC.
+# Старый <name>.json (список) один раз подхватывается при первом обращении.
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+COMPACT_EVERY_SEC = int(os.getenv("AR_LOG_COMPACT_SEC", "300"))
+
+MergeFn = Callable[[dict, dict], dict]
+
+
+def _parse_iso(dt_str: str) -> datetime | None:
+    try:
+        ts = datetime.fromisoformat(dt_str)
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts
+    except Exception:
+        return None
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        keep_window: timedelta,
+        unique_keys: Tuple[str, ...] = (),
+        merge: Optional[MergeFn] = None,
+        legacy_json: Optional[Path] = None,
+    ):
+        self.path = Path(path)
+        self.keep_window = keep_window
+        self.unique_keys = tuple(unique_keys)
+        self.merge = merge
+        self.legacy_json = Path(legacy_json) if legacy_json else None
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._fh = None
+        # key -> record (для журналов без unique_keys ключ — порядковый номер)
+        self._rows: Dict[object, dict] = {}
+        self._seq = 0
+        self._appended_since_compact = 0
+
+    # ---------- ключи / окно ----------
+    def _key(self, record: dict) -> object:
+        if not self.unique_keys:
+            self._seq += 1
+            return self._seq
+        return tuple(str(record.get(k, "")).strip().lower() for k in self.unique_keys)
+
+    def _is_fresh(self, record: dict, now: datetime) -> bool:
+        ts = _parse_iso(str(record.get("date", "")))
+        return ts is not None and now - ts <= self.keep_window
+
+    # ---------- загрузка ----------
+    def _read_lines(self) -> List[dict]:
+        out: List[dict] = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except Exception:
+                        continue  # недописанная строка после падения
+                    if isinstance(rec, dict):
+                        out.append(rec)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            pass
+        return out
+
+    def _read_legacy(self) -> List[dict]:
+        if not self.legacy_json or not self.legacy_json.exists():
+            return []
+        try:
+            data = json.loads(self.legacy_json.read_text(encoding="utf-8"))
+            return [x for x in data if isinstance(x, dict)] if isinstance(data, list) else []
+        except Exception:
+            return []
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        migrate = not self.path.exists()
+        records = self._read_legacy() if migrate else self._read_lines()
+        now = datetime.now(timezone.utc)
+        for rec in records:
+            if self._is_fresh(rec, now):
+                self._rows[self._key(rec)] = rec
+        self._loaded = True
+        if migrate or len(records) > len(self._rows):
+            self._rewrite()
+
+    # ---------- запись ----------
+    def _handle(self):
+        if self._fh is None:
+            self._fh = open(self.path, "a", encoding="utf-8")
+        return self._fh
+
+    def _write_line(self, record: dict) -> None:
+        fh = self._handle()
+        fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        fh.flush()
+        self._appended_since_compact += 1
+
+    def append(self, record: dict) -> None:
+        """
+        Дописать событие. Для журналов с unique_keys — upsert: в файл уходит итоговая запись.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            key = self._key(record)
+            old = self._rows.get(key) if self.unique_keys else None
+            if old is not None and self._is_fresh(old, datetime.now(timezone.utc)):
+                rec = self.merge(dict(old), record) if self.merge else {**old, **record}
+            else:
+                rec = dict(record)
+                self._rows.pop(key, None)  # новая запись — в конец порядка
+            self._rows[key] = rec
+            try:
+                self._write_line(rec)
+            except Exception:
+                self._close()
+
+    # ---------- компакция ----------
+    def _close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+            self._fh = None
+
+    def _rewrite(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rec in self._rows.values():
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._close()
+        os.replace(tmp, self.path)
+        self._appended_since_compact = 0
+
+    def compact(self) -> int:
+        """
+        Выкинуть записи старше keep_window и дубли ключей. Возвращает число живых записей.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            now = datetime.now(timezone.utc)
+            before = len(self._rows)
+            self._rows = {k: r for k, r in self._rows.items() if self._is_fresh(r, now)}
+            if self._appended_since_compact or len(self._rows) != before:
+                try:
+                    self._rewrite()
+                except Exception:
+                    pass
+            return len(self._rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._close()
+            self._rows = {}
+            self._seq = 0
+            self._appended_since_compact = 0
+            self._loaded = True
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text("", encoding="utf-8")
+            except Exception:
+                pass
+
+    def records(self) -> List[dict]:
+        """Живые записи (в пределах окна), в порядке поступления."""
+        with self._lock:
+            self._ensure_loaded()
+            now = datetime.now(timezone.utc)
+            return [dict(r) for r in self._rows.values() if self._is_fresh(r, now)]
+
+
+async def compaction_loop(logs: List[EventLog], every_sec: int = COMPACT_EVERY_SEC) -> None:
+    while True:
+        await asyncio.sleep(max(5, int(every_sec)))
+        for log in logs:
+            try:
+                await asyncio.to_thread(log.compact)
+            except Exception:
+                pass
@@ -5,6 +5,7 @@ import json
 import os
 import re
 import hashlib
+import heapq
 import unicodedata
 import asyncio
 import inspect
@@ -22,18 +23,26 @@ from telethon.errors.rpcerrorlist import (
     InputUserDeactivatedError,
 )
 
-from storage import load_data
+from storage import read_data
+from handlers import codec
 from handlers.normalizers.entry import run_build_parsed_goods
 from handlers.normalizers import entry as entry_mod  # ✅ extract_* / match_model_from_text / indexes
-from handlers.parsing.matcher import match_product  # (ok, reason)
+from handlers.parsing.matcher import match_product, get_field, _norm_field_value  # (ok, reason)
 from handlers.parsing import PARSED_FILE  # parsed_data.json
+from handlers.parsing.results import load_region_index  # region_index.json (цены/регионы по вариантам)
+from handlers.parsing.generations import generation_file, is_generation_path
+from handlers.auto_replies.event_log import EventLog, compaction_loop
 
 # ====================== Файлы/пути ======================
 BASE_DIR = Path(__file__).resolve().parent
 LOG_FILE = BASE_DIR / "auto_replies.log"
+# старые JSON-списки: только источник для однократного переноса в *.jsonl
 SPAM_FILE = BASE_DIR / "spam_messages.json"
 UNMATCHED_FILE = BASE_DIR / "unmatched_queries.json"
 MATCHED_FILE = BASE_DIR / "matched_queries.json"
+SPAM_LOG_FILE = BASE_DIR / "spam_messages.jsonl"
+UNMATCHED_LOG_FILE = BASE_DIR / "unmatched_queries.jsonl"
+MATCHED_LOG_FILE = BASE_DIR / "matched_queries.jsonl"
 SOURCES_FILE = BASE_DIR.parent.parent / "sources.json"
 
 
@@ -44,26 +53,6 @@ def _ensure_parent(p: Path):
         pass
 
 
-def _ensure_json_file(file: Path, default):
-    _ensure_parent(file)
-    if not file.exists():
-        try:
-            file.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
-            return
-        except Exception:
-            return
-    try:
-        _ = json.loads(file.read_text(encoding="utf-8"))
-    except Exception:
-        try:
-            file.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception:
-            pass
-
-
-_ensure_json_file(SPAM_FILE, [])
-_ensure_json_file(UNMATCHED_FILE, [])
-_ensure_json_file(MATCHED_FILE, [])
 _ensure_parent(LOG_FILE)
 
 LOG_TO_STDOUT = os.getenv("AR_VERBOSE", "0") == "1"
@@ -116,27 +105,14 @@ def _clear_runtime_state():
 
 
 def _clear_files():
-    _ensure_json_file(SPAM_FILE, [])
-    _ensure_json_file(UNMATCHED_FILE, [])
-    _ensure_json_file(MATCHED_FILE, [])
     _ensure_parent(LOG_FILE)
 
     try:
         LOG_FILE.write_text("", encoding="utf-8")
     except Exception:
         pass
-    try:
-        SPAM_FILE.write_text("[]", encoding="utf-8")
-    except Exception:
-        pass
-    try:
-        UNMATCHED_FILE.write_text("[]", encoding="utf-8")
-    except Exception:
-        pass
-    try:
-        MATCHED_FILE.write_text("[]", encoding="utf-8")
-    except Exception:
-        pass
+    for log in (_SPAM_LOG, _UNMATCHED_LOG, _MATCHED_LOG):
+        log.clear()
 
 
 def _clear_all_logs_and_state():
@@ -716,50 +692,32 @@ def _split_candidate_lines(text: str) -> list[str]:
     return out
 
 
-# ====================== Логи prune ======================
-def _parse_iso(dt_str: str) -> datetime | None:
-    try:
-        ts = datetime.fromisoformat(dt_str)
-        if ts.tzinfo is None:
-            ts = ts.replace(tzinfo=timezone.utc)
-        return ts
-    except Exception:
-        return None
+# ====================== Журналы (append-only JSONL) ======================
+def _merge_spam(old: dict, rec: dict) -> dict:
+    # повтор спама: обновляем только дату и (если есть) причину
+    old["date"] = rec["date"]
+    old["reason"] = rec.get("reason") or old.get("reason", "")
+    return old
 
 
-def _prune_records(rows: List[dict], keep_window: timedelta) -> List[dict]:
-    now = datetime.now(timezone.utc)
-    fresh: List[dict] = []
-    for r in rows or []:
-        ts = _parse_iso(r.get("date", ""))
-        if ts is None:
-            continue
-        if now - ts <= keep_window:
-            fresh.append(r)
-    return fresh
+_SPAM_LOG = EventLog(
+    SPAM_LOG_FILE,
+    keep_window=WINDOW_SPAM_KEEP,
+    unique_keys=("user_id", "text"),
+    merge=_merge_spam,
+    legacy_json=SPAM_FILE,
+)
+_UNMATCHED_LOG = EventLog(UNMATCHED_LOG_FILE, keep_window=WINDOW_KEEP_LOGS, legacy_json=UNMATCHED_FILE)
+_MATCHED_LOG = EventLog(
+    MATCHED_LOG_FILE,
+    keep_window=WINDOW_KEEP_LOGS,
+    unique_keys=("user_id", "text"),
+    legacy_json=MATCHED_FILE,
+)
 
 
 # ====================== SPAM helpers ======================
-def _load_spam() -> List[dict]:
-    _ensure_json_file(SPAM_FILE, [])
-    try:
-        data = json.loads(SPAM_FILE.read_text(encoding="utf-8"))
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
-
-
-def _save_spam_list(data: List[dict]):
-    try:
-        SPAM_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-
 def save_spam(user_id: int, text: str, account_name: str, origin: str, reason: str = ""):
-    data = _load_spam()
-    data = _prune_records(data, WINDOW_SPAM_KEEP)
-
     rec = {
         "user_id": user_id,
         "text": (text or "").strip(),
@@ -768,17 +726,7 @@ def save_spam(user_id: int, text: str, account_name: str, origin: str, reason: s
         "reason": reason,
         "date": datetime.now(timezone.utc).isoformat(),
     }
-
-    key = (str(rec["user_id"]), rec["text"].lower())
-    for r in data:
-        if (str(r.get("user_id")), str(r.get("text", "")).lower()) == key:
-            r["date"] = rec["date"]
-            r["reason"] = reason or r.get("reason", "")
-            _save_spam_list(data)
-            return
-
-    data.append(rec)
-    _save_spam_list(data)
+    _SPAM_LOG.append(rec)
 
 
 # ====================== parsed_data.json loaders ======================
@@ -792,8 +740,11 @@ def _resolve_parsed_path() -> Path | None:
         _log(f"⚠️ AR_PARSED_FILE задан, но файла нет: {p}")
 
     try:
-        if PARSED_FILE and Path(PARSED_FILE).exists():
-            return Path(PARSED_FILE)
+        if PARSED_FILE:
+            # текущее опубликованное поколение (fallback — рабочий файл)
+            p = generation_file(Path(PARSED_FILE).parent, Path(PARSED_FILE).name)
+            if p.exists():
+                return p
     except Exception:
         pass
 
@@ -992,11 +943,49 @@ def _offer_from_leaf_fast(leaf_title: str, path_parts: list[str], leaf_payload:
     return e
 
 
+def _load_etalons_from_region_index(data_dir: Path) -> List[dict]:
+    """
+    Офферы из region_index.json (пишет пайплайн рядом с parsed_data.json):
+    не нужно парсить всё дерево parsed_data.json ради цен вариантов.
+    """
+    try:
+        ridx = load_region_index(data_dir)
+    except Exception as e:
+        _log(f"⚠️ region_index.json: ошибка чтения ({e}) — fallback на parsed_data.json")
+        return []
+
+    out: List[dict] = []
+    ok_cnt, drop_cnt = 0, 0
+    for (mpath, _key), info in ridx.items():
+        title = (info.get("title") or "").strip()
+        if not title:
+            continue  # алиасы без RAM — не отдельные позиции
+        try:
+            price = _extract_min_price({"min_price": info.get("price")})
+            if price is None:
+                drop_cnt += 1
+                continue
+            e = _offer_from_leaf_fast(title, list(mpath), {"best_channels": info.get("channels") or []}, int(price))
+            if not e:
+                drop_cnt += 1
+                continue
+            out.append(e)
+            ok_cnt += 1
+        except Exception:
+            drop_cnt += 1
+            continue
+
+    if out:
+        _log(f"✅ region_index: офферов загружено {ok_cnt}, пропущено {drop_cnt}")
+    return out
+
+
 def _load_etalons_from_parsed() -> List[dict]:
     """
     Загружает офферы для автоответчика из parsed_data.json.
 
-    Поддерживаем 2 формата:
+    Поддерживаем 3 источника:
+    0) region_index.json рядом с parsed_data.json (компактный индекс пайплайна)
     1) legacy: parsed_data["etalon_with_prices"] (list)
     2) новый:  parsed_data["catalog"] (tree) где листья содержат {"min_price": ...}
     """
@@ -1005,8 +994,12 @@ def _load_etalons_from_parsed() -> List[dict]:
         _log("❌ parsed_data.json не найден (PARSED_FILE/ENV/fallbacks)")
         return []
 
+    from_index = _load_etalons_from_region_index(path.parent)
+    if from_index:
+        return from_index
+
     try:
-        parsed = json.loads(path.read_text(encoding="utf-8"))
+        parsed = codec.decode(path.read_bytes())
     except Exception as e:
         _log(f"❌ Ошибка чтения {path}: {e}")
         return []
@@ -1096,12 +1089,14 @@ def _etalons_live(ttl_sec: int = ETALON_TTL_SEC) -> List[dict]:
         same_src = (str(p or "") == str(_ETALON_CACHE.get("src_path") or "")) and (
             mtime == int(_ETALON_CACHE.get("src_mtime") or 0)
         )
-        if cached_ok and same_src:
+        # файл из опубликованного поколения неизменяем: держим офферы, пока не переключится CURRENT
+        if same_src and (cached_ok or (p and is_generation_path(p))):
             return _ETALON_CACHE["items"]
     except Exception:
         pass
 
     items = _load_etalons_from_parsed()
+    _offer_index(items)
     _ETALON_CACHE["items"] = items
     _ETALON_CACHE["ts"] = now
     _ETALON_CACHE["src_mtime"] = mtime
@@ -1109,37 +1104,7 @@ def _etalons_live(ttl_sec: int = ETALON_TTL_SEC) -> List[dict]:
     return items
 
 
-# ====================== JSON helpers для matched/unmatched ======================
-def _append_json(file: Path, record: dict, unique_keys: tuple[str, ...] = ()):
-    _ensure_json_file(file, [])
-    try:
-        data = json.loads(file.read_text(encoding="utf-8"))
-        if not isinstance(data, list):
-            data = []
-    except Exception:
-        data = []
-
-    data = _prune_records(data, WINDOW_KEEP_LOGS)
-
-    if unique_keys:
-        key_val = tuple(str(record.get(k, "")).strip().lower() for k in unique_keys)
-        for r in data:
-            other = tuple(str(r.get(k, "")).strip().lower() for k in unique_keys)
-            if other == key_val:
-                r.update(record)
-                try:
-                    file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-                except Exception:
-                    pass
-                return
-
-    data.append(record)
-    try:
-        file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-
+# ====================== matched/unmatched ======================
 def _save_unmatched(
     user_id: int,
     text: str,
@@ -1159,7 +1124,7 @@ def _save_unmatched(
         "origin": origin,
         "date": datetime.now(timezone.utc).isoformat(),
     }
-    _append_json(UNMATCHED_FILE, record)
+    _UNMATCHED_LOG.append(record)
 
 
 def _save_matched(
@@ -1183,7 +1148,7 @@ def _save_matched(
         "origin": origin,
         "date": datetime.now(timezone.utc).isoformat(),
     }
-    _append_json(MATCHED_FILE, record, unique_keys=("user_id", "text"))
+    _MATCHED_LOG.append(record)
 
 
 # ====================== Вспомогательные: сбор whitelist ======================
@@ -1277,7 +1242,7 @@ def _allowed_paths_live(ttl_sec: int = ALLOWED_PATHS_TTL_SEC) -> list[list[str]]
         pass
 
     try:
-        db = load_data()
+        db = read_data()
         spec = _load_allowed_paths_spec(db)
     except Exception:
         spec = []
@@ -1335,7 +1300,7 @@ def _enabled_live(ttl_sec: int = 2) -> bool:
         pass
 
     try:
-        _ENABLED_CACHE["val"] = bool(load_data().get("auto_replies_enabled", False))
+        _ENABLED_CACHE["val"] = bool(read_data().get("auto_replies_enabled", False))
     except Exception:
         _ENABLED_CACHE["val"] = False
     _ENABLED_CACHE["ts"] = now
@@ -1353,7 +1318,7 @@ def _allowed_ids_live(acc_name: str, ttl_sec: int = 15) -> set[int]:
             pass
 
     try:
-        db = load_data()
+        db = read_data()
         ids = _collect_allowed_chat_ids(db, acc_name)
     except Exception:
         ids = set()
@@ -1424,38 +1389,98 @@ def _compose_reply(parsed_used: dict, offer: dict) -> str:
 
 
 # ====================== Матчинг ======================
+_MODEL_MISMATCH = "model не совпал"
+
+
+def _offer_price(e: dict) -> int:
+    try:
+        return int(e.get("price", 0))
+    except Exception:
+        return 0
+
+
+def _offer_model_key(item: dict) -> str:
+    # та же нормализация model, что в match_product (от категории она не зависит)
+    return _norm_field_value("_default", "model", get_field(item, "model"))
+
+
+class _OfferIndex:
+    """
+    Офферы по корзинам model (как её сравнивает match_product): оффер с чужой моделью
+    match_product всегда отбрасывает с "model не совпал", поэтому строку проверяем только по своей корзине.
+    Корзины отсортированы по (цена, порядок загрузки): первый прошедший проверки оффер —
+    тот же самый дешёвый, что дал бы полный перебор.
+    Офферы с code могут сматчиться по коду мимо модели — их проверяем для каждой строки.
+    """
+
+    def __init__(self, offers: list[dict]):
+        self.total = len(offers)
+        self.by_model: dict[str, list[tuple[int, int, dict]]] = {}
+        self.with_code: list[tuple[int, int, dict]] = []
+        for i, e in enumerate(offers):
+            item = (_offer_price(e), i, e)
+            if get_field(e, "code") is not None:
+                self.with_code.append(item)
+            else:
+                self.by_model.setdefault(_offer_model_key(e), []).append(item)
+        for bucket in self.by_model.values():
+            bucket.sort(key=lambda t: (t[0], t[1]))
+        self.with_code.sort(key=lambda t: (t[0], t[1]))
+
+    def candidates(self, parsed_item: dict):
+        bucket = self.by_model.get(_offer_model_key(parsed_item)) or []
+        if not self.with_code:
+            return iter(bucket)
+        return heapq.merge(bucket, self.with_code, key=lambda t: (t[0], t[1]))
+
+
+# индекс строится вместе с загрузкой офферов (_etalons_live) и живёт, пока тот же список
+_OFFER_INDEX: dict = {"offers": None, "index": None}
+
+
+def _offer_index(offers: list[dict]) -> _OfferIndex:
+    if _OFFER_INDEX["offers"] is not offers:
+        _OFFER_INDEX["index"] = _OfferIndex(offers)
+        _OFFER_INDEX["offers"] = offers
+    return _OFFER_INDEX["index"]
+
+
 def _match_best_offer(parsed_item: dict, offers: list[dict]) -> tuple[Optional[dict], str]:
-    best = None
-    best_price = None
+    index = _offer_index(offers)
     reasons: dict[str, int] = {}
+    first_at: dict[str, int] = {}   # причина -> индекс первого оффера с ней (порядок как при полном переборе)
+    checked: set[int] = set()
 
-    for e in offers:
+    for price, i, e in index.candidates(parsed_item):
+        checked.add(i)
         ok, reason = match_product(e, parsed_item)
         if not ok:
-            reasons[reason or "no_match"] = reasons.get(reason or "no_match", 0) + 1
+            r = reason or "no_match"
+            reasons[r] = reasons.get(r, 0) + 1
+            first_at[r] = min(first_at.get(r, i), i)
             continue
 
         ok2, r2 = _hard_attribute_guards(parsed_item, e)
         if not ok2:
             reasons[r2] = reasons.get(r2, 0) + 1
+            first_at[r2] = min(first_at.get(r2, i), i)
             continue
 
-        try:
-            price = int(e.get("price", 0))
-        except Exception:
-            price = 0
         if price <= 0:
             continue
+        return e, ""
 
-        if best is None or (best_price is None) or price < best_price:
-            best = e
-            best_price = price
-
-    if best:
-        return best, ""
+    # офферы других моделей: полный перебор отбросил бы каждый с "model не совпал"
+    skipped = index.total - len(checked)
+    if skipped > 0:
+        first_skipped = 0
+        while first_skipped in checked:
+            first_skipped += 1
+        reasons[_MODEL_MISMATCH] = reasons.get(_MODEL_MISMATCH, 0) + skipped
+        first_at[_MODEL_MISMATCH] = min(first_at.get(_MODEL_MISMATCH, first_skipped), first_skipped)
 
     if reasons:
-        top = sorted(reasons.items(), key=lambda kv: kv[1], reverse=True)[0][0]
+        top = min(reasons, key=lambda r: (-reasons[r], first_at[r]))
         return None, top
     return None, "no_match"
 
@@ -1515,6 +1540,7 @@ def register_auto_replies(client, acc_name: str):
     if is_primary and not _PRUNE_TASK_STARTED:
         try:
             asyncio.create_task(_daily_prune_job(acc_name))
+            asyncio.create_task(compaction_loop([_SPAM_LOG, _UNMATCHED_LOG, _MATCHED_LOG]))
             _PRUNE_TASK_STARTED = True
         except Exception:
             pass
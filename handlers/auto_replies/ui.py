@@ -7,10 +7,14 @@ from aiogram.types import (
     Message,
 )
 from handlers.auth_utils import auth_get
-from storage import load_data, save_data
+from handlers import path_ids
+from storage import load_data, read_data, save_data
 
 router = Router()
 
+# ID путей категорий в callback_data (полный путь "A|B|C" упирается в лимит 64 байта)
+_PATH_NS = "ar"
+
 
 # ========================= МЕНЮ НАСТРОЕК =========================
 
@@ -51,7 +55,7 @@ def _format_blacklist_text(blacklist: list[str]) -> str:
 
 
 async def _render_settings_message(callback: CallbackQuery, *, edit: bool = False):
-    db = load_data()
+    db = read_data()
     enabled = db.get("auto_replies_enabled", False)
     text = "⚙️ Настройки автоответов:"
     markup = auto_replies_menu(enabled)
@@ -112,7 +116,7 @@ async def show_blacklist(callback: CallbackQuery):
     """
     await callback.answer()
 
-    db = load_data()
+    db = read_data()
     blacklist: list[str] = db.get("auto_replies_blacklist", [])
 
     text = _format_blacklist_text(blacklist)
@@ -317,9 +321,10 @@ def _build_categories_keyboard(
             checkbox_text = "✅" if checked else "⬜️"
 
             # чекбокс — только переключает
-            cb_toggle = "ar_cat_toggle:" + "|".join(child_path)
+            child_id = path_ids.path_id(child_path, _PATH_NS)
+            cb_toggle = "ar_cat_toggle:" + child_id
             # папка — только открывает уровень
-            cb_open = "ar_cat_open:" + "|".join(child_path)
+            cb_open = "ar_cat_open:" + child_id
 
             row = [
                 InlineKeyboardButton(text=checkbox_text, callback_data=cb_toggle),
@@ -332,7 +337,7 @@ def _build_categories_keyboard(
     nav_row: list[InlineKeyboardButton] = []
     if current_path:
         parent_path = current_path[:-1]
-        parent_data = "ar_cat_back:" + "|".join(parent_path)
+        parent_data = "ar_cat_back:" + path_ids.path_id(parent_path, _PATH_NS)
         nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=parent_data))
     else:
         nav_row.append(InlineKeyboardButton(text="⬅️ Назад", callback_data="auto_replies"))
@@ -344,7 +349,7 @@ def _build_categories_keyboard(
 
 
 async def _render_categories_tree(callback: CallbackQuery, current_path: list[str], *, edit: bool = True):
-    db = load_data()
+    db = read_data()
     tree = _get_catalog_tree(db)
     allowed_spec = _load_allowed_paths_spec(db)
 
@@ -379,8 +384,11 @@ async def open_category(callback: CallbackQuery):
     Просто провалиться внутрь узла (без изменения флагов).
     """
     data = callback.data or ""
-    _, _, raw_path = data.partition("ar_cat_open:")
-    path = [p for p in raw_path.split("|") if p]
+    _, _, path_id = data.partition("ar_cat_open:")
+    path = path_ids.resolve(path_id, _PATH_NS)
+    if path is None:
+        await callback.answer("Меню устарело. Откройте категории заново.", show_alert=True)
+        return
 
     await callback.answer()
     await _render_categories_tree(callback, current_path=path, edit=True)
@@ -392,8 +400,11 @@ async def toggle_category(callback: CallbackQuery):
     Переключить чекбокс для узла (target), но остаться на том же уровне (parent).
     """
     data = callback.data or ""
-    _, _, raw_path = data.partition("ar_cat_toggle:")
-    path = [p for p in raw_path.split("|") if p]
+    _, _, path_id = data.partition("ar_cat_toggle:")
+    path = path_ids.resolve(path_id, _PATH_NS)
+    if path is None:
+        await callback.answer("Меню устарело. Откройте категории заново.", show_alert=True)
+        return
 
     db = load_data()
     spec = _load_allowed_paths_spec(db)
@@ -412,8 +423,11 @@ async def back_in_categories(callback: CallbackQuery):
     Шаг назад по дереву категорий.
     """
     data = callback.data or ""
-    _, _, raw_path = data.partition("ar_cat_back:")
-    path = [p for p in raw_path.split("|") if p]
+    _, _, path_id = data.partition("ar_cat_back:")
+    path = path_ids.resolve(path_id, _PATH_NS)
+    if path is None:
+        await callback.answer("Меню устарело. Откройте категории заново.", show_alert=True)
+        return
 
     await callback.answer()
     await _render_categories_tree(callback, current_path=path, edit=True)
@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from storage import load_data, save_data
+from storage import load_data, move_node, read_data, save_data
 import hashlib
 
 router = Router()
@@ -29,7 +29,7 @@ def build_brand_index(db: dict):
 
 # ================== Меню брендов внутри категории ==================
 async def show_brands_menu(msg_or_cb, cat: str, title: str = None):
-    db = load_data()
+    db = read_data()
     build_brand_index(db)
     brands = list(db.get("etalon", {}).get(cat, {}).keys())
 
@@ -71,7 +71,7 @@ async def brand_add(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("brand_rename:"))
 async def brand_rename(callback: CallbackQuery, state: FSMContext):
     _, cat = callback.data.split(":")
-    db = load_data()
+    db = read_data()
     build_brand_index(db)
     brands = list(db.get("etalon", {}).get(cat, {}).keys())
 
@@ -92,7 +92,7 @@ async def brand_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("choose_brand_rename:"))
 async def choose_brand_for_rename(callback: CallbackQuery, state: FSMContext):
     _, b_id = callback.data.split(":")
-    db = load_data()
+    db = read_data()
     build_brand_index(db)
     if b_id not in brand_index:
         await callback.answer("⚠️ Бренд не найден", show_alert=True)
@@ -111,7 +111,7 @@ async def choose_brand_for_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("brand_delete:"))
 async def brand_delete(callback: CallbackQuery, state: FSMContext):
     _, cat = callback.data.split(":")
-    db = load_data()
+    db = read_data()
     build_brand_index(db)
     brands = list(db.get("etalon", {}).get(cat, {}).keys())
 
@@ -225,7 +225,7 @@ async def brand_sort(callback: CallbackQuery):
     await _show_brand_sort(callback, cat)
 
 async def _show_brand_sort(callback: CallbackQuery, cat: str):
-    db = load_data()
+    db = read_data()
     build_brand_index(db)
     brands = list(db.get("etalon", {}).get(cat, {}).keys())
     if not brands:
@@ -244,29 +244,14 @@ async def _show_brand_sort(callback: CallbackQuery, cat: str):
     kb.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"nav_cat:{cat}")])
     await callback.message.edit_text(f"🔀 Сортировка брендов в {cat}:", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
 
-def move_item_in_dict(d: dict, key: str, direction: str):
-    keys = list(d.keys())
-    if key not in keys:
-        return d
-    idx = keys.index(key)
-    if direction == "up" and idx > 0:
-        keys[idx], keys[idx - 1] = keys[idx - 1], keys[idx]
-    elif direction == "down" and idx < len(keys) - 1:
-        keys[idx], keys[idx + 1] = keys[idx + 1], keys[idx]
-    return {k: d[k] for k in keys}
-
 @router.callback_query(F.data.startswith("brand_move_up:"))
 async def brand_move_up(callback: CallbackQuery):
     _, cat, br = callback.data.split(":", maxsplit=2)
-    db = load_data()
-    db["etalon"][cat] = move_item_in_dict(db.get("etalon", {}).get(cat, {}), br, "up")
-    save_data(db)
+    move_node("etalon", [cat, br], -1)
     await _show_brand_sort(callback, cat)
 
 @router.callback_query(F.data.startswith("brand_move_down:"))
 async def brand_move_down(callback: CallbackQuery):
     _, cat, br = callback.data.split(":", maxsplit=2)
-    db = load_data()
-    db["etalon"][cat] = move_item_in_dict(db.get("etalon", {}).get(cat, {}), br, "down")
-    save_data(db)
+    move_node("etalon", [cat, br], 1)
     await _show_brand_sort(callback, cat)
@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from storage import load_data, save_data
+from storage import load_data, move_node, read_data, save_data
 
 router = Router()
 
@@ -20,7 +20,7 @@ async def nav_catalog(callback: CallbackQuery, state: FSMContext):
 
 # ================== Меню категорий ==================
 async def show_categories_menu(msg_or_cb, title: str = "📂 Категории"):
-    db = load_data()
+    db = read_data()
     cats = list(db.get("etalon", {}).keys())
 
     kb = [
@@ -54,7 +54,7 @@ async def cat_add(callback: CallbackQuery, state: FSMContext):
 # ================== Переименование ==================
 @router.callback_query(F.data == "cat_rename")
 async def cat_rename(callback: CallbackQuery, state: FSMContext):
-    db = load_data()
+    db = read_data()
     cats = list(db.get("etalon", {}).keys())
 
     if not cats:
@@ -82,7 +82,7 @@ async def choose_cat_for_rename(callback: CallbackQuery, state: FSMContext):
 # ================== Удаление ==================
 @router.callback_query(F.data == "cat_delete")
 async def cat_delete(callback: CallbackQuery, state: FSMContext):
-    db = load_data()
+    db = read_data()
     cats = list(db.get("etalon", {}).keys())
 
     if not cats:
@@ -184,7 +184,7 @@ async def cat_sort(callback: CallbackQuery, state: FSMContext | None = None):
 
 
 async def _show_cat_sort(callback: CallbackQuery):
-    db = load_data()
+    db = read_data()
     cats = list(db.get("etalon", {}).keys())
 
     if not cats:
@@ -208,33 +208,16 @@ async def _show_cat_sort(callback: CallbackQuery):
     )
 
 
-def move_item_in_dict(d: dict, key: str, direction: str):
-    """Перемещает элемент key вверх/вниз внутри словаря"""
-    keys = list(d.keys())
-    if key not in keys:
-        return d
-    idx = keys.index(key)
-    if direction == "up" and idx > 0:
-        keys[idx], keys[idx - 1] = keys[idx - 1], keys[idx]
-    elif direction == "down" and idx < len(keys) - 1:
-        keys[idx], keys[idx + 1] = keys[idx + 1], keys[idx]
-    return {k: d[k] for k in keys}
-
-
 @router.callback_query(F.data.startswith("cat_move_up:"))
 async def cat_move_up(callback: CallbackQuery):
     _, cat = callback.data.split(":", maxsplit=1)
-    db = load_data()
-    db["etalon"] = move_item_in_dict(db.get("etalon", {}), cat, "up")
-    save_data(db)
+    move_node("etalon", [cat], -1)
     await _show_cat_sort(callback)
 
 
 @router.callback_query(F.data.startswith("cat_move_down:"))
 async def cat_move_down(callback: CallbackQuery):
     _, cat = callback.data.split(":", maxsplit=1)
-    db = load_data()
-    db["etalon"] = move_item_in_dict(db.get("etalon", {}), cat, "down")
-    save_data(db)
+    move_node("etalon", [cat], 1)
     await _show_cat_sort(callback)
 
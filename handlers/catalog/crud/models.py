@@ -3,7 +3,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from storage import load_data, save_data
+from storage import load_data, move_node, read_data, save_data
 from handlers.catalog import etalon
 import hashlib
 
@@ -42,7 +42,7 @@ def build_model_index(db: dict):
 
 # ================== Меню моделей внутри линейки ==================
 async def show_models_menu(msg_or_cb, cat: str, br: str, sr: str, title: str = None):
-    db = load_data()
+    db = read_data()
     build_model_index(db)
 
     models = list(db.get("etalon", {}).get(cat, {}).get(br, {}).get(sr, {}).keys())
@@ -69,7 +69,7 @@ async def show_models_menu(msg_or_cb, cat: str, br: str, sr: str, title: str = N
 @router.callback_query(F.data.startswith("nav_model:"))
 async def nav_model(callback: CallbackQuery, state: FSMContext):
     _, m_id = callback.data.split(":", maxsplit=1)
-    db = load_data()
+    db = read_data()
     build_model_index(db)
 
     if m_id not in model_index:
@@ -85,7 +85,7 @@ async def model_add(callback: CallbackQuery, state: FSMContext):
     _, s_id = callback.data.split(":", maxsplit=1)
 
     # s_id -> (cat, br, sr) через перебор (без отдельного series_index)
-    db = load_data()
+    db = read_data()
     cat = br = sr = None
     for c, brands in db.get("etalon", {}).items():
         for b, series in brands.items():
@@ -113,7 +113,7 @@ async def model_add(callback: CallbackQuery, state: FSMContext):
 async def model_rename(callback: CallbackQuery, state: FSMContext):
     _, s_id = callback.data.split(":", maxsplit=1)
 
-    db = load_data()
+    db = read_data()
     # найдём (cat, br, sr)
     cat = br = sr = None
     series_branch = None
@@ -153,7 +153,7 @@ async def model_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("choose_model_rename:"))
 async def choose_model_for_rename(callback: CallbackQuery, state: FSMContext):
     _, m_id = callback.data.split(":", maxsplit=1)
-    db = load_data()
+    db = read_data()
     build_model_index(db)
     if m_id not in model_index:
         await callback.answer("⚠️ Модель не найдена", show_alert=True)
@@ -172,7 +172,7 @@ async def choose_model_for_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("model_delete:"))
 async def model_delete(callback: CallbackQuery, state: FSMContext):
     _, s_id = callback.data.split(":", maxsplit=1)
-    db = load_data()
+    db = read_data()
 
     # найдём (cat, br, sr)
     cat = br = sr = None
@@ -261,7 +261,7 @@ async def model_sort(callback: CallbackQuery):
     await _show_model_sort(callback, s_id)
 
 async def _show_model_sort(callback: CallbackQuery, s_id: str):
-    db = load_data()
+    db = read_data()
 
     # извлекаем (cat, br, sr)
     cat = br = sr = None
@@ -300,42 +300,28 @@ async def _show_model_sort(callback: CallbackQuery, s_id: str):
         reply_markup=InlineKeyboardMarkup(inline_keyboard=kb)
     )
 
-def move_item_in_dict(d: dict, key: str, direction: str):
-    """Перемещает элемент key вверх/вниз внутри словаря"""
-    keys = list(d.keys())
-    if key not in keys:
-        return d
-    idx = keys.index(key)
-    if direction == "up" and idx > 0:
-        keys[idx], keys[idx - 1] = keys[idx - 1], keys[idx]
-    elif direction == "down" and idx < len(keys) - 1:
-        keys[idx], keys[idx + 1] = keys[idx + 1], keys[idx]
-    return {k: d[k] for k in keys}
-
 @router.callback_query(F.data.startswith("model_move_up:"))
 async def model_move_up(callback: CallbackQuery):
     _, m_id = callback.data.split(":", maxsplit=1)
-    db = load_data()
+    db = read_data()
     build_model_index(db)
     if m_id not in model_index:
         await callback.answer("⚠️ Модель не найдена", show_alert=True)
         return
     cat, br, sr, m = model_index[m_id]
-    db["etalon"][cat][br][sr] = move_item_in_dict(db.get("etalon", {}).get(cat, {}).get(br, {}).get(sr, {}), m, "up")
-    save_data(db)
+    move_node("etalon", [cat, br, sr, m], -1)
     await _show_model_sort(callback, sid_sr(cat, br, sr))
 
 @router.callback_query(F.data.startswith("model_move_down:"))
 async def model_move_down(callback: CallbackQuery):
     _, m_id = callback.data.split(":", maxsplit=1)
-    db = load_data()
+    db = read_data()
     build_model_index(db)
     if m_id not in model_index:
         await callback.answer("⚠️ Модель не найдена", show_alert=True)
         return
     cat, br, sr, m = model_index[m_id]
-    db["etalon"][cat][br][sr] = move_item_in_dict(db.get("etalon", {}).get(cat, {}).get(br, {}).get(sr, {}), m, "down")
-    save_data(db)
+    move_node("etalon", [cat, br, sr, m], 1)
     await _show_model_sort(callback, sid_sr(cat, br, sr))
 
 # ================== Обработка названий ==================
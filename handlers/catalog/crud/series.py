@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from storage import load_data, save_data
+from storage import load_data, move_node, read_data, save_data
 import hashlib
 
 router = Router()
@@ -40,7 +40,7 @@ def build_indexes(db: dict):
 
 # ================== Меню линеек внутри бренда ==================
 async def show_series_menu(msg_or_cb, b_id: str, title: str = None):
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     cat, br = brand_index[b_id]
 
@@ -70,7 +70,7 @@ async def nav_brand(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("nav_series:"))
 async def nav_series(callback: CallbackQuery, state: FSMContext):
     _, s_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     if s_id not in series_index:
         await callback.answer("⚠️ Линейка не найдена", show_alert=True)
@@ -83,7 +83,7 @@ async def nav_series(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("series_add:"))
 async def series_add(callback: CallbackQuery, state: FSMContext):
     _, b_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     cat, br = brand_index[b_id]
 
@@ -99,7 +99,7 @@ async def series_add(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("series_rename:"))
 async def series_rename(callback: CallbackQuery, state: FSMContext):
     _, b_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     cat, br = brand_index[b_id]
     series = list(db.get("etalon", {}).get(cat, {}).get(br, {}).keys())
@@ -119,7 +119,7 @@ async def series_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("choose_series_rename:"))
 async def choose_series_for_rename(callback: CallbackQuery, state: FSMContext):
     _, s_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     if s_id not in series_index:
         await callback.answer("⚠️ Линейка не найдена", show_alert=True)
@@ -137,7 +137,7 @@ async def choose_series_for_rename(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("series_delete:"))
 async def series_delete(callback: CallbackQuery, state: FSMContext):
     _, b_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     cat, br = brand_index[b_id]
     series = list(db.get("etalon", {}).get(cat, {}).get(br, {}).keys())
@@ -243,7 +243,7 @@ async def series_sort(callback: CallbackQuery):
     await _show_series_sort(callback, b_id)
 
 async def _show_series_sort(callback: CallbackQuery, b_id: str):
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     cat, br = brand_index[b_id]
     series = list(db.get("etalon", {}).get(cat, {}).get(br, {}).keys())
@@ -264,39 +264,26 @@ async def _show_series_sort(callback: CallbackQuery, b_id: str):
     kb.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"nav_brand:{b_id}")])
     await callback.message.edit_text(f"🔀 Сортировка линеек ({cat}/{br}):", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
 
-def move_item_in_dict(d: dict, key: str, direction: str):
-    keys = list(d.keys())
-    if key not in keys:
-        return d
-    idx = keys.index(key)
-    if direction == "up" and idx > 0:
-        keys[idx], keys[idx - 1] = keys[idx - 1], keys[idx]
-    elif direction == "down" and idx < len(keys) - 1:
-        keys[idx], keys[idx + 1] = keys[idx + 1], keys[idx]
-    return {k: d[k] for k in keys}
-
 @router.callback_query(F.data.startswith("series_move_up:"))
 async def series_move_up(callback: CallbackQuery):
     _, s_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     if s_id not in series_index:
         await callback.answer("⚠️ Линейка не найдена", show_alert=True)
         return
     cat, br, sr = series_index[s_id]
-    db["etalon"][cat][br] = move_item_in_dict(db.get("etalon", {}).get(cat, {}).get(br, {}), sr, "up")
-    save_data(db)
+    move_node("etalon", [cat, br, sr], -1)
     await _show_series_sort(callback, sid_br(cat, br))
 
 @router.callback_query(F.data.startswith("series_move_down:"))
 async def series_move_down(callback: CallbackQuery):
     _, s_id = callback.data.split(":", 1)
-    db = load_data()
+    db = read_data()
     build_indexes(db)
     if s_id not in series_index:
         await callback.answer("⚠️ Линейка не найдена", show_alert=True)
         return
     cat, br, sr = series_index[s_id]
-    db["etalon"][cat][br] = move_item_in_dict(db.get("etalon", {}).get(cat, {}).get(br, {}), sr, "down")
-    save_data(db)
+    move_node("etalon", [cat, br, sr], 1)
     await _show_series_sort(callback, sid_br(cat, br))
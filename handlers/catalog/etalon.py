@@ -2,7 +2,7 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-from storage import load_data, save_data
+from storage import delete_node, read_data, set_node
 from handlers.catalog.crud.models import build_model_index, model_index, sid_sr  # ✅ добавили sid_sr
 
 router = Router()
@@ -14,7 +14,7 @@ class EtalonStates(StatesGroup):
 
 # === Меню эталона у модели ===
 async def render_etalon_menu(event, cat: str, br: str, sr: str, m: str, state: FSMContext):
-    db = load_data()
+    db = read_data()
     await state.update_data(category=cat, brand=br, series=sr, model=m)
 
     s_id = sid_sr(cat, br, sr)  # ✅ используем хэш-ид линейки
@@ -45,7 +45,7 @@ async def render_etalon_menu(event, cat: str, br: str, sr: str, m: str, state: F
 async def etalon_model(callback: CallbackQuery, state: FSMContext):
     _, m_id = callback.data.split(":", maxsplit=1)
 
-    db = load_data()
+    db = read_data()
     build_model_index(db)
 
     if m_id not in model_index:
@@ -112,9 +112,7 @@ async def save_etalon_text(msg: Message, state: FSMContext):
 
     # сохраняем как список строк
     lines = msg.text.splitlines()
-    db = load_data()
-    db.setdefault("etalon", {}).setdefault(cat, {}).setdefault(br, {}).setdefault(sr, {})[m] = lines
-    save_data(db)
+    set_node("etalon", [cat, br, sr, m], lines)
     
     await state.clear()
     await msg.answer(f"✅ Эталон сохранён для <b>{m}</b>")
@@ -139,9 +137,7 @@ async def delete_etalon(callback: CallbackQuery, state: FSMContext):
 
     cat, br, sr, m = data["category"], data["brand"], data["series"], data["model"]
 
-    db = load_data()
-    db.setdefault("etalon", {}).setdefault(cat, {}).setdefault(br, {}).setdefault(sr, {}).pop(m, None)
-    save_data(db)
+    delete_node("etalon", [cat, br, sr, m])
 
     await callback.message.answer("🗑 Эталон удалён.")
     await render_etalon_menu(callback, cat, br, sr, m, state)
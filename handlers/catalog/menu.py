@@ -1,7 +1,7 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from handlers.auth_utils import auth_get
-from storage import load_data
+from storage import read_data
 from . import etalon   # для вызова render_etalon_menu
 from aiogram.fsm.context import FSMContext
 
@@ -36,7 +36,7 @@ async def show_full_catalog(callback: CallbackQuery):
     if not u or not (u.get("role") == "admin" or access.get("products.catalog")):
         await callback.answer("⛔️ Нет доступа", show_alert=True)
         return
-    db = load_data()
+    db = read_data()
     catalog = db.get("etalon", {})
     etalons = catalog
 
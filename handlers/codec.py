@@ -0,0 +1,176 @@
+# handlers/codec.py
+# Кодек артефактов пайплайна и кэшей (parsed_*.json, индексы, посты каналов, кэш конкурентов).
+#
+# Формат выбирается на артефакт (ARTIFACT_FORMATS + env), при чтении определяется по заголовку.
+# Всё, чего нет в ARTIFACT_FORMATS (auth_users.json, bot_users.json, настройки каналов, media_file_ids.json, ...), —
+# файлы состояния: они всегда пишутся обычным json, env на них не действует.
+#   json          — как раньше (indent=2, читается глазами)
+#   json-compact  — без отступов (меньше и быстрее)
+#   msgpack       — бинарный (нужен пакет msgpack), заголовок MSGPACK_MAGIC
+#   <fmt>+gzip / <fmt>+zstd — сжатие поверх (zstd — пакет zstandard, gzip — stdlib)
+# Имена файлов не меняются (*.json): читатели через read_file понимают любой формат.
+# Нет нужного пакета при записи — деградируем до json-compact / gzip с предупреждением.
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# 0xC1 не встречается ни в msgpack, ни в начале JSON/UTF-8 — однозначный маркер
+MSGPACK_MAGIC = b"\xc1MP1"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# общий формат артефактов из ARTIFACT_FORMATS (пусто — у каждого свой из таблицы)
+DEFAULT_FORMAT = (os.getenv("ARTIFACT_CODEC") or "").strip().lower()
+STATE_FORMAT = "json"
+
+# формат по умолчанию для конкретных артефактов (переопределяется ARTIFACT_CODEC, а для одного
+# артефакта — ARTIFACT_CODEC_<ИМЯ>, например ARTIFACT_CODEC_PARSED_MATCHED=msgpack+zstd)
+ARTIFACT_FORMATS: Dict[str, str] = {
+    "parsed_etalon.json": "json-compact",
+    "parsed_goods.json": "json-compact",
+    "parsed_matched.json": "json-compact",
+    "parsed_data.json": "json-compact",
+    "region_index.json": "json-compact",
+    "model_fingerprints.json": "json-compact",
+    "model_index.json": "json-compact",
+    "code_index.json": "json-compact",
+    "unmatched_etalon.json": "json-compact",
+    "unmatched_parsed_from_matcher.json": "json-compact",
+    "_competitor_price_cache.json": "json-compact",
+    "posts.json": "json-compact",
+    "group_posts.json": "json-compact",
+    "path_ids.json": "json-compact",
+}
+
+_WARNED: set = set()
+
+
+def _warn_once(key: str, msg: str) -> None:
+    if key not in _WARNED:
+        _WARNED.add(key)
+        print(f"[codec] ⚠️ {msg}")
+
+
+def _msgpack():
+    try:
+        import msgpack  # type: ignore
+        return msgpack
+    except Exception:
+        return None
+
+
+def _zstd():
+    try:
+        import zstandard  # type: ignore
+        return zstandard
+    except Exception:
+        return None
+
+
+def format_for(path: Path) -> str:
+    """
+    Формат записи артефакта: env ARTIFACT_CODEC_<ИМЯ> > ARTIFACT_CODEC > ARTIFACT_FORMATS.
+    Файлы не из ARTIFACT_FORMATS — всегда STATE_FORMAT (их читают и внешние скрипты, и json.load).
+    """
+    name = Path(path).name
+    if name not in ARTIFACT_FORMATS:
+        return STATE_FORMAT
+    env_key = "ARTIFACT_CODEC_" + Path(name).stem.upper().lstrip("_")
+    fmt = os.getenv(env_key)
+    if fmt:
+        return fmt.strip().lower()
+    return DEFAULT_FORMAT or ARTIFACT_FORMATS[name]
+
+
+# ---------- encode ----------
+
+def encode(obj: Any, fmt: str = "json") -> bytes:
+    base, _, comp = (fmt or "json").strip().lower().partition("+")
+
+    if base == "msgpack":
+        mp = _msgpack()
+        if mp is None:
+            _warn_once("msgpack", "msgpack не установлен — пишу json-compact")
+            base = "json-compact"
+        else:
+            data = MSGPACK_MAGIC + mp.packb(obj, use_bin_type=True)
+    if base == "json-compact":
+        data = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    elif base != "msgpack":
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+    if comp == "zstd":
+        zs = _zstd()
+        if zs is None:
+            _warn_once("zstd", "zstandard не установлен — сжимаю gzip")
+            comp = "gzip"
+        else:
+            return zs.ZstdCompressor(level=3).compress(data)
+    if comp == "gzip":
+        return gzip.compress(data, compresslevel=5, mtime=0)
+    return data
+
+
+# ---------- decode ----------
+
+def decode(data: bytes, *, object_pairs_hook: Optional[Callable] = None) -> Any:
+    """
+    Формат определяется по первым байтам (сжатие -> msgpack -> JSON).
+    """
+    if data[:4] == ZSTD_MAGIC:
+        zs = _zstd()
+        if zs is None:
+            raise RuntimeError("zstd-артефакт, но пакет zstandard не установлен")
+        return decode(zs.ZstdDecompressor().decompressobj().decompress(data), object_pairs_hook=object_pairs_hook)
+    if data[:2] == GZIP_MAGIC:
+        return decode(gzip.decompress(data), object_pairs_hook=object_pairs_hook)
+    if data[:4] == MSGPACK_MAGIC:
+        mp = _msgpack()
+        if mp is None:
+            raise RuntimeError("msgpack-артефакт, но пакет msgpack не установлен")
+        return mp.unpackb(data[4:], raw=False, strict_map_key=False)
+    text = data.decode("utf-8-sig")
+    if object_pairs_hook is not None:
+        return json.loads(text, object_pairs_hook=object_pairs_hook)
+    return json.loads(text)
+
+
+# ---------- файлы ----------
+
+def read_file(path: Path, default: Any = None, *, object_pairs_hook: Optional[Callable] = None) -> Any:
+    """
+    Прочитать артефакт любого формата. Нет файла / пустой / битый -> default.
+    """
+    path = Path(path)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return default
+    except Exception:
+        return default
+    if not data.strip():
+        return default
+    try:
+        return decode(data, object_pairs_hook=object_pairs_hook)
+    except Exception:
+        return default
+
+
+def write_file(path: Path, obj: Any, fmt: Optional[str] = None, *, atomic: bool = True) -> None:
+    """
+    Записать артефакт в формате fmt (по умолчанию — format_for(path)); atomic: tmp + replace.
+    """
+    path = Path(path)
+    data = encode(obj, fmt or format_for(path))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not atomic:
+        path.write_bytes(data)
+        return
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
@@ -16,6 +16,8 @@ from bs4 import BeautifulSoup
 import gspread
 from google.oauth2.service_account import Credentials
 
+from handlers import codec, persist_utils
+
 
 # =======================
 # Настройки (env-overrides)
@@ -223,8 +225,7 @@ class _PriceCache:
                 return
             try:
                 if self.path.exists():
-                    raw = self.path.read_text(encoding="utf-8")
-                    obj = json.loads(raw)
+                    obj = codec.decode(self.path.read_bytes())
                     if isinstance(obj, dict):
                         self._data = obj
             except Exception:
@@ -273,9 +274,7 @@ class _PriceCache:
         await self.ensure_loaded()
         async with self._lock:
             try:
-                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
-                tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
-                tmp.replace(self.path)
+                persist_utils.write_json(self.path, self._data)
             except Exception as e:
                 if DEBUG:
                     print(f"⚠️ cache save failed: {e}")
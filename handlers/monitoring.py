@@ -4,7 +4,7 @@ from pathlib import Path
 import json
 import asyncio
 from datetime import datetime
-from storage import load_data, save_data
+from storage import append_monitoring_history, load_data, update_key
 
 router = Router()
 
@@ -37,7 +37,7 @@ async def toggle_monitoring(callback: CallbackQuery):
         # 🔥 при выключении мониторинга очищаем историю
         db["monitoring"]["history"] = []
 
-    save_data(db)
+    update_key("monitoring", db["monitoring"])
     await monitoring_menu(callback)
 
 # === Выбор периодичности ===
@@ -53,7 +53,7 @@ async def set_period(callback: CallbackQuery):
 async def choose_period(callback: CallbackQuery):
     _, val = callback.data.split(":")
     db["monitoring"]["period"] = int(val)
-    save_data(db)
+    update_key("monitoring", db["monitoring"])
     await monitoring_menu(callback)
 
 # === Настройка часов работы ===
@@ -73,14 +73,14 @@ async def set_hours(callback: CallbackQuery):
 async def set_hour_start(callback: CallbackQuery):
     _, diff = callback.data.split(":")
     db["monitoring"]["work_hours"]["start"] += int(diff)
-    save_data(db)
+    update_key("monitoring", db["monitoring"])
     await set_hours(callback)
 
 @router.callback_query(F.data.startswith("hour_end:"))
 async def set_hour_end(callback: CallbackQuery):
     _, diff = callback.data.split(":")
     db["monitoring"]["work_hours"]["end"] += int(diff)
-    save_data(db)
+    update_key("monitoring", db["monitoring"])
     await set_hours(callback)
 
 # === История мониторинга ===
@@ -133,7 +133,7 @@ async def monitoring_log(callback: CallbackQuery):
 @router.callback_query(F.data == "clear_history")
 async def clear_history(callback: CallbackQuery):
     db["monitoring"]["history"] = []
-    save_data(db)
+    update_key("monitoring", db["monitoring"])
     await callback.message.answer("🧹 История мониторинга очищена.",
                                   reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                                       [InlineKeyboardButton(text="⬅️ Назад", callback_data="monitoring")]
@@ -173,7 +173,7 @@ async def monitoring_loop():
                 mon.setdefault("history", []).append(entry)
                 # ✨ Храним только последние 20
                 mon["history"] = mon["history"][-20:]
-                save_data(db)
+                append_monitoring_history(entry, keep=20)
 
         # безопасное ожидание
         await asyncio.sleep(mon.get("period", 30) * 60)
@@ -46,10 +46,13 @@ ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+import storage
+from handlers import codec
 from handlers.normalizers import text_utils as tu
 from handlers.normalizers import entry_dicts as D
 from handlers.normalizers import entry_regex as R
 from handlers.parsing import matcher as matcher_mod
+from handlers.parsing.context import current_pipeline as _pipeline
 
 logger = logging.getLogger("parsing.entry")
 
@@ -57,6 +60,8 @@ logger = logging.getLogger("parsing.entry")
 # PATHS
 # ============================================================
 
+# Пути ниже — значения по умолчанию (общая папка). Во время прогона функции берут
+# пути из handlers.parsing.context.current_pipeline(): у пользователя — своя папка.
 BASE_DIR = ROOT
 DATA_DIR = BASE_DIR / "handlers" / "parsing" / "data"
 
@@ -93,7 +98,7 @@ def _load_json(path: Path, default: Any):
     if not path.exists():
         return default
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return codec.decode(path.read_bytes())
     except Exception as e:
         logger.warning("Failed to read json %s: %s", path, e)
         return default
@@ -103,10 +108,11 @@ def _save_json(path: Path, obj: Any) -> None:
     """
     Atomic save: write to .tmp then replace.
     Prevents half-written JSON on crash.
+    Format is per artifact (handlers.codec.format_for).
     """
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.write_bytes(codec.encode(obj, codec.format_for(path)))
     tmp.replace(path)
 
 
@@ -121,6 +127,15 @@ def _build_id_for_file(path: Path) -> str:
         return "0:0"
 
 
+def _load_root_data(root_data_path: Path) -> Tuple[Dict[str, Any], str]:
+    """
+    data.json проекта читаем через storage (кэш в памяти / SQLite), любой другой файл — напрямую.
+    """
+    if Path(root_data_path) == ROOT_DATA_JSON:
+        return storage.read_data(), storage.data_build_id()
+    return _load_json(root_data_path, {}), _build_id_for_file(root_data_path)
+
+
 def _clean(s: str) -> str:
     return tu.clean_generic_text(tu.fix_confusables(s or ""))
 
@@ -1833,7 +1848,7 @@ def build_code_index(etalon_items: List[Dict[str, Any]]) -> Dict[str, Dict[str,
 
 
 def _load_code_index() -> Dict[str, Dict[str, Any]]:
-    ci = _load_json(CODE_INDEX_JSON, {})
+    ci = _load_json(_pipeline().code_index, {})
     if isinstance(ci, dict):
         idx = ci.get("index")
         if isinstance(idx, dict) and idx:
@@ -1842,13 +1857,13 @@ def _load_code_index() -> Dict[str, Dict[str, Any]]:
 
 
 def _load_model_index() -> Dict[str, Dict[str, Any]]:
-    mi = _load_json(MODEL_INDEX_JSON, {})
+    mi = _load_json(_pipeline().model_index, {})
     if isinstance(mi, dict):
         idx = mi.get("index")
         if isinstance(idx, dict) and idx:
             return idx
 
-    pe = _load_json(PARSED_ETALON_JSON, {})
+    pe = _load_json(_pipeline().parsed_etalon, {})
     items = (pe.get("items") if isinstance(pe, dict) else None) or []
     if not isinstance(items, list):
         items = []
@@ -3734,8 +3749,9 @@ def normalize_text_as_etalon_item(
 
     raw = _clean(raw_in) if prefer_clean else raw_in
 
-    if not PARSED_ETALON_JSON.exists():
-        run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=PARSED_ETALON_JSON)
+    parsed_etalon_path = _pipeline().parsed_etalon
+    if not parsed_etalon_path.exists():
+        run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=parsed_etalon_path)
 
     model_index = _load_model_index()
     code_index = _load_code_index()
@@ -3785,8 +3801,9 @@ def normalize_text_as_goods_item(
 
     raw = _clean(raw_in) if prefer_clean else raw_in
 
-    if not PARSED_ETALON_JSON.exists():
-        run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=PARSED_ETALON_JSON)
+    parsed_etalon_path = _pipeline().parsed_etalon
+    if not parsed_etalon_path.exists():
+        run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=parsed_etalon_path)
 
     model_index = _load_model_index()
     code_index = _load_code_index()
@@ -3836,13 +3853,11 @@ def run_build_parsed_etalon(
     out_path: Path | None = None,
 ) -> Dict[str, Any]:
     if out_path is None:
-        out_path = PARSED_ETALON_JSON
-    db = _load_json(root_data_path, {})
+        out_path = _pipeline().parsed_etalon
+    db, build_id = _load_root_data(root_data_path)
     if not isinstance(db, dict):
         db = {}
 
-    build_id = _build_id_for_file(root_data_path)
-
     items: List[Dict[str, Any]] = []
 
     cnt_brand = Counter()
@@ -3946,28 +3961,28 @@ def run_build_parsed_etalon(
     model_index, aliases_map, collisions = build_model_index_and_aliases(items)
     code_index = build_code_index(items)
 
-    _save_json(MODEL_INDEX_JSON, {
+    _save_json(_pipeline().model_index, {
         "scope": SCOPE_ETALON,
         "build_id": build_id,
         "index_count": len(model_index),
         "index": model_index,
     })
 
-    _save_json(MODEL_ALIASES_JSON, {
+    _save_json(_pipeline().model_aliases, {
         "scope": SCOPE_ETALON,
         "build_id": build_id,
         "aliases_count": len(aliases_map),
         "aliases": aliases_map,
     })
 
-    _save_json(ALIAS_COLLISIONS_JSON, {
+    _save_json(_pipeline().alias_collisions, {
         "scope": SCOPE_ETALON,
         "build_id": build_id,
         "collisions_count": len(collisions),
         "collisions": collisions,
     })
 
-    _save_json(CODE_INDEX_JSON, {
+    _save_json(_pipeline().code_index, {
         "scope": SCOPE_ETALON,
         "build_id": build_id,
         "index_count": len(code_index),
@@ -4008,7 +4023,7 @@ def run_build_parsed_etalon(
             "case": cnt_case.most_common(10),
         }
     }
-    _save_json(LEARNED_TOKENS_JSON, learned)
+    _save_json(_pipeline().learned_tokens, learned)
 
     stats = {
         "scope": SCOPE_ETALON,
@@ -4041,7 +4056,7 @@ def run_build_parsed_etalon(
         "aliases": {"count": len(aliases_map), "collisions": len(collisions)},
         "code_index": {"count": len(code_index)},
     }
-    _save_json(ETALON_STATS_JSON, stats)
+    _save_json(_pipeline().etalon_stats, stats)
 
     return {
         "items_count": len(items),
@@ -4057,11 +4072,12 @@ def ensure_etalon_ready() -> None:
     """
     Ensure parsed_etalon + indexes are built and up-to-date with data.json.
     """
-    build_id = _build_id_for_file(ROOT_DATA_JSON)
+    build_id = storage.data_build_id()
 
-    mi = _load_json(MODEL_INDEX_JSON, {})
-    ci = _load_json(CODE_INDEX_JSON, {})
-    pe = _load_json(PARSED_ETALON_JSON, {})
+    ctx = _pipeline()
+    mi = _load_json(ctx.model_index, {})
+    ci = _load_json(ctx.code_index, {})
+    pe = _load_json(ctx.parsed_etalon, {})
 
     def ok(meta: Any) -> bool:
         return isinstance(meta, dict) and (meta.get("build_id") == build_id)
@@ -4070,7 +4086,7 @@ def ensure_etalon_ready() -> None:
         return
 
     logger.info("Etalon/index build_id mismatch -> rebuilding etalon (build_id=%s)", build_id)
-    run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=PARSED_ETALON_JSON)
+    run_build_parsed_etalon(root_data_path=ROOT_DATA_JSON, out_path=ctx.parsed_etalon)
 
 
 # ============================================================
@@ -4085,15 +4101,15 @@ def run_build_parsed_goods(
     run_matcher: bool = True,
 ) -> Dict[str, Any]:
     if messages_path is None:
-        messages_path = PARSED_MESSAGES_JSON
+        messages_path = _pipeline().parsed_messages
     if out_path is None:
-        out_path = PARSED_GOODS_JSON
+        out_path = _pipeline().parsed_goods
     if ensure_etalon:
         ensure_etalon_ready()
 
     model_index = _load_model_index()
     if not model_index:
-        raise RuntimeError("model_index is empty (check etalon build / MODEL_INDEX_JSON)")
+        raise RuntimeError("model_index is empty (check etalon build / model_index.json)")
 
     code_index = _load_code_index()
 
@@ -4282,7 +4298,7 @@ def run_build_parsed_goods(
         }
     }
     _save_json(out_path, out)
-    _save_json(UNMATCHED_PARSED_JSON, {
+    _save_json(_pipeline().unmatched_parsed, {
         "source": str(messages_path),
         "items": unmatched,
         "items_count": len(unmatched),
@@ -4297,7 +4313,7 @@ def run_build_parsed_goods(
         "goods_count": len(goods),
         "unmatched_count": len(unmatched),
         "out": str(out_path),
-        "unmatched_out": str(UNMATCHED_PARSED_JSON),
+        "unmatched_out": str(_pipeline().unmatched_parsed),
         "code_index_loaded": bool(code_index),
         "code_index_count": len(code_index) if code_index else 0,
         "matcher_ran": bool(run_matcher),
@@ -4311,16 +4327,17 @@ def run_build_parsed_goods(
 # ============================================================
 
 def run_matcher_stage():
-    if not PARSED_GOODS_JSON.exists() or PARSED_GOODS_JSON.stat().st_size < 20:
-        raise RuntimeError(f"parsed_goods.json not ready: {PARSED_GOODS_JSON}")
+    ctx = _pipeline()
+    if not ctx.parsed_goods.exists() or ctx.parsed_goods.stat().st_size < 20:
+        raise RuntimeError(f"parsed_goods.json not ready: {ctx.parsed_goods}")
 
     return matcher_mod.run_matcher(
-        etalon_path=PARSED_ETALON_JSON,
-        goods_path=PARSED_GOODS_JSON,
-        matched_path=PARSED_MATCHED_JSON,
-        stats_path=MATCH_STATS_JSON,
-        unmatched_etalon_path=UNMATCHED_ETALON_JSON,
-        unmatched_parsed_path=UNMATCHED_PARSED_FROM_MATCHER_JSON,
+        etalon_path=ctx.parsed_etalon,
+        goods_path=ctx.parsed_goods,
+        matched_path=ctx.parsed_matched,
+        stats_path=ctx.match_stats,
+        unmatched_etalon_path=ctx.unmatched_etalon,
+        unmatched_parsed_path=ctx.unmatched_parsed_from_matcher,
     )
 
 
@@ -4332,14 +4349,15 @@ def run_matcher_stage():
 def run_as_parser() -> Dict[str, Any]:
     logger.info("ENTRY: run_as_parser() start")
 
+    ctx = _pipeline()
     et = run_build_parsed_etalon(
         root_data_path=ROOT_DATA_JSON,
-        out_path=PARSED_ETALON_JSON,
+        out_path=ctx.parsed_etalon,
     )
 
     gd = run_build_parsed_goods(
-        messages_path=PARSED_MESSAGES_JSON,
-        out_path=PARSED_GOODS_JSON,
+        messages_path=ctx.parsed_messages,
+        out_path=ctx.parsed_goods,
         ensure_etalon=True,
         run_matcher=True,
     )
@@ -0,0 +1,99 @@
+# handlers/parsing/change_feed.py
+# Лента изменений цен между поколениями (parsing/generations.py).
+#
+# results на каждой сборке считает отпечаток входных данных рендера каждой модели
+# (поддерево parsed_data: варианты, min_price, каналы + её записи в region_index)
+# и кладёт в поколение:
+#   model_fingerprints.json — {"etalon_build_id": ..., "models": {"кат\x1fбренд\x1f...\x1fмодель": fp}}
+#   price_changes.json      — {"gen_base": <предыдущее поколение>, "full": bool, "changed": [[путь], ...]}
+# full=True — сравнивать не с чем или поменялись etalon/catalog в data.json (шаблоны постов): нужен полный проход.
+# etalon_build_id — storage.key_build_id("etalon", "catalog"): записи в другие ключи (monitoring,
+# настройки, автоответы) ленту не сбрасывают.
+#
+# Публикация (channel_updater) по changed_paths_since() узнаёт, какие модели изменились с поколения,
+# по которому канал синхронизировали в прошлый раз, и правит только их посты.
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from handlers import codec
+from handlers.parsing.generations import (
+    GENERATIONS_KEEP,
+    current_generation_dir,
+    current_generation_id,
+    generation_dir,
+)
+
+FEED_NAME = "price_changes.json"
+FINGERPRINTS_NAME = "model_fingerprints.json"
+
+_SEP = "\x1f"
+
+
+def path_key(path: Iterable[str]) -> str:
+    return _SEP.join(str(x) for x in path)
+
+
+def _key_path(key: str) -> Tuple[str, ...]:
+    return tuple(key.split(_SEP))
+
+
+def write_change_feed(data_dir: Path, fingerprints: Dict[str, str], *, etalon_build_id: str) -> dict:
+    """
+    Сравнивает отпечатки моделей с текущим (ещё не заменённым) поколением data_dir и пишет
+    model_fingerprints.json + price_changes.json в рабочую папку — их опубликует publish_generation.
+    """
+    data_dir = Path(data_dir)
+    base_id = current_generation_id(data_dir)
+    prev = codec.read_file(current_generation_dir(data_dir) / FINGERPRINTS_NAME, None) if base_id else None
+
+    full = True
+    changed: List[List[str]] = []
+    if isinstance(prev, dict) and isinstance(prev.get("models"), dict) and prev.get("etalon_build_id") == etalon_build_id:
+        full = False
+        old = prev["models"]
+        for key in sorted(set(old) | set(fingerprints)):
+            if old.get(key) != fingerprints.get(key):
+                changed.append(list(_key_path(key)))
+
+    codec.write_file(
+        data_dir / FINGERPRINTS_NAME,
+        {"etalon_build_id": etalon_build_id, "models": fingerprints},
+    )
+    feed = {
+        "gen_base": base_id,
+        "full": full,
+        "changed": changed,
+        "created_ns": time.time_ns(),
+    }
+    codec.write_file(data_dir / FEED_NAME, feed)
+    return feed
+
+
+def changed_paths_since(data_dir: Path, gen_id: Optional[str]) -> Optional[Set[Tuple[str, ...]]]:
+    """
+    Пути моделей, изменившихся между поколением gen_id и текущим (объединение лент по цепочке gen_base).
+    None — точный список не восстановить (нет поколений/лент, в цепочке полная пересборка,
+    gen_id уже удалён) — тогда нужен полный проход.
+    """
+    data_dir = Path(data_dir)
+    cur = current_generation_id(data_dir)
+    if not gen_id or not cur:
+        return None
+
+    out: Set[Tuple[str, ...]] = set()
+    # дальше GENERATIONS_KEEP поколений назад файлов уже нет
+    for _ in range(GENERATIONS_KEEP + 1):
+        if cur == gen_id:
+            return out
+        feed = codec.read_file(generation_dir(data_dir, cur) / FEED_NAME, None)
+        if not isinstance(feed, dict) or feed.get("full") or not feed.get("gen_base"):
+            return None
+        for p in feed.get("changed") or []:
+            if isinstance(p, list) and p:
+                out.add(tuple(str(x) for x in p))
+        cur = str(feed["gen_base"])
+    return out if cur == gen_id else None
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Iterator, Optional
 import json
 
 
@@ -18,61 +21,130 @@ def _ensure_file(path: Path, default_obj) -> None:
         path.write_text(json.dumps(default_obj, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def set_parsing_data_dir(base_dir: Path) -> None:
-    base_dir = Path(base_dir).resolve()
-    base_dir.mkdir(parents=True, exist_ok=True)
-
-    # handlers/parsing/__init__.py
-    from handlers import parsing as parsing_mod
-
-    parsing_mod.BASE_DIR = base_dir
-    parsing_mod.PARSED_FILE = base_dir / "parsed_data.json"
-    parsing_mod.CACHE_FILE = base_dir / "parsed_cache.json"
-    parsing_mod.MESSAGES_FILE = base_dir / "parsed_messages.json"
-    parsing_mod.UNMATCHED_ETALON_FILE = base_dir / "unmatched_etalon.json"
-    parsing_mod.UNMATCHED_PARSED_FILE = base_dir / "unmatched_parsed.json"
-
-    _ensure_file(parsing_mod.PARSED_FILE, {"etalon_with_prices": [], "timestamp": ""})
-    _ensure_file(parsing_mod.CACHE_FILE, {"meta": {"etalon_hash": None, "last_updated": ""}})
-    _ensure_file(parsing_mod.MESSAGES_FILE, [])
-    _ensure_file(parsing_mod.UNMATCHED_ETALON_FILE, [])
-    _ensure_file(parsing_mod.UNMATCHED_PARSED_FILE, [])
-
-    # handlers/parsing/parser.py
-    from handlers.parsing import parser as parser_mod
-    parser_mod.DATA_DIR = base_dir
-    parser_mod.MESSAGES_FILE = base_dir / "parsed_messages.json"
-
-    # handlers/normalizers/entry.py
-    from handlers.normalizers import entry as entry_mod
-    entry_mod.DATA_DIR = base_dir
-    entry_mod.PARSED_ETALON_JSON = base_dir / "parsed_etalon.json"
-    entry_mod.PARSED_MESSAGES_JSON = base_dir / "parsed_messages.json"
-    entry_mod.PARSED_GOODS_JSON = base_dir / "parsed_goods.json"
-    entry_mod.ETALON_STATS_JSON = base_dir / "etalon_stats.json"
-    entry_mod.MODEL_ALIASES_JSON = base_dir / "model_aliases.json"
-    entry_mod.MODEL_INDEX_JSON = base_dir / "model_index.json"
-    entry_mod.CODE_INDEX_JSON = base_dir / "code_index.json"
-    entry_mod.LEARNED_TOKENS_JSON = base_dir / "etalon_learned_tokens.json"
-    entry_mod.ALIAS_COLLISIONS_JSON = base_dir / "alias_collisions.json"
-    entry_mod.PARSED_MATCHED_JSON = base_dir / "parsed_matched.json"
-    entry_mod.UNMATCHED_PARSED_JSON = base_dir / "unmatched_parsed.json"
-    entry_mod.MATCH_STATS_JSON = base_dir / "match_stats.json"
-    entry_mod.UNMATCHED_ETALON_JSON = base_dir / "unmatched_etalon.json"
-    entry_mod.UNMATCHED_PARSED_FROM_MATCHER_JSON = base_dir / "unmatched_parsed_from_matcher.json"
-
-    # handlers/parsing/matcher.py
-    from handlers.parsing import matcher as matcher_mod
-    matcher_mod.DATA_DIR = base_dir
-    matcher_mod.ETALON_FILE = base_dir / "parsed_etalon.json"
-    matcher_mod.GOODS_FILE = base_dir / "parsed_goods.json"
-    matcher_mod.MATCHED_FILE = base_dir / "parsed_matched.json"
-    matcher_mod.UNMATCHED_ETALON_FILE = base_dir / "unmatched_etalon.json"
-    matcher_mod.UNMATCHED_PARSED_FILE = base_dir / "unmatched_parsed.json"
-    matcher_mod.MATCH_STATS_FILE = base_dir / "match_stats.json"
-
-    # handlers/parsing/results.py
-    from handlers.parsing import results as results_mod
-    results_mod.DATA_DIR = base_dir
-    results_mod.MATCHED_FILE = base_dir / "parsed_matched.json"
-    results_mod.PARSED_FILE = base_dir / "parsed_data.json"
+class PipelineContext:
+    """
+    Папка данных одного прогона пайплайна (parser -> entry -> matcher -> results)
+    и пути всех его артефактов. Передаётся через contextvar, а не через
+    глобальные переменные модулей, поэтому пайплайны разных пользователей
+    (asyncio-задачи / asyncio.to_thread) не пишут в чужие папки.
+    """
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir).resolve()
+
+    def __repr__(self) -> str:
+        return f"PipelineContext({str(self.base_dir)!r})"
+
+    def path(self, name: str) -> Path:
+        return self.base_dir / name
+
+    @property
+    def is_default(self) -> bool:
+        return self.base_dir == DEFAULT_BASE_DIR
+
+    # parser
+    @property
+    def parsed_messages(self) -> Path:
+        return self.path("parsed_messages.json")
+
+    @property
+    def parsed_cache(self) -> Path:
+        return self.path("parsed_cache.json")
+
+    # entry
+    @property
+    def parsed_etalon(self) -> Path:
+        return self.path("parsed_etalon.json")
+
+    @property
+    def parsed_goods(self) -> Path:
+        return self.path("parsed_goods.json")
+
+    @property
+    def etalon_stats(self) -> Path:
+        return self.path("etalon_stats.json")
+
+    @property
+    def model_aliases(self) -> Path:
+        return self.path("model_aliases.json")
+
+    @property
+    def model_index(self) -> Path:
+        return self.path("model_index.json")
+
+    @property
+    def code_index(self) -> Path:
+        return self.path("code_index.json")
+
+    @property
+    def learned_tokens(self) -> Path:
+        return self.path("etalon_learned_tokens.json")
+
+    @property
+    def alias_collisions(self) -> Path:
+        return self.path("alias_collisions.json")
+
+    @property
+    def unmatched_parsed(self) -> Path:
+        return self.path("unmatched_parsed.json")
+
+    # matcher
+    @property
+    def parsed_matched(self) -> Path:
+        return self.path("parsed_matched.json")
+
+    @property
+    def match_stats(self) -> Path:
+        return self.path("match_stats.json")
+
+    @property
+    def unmatched_etalon(self) -> Path:
+        return self.path("unmatched_etalon.json")
+
+    @property
+    def unmatched_parsed_from_matcher(self) -> Path:
+        return self.path("unmatched_parsed_from_matcher.json")
+
+    # results
+    @property
+    def parsed_data(self) -> Path:
+        return self.path("parsed_data.json")
+
+    @property
+    def region_index(self) -> Path:
+        return self.path("region_index.json")
+
+    def ensure_files(self) -> None:
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        _ensure_file(self.parsed_data, {"etalon_with_prices": [], "timestamp": ""})
+        _ensure_file(self.parsed_cache, {"meta": {"etalon_hash": None, "last_updated": ""}})
+        _ensure_file(self.parsed_messages, [])
+        _ensure_file(self.unmatched_etalon, [])
+        _ensure_file(self.unmatched_parsed, [])
+
+
+_DEFAULT_PIPELINE = PipelineContext(DEFAULT_BASE_DIR)
+_PIPELINE_CTX: ContextVar[Optional[PipelineContext]] = ContextVar("parsing_pipeline", default=None)
+
+
+def current_pipeline() -> PipelineContext:
+    """
+    Контекст текущего прогона; вне pipeline_context() — общая папка DEFAULT_BASE_DIR.
+    """
+    return _PIPELINE_CTX.get() or _DEFAULT_PIPELINE
+
+
+@contextmanager
+def pipeline_context(base_dir: Path) -> Iterator[PipelineContext]:
+    """
+    with pipeline_context(user_data_dir(uid)):
+        await asyncio.to_thread(run_pipeline)   # to_thread копирует contextvars
+    """
+    ctx = PipelineContext(base_dir)
+    ctx.ensure_files()
+    token = _PIPELINE_CTX.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _PIPELINE_CTX.reset(token)
+
@@ -0,0 +1,171 @@
+# handlers/parsing/generations.py
+# Поколения артефактов пайплайна:
+#   <data_dir>/generations/<gen_id>/{parsed_data.json, parsed_matched.json, region_index.json,
+#                                    model_fingerprints.json, price_changes.json, manifest.json}
+#   <data_dir>/CURRENT  -> "<gen_id>"   (атомарно переключается после полной записи поколения)
+#
+# Пайплайн пишет рабочие файлы в <data_dir> как раньше, а в конце публикует их
+# новым поколением. Читатели (view_prices / channel_updater / auto_replies) берут
+# файлы только из текущего поколения: никаких полу-записанных цепочек файлов,
+# а кэш в памяти инвалидируется одним stat() указателя.
+
+from __future__ import annotations
+
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GENERATIONS_DIRNAME = "generations"
+POINTER_NAME = "CURRENT"
+MANIFEST_NAME = "manifest.json"
+
+# сколько поколений держим на диске (читатель мог закрепить предыдущее)
+GENERATIONS_KEEP = 3
+
+# что публикуем из рабочей папки
+PUBLISHED_FILES = (
+    "parsed_data.json",
+    "parsed_matched.json",
+    "region_index.json",
+    "model_fingerprints.json",   # parsing/change_feed.py
+    "price_changes.json",
+)
+
+# str(data_dir) -> (stat указателя, gen_id)
+_POINTER_CACHE: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def _pointer_path(data_dir: Path) -> Path:
+    return Path(data_dir) / POINTER_NAME
+
+
+def _generations_root(data_dir: Path) -> Path:
+    return Path(data_dir) / GENERATIONS_DIRNAME
+
+
+def _new_gen_id() -> str:
+    return f"g{time.time_ns():x}"
+
+
+def _copy_artifact(src: Path, dst: Path) -> None:
+    """
+    Именно копия (не hardlink): часть писателей (matcher, сброс в parser) пишет
+    рабочие файлы на месте, и общий inode испортил бы опубликованное поколение.
+    copy2 сохраняет mtime — по нему region_index сверяет версию parsed_matched.json.
+    """
+    shutil.copy2(src, dst)
+
+
+def publish_generation(data_dir: Path, names: Iterable[str] = PUBLISHED_FILES) -> Optional[str]:
+    """
+    Собирает новое поколение из рабочих файлов data_dir и атомарно переключает CURRENT.
+    Возвращает gen_id (или None, если публиковать нечего).
+    """
+    data_dir = Path(data_dir)
+    present = [n for n in names if (data_dir / n).exists()]
+    if not present:
+        return None
+
+    gen_id = _new_gen_id()
+    root = _generations_root(data_dir)
+    gen_dir = root / gen_id
+    tmp_dir = root / f".{gen_id}.tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    for name in present:
+        _copy_artifact(data_dir / name, tmp_dir / name)
+    (tmp_dir / MANIFEST_NAME).write_text(
+        json.dumps({"gen_id": gen_id, "files": present, "created_ns": time.time_ns()}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    tmp_dir.replace(gen_dir)
+
+    pointer = _pointer_path(data_dir)
+    tmp_ptr = pointer.with_name(pointer.name + ".tmp")
+    tmp_ptr.write_text(gen_id, encoding="utf-8")
+    tmp_ptr.replace(pointer)
+
+    _prune_generations(data_dir, keep_id=gen_id)
+    return gen_id
+
+
+def _prune_generations(data_dir: Path, *, keep_id: str) -> None:
+    root = _generations_root(data_dir)
+    try:
+        gens = sorted(p for p in root.iterdir() if p.is_dir())
+    except Exception:
+        return
+    live = [p for p in gens if not p.name.startswith(".")]
+    stale = [p for p in gens if p.name.startswith(".")]
+    old = [p for p in live if p.name != keep_id][: max(0, len(live) - GENERATIONS_KEEP)]
+    for p in old + stale:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def current_generation_id(data_dir: Path) -> Optional[str]:
+    """
+    gen_id из CURRENT. Файл перечитывается, только если изменился его stat.
+    """
+    pointer = _pointer_path(data_dir)
+    try:
+        st = pointer.stat()
+    except Exception:
+        _POINTER_CACHE.pop(str(data_dir), None)
+        return None
+    sig = (int(st.st_mtime_ns), int(st.st_size))
+    cached = _POINTER_CACHE.get(str(data_dir))
+    if cached and cached[0] == sig:
+        return cached[1] or None
+    try:
+        gen_id = pointer.read_text(encoding="utf-8").strip()
+    except Exception:
+        gen_id = ""
+    if gen_id and not (_generations_root(data_dir) / gen_id).is_dir():
+        gen_id = ""
+    _POINTER_CACHE[str(data_dir)] = (sig, gen_id)
+    return gen_id or None
+
+
+def generation_dir(data_dir: Path, gen_id: str) -> Path:
+    return _generations_root(data_dir) / gen_id
+
+
+def current_generation_dir(data_dir: Path) -> Path:
+    """
+    Папка текущего поколения; если поколений ещё нет — сама data_dir (legacy-раскладка).
+    """
+    gen_id = current_generation_id(data_dir)
+    if gen_id:
+        return _generations_root(data_dir) / gen_id
+    return Path(data_dir)
+
+
+def generation_file(data_dir: Path, name: str) -> Path:
+    """
+    Путь к артефакту name в текущем поколении (fallback — рабочий файл в data_dir).
+    """
+    gen_dir = current_generation_dir(data_dir)
+    p = gen_dir / name
+    if p.exists() or gen_dir == Path(data_dir):
+        return p
+    return Path(data_dir) / name
+
+
+def is_generation_path(path: Path) -> bool:
+    """
+    Файл лежит внутри опубликованного поколения (он неизменяем — кэш можно не перепроверять).
+    """
+    try:
+        return Path(path).parent.parent.name == GENERATIONS_DIRNAME
+    except Exception:
+        return False
+
+
+def list_generations(data_dir: Path) -> List[str]:
+    root = _generations_root(data_dir)
+    try:
+        return sorted(p.name for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    except Exception:
+        return []
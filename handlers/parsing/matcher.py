@@ -16,7 +16,6 @@
 
 from __future__ import annotations
 
-import json
 import re
 import sys
 from pathlib import Path
@@ -41,6 +40,11 @@ except Exception:
     D = None  # type: ignore
 
 
+from handlers import codec
+from handlers.parsing.context import current_pipeline
+from handlers.parsing.generations import current_generation_id, generation_dir
+
+
 # ======================
 # ✅ AFTER-MATCH PIPELINE (build parsed_data.json)
 # ======================
@@ -922,7 +926,7 @@ def _load_items(path: Path) -> List[dict]:
     if not path.exists():
         return []
     try:
-        obj = json.loads(path.read_text(encoding="utf-8"))
+        obj = codec.decode(path.read_bytes())
     except Exception:
         return []
     if isinstance(obj, dict):
@@ -933,25 +937,52 @@ def _load_items(path: Path) -> List[dict]:
     return []
 
 
+def _load_previous_matched(matched_path: Path) -> Optional[List[dict]]:
+    """
+    matched прошлого прогона — из опубликованного поколения: рабочий parsed_matched.json
+    parser._reset_data_dir_files() обнуляет перед каждым прогоном.
+    None — поколений ещё нет (инкрементально пересобрать не из чего).
+    """
+    data_dir = Path(matched_path).parent
+    gen_id = current_generation_id(data_dir)
+    if not gen_id:
+        return None
+    prev_path = generation_dir(data_dir, gen_id) / Path(matched_path).name
+    if not prev_path.exists():
+        return None
+    return _load_items(prev_path)
+
+
 def _write_json(path: Path, obj: Any):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    codec.write_file(path, obj)
 
 
 def run_matcher(
     *,
-    etalon_path: Path = ETALON_FILE,
-    goods_path: Path = GOODS_FILE,
-    matched_path: Path = MATCHED_FILE,
-    stats_path: Path = MATCH_STATS_FILE,
-    unmatched_etalon_path: Path = UNMATCHED_ETALON_FILE,
-    unmatched_parsed_path: Path = UNMATCHED_PARSED_FILE,
+    etalon_path: Optional[Path] = None,
+    goods_path: Optional[Path] = None,
+    matched_path: Optional[Path] = None,
+    stats_path: Optional[Path] = None,
+    unmatched_etalon_path: Optional[Path] = None,
+    unmatched_parsed_path: Optional[Path] = None,
 ) -> dict:
+    # пути не переданы — берём из контекста текущего прогона (общая папка или папка пользователя)
+    ctx = current_pipeline()
+    etalon_path = etalon_path or ctx.parsed_etalon
+    goods_path = goods_path or ctx.parsed_goods
+    matched_path = matched_path or ctx.parsed_matched
+    stats_path = stats_path or ctx.match_stats
+    unmatched_etalon_path = unmatched_etalon_path or ctx.unmatched_etalon
+    unmatched_parsed_path = unmatched_parsed_path or ctx.unmatched_parsed
+
     parsed_etalon = _load_items(etalon_path)
     parsed_pool = _load_items(goods_path)
 
     matched, stats, unmatched_etalon, unmatched_parsed = match_etalon_with_parsed(parsed_etalon, parsed_pool)
 
+    # прошлый результат нужен results_builder для инкрементальной пересборки parsed_data.json
+    previous_matched = _load_previous_matched(matched_path)
+
     _write_json(
         matched_path,
         {
@@ -963,7 +994,12 @@ def run_matcher(
 
     try:
         if results_builder is not None:
-            results_builder.rebuild_parsed_data_all()
+            changed = results_builder.changed_model_paths(previous_matched or [], matched)
+            results_builder.rebuild_parsed_data_incremental(
+                changed,
+                matched=matched,
+                previous_matched=previous_matched,
+            )
         else:
             print("[matcher] ⚠️ results_builder import failed (skipped parsed_data rebuild)")
     except Exception as e:
@@ -0,0 +1,163 @@
+# handlers/parsing/overlay.py
+# Слоёные цены для sources_mode == "custom":
+#   base (общий parsed_data.json) + user (parsed_data.json пользователя)
+# Ничего не склеиваем на диске и не пересобираем пайплайн на пользователя:
+# цена варианта считается при чтении — минимум по слоям, при равной цене
+# каналы/регионы объединяются. Поиск — O(1) на вариант (dict по пути модели).
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from handlers import codec
+from handlers.parsing.results import _file_build_id, _is_model_leaf, _price_to_float
+
+ModelKey = Tuple[str, ...]
+PriceLayer = Dict[ModelKey, Dict[str, Any]]
+
+_LAYER_CACHE: Dict[str, Tuple[str, PriceLayer]] = {}
+_OVERLAY_CACHE: Dict[Tuple[str, ...], "PriceOverlay"] = {}
+
+
+def _flatten_models(catalog: Any) -> PriceLayer:
+    """
+    catalog (дерево parsed_data) -> {tuple(model_path): {variant_title: variant_value}}
+    """
+    out: PriceLayer = {}
+
+    def walk(node: Any, path: List[str]) -> None:
+        if not isinstance(node, dict):
+            return
+        for k, v in node.items():
+            key = str(k)
+            if isinstance(v, dict) and v and _is_model_leaf(v):
+                out[tuple(path + [key])] = v
+                continue
+            if isinstance(v, dict):
+                walk(v, path + [key])
+
+    walk(catalog, [])
+    return out
+
+
+def load_price_layer(parsed_path: Path) -> PriceLayer:
+    """
+    Плоский слой цен из parsed_data.json (кэш по mtime+size файла).
+    """
+    parsed_path = Path(parsed_path)
+    build_id = _file_build_id(parsed_path)
+    cached = _LAYER_CACHE.get(str(parsed_path))
+    if cached and cached[0] == build_id:
+        return cached[1]
+
+    layer: PriceLayer = {}
+    try:
+        if parsed_path.exists():
+            data = codec.decode(parsed_path.read_bytes())
+            if isinstance(data, dict):
+                layer = _flatten_models(data.get("catalog"))
+    except Exception:
+        layer = {}
+
+    _LAYER_CACHE[str(parsed_path)] = (build_id, layer)
+    return layer
+
+
+def _merge_lists(a: Any, b: Any) -> List[str]:
+    out: List[str] = []
+    for src in (a, b):
+        if isinstance(src, str):
+            src = [src]
+        for x in (src or []):
+            s = str(x or "").strip()
+            if s and s not in out:
+                out.append(s)
+    return out
+
+
+class PriceOverlay:
+    """
+    Read-time объединение нескольких слоёв цен (первый слой — базовый).
+    """
+
+    def __init__(self, layers: Iterable[PriceLayer], *, version: str = ""):
+        self.layers: List[PriceLayer] = [x for x in layers if isinstance(x, dict)]
+        self.version = version
+
+    def variant(self, model_path: Iterable[str], title: str) -> Dict[str, Any]:
+        """
+        {"min_price", "best_channels", "region_min"} либо {} (цены нет ни в одном слое).
+        """
+        key = tuple(str(x) for x in (model_path or ()))
+        best: Optional[Dict[str, Any]] = None
+        best_price: Optional[float] = None
+        for layer in self.layers:
+            leaf = layer.get(key)
+            if not leaf:
+                continue
+            info = leaf.get(title)
+            if not isinstance(info, dict):
+                continue
+            price = _price_to_float(info.get("min_price"))
+            if price is None:
+                continue
+            if best is None or price < best_price:
+                best = {
+                    "min_price": info.get("min_price"),
+                    "best_channels": list(info.get("best_channels") or []),
+                    "region_min": info.get("region_min"),
+                }
+                best_price = price
+            elif price == best_price:
+                best["best_channels"] = _merge_lists(best.get("best_channels"), info.get("best_channels"))
+                best["region_min"] = _merge_lists(best.get("region_min"), info.get("region_min"))
+        return best or {}
+
+    def model_variants(self, model_path: Iterable[str], base_variants: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Лист модели с ценами из всех слоёв (порядок вариантов — как в base_variants).
+        """
+        key = tuple(str(x) for x in (model_path or ()))
+        titles: List[str] = [str(t) for t in (base_variants or {}).keys()]
+        seen = set(titles)
+        for layer in self.layers:
+            for t in (layer.get(key) or {}).keys():
+                if t not in seen:
+                    seen.add(t)
+                    titles.append(t)
+        return {t: self.variant(key, t) for t in titles}
+
+    def apply_to_catalog(self, catalog: Any, _path: Optional[List[str]] = None) -> Any:
+        """
+        Копия дерева каталога, где листья моделей заменены на объединённые (для полного обхода, например sync_channel).
+        """
+        path = list(_path or [])
+        if not isinstance(catalog, dict):
+            return catalog
+        out: Dict[str, Any] = {}
+        for k, v in catalog.items():
+            key = str(k)
+            if isinstance(v, dict) and v and _is_model_leaf(v):
+                out[k] = self.model_variants(path + [key], v)
+            elif isinstance(v, dict):
+                out[k] = self.apply_to_catalog(v, path + [key])
+            else:
+                out[k] = v
+        return out
+
+
+def overlay_for_paths(*parsed_paths: Path) -> PriceOverlay:
+    """
+    Overlay по нескольким parsed_data.json (base первым). Кэш по версиям файлов.
+    """
+    paths = [Path(p) for p in parsed_paths]
+    key = tuple(f"{p}@{_file_build_id(p)}" for p in paths)
+    cached = _OVERLAY_CACHE.get(key)
+    if cached is not None:
+        return cached
+    ov = PriceOverlay([load_price_layer(p) for p in paths], version="+".join(key))
+    if len(_OVERLAY_CACHE) > 64:
+        _OVERLAY_CACHE.clear()
+    _OVERLAY_CACHE[key] = ov
+    return ov
@@ -18,6 +18,7 @@ from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMar
 
 # твои импорты (как было)
 from telethon_manager import get_all_clients, resolve_entity, get_clients_for_user  # noqa
+from handlers import codec
 from handlers.auth_utils import auth_get
 
 ROOT = Path(__file__).resolve().parents[2]
@@ -25,7 +26,8 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from handlers.normalizers.entry import run_build_parsed_goods, run_build_parsed_etalon
-from handlers.parsing.context import set_parsing_data_dir, user_data_dir, DEFAULT_BASE_DIR
+from handlers.parsing.context import current_pipeline, pipeline_context, user_data_dir, DEFAULT_BASE_DIR
+from handlers.parsing.generations import POINTER_NAME
 
 router = Router()
 
@@ -63,8 +65,6 @@ async def collect_menu(callback: CallbackQuery):
         await callback.answer()
     except Exception:
         pass
-    if (u or {}).get("role") != "admin":
-        set_parsing_data_dir(DEFAULT_BASE_DIR)
 
 
 @router.callback_query(F.data == "show_unmatched")
@@ -112,10 +112,14 @@ async def collect_all(callback: CallbackQuery):
     if not has_sources:
         await callback.message.answer("⚠️ Источники не добавлены. Добавь каналы/ботов в «Настройки → Источники».")
         return
-    if u.get("role") == "admin":
-        set_parsing_data_dir(DEFAULT_BASE_DIR)
-    else:
-        set_parsing_data_dir(user_data_dir(callback.from_user.id))
+    # ✅ папка данных прогона живёт в contextvar (pipeline_context), а не в глобальных путях модулей:
+    #    сборы разных пользователей могут идти параллельно
+    data_dir = DEFAULT_BASE_DIR if u.get("role") == "admin" else user_data_dir(callback.from_user.id)
+    with pipeline_context(data_dir):
+        await _collect_all_in_context(callback, u, sources_mode)
+
+
+async def _collect_all_in_context(callback: CallbackQuery, u: dict, sources_mode: str) -> None:
     _reset_outputs()
 
     # ✅ дефолты, чтобы не словить UnboundLocalError даже если что-то упадёт раньше
@@ -184,9 +188,9 @@ async def collect_all(callback: CallbackQuery):
     messages = dedupe_messages_by_header_keep_latest(messages)
 
     parsed_messages = parse_messages(messages)
-    _write_json(MESSAGES_FILE, parsed_messages)
+    _write_json(current_pipeline().parsed_messages, parsed_messages)
 
-    # ✅ полный пайплайн в одном thread, чтобы не плодить ошибки/гонки
+    # ✅ полный пайплайн в одном thread (asyncio.to_thread копирует contextvars -> та же папка данных)
     def _run_pipeline() -> None:
         run_build_parsed_etalon()
         run_build_parsed_goods()
@@ -202,40 +206,8 @@ async def collect_all(callback: CallbackQuery):
 
     await asyncio.to_thread(_run_pipeline)
 
-    # кастом: дополняем пользовательский matched нашими данными и пересобираем parsed_data.json
-    if (u or {}).get("role") != "admin" and (u or {}).get("sources_mode") == "custom":
-        try:
-            from handlers.parsing import results as results_mod
-            base_matched = (DEFAULT_BASE_DIR / "parsed_matched.json")
-            user_dir = user_data_dir(callback.from_user.id)
-            user_matched = user_dir / "parsed_matched.json"
-
-            def _load_items(p: Path) -> list[dict]:
-                if not p.exists():
-                    return []
-                try:
-                    raw = json.loads(p.read_text(encoding="utf-8"))
-                except Exception:
-                    return []
-                if isinstance(raw, dict) and isinstance(raw.get("items"), list):
-                    return [x for x in raw["items"] if isinstance(x, dict)]
-                if isinstance(raw, list):
-                    return [x for x in raw if isinstance(x, dict)]
-                return []
-
-            merged_items = _load_items(base_matched) + _load_items(user_matched)
-            user_matched.write_text(
-                json.dumps(
-                    {"items": merged_items, "items_count": len(merged_items)},
-                    ensure_ascii=False,
-                    indent=2,
-                ),
-                encoding="utf-8",
-            )
-            set_parsing_data_dir(user_dir)
-            results_mod.rebuild_parsed_data_all()
-        except Exception:
-            pass
+    # кастом: base + user цены объединяются при чтении (handlers/parsing/overlay.py),
+    # пользовательский parsed_matched.json/parsed_data.json остаются только со своими ценами
 
     total_msgs = len(parsed_messages)
     total_lines = sum(int(m.get("lines_count") or 0) for m in parsed_messages)
@@ -268,20 +240,20 @@ def _utcnow_iso() -> str:
 
 
 def _write_json(path: Path, payload: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    codec.write_file(path, payload)
 
 def _reset_data_dir_files() -> None:
     """
-    Очищаем ВСЕ файлы в DATA_DIR, но НЕ удаляем их:
+    Очищаем ВСЕ файлы в папке текущего прогона (current_pipeline()), но НЕ удаляем их:
       - *.json -> записываем []
       - остальные -> записываем пустую строку ""
-    Папки внутри DATA_DIR не трогаем.
+    Вложенные папки не трогаем.
     """
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    data_dir = current_pipeline().base_dir
+    data_dir.mkdir(parents=True, exist_ok=True)
 
     base_dir = DEFAULT_BASE_DIR.resolve()
-    is_user_dir = DATA_DIR.resolve() != base_dir
+    is_user_dir = data_dir.resolve() != base_dir
 
     mutable = {
         "parsed_messages.json",
@@ -306,7 +278,7 @@ def _reset_data_dir_files() -> None:
 
     def _copy_base(name: str) -> None:
         src = base_dir / name
-        dst = DATA_DIR / name
+        dst = data_dir / name
         if not src.exists():
             return
         try:
@@ -318,7 +290,7 @@ def _reset_data_dir_files() -> None:
 
     if is_user_dir:
         for name in mutable:
-            _clear_file(DATA_DIR / name)
+            _clear_file(data_dir / name)
         # гарантируем эталоны/индексы от базы, если их нет
         for name in (
             "parsed_etalon.json",
@@ -332,9 +304,11 @@ def _reset_data_dir_files() -> None:
             _copy_base(name)
         return
 
-    for p in DATA_DIR.iterdir():
+    for p in data_dir.iterdir():
         if not p.is_file():
             continue
+        if p.name in (POINTER_NAME, POINTER_NAME + ".tmp"):
+            continue  # указатель на опубликованное поколение: читатели работают с ним, пока идёт сбор
         _clear_file(p)
 
 
@@ -4,11 +4,12 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
 from pathlib import Path
 import re
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, Iterable, List, Tuple, Optional, Set
 
 # ✅ чтобы main.py мог сделать dp.include_router(results.router)
 try:
@@ -18,9 +19,15 @@ except Exception:  # pragma: no cover - fallback for parsing env without aiogram
         def __init__(self, *args, **kwargs):
             pass
 
-from storage import load_data
+import storage
+from storage import read_data
 import importlib.util
 
+from handlers import codec
+from handlers.parsing import change_feed
+from handlers.parsing.context import current_pipeline
+from handlers.parsing.generations import current_generation_dir, generation_file, publish_generation
+
 
 # =========================
 # AIROGRAM ROUTER (stub)
@@ -34,8 +41,13 @@ MODULE_DIR = Path(__file__).parent.resolve()
 DATA_DIR = MODULE_DIR / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# пути по умолчанию (общая папка); в прогоне используются пути из current_pipeline()
 MATCHED_FILE = DATA_DIR / "parsed_matched.json"
 PARSED_FILE = DATA_DIR / "parsed_data.json"
+REGION_INDEX_FILE = DATA_DIR / "region_index.json"
+
+# формат region_index.json; при несовместимых изменениях — увеличить
+REGION_INDEX_VERSION = 1
 
 _REGION_FLAG_MAP: Optional[Dict[str, str]] = None
 _FLAG_RE = re.compile(r"[\U0001F1E6-\U0001F1FF]{2}")
@@ -85,7 +97,7 @@ def _read_json(path: Path, default):
     try:
         if not path.exists():
             return default
-        return json.loads(path.read_text(encoding="utf-8"))
+        return codec.decode(path.read_bytes())
     except Exception:
         return default
 
@@ -93,7 +105,7 @@ def _read_json(path: Path, default):
 def _write_json(path: Path, payload: Any) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.write_bytes(codec.encode(payload, codec.format_for(path)))
     tmp.replace(path)
 
 
@@ -129,8 +141,28 @@ def _strip_ram(s: str) -> str:
 # Read sources
 # -------------------------
 
+def _file_build_id(path: Path) -> str:
+    """
+    Дешёвый id версии файла (mtime_ns + size).
+    """
+    try:
+        st = Path(path).stat()
+        return f"{int(st.st_mtime_ns)}:{int(st.st_size)}"
+    except Exception:
+        return "0:0"
+
+
+def _etalon_build_id() -> str:
+    """
+    Версия ключей etalon/catalog в data.json / data.db: если она поменялась — структура каталога/эталона
+    могла измениться, и инкрементальная сборка недопустима. Записи в другие ключи (monitoring,
+    auto_replies_*, ...) её не меняют.
+    """
+    return storage.key_build_id("etalon", "catalog")
+
+
 def _get_catalog_and_etalon() -> Tuple[dict, dict]:
-    db = load_data() or {}
+    db = read_data() or {}
     cat = db.get("catalog") or {}
     et = db.get("etalon") or {}
     cat = cat if isinstance(cat, dict) else {}
@@ -139,7 +171,7 @@ def _get_catalog_and_etalon() -> Tuple[dict, dict]:
 
 
 def _read_matched_items() -> List[dict]:
-    data = _read_json(MATCHED_FILE, {})
+    data = _read_json(current_pipeline().parsed_matched, {})
     if isinstance(data, dict):
         items = data.get("items") or []
         return [x for x in items if isinstance(x, dict)]
@@ -216,108 +248,6 @@ def _is_model_leaf(node: Any) -> bool:
 # Build index from matched
 # -------------------------
 
-def _build_index(matched: List[dict]) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    """
-    Ключ: (tuple(model_path), variant_title/raw_parsed) -> {min_price, best_channels}
-    """
-    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
-    stripped_bucket: Dict[Tuple[Tuple[str, ...], str], List[Dict[str, Any]]] = {}
-
-    def _regions_for_min_price(item: dict, min_price: Optional[float]) -> List[str]:
-        out: List[str] = []
-        if min_price is None:
-            return out
-        prices = item.get("prices")
-        if isinstance(prices, list):
-            for p in prices:
-                if not isinstance(p, dict):
-                    continue
-                mp = _price_to_float(p.get("price"))
-                if mp is None or mp != min_price:
-                    continue
-                raw = (p.get("raw") or "").strip()
-                reg = _extract_region_from_raw(raw).strip().lower()
-                if reg and reg not in out:
-                    out.append(reg)
-        if not out:
-            params = item.get("params") or {}
-            if isinstance(params, dict):
-                reg = (params.get("region") or "").strip().lower()
-                if reg:
-                    out.append(reg)
-        return out
-
-    for it in matched:
-        path = it.get("path") or []
-        raw = (it.get("raw_parsed") or "").strip()
-
-        if not isinstance(path, list) or not path:
-            continue
-        if not raw:
-            continue  # без raw_parsed не сможем положить цену в вариант
-
-        mp = _price_to_float(it.get("min_price"))
-
-        # matcher гарантирует best_channel: list[str], но страхуемся
-        bch = it.get("best_channel")
-        if bch is None:
-            bch = []
-        if isinstance(bch, str):
-            bch = [bch]
-        if not isinstance(bch, list):
-            bch = []
-        params = it.get("params") or {}
-        if not isinstance(params, dict):
-            params = {}
-        region = (params.get("region") or "").strip().lower()
-
-        # нормализация каналов
-        best_channels: List[str] = []
-        seen = set()
-        for x in bch:
-            s = str(x or "").strip()
-            if s and s not in seen:
-                seen.add(s)
-                best_channels.append(s)
-
-        raw_norm = _norm_key(raw)
-        if not raw_norm:
-            continue
-
-        regions = _regions_for_min_price(it, mp)
-        info = {
-            "min_price": mp,
-            "best_channels": best_channels,
-            "region_min": regions,
-        }
-        key = (tuple(path), raw_norm)
-        existing = idx.get(key)
-        if existing is None:
-            idx[key] = info
-        else:
-            ex_mp = existing.get("min_price")
-            if ex_mp is None or (mp is not None and mp < ex_mp):
-                idx[key] = info
-            elif mp is not None and ex_mp is not None and mp == ex_mp:
-                ex_regions = existing.get("region_min") or []
-                if not isinstance(ex_regions, list):
-                    ex_regions = [str(ex_regions)]
-                for r in regions:
-                    if r not in ex_regions:
-                        ex_regions.append(r)
-                existing["region_min"] = ex_regions
-
-        raw_stripped = _strip_ram(raw_norm)
-        if raw_stripped != raw_norm:
-            stripped_bucket.setdefault((tuple(path), raw_stripped), []).append(info)
-
-    for key, items in stripped_bucket.items():
-        if len(items) == 1 and key not in idx:
-            idx[key] = items[0]
-
-    return idx
-
-
 # -------------------------
 # Merge into catalog structure
 # -------------------------
@@ -331,7 +261,8 @@ def _merge_catalog_with_prices(
     """
     Возвращает новый узел каталога, где в листьях-вариантах:
       - {}  (нет цены)
-      - {"min_price": ..., "best_channels": [...]}  (есть цена)
+      - {"min_price": ..., "best_channels": [...], "region_min": [...]}  (есть цена)
+    idx — индекс вариантов (_build_variant_index), тот же, что уходит в region_index.json.
     """
     out: dict = {}
 
@@ -354,11 +285,11 @@ def _merge_catalog_with_prices(
                     if vt_stripped != vt_norm:
                         info = idx.get((model_path, vt_stripped))
 
-                if info and info.get("min_price") is not None:
+                if info and info.get("price") is not None:
                     variants_out[variant_title] = {
-                        "min_price": info["min_price"],
-                        "best_channels": info.get("best_channels") or [],
-                        "region_min": info.get("region_min"),
+                        "min_price": info["price"],
+                        "best_channels": info.get("channels") or [],
+                        "region_min": info.get("region") or [],
                     }
                 else:
                     variants_out[variant_title] = {}
@@ -385,11 +316,11 @@ def _merge_catalog_with_prices(
                     if vt_stripped != vt_norm:
                         info = idx.get((model_path, vt_stripped))
 
-                if info and info.get("min_price") is not None:
+                if info and info.get("price") is not None:
                     variants_out[variant_title] = {
-                        "min_price": info["min_price"],
-                        "best_channels": info.get("best_channels") or [],
-                        "region_min": info.get("region_min"),
+                        "min_price": info["price"],
+                        "best_channels": info.get("channels") or [],
+                        "region_min": info.get("region") or [],
                     }
                 else:
                     # сохраняем пустым (даже если vv уже был с ценой — rebuild всегда строит заново)
@@ -411,11 +342,346 @@ def _merge_catalog_with_prices(
 # Public API
 # -------------------------
 
+# -------------------------
+# Region/price index (region_index.json)
+# -------------------------
+# Один компактный индекс на прогон пайплайна:
+#   (tuple(model_path), variant_norm) -> {"price", "region", "channels", "title"}
+# Его читают view_prices / channel_updater / auto_replies вместо того,
+# чтобы каждый раз перечитывать parsed_matched.json и гонять extract_region.
+
+_EXTRACT_REGION: Any = None
+_REGION_INDEX_CACHE: Dict[str, Tuple[str, "RegionIndex"]] = {}
+_MERGED_REGION_CACHE: Dict[Tuple[str, ...], "RegionIndex"] = {}
+
+
+class RegionIndex(dict):
+    """
+    dict: (tuple(model_path), variant_norm) -> {"price": float|None, "region": [...], "channels": [...], "title": str}
+
+    version — версия артефакта (меняется при каждой пересборке),
+    models  — регионы самой дешёвой позиции модели (fallback, если у варианта региона нет).
+    """
+
+    def __init__(self, *args, version: str = "", models: Optional[Dict[Tuple[str, ...], List[str]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = version
+        self.models: Dict[Tuple[str, ...], List[str]] = dict(models or {})
+
+    def model_regions(self, model_path: Iterable[str]) -> List[str]:
+        return list(self.models.get(tuple(model_path or ()), []))
+
+
+def _extract_region_full(raw: str) -> str:
+    """
+    extract_region из normalizers.entry (флаги + текстовые маркеры);
+    если entry недоступен — только флаги.
+    """
+    global _EXTRACT_REGION
+    if _EXTRACT_REGION is None:
+        try:
+            from handlers.normalizers.entry import extract_region as _er  # type: ignore
+            _EXTRACT_REGION = _er
+        except Exception:
+            _EXTRACT_REGION = _extract_region_from_raw
+    try:
+        return _EXTRACT_REGION(raw) or ""
+    except Exception:
+        return ""
+
+
+def _price_to_float_loose(v) -> Optional[float]:
+    try:
+        return float(str(v if v is not None else "").replace(" ", ""))
+    except Exception:
+        return None
+
+
+def _model_regions_from_index(idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]) -> Dict[Tuple[str, ...], List[str]]:
+    """
+    Для каждой модели — регионы самой дешёвой позиции, у которой регион известен.
+    """
+    best: Dict[Tuple[str, ...], Tuple[Optional[float], List[str]]] = {}
+    for (mpath, _raw_key), info in idx.items():
+        if not isinstance(info, dict):
+            continue
+        regs = info.get("region") or []
+        if not regs:
+            continue
+        price = info.get("price")
+        cur = best.get(mpath)
+        if cur is None or cur[0] is None or (price is not None and price < cur[0]):
+            best[mpath] = (price, regs if isinstance(regs, list) else [str(regs)])
+    return {k: v[1] for k, v in best.items()}
+
+
+def _build_variant_index(matched: List[dict]) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
+    """
+    Единый индекс вариантов прогона: (tuple(model_path), variant_norm) -> {"price", "region", "channels", "title"}.
+    Из него строятся и цены parsed_data.json (_merge_catalog_with_prices), и region_index.json —
+    один проход по matched и один разбор регионов, поэтому они не расходятся.
+    """
+    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
+    stripped_bucket: Dict[Tuple[Tuple[str, ...], str], List[Dict[str, Any]]] = {}
+
+    def _regions_for_min_price(item: dict, min_price: Optional[float]) -> List[str]:
+        out: List[str] = []
+        if min_price is None:
+            return out
+        prices = item.get("prices")
+        if isinstance(prices, list):
+            for p in prices:
+                if not isinstance(p, dict):
+                    continue
+                mp = _price_to_float_loose(p.get("price"))
+                if mp is None or mp != min_price:
+                    continue
+                raw = (p.get("raw") or "").strip()
+                reg = _extract_region_full(raw).strip().lower()
+                if reg and reg not in out:
+                    out.append(reg)
+        if not out:
+            params = item.get("params") or {}
+            if isinstance(params, dict):
+                reg = (params.get("region") or "").strip().lower()
+                if reg:
+                    out.append(reg)
+        return out
+
+    for it in matched:
+        if not isinstance(it, dict):
+            continue
+        path = it.get("path") or []
+        raw = (it.get("raw_parsed") or "").strip()
+        if not isinstance(path, list) or not path:
+            continue
+        if not raw:
+            continue
+        mp = _price_to_float_loose(it.get("min_price"))
+        regions = _regions_for_min_price(it, mp)
+
+        raw_norm = _norm_key(raw)
+        if not raw_norm:
+            continue
+
+        # matcher гарантирует best_channel: list[str], но страхуемся
+        bch = it.get("best_channel") or []
+        if isinstance(bch, str):
+            bch = [bch]
+        channels: List[str] = []
+        for x in (bch if isinstance(bch, list) else []):
+            ch = str(x or "").strip()
+            if ch and ch not in channels:
+                channels.append(ch)
+
+        info = {"price": mp, "region": regions, "channels": channels, "title": raw}
+
+        key = (tuple(str(x) for x in path), raw_norm)
+        ex = idx.get(key)
+        if ex is None:
+            idx[key] = info
+        else:
+            ex_mp = ex.get("price")
+            if ex_mp is None or (mp is not None and mp < ex_mp):
+                idx[key] = info
+            elif mp is not None and ex_mp is not None and mp == ex_mp:
+                ex_regs = ex.get("region") or []
+                if not isinstance(ex_regs, list):
+                    ex_regs = [str(ex_regs)]
+                for r in regions:
+                    if r not in ex_regs:
+                        ex_regs.append(r)
+                ex["region"] = ex_regs
+
+        raw_stripped = _strip_ram(raw_norm)
+        if raw_stripped != raw_norm:
+            stripped_bucket.setdefault((key[0], raw_stripped), []).append(info)
+
+    for key, bucket in stripped_bucket.items():
+        if key in idx:
+            continue
+        if len(bucket) == 1:
+            # алиас без RAM: без title, чтобы потребители не считали его отдельной позицией
+            alias = dict(bucket[0])
+            alias.pop("title", None)
+            idx[key] = alias
+
+    return idx
+
+
+def build_region_index(
+    matched: List[dict],
+    *,
+    version: str = "",
+    index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
+) -> RegionIndex:
+    """index — уже построенный _build_variant_index(matched) (чтобы не проходить matched второй раз)."""
+    idx = index if index is not None else _build_variant_index(matched)
+    return RegionIndex(idx, version=version, models=_model_regions_from_index(idx))
+
+
+def _region_index_to_payload(ridx: RegionIndex, *, source_build_id: str) -> dict:
+    models: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for (mpath, key), info in ridx.items():
+        m = models.get(mpath)
+        if m is None:
+            m = {"path": list(mpath), "variants": {}}
+            regs = ridx.models.get(mpath)
+            if regs:
+                m["region"] = regs
+            models[mpath] = m
+        v: Dict[str, Any] = {"p": info.get("price"), "r": info.get("region") or []}
+        if info.get("channels"):
+            v["c"] = info["channels"]
+        if info.get("title"):
+            v["t"] = info["title"]
+        m["variants"][key] = v
+    return {
+        "version": REGION_INDEX_VERSION,
+        "source_build_id": source_build_id,
+        "timestamp": _utcnow_iso(),
+        "models": list(models.values()),
+    }
+
+
+def _region_index_from_payload(payload: Any, *, version: str) -> Optional[RegionIndex]:
+    if not isinstance(payload, dict) or payload.get("version") != REGION_INDEX_VERSION:
+        return None
+    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
+    model_regions: Dict[Tuple[str, ...], List[str]] = {}
+    for m in payload.get("models") or []:
+        if not isinstance(m, dict):
+            continue
+        mpath = tuple(str(x) for x in (m.get("path") or []))
+        if not mpath:
+            continue
+        if m.get("region"):
+            model_regions[mpath] = list(m["region"])
+        for key, v in (m.get("variants") or {}).items():
+            if not isinstance(v, dict):
+                continue
+            info: Dict[str, Any] = {"price": v.get("p"), "region": list(v.get("r") or []), "channels": list(v.get("c") or [])}
+            if v.get("t"):
+                info["title"] = v["t"]
+            idx[(mpath, str(key))] = info
+    return RegionIndex(idx, version=version, models=model_regions)
+
+
+def write_region_index(
+    matched: List[dict],
+    *,
+    path: Optional[Path] = None,
+    matched_path: Optional[Path] = None,
+    index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
+) -> RegionIndex:
+    """
+    Строит и атомарно пишет компактный region_index.json рядом с parsed_matched.json.
+    """
+    ctx = current_pipeline()
+    path = Path(path or ctx.region_index)
+    source_build_id = _file_build_id(Path(matched_path or ctx.parsed_matched))
+    ridx = build_region_index(matched, version=f"{REGION_INDEX_VERSION}:{source_build_id}", index=index)
+    payload = _region_index_to_payload(ridx, source_build_id=source_build_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(codec.encode(payload, codec.format_for(path)))
+    tmp.replace(path)
+    _REGION_INDEX_CACHE.pop(str(path), None)
+    return ridx
+
+
+def load_region_index(data_dir: Optional[Path] = None) -> RegionIndex:
+    """
+    Читает region_index.json из data_dir (по умолчанию — папка текущего прогона) с кэшем по версии.
+    Если индекса нет или он старше parsed_matched.json (каталог от старой версии бота,
+    пользовательская папка) — пересобирает его из parsed_matched.json один раз.
+    """
+    # читаем из опубликованного поколения (если поколений нет — из самой папки)
+    base = current_generation_dir(Path(data_dir) if data_dir is not None else current_pipeline().base_dir)
+    path = base / "region_index.json"
+    matched_path = base / "parsed_matched.json"
+
+    source_build_id = _file_build_id(matched_path)
+    cached = _REGION_INDEX_CACHE.get(str(path))
+    if cached and cached[0] == source_build_id:
+        return cached[1]
+
+    ridx: Optional[RegionIndex] = None
+    payload = _read_json(path, None)
+    if isinstance(payload, dict) and payload.get("source_build_id") == source_build_id:
+        ridx = _region_index_from_payload(payload, version=f"{REGION_INDEX_VERSION}:{source_build_id}")
+
+    if ridx is None:
+        if source_build_id == "0:0":
+            ridx = RegionIndex(version="")
+        else:
+            items = _read_json(matched_path, {})
+            if isinstance(items, dict):
+                items = items.get("items") or []
+            items = [x for x in items if isinstance(x, dict)] if isinstance(items, list) else []
+            try:
+                ridx = write_region_index(items, path=path, matched_path=matched_path)
+            except Exception:
+                ridx = build_region_index(items, version=f"{REGION_INDEX_VERSION}:{source_build_id}")
+
+    _REGION_INDEX_CACHE[str(path)] = (source_build_id, ridx)
+    return ridx
+
+
+def merge_region_indexes(*indexes: RegionIndex) -> RegionIndex:
+    """
+    Объединение индексов (base + user): минимальная цена, при равной — объединение регионов/каналов.
+    Результат кэшируется по версиям входных индексов; если у какого-то из них версии нет
+    (id объекта после сборки мусора переиспользуется — ключом быть не может), объединяем без кэша.
+    """
+    versions = [getattr(ix, "version", "") or "" for ix in indexes]
+    key: Optional[Tuple[str, ...]] = tuple(versions) if all(versions) else None
+    if key is not None:
+        cached = _MERGED_REGION_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    out: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
+    for ix in indexes:
+        for k, info in (ix or {}).items():
+            ex = out.get(k)
+            if ex is None:
+                out[k] = dict(info)
+                continue
+            mp = info.get("price")
+            ex_mp = ex.get("price")
+            if ex_mp is None or (mp is not None and mp < ex_mp):
+                out[k] = dict(info)
+            elif mp is not None and mp == ex_mp:
+                merged = dict(ex)
+                merged["region"] = list(dict.fromkeys(list(ex.get("region") or []) + list(info.get("region") or [])))
+                merged["channels"] = list(dict.fromkeys(list(ex.get("channels") or []) + list(info.get("channels") or [])))
+                out[k] = merged
+
+    ridx = RegionIndex(out, version="+".join(key) if key is not None else "", models=_model_regions_from_index(out))
+    if key is not None:
+        if len(_MERGED_REGION_CACHE) > 64:
+            _MERGED_REGION_CACHE.clear()
+        _MERGED_REGION_CACHE[key] = ridx
+    return ridx
+
+
+def _count_priced(
+    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]],
+    paths: Optional[Set[Tuple[str, ...]]] = None,
+) -> int:
+    return sum(
+        1 for (mpath, _k), v in idx.items()
+        if v.get("price") is not None and (paths is None or mpath in paths)
+    )
+
+
 def rebuild_parsed_data_all() -> dict:
+    etalon_build_id = _etalon_build_id()
     _catalog, etalon = _get_catalog_and_etalon()
     catalog = etalon
     matched = _read_matched_items()
-    idx = _build_index(matched)
+    idx = _build_variant_index(matched)
 
     catalog_with_prices = _merge_catalog_with_prices(catalog, idx, [], etalon)
 
@@ -424,9 +690,247 @@ def rebuild_parsed_data_all() -> dict:
         "catalog": catalog_with_prices,
         "stats": {
             "matched_items": len(matched),
-            "priced_variants": sum(1 for v in idx.values() if v.get("min_price") is not None),
+            "priced_variants": _count_priced(idx),
+        },
+        "etalon_build_id": etalon_build_id,
+    }
+
+    _write_json(current_pipeline().parsed_data, payload)
+    ridx = _write_region_index_safe(matched, idx)
+    _write_change_feed_safe(payload["catalog"], ridx, etalon_build_id=etalon_build_id)
+    _publish_generation_safe()
+    return payload
+
+
+def _write_region_index_safe(
+    matched: List[dict],
+    index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
+) -> Optional[RegionIndex]:
+    try:
+        return write_region_index(matched, index=index)
+    except Exception as e:
+        print(f"[results] ⚠️ region_index.json write failed: {e}")
+        return None
+
+
+def _model_fingerprints(catalog: dict, ridx: Optional[RegionIndex]) -> Dict[str, str]:
+    """
+    Отпечаток всего, из чего рендерится пост модели: её поддерево в parsed_data
+    (варианты, min_price, каналы) + записи region_index по её пути.
+    """
+    by_model: Dict[Tuple[str, ...], List[Any]] = {}
+    for (mpath, key), info in (ridx or {}).items():
+        by_model.setdefault(mpath, []).append([key, info])
+
+    out: Dict[str, str] = {}
+
+    def _walk(node: Any, path: Tuple[str, ...]) -> None:
+        if not isinstance(node, dict):
+            return
+        if path and _is_model_leaf(node):
+            regions = sorted(by_model.get(path, []), key=lambda kv: kv[0])
+            model_regions = ridx.model_regions(path) if ridx is not None else []
+            raw = json.dumps([node, regions, model_regions], ensure_ascii=False, sort_keys=True, default=str)
+            out[change_feed.path_key(path)] = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+            return
+        for k, v in node.items():
+            _walk(v, path + (str(k),))
+
+    _walk(catalog, ())
+    return out
+
+
+def _write_change_feed_safe(catalog: Any, ridx: Optional[RegionIndex], *, etalon_build_id: str) -> None:
+    """
+    Лента изменений для публикации: какие модели поменялись относительно текущего поколения.
+    Без region_index отпечатки неполные — пишем их с пустым etalon_build_id: эта и следующая лента будут full.
+    """
+    try:
+        fps = _model_fingerprints(catalog if isinstance(catalog, dict) else {}, ridx)
+        feed = change_feed.write_change_feed(
+            current_pipeline().base_dir,
+            fps,
+            etalon_build_id=etalon_build_id if ridx is not None else "",
+        )
+        if feed.get("full"):
+            print(f"[results] 🧾 change feed: full (models={len(fps)})")
+        else:
+            print(f"[results] 🧾 change feed: {len(feed.get('changed') or [])}/{len(fps)} models changed")
+    except Exception as e:
+        print(f"[results] ⚠️ change feed write failed: {e}")
+
+
+def _publish_generation_safe() -> None:
+    """
+    parsed_data + parsed_matched + region_index готовы — публикуем их новым поколением
+    (читатели видят либо старый, либо новый набор целиком).
+    """
+    try:
+        publish_generation(current_pipeline().base_dir)
+    except Exception as e:
+        print(f"[results] ⚠️ generation publish failed: {e}")
+
+
+# -------------------------
+# Incremental rebuild
+# -------------------------
+
+def _item_path(it: dict) -> Optional[Tuple[str, ...]]:
+    path = it.get("path") or []
+    if not isinstance(path, list) or not path:
+        return None
+    return tuple(str(x) for x in path)
+
+
+def _item_signature(it: dict) -> str:
+    """
+    Отпечаток только тех полей matched-элемента, которые влияют на parsed_data.json.
+    """
+    params = it.get("params") or {}
+    region = params.get("region") if isinstance(params, dict) else None
+    prices = []
+    for p in (it.get("prices") or []):
+        if isinstance(p, dict):
+            prices.append([p.get("price"), p.get("raw")])
+    sig = [it.get("raw_parsed"), it.get("min_price"), it.get("best_channel"), region, prices]
+    return json.dumps(sig, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _signatures_by_path(items: List[dict]) -> Dict[Tuple[str, ...], List[str]]:
+    out: Dict[Tuple[str, ...], List[str]] = {}
+    for it in items:
+        path = _item_path(it)
+        if path is None:
+            continue
+        out.setdefault(path, []).append(_item_signature(it))
+    for sigs in out.values():
+        sigs.sort()
+    return out
+
+
+def changed_model_paths(old_items: List[dict], new_items: List[dict]) -> Set[Tuple[str, ...]]:
+    """
+    Пути моделей, у которых изменились входные данные для parsed_data.json
+    (появились/пропали/поменялись matched-элементы).
+    """
+    old_sig = _signatures_by_path(old_items or [])
+    new_sig = _signatures_by_path(new_items or [])
+    changed: Set[Tuple[str, ...]] = set()
+    for path in set(old_sig) | set(new_sig):
+        if old_sig.get(path) != new_sig.get(path):
+            changed.add(path)
+    return changed
+
+
+def _published_variant_index() -> Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]]:
+    """
+    Полный индекс вариантов из region_index.json опубликованного поколения
+    (None — поколения нет или индекс собран не по его parsed_matched.json).
+    """
+    ctx = current_pipeline()
+    gen_dir = current_generation_dir(ctx.base_dir)
+    if gen_dir == ctx.base_dir:
+        return None
+    payload = _read_json(gen_dir / ctx.region_index.name, None)
+    if not isinstance(payload, dict) or payload.get("source_build_id") != _file_build_id(gen_dir / ctx.parsed_matched.name):
+        return None
+    ridx = _region_index_from_payload(payload, version="")
+    return dict(ridx) if ridx is not None else None
+
+
+def _items_for_paths(items: List[dict], paths: Set[Tuple[str, ...]]) -> List[dict]:
+    return [it for it in (items or []) if _item_path(it) in paths]
+
+
+def rebuild_parsed_data_incremental(
+    changed_paths: Iterable[Iterable[str]],
+    *,
+    matched: Optional[List[dict]] = None,
+    previous_matched: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Пересобирает в parsed_data.json только поддеревья моделей из changed_paths.
+
+    matched / previous_matched — новые и прошлые matched-элементы (если новые не
+    переданы, читаются из parsed_matched.json текущего прогона). Прошлые (из опубликованного поколения,
+    как и прошлый parsed_data.json) нужны для пересчёта stats по дельте.
+
+    Полная пересборка выполняется, если:
+      - parsed_data.json отсутствует/битый или собран по другой версии data.json;
+      - не переданы previous_matched (stats не пересчитать по дельте);
+      - структура каталога в parsed_data.json не совпадает с эталоном.
+    """
+    paths: Set[Tuple[str, ...]] = set()
+    for p in changed_paths or []:
+        t = tuple(str(x) for x in (p or []))
+        if t:
+            paths.add(t)
+
+    # база — опубликованное поколение: рабочий parsed_data.json парсер обнуляет перед прогоном
+    ctx = current_pipeline()
+    prev = _read_json(generation_file(ctx.base_dir, ctx.parsed_data.name), {})
+    catalog_prev = prev.get("catalog") if isinstance(prev, dict) else None
+    etalon_build_id = _etalon_build_id()
+    if (
+        previous_matched is None
+        or not isinstance(catalog_prev, dict)
+        or prev.get("etalon_build_id") != etalon_build_id
+    ):
+        return rebuild_parsed_data_all()
+
+    if matched is None:
+        matched = _read_matched_items()
+
+    _catalog, etalon = _get_catalog_and_etalon()
+
+    new_idx = _build_variant_index(_items_for_paths(matched, paths))
+    old_idx = _build_variant_index(_items_for_paths(previous_matched, paths))
+
+    # region_index.json — полный: берём опубликованный и заменяем в нём только изменённые модели
+    full_idx = _published_variant_index()
+    if full_idx is None:
+        full_idx = _build_variant_index(matched)
+    else:
+        full_idx = {k: v for k, v in full_idx.items() if k[0] not in paths}
+        full_idx.update(new_idx)
+
+    for model_path in sorted(paths):
+        # модель, которой нет в эталоне, в parsed_data не попадает (как и при полной сборке)
+        et_node: Any = etalon
+        for p in model_path:
+            et_node = et_node.get(p) if isinstance(et_node, dict) else None
+        if et_node is None:
+            continue
+
+        parent: Any = catalog_prev
+        for p in model_path[:-1]:
+            parent = parent.get(p) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict):
+            # структура разъехалась — безопаснее собрать целиком
+            return rebuild_parsed_data_all()
+
+        key = model_path[-1]
+        merged = _merge_catalog_with_prices({key: et_node}, new_idx, list(model_path[:-1]), etalon)
+        parent[key] = merged.get(key)
+
+    stats_prev = prev.get("stats") if isinstance(prev.get("stats"), dict) else {}
+    try:
+        priced_prev = int(stats_prev.get("priced_variants") or 0)
+    except Exception:
+        priced_prev = 0
+
+    payload = {
+        "timestamp": _utcnow_iso(),
+        "catalog": catalog_prev,
+        "stats": {
+            "matched_items": len(matched),
+            "priced_variants": max(0, priced_prev - _count_priced(old_idx) + _count_priced(new_idx, paths)),
         },
+        "etalon_build_id": etalon_build_id,
     }
 
-    _write_json(PARSED_FILE, payload)
+    _write_json(current_pipeline().parsed_data, payload)
+    ridx = _write_region_index_safe(matched, full_idx)
+    _write_change_feed_safe(payload["catalog"], ridx, etalon_build_id=etalon_build_id)
+    _publish_generation_safe()
     return payload
@@ -0,0 +1,139 @@
+# handlers/path_ids.py
+# Короткие стабильные ID путей каталога для callback_data (Telegram ограничивает её ~64 байтами).
+#
+# ID = blake2s(namespace + путь) -> 6 байт в base32 (10 символов). Один и тот же путь всегда
+# даёт один и тот же ID — в любом поколении каталога, после рестарта, у любого пользователя, —
+# поэтому старые кнопки продолжают работать, пока путь есть в каталоге.
+# Обратная таблица id -> (namespace, путь): OrderedDict в памяти (поиск O(1), LRU, не больше PATH_IDS_MAX)
+# + компактный файл data/path_ids.json (persist_utils, отложенная запись), который поднимается при старте.
+# Файл лежит в data/ проекта рядом с auth_users.json, а не в handlers/parsing/data: папку пайплайна
+# parser._reset_data_dir_files() обнуляет перед каждым сбором. Порядок строк в файле — LRU-порядок
+# (resolve() тоже помечает таблицу изменённой), поэтому после рестарта вытесняются действительно старые ID.
+#
+# namespace разделяет экраны: "vp" (просмотр цен), "ar" (автоответы), "mk:<канал>" (наценки канала) и т.п. —
+# ID из одного меню не разрешается в другом.
+
+from __future__ import annotations
+
+import atexit
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from handlers import persist_utils
+from handlers.parsing.context import DEFAULT_BASE_DIR
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PATH_IDS_FILE = PROJECT_ROOT / "data" / "path_ids.json"
+# прежнее место (папка пайплайна): читаем один раз, если нового файла ещё нет
+_LEGACY_FILE = DEFAULT_BASE_DIR / "path_ids.json"
+PATH_IDS_MAX = int(os.getenv("PATH_IDS_MAX", "50000"))
+# новые ID сбрасываем на диск не чаще, чем раз в столько секунд (и всегда — при выходе)
+SAVE_EVERY_SEC = float(os.getenv("PATH_IDS_SAVE_SEC", "5"))
+
+_TABLE_VERSION = 1
+_ID_BYTES = 6
+_SEP = "\x1f"
+
+# id -> (namespace, путь); порядок — от давно не использованных к свежим
+_TABLE: "OrderedDict[str, Tuple[str, Tuple[str, ...]]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATE = {"loaded": False, "dirty": False, "saved_at": 0.0}
+
+
+def _digest(ns: str, path: Tuple[str, ...], salt: int) -> str:
+    base = f"{salt}{_SEP}{ns}{_SEP}{_SEP.join(path)}" if salt else f"{ns}{_SEP}{_SEP.join(path)}"
+    raw = hashlib.blake2s(base.encode("utf-8"), digest_size=_ID_BYTES).digest()
+    return base64.b32encode(raw).decode("ascii").rstrip("=").lower()
+
+
+def _load() -> None:
+    if _STATE["loaded"]:
+        return
+    _STATE["loaded"] = True
+    payload = persist_utils.read_json(PATH_IDS_FILE, None)
+    if payload is None and PATH_IDS_FILE != _LEGACY_FILE:
+        payload = persist_utils.read_json(_LEGACY_FILE, None)
+        _STATE["dirty"] = isinstance(payload, dict)  # перенесём в новый файл при ближайшей записи
+    if not isinstance(payload, dict) or payload.get("version") != _TABLE_VERSION:
+        return
+    for row in payload.get("ids") or []:
+        try:
+            pid, ns, path = row
+            _TABLE[str(pid)] = (str(ns), tuple(str(x) for x in path))
+        except Exception:
+            continue
+    while len(_TABLE) > PATH_IDS_MAX:
+        _TABLE.popitem(last=False)
+
+
+def _save(force: bool = False) -> None:
+    if not _STATE["dirty"]:
+        return
+    now = time.monotonic()
+    if not force and now - _STATE["saved_at"] < SAVE_EVERY_SEC:
+        return
+    rows = [[pid, ns, list(path)] for pid, (ns, path) in _TABLE.items()]
+    _STATE["dirty"] = False
+    _STATE["saved_at"] = now
+    persist_utils.write_json(PATH_IDS_FILE, {"version": _TABLE_VERSION, "ids": rows})
+
+
+def path_id(path: Sequence[str], ns: str = "") -> str:
+    """
+    Короткий ID пути (только [a-z2-7], без ':' и '|' — безопасно вставлять в callback_data).
+    """
+    key = (str(ns), tuple(str(x) for x in path))
+    with _LOCK:
+        _load()
+        salt = 0
+        while True:
+            pid = _digest(key[0], key[1], salt)
+            cur = _TABLE.get(pid)
+            if cur is None:
+                _TABLE[pid] = key
+                if len(_TABLE) > PATH_IDS_MAX:
+                    _TABLE.popitem(last=False)
+                _STATE["dirty"] = True
+                break
+            if cur == key:
+                if next(reversed(_TABLE)) != pid:
+                    _TABLE.move_to_end(pid)
+                    _STATE["dirty"] = True
+                break
+            # коллизия 48-битного хэша — берём следующий вариант, таблица запомнит выбор
+            salt += 1
+        _save()
+    return pid
+
+
+def resolve(pid: str, ns: str = "") -> Optional[List[str]]:
+    """
+    Путь по ID. None — ID неизвестен (вытеснен из таблицы) или выдан для другого namespace.
+    """
+    with _LOCK:
+        _load()
+        cur = _TABLE.get(str(pid or ""))
+        if cur is None or cur[0] != str(ns):
+            return None
+        if next(reversed(_TABLE)) != pid:
+            # свежесть тоже сохраняем (запись отложенная) — иначе после рестарта LRU вытеснит ходовые ID
+            _TABLE.move_to_end(pid)
+            _STATE["dirty"] = True
+            _save()
+        return list(cur[1])
+
+
+def flush() -> None:
+    """Записать новые ID (shutdown, тесты)."""
+    with _LOCK:
+        _save(force=True)
+
+
+# регистрируется после persist_utils: при выходе сначала ставим таблицу в очередь, потом её пишет flush писателя
+atexit.register(flush)
@@ -0,0 +1,171 @@
+# handlers/persist_utils.py
+# Общий фоновый писатель JSON-файлов состояния.
+#
+# write_json(path, payload) из async-хендлера не трогает диск: payload сразу
+# сериализуется (снимок — вызывающий может дальше менять свой dict), а запись
+# откладывается на WRITE_DELAY_SEC и склеивается: из серии записей одного файла
+# на диск попадает только последняя. Пишет отдельный поток: tmp + os.replace.
+#
+# Формат файла — handlers.codec (format_for(path): json / json-compact / msgpack / +gzip|+zstd),
+# read_json понимает любой из них.
+# read_json / exists видят ещё не записанные данные (read-your-writes).
+# flush() — записать всё немедленно (shutdown, atexit, тесты).
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from handlers import codec
+
+WRITE_DELAY_SEC = float(os.getenv("PERSIST_WRITE_DELAY_SEC", "0.5"))
+# дольше этого запись не откладывается, даже если файл пишут непрерывно
+WRITE_MAX_DELAY_SEC = float(os.getenv("PERSIST_WRITE_MAX_DELAY_SEC", "3"))
+
+
+class _Pending:
+    __slots__ = ("data", "due", "deadline")
+
+    def __init__(self, data: bytes, due: float, deadline: float):
+        self.data = data
+        self.due = due
+        self.deadline = deadline
+
+
+class JsonWriter:
+    def __init__(self, delay: float = WRITE_DELAY_SEC, max_delay: float = WRITE_MAX_DELAY_SEC):
+        self.delay = max(0.0, float(delay))
+        self.max_delay = max(self.delay, float(max_delay))
+        self._pending: Dict[str, _Pending] = {}
+        self._cond = threading.Condition()
+        # берётся до извлечения из очереди: запись одного файла никогда не обгонит более новую
+        self._io_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- постановка в очередь ----------
+    def write_json(self, path: Path, payload: Any, *, fmt: Optional[str] = None, delay: Optional[float] = None) -> None:
+        data = codec.encode(payload, fmt or codec.format_for(path))
+        self.write_bytes(path, data, delay=delay)
+
+    def write_bytes(self, path: Path, data: bytes, *, delay: Optional[float] = None) -> None:
+        key = str(Path(path))
+        now = time.monotonic()
+        d = self.delay if delay is None else max(0.0, float(delay))
+        with self._cond:
+            cur = self._pending.get(key)
+            deadline = cur.deadline if cur else now + self.max_delay
+            self._pending[key] = _Pending(data, min(now + d, deadline), deadline)
+            self._ensure_thread()
+            self._cond.notify()
+
+    # ---------- чтение с учётом очереди ----------
+    def pending_data(self, path: Path) -> Optional[bytes]:
+        with self._cond:
+            cur = self._pending.get(str(Path(path)))
+            return cur.data if cur else None
+
+    def read_json(self, path: Path, default: Any) -> Any:
+        data = self.pending_data(path)
+        if data is None:
+            return codec.read_file(path, default)
+        try:
+            return codec.decode(data)
+        except Exception:
+            return default
+
+    def exists(self, path: Path) -> bool:
+        return self.pending_data(path) is not None or Path(path).exists()
+
+    def discard(self, path: Path) -> int:
+        """Отменить отложенные записи файла path (или всех файлов внутри папки path)."""
+        key = str(Path(path))
+        prefix = key.rstrip(os.sep) + os.sep
+        with self._io_lock, self._cond:
+            keys = [k for k in self._pending if k == key or k.startswith(prefix)]
+            for k in keys:
+                self._pending.pop(k, None)
+        return len(keys)
+
+    # ---------- запись ----------
+    @staticmethod
+    def _write_file(key: str, data: bytes) -> None:
+        path = Path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[persist] ⚠️ не удалось записать {path}: {e}")
+
+    def _take(self, *, only_due: bool) -> Dict[str, bytes]:
+        now = time.monotonic()
+        with self._cond:
+            keys = [k for k, p in self._pending.items() if not only_due or p.due <= now]
+            return {k: self._pending.pop(k).data for k in keys}
+
+    def flush(self) -> int:
+        """Записать все отложенные файлы прямо сейчас (в текущем потоке)."""
+        with self._io_lock:
+            items = self._take(only_due=False)
+            for key, data in items.items():
+                self._write_file(key, data)
+        return len(items)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="json-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wait = min(p.due for p in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            with self._io_lock:
+                for key, data in self._take(only_due=True).items():
+                    self._write_file(key, data)
+
+
+_WRITER = JsonWriter()
+
+atexit.register(_WRITER.flush)
+
+
+def write_json(path: Path, payload: Any, *, fmt: Optional[str] = None, delay: Optional[float] = None) -> None:
+    _WRITER.write_json(path, payload, fmt=fmt, delay=delay)
+
+
+def read_json(path: Path, default: Any) -> Any:
+    return _WRITER.read_json(path, default)
+
+
+def exists(path: Path) -> bool:
+    return _WRITER.exists(path)
+
+
+def has_pending(path: Path) -> bool:
+    return _WRITER.pending_data(path) is not None
+
+
+def discard(path: Path) -> int:
+    return _WRITER.discard(path)
+
+
+def flush() -> int:
+    return _WRITER.flush()
+
+
+async def aflush() -> int:
+    """flush() из event loop (не блокируя его)."""
+    return await asyncio.to_thread(_WRITER.flush)
@@ -0,0 +1,285 @@
+# handlers/price_search.py
+# Inline-поиск цен (aiogram v3): "@bot 15 pro 256 black" -> подходящие варианты с минимальными ценами.
+#
+# Запрос разбирается тем же нормализатором, что и товары из каналов:
+#   - модель — entry.match_model_from_text по model_index.json пайплайна (алиасы моделей;
+#     перечитывается по mtime/size файла, здесь не пересобирается),
+#     fallback — по словам из названий моделей текущего parsed_data;
+#   - атрибуты — entry.extract_storage / extract_colors_all / extract_sim / extract_region.
+# Данные — как в view_prices (поколение parsed_data пользователя + overlay + region_index).
+# На поколение строится индекс слов названий моделей, атрибуты вариантов разбираются один раз на заголовок,
+# ответы кэшируются по нормализованному запросу в page-view view_prices (сбрасывается со сменой поколения).
+#
+# Нужен включённый inline mode у бота (BotFather -> /setinline).
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from handlers.auth_utils import auth_get
+from handlers.normalizers import entry as entry_mod
+from handlers import view_prices as vp
+
+router = Router(name="price_search")
+
+MAX_RESULTS = 20            # вариантов в ответе
+MAX_MODELS = 5              # моделей-кандидатов из fallback-поиска
+INLINE_CACHE_TIME = 30      # сек: кэш ответа на стороне Telegram (is_personal — цены у пользователей разные)
+MIN_QUERY_LEN = 2
+
+_QUERY_CACHE_MAX = 2000
+_ATTRS_CACHE_MAX = 50000
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё+]+")
+
+# заголовок варианта -> разобранные атрибуты (от поколения не зависят)
+_ATTRS_CACHE: Dict[str, Dict[str, Any]] = {}
+# путь model_index.json -> ((mtime_ns, size) | None, индекс)
+_MODEL_INDEX_CACHE: Dict[str, Tuple[Optional[Tuple[int, int]], dict]] = {}
+
+
+def _tokens(s: str) -> List[str]:
+    return _TOKEN_RE.findall(vp._norm_key(s))
+
+
+def _norm_query(q: str) -> str:
+    return " ".join(_tokens(q))
+
+
+def _model_index_live() -> dict:
+    """
+    model_index.json (его собирает пайплайн, entry.ensure_etalon_ready) с кэшем по mtime/size —
+    как region_index. Не пересобираем: нет файла — модель ищется только по словам названий.
+    Файл читается с диска — вызывать через asyncio.to_thread.
+    """
+    path = entry_mod.MODEL_INDEX_JSON
+    try:
+        st = path.stat()
+        sig: Optional[Tuple[int, int]] = (int(st.st_mtime_ns), int(st.st_size))
+    except OSError:
+        sig = None
+    cached = _MODEL_INDEX_CACHE.get(str(path))
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+
+    idx: dict = {}
+    if sig is not None:
+        mi = entry_mod._load_json(path, {})
+        if isinstance(mi, dict) and isinstance(mi.get("index"), dict):
+            idx = mi["index"]
+    _MODEL_INDEX_CACHE[str(path)] = (sig, idx)
+    return idx
+
+
+def _attrs(text: str) -> Dict[str, Any]:
+    """storage / ram / colors / sim / region из текста (запроса или заголовка варианта)."""
+    try:
+        storage, ram = entry_mod.extract_storage(text)
+    except Exception:
+        storage, ram = None, None
+    try:
+        colors = [vp._norm_key(c) for c in (entry_mod.extract_colors_all(text, limit=3) or [])]
+    except Exception:
+        colors = []
+    try:
+        sim = entry_mod.extract_sim(text)
+    except Exception:
+        sim = None
+    try:
+        region = entry_mod.extract_region(text)
+    except Exception:
+        region = None
+    return {
+        "storage": vp._norm_key(storage or "") or None,
+        "ram": ram or None,
+        "colors": colors,
+        "sim": vp._norm_key(sim or "") or None,
+        "region": vp._norm_key(region or "") or None,
+    }
+
+
+def _variant_attrs(title: str) -> Dict[str, Any]:
+    a = _ATTRS_CACHE.get(title)
+    if a is None:
+        a = _attrs(title)
+        if len(_ATTRS_CACHE) >= _ATTRS_CACHE_MAX:
+            _ATTRS_CACHE.clear()
+        _ATTRS_CACHE[title] = a
+    return a
+
+
+def _variant_regions(title_attrs: Dict[str, Any], info: Dict[str, Any]) -> Set[str]:
+    out: Set[str] = set()
+    if title_attrs.get("region"):
+        out.add(title_attrs["region"])
+    for k in ("region_min", "region"):
+        v = info.get(k)
+        for r in (v if isinstance(v, list) else [v]):
+            if r:
+                out.add(vp._norm_key(str(r)))
+    return out
+
+
+def _variant_matches(q: Dict[str, Any], title: str, info: Dict[str, Any]) -> bool:
+    va = _variant_attrs(title)
+    if q["storage"] and va["storage"] != q["storage"]:
+        return False
+    if q["ram"] and va["ram"] and va["ram"] != q["ram"]:
+        return False
+    if q["colors"] and not (set(q["colors"]) & set(va["colors"])):
+        return False
+    if q["sim"] and va["sim"] != q["sim"]:
+        return False
+    if q["region"] and q["region"] not in _variant_regions(va, info):
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------
+# Индекс моделей поколения (fallback, если алиасы не нашли модель)
+# ---------------------------------------------------------------------
+class _ModelWords:
+    def __init__(self, root: Dict[str, Any]):
+        self.paths: List[Tuple[str, ...]] = []
+        self.words: List[Set[str]] = []
+        self.by_word: Dict[str, Set[int]] = {}
+        for path, _variants in vp._collect_models_in_subtree(root, []):
+            i = len(self.paths)
+            self.paths.append(tuple(path))
+            # бренд + серия + модель: "apple iphone 15 iphone 15 pro"
+            ws = set(_tokens(" ".join(path[1:])))
+            self.words.append(ws)
+            for w in ws:
+                self.by_word.setdefault(w, set()).add(i)
+
+    def find(self, q_tokens: List[str]) -> List[Tuple[str, ...]]:
+        known = [t for t in q_tokens if t in self.by_word]
+        if not known:
+            return []
+        ids = set.intersection(*(self.by_word[t] for t in known))
+        # ближе всего — модель без лишних слов ("15 pro" -> "iPhone 15 Pro", а не "... Pro Max")
+        ranked = sorted(ids, key=lambda i: (len(self.words[i]), i))
+        return [self.paths[i] for i in ranked[:MAX_MODELS]]
+
+
+def _search_state(view: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if view is None:
+        return {"words": None, "results": {}}
+    st = view.get("search")
+    if st is None:
+        st = view["search"] = {"words": None, "results": {}}
+    return st
+
+
+def _candidate_models(
+    query: str,
+    q_tokens: List[str],
+    root: Dict[str, Any],
+    st: Dict[str, Any],
+    model_index: Optional[dict],
+) -> List[Tuple[str, ...]]:
+    meta = None
+    if model_index:
+        try:
+            meta = entry_mod.match_model_from_text(query, model_index)
+        except Exception:
+            meta = None
+    if isinstance(meta, dict):
+        p = tuple(str(x) for x in (meta.get("path") or []))
+        if p and vp._is_model_leaf(vp._dig(root, list(p))):
+            return [p]
+    if st["words"] is None:
+        st["words"] = _ModelWords(root)
+    return st["words"].find(q_tokens)
+
+
+def _search(
+    query: str,
+    *,
+    root: Dict[str, Any],
+    view: Optional[Dict[str, Any]],
+    region_index: Any,
+    overlay: Any,
+    model_index: Optional[dict] = None,
+) -> List[Tuple[str, str, str]]:
+    """
+    [(id, строка варианта, путь модели)] для ответа на inline-запрос, дешёвые первыми.
+    model_index — алиасы моделей (_model_index_live); без него — поиск по словам названий.
+    """
+    qn = _norm_query(query)
+    st = _search_state(view)
+    cached = st["results"].get(qn)
+    if cached is not None:
+        return cached
+
+    q_tokens = qn.split()
+    q_attrs = _attrs(query)
+    found: List[Tuple[float, str, str, str]] = []
+    for mpath in _candidate_models(query, q_tokens, root, st, model_index):
+        node = vp._dig(root, list(mpath))
+        if not isinstance(node, dict):
+            continue
+        variants = overlay.model_variants(mpath, node) if overlay is not None else node
+        crumb = " / ".join(mpath[1:])
+        for title, info in variants.items():
+            if not isinstance(info, dict) or info.get("min_price") is None:
+                continue
+            if not _variant_matches(q_attrs, str(title), info):
+                continue
+            line = vp._render_variant_line(str(title), info, region_index=region_index, model_path=list(mpath))
+            rid = hashlib.sha1("\x1f".join(mpath + (str(title),)).encode("utf-8")).hexdigest()[:32]
+            try:
+                price = float(info.get("min_price"))
+            except Exception:
+                price = float("inf")
+            found.append((price, rid, line, crumb))
+
+    found.sort(key=lambda x: x[0])
+    results = [(rid, line, crumb) for _p, rid, line, crumb in found[:MAX_RESULTS]]
+
+    if len(st["results"]) >= _QUERY_CACHE_MAX:
+        st["results"].clear()
+    st["results"][qn] = results
+    return results
+
+
+@router.inline_query()
+async def inline_price_search(inline_query: InlineQuery):
+    u = await auth_get(inline_query.from_user.id)
+    access = (u or {}).get("access") or {}
+    query = (inline_query.query or "").strip()
+    if not u or not (u.get("role") == "admin" or access.get("main.view_prices")) or len(query) < MIN_QUERY_LEN:
+        await inline_query.answer([], cache_time=5, is_personal=True)
+        return
+
+    parsed_path = vp._parsed_data_path_for_user(u)
+    data = vp._get_data_for_user(u)
+    region_index = vp._get_region_index_for_user(u)
+    overlay = vp._get_price_overlay_for_user(u)
+    view = vp._page_view(parsed_path, region_index, overlay)
+    root = vp._get_catalog_root(data)
+    model_index = await asyncio.to_thread(_model_index_live)
+
+    t0 = time.perf_counter()
+    found = _search(query, root=root, view=view, region_index=region_index, overlay=overlay, model_index=model_index)
+    ms = (time.perf_counter() - t0) * 1000
+    if ms > 50:
+        print(f"[price_search] ⚠️ {ms:.0f}ms: {query!r}")
+
+    results = [
+        InlineQueryResultArticle(
+            id=rid,
+            title=line,
+            description=crumb,
+            input_message_content=InputTextMessageContent(message_text=f"{crumb}\n{line}"),
+        )
+        for rid, line, crumb in found
+    ]
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
@@ -0,0 +1,186 @@
+# handlers/publishing/catalog_index.py
+# Плоский индекс дерева каталога для публикации (parsed_data["catalog"] или data.json["etalon"]):
+#   порядок категорий/брендов/моделей, заголовки моделей, путь модели в дереве.
+# Дерево обходится один раз на версию каталога; поиск пути модели — по словарям бренда,
+# серии-контейнеры определяются один раз на узел.
+#
+# Семантика та же, что у прежних обходов в channel_updater
+# (_order_from_prices_catalog / _find_first_model_path_in_catalog / _collect_all_model_titles).
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+_INDEX_CACHE_MAX = 16
+# по id держим меньше: запись не даёт освободить само дерево
+_ID_CACHE_MAX = 8
+
+# version -> CatalogIndex (общий для всех каналов, пока версия каталога та же)
+_BY_VERSION: Dict[str, "CatalogIndex"] = {}
+# id(catalog) -> (catalog, CatalogIndex): ссылка на дерево держит id от переиспользования
+_BY_ID: Dict[int, Tuple[Any, "CatalogIndex"]] = {}
+
+
+def _looks_like_models_map(d: dict) -> bool:
+    """
+    Эвристика: если хотя бы у одного значения есть признаки "узла модели",
+    считаем, что d это map model_name -> model_node.
+    """
+    if not isinstance(d, dict) or not d:
+        return False
+
+    sample_vals = list(d.values())[:5]
+    for v in sample_vals:
+        if isinstance(v, dict):
+            if any(k in v for k in ("variants", "items", "rows", "lines", "min_price", "price", "prices", "best_channels")):
+                return True
+        elif isinstance(v, list):
+            return True
+    return False
+
+
+def _is_series_container(node: Any) -> bool:
+    """
+    Серия: dict, где значения преимущественно dict (подмодели),
+    и при этом это НЕ leaf с ценой/вариантами.
+    """
+    if not isinstance(node, dict) or not node:
+        return False
+
+    # если на верхнем уровне есть признаки "модельного" leaf — это НЕ серия
+    if any(k in node for k in ("min_price", "price", "best_channels", "variants", "items", "rows", "lines")):
+        return False
+
+    vals = list(node.values())[:10]
+    dict_vals = sum(1 for v in vals if isinstance(v, dict))
+    list_vals = sum(1 for v in vals if isinstance(v, list))
+
+    # серия обычно почти целиком из dict'ов (подмоделей)
+    return dict_vals >= max(1, (len(vals) * 6) // 10) and list_vals == 0
+
+
+class _BrandBlock:
+    """Один бренд: модели по порядку + где искать модель (ключ бренда / первая серия с ней)."""
+
+    def __init__(self, block: dict):
+        self.direct: Dict[str, Tuple[bool, bool]] = {}   # model -> (series == model внутри, это серия-контейнер)
+        self.series_first: Dict[str, str] = {}          # model -> первая серия, где она есть
+        for k, v in block.items():
+            key = str(k)
+            if isinstance(v, dict):
+                self.direct[key] = (key in v, _is_series_container(v))
+                for m2 in v.keys():
+                    self.series_first.setdefault(str(m2), key)
+            else:
+                self.direct[key] = (False, False)
+
+    def path(self, cat: str, br: str, model: str) -> Optional[List[str]]:
+        hit = self.direct.get(model)
+        if hit is not None:
+            same_key, is_series = hit
+            if same_key:
+                # data.json: ...["iPhone 17"]["iPhone 17"] -> [list]
+                return [cat, br, model, model]
+            if not is_series:
+                return [cat, br, model]
+        series = self.series_first.get(model)
+        if series is not None:
+            return [cat, br, series, model]
+        return None
+
+
+class CatalogIndex:
+    def __init__(self, catalog: Any):
+        self.cat_list: List[str] = []
+        self.cat_brands: Dict[str, List[str]] = {}
+        self.brand_models: Dict[Tuple[str, str], List[str]] = {}
+        self.model_count = 0
+        # только строки: индекс переживает само дерево (кэш по версии)
+        self._blocks: Dict[Tuple[str, str], _BrandBlock] = {}
+        self._paths: Dict[Tuple[str, str, str], Optional[List[str]]] = {}
+
+        if not isinstance(catalog, dict):
+            self.titles: set = set()
+            return
+
+        for cat, brands in catalog.items():
+            if not isinstance(brands, dict):
+                continue
+            cat = str(cat)
+            self.cat_list.append(cat)
+            br_list: List[str] = []
+            for br, block in brands.items():
+                if not isinstance(block, dict):
+                    continue
+                br = str(br)
+                br_list.append(br)
+                self._blocks[(cat, br)] = _BrandBlock(block)
+
+                models_order: List[str] = []
+                seen: set = set()
+                if _looks_like_models_map(block):
+                    self.model_count += len(block)
+                    names = [str(m) for m in block.keys()]
+                else:
+                    names = []
+                    for _series, models in block.items():
+                        if isinstance(models, dict):
+                            self.model_count += len(models)
+                            names.extend(str(m) for m in models.keys())
+                for mn in names:
+                    if mn not in seen:
+                        seen.add(mn)
+                        models_order.append(mn)
+                self.brand_models[(cat, br)] = models_order
+            self.cat_brands[cat] = br_list
+
+        self.titles = {m for models in self.brand_models.values() for m in models}
+
+    def order(self) -> Tuple[List[str], Dict[str, List[str]], Dict[Tuple[str, str], List[str]]]:
+        """Копии списков порядка (вызывающий их фильтрует)."""
+        return (
+            list(self.cat_list),
+            {k: list(v) for k, v in self.cat_brands.items()},
+            {k: list(v) for k, v in self.brand_models.items()},
+        )
+
+    def model_path(self, cat: str, br: str, model: str) -> Optional[List[str]]:
+        """
+        Путь модели:
+          A) cat/brand/model
+          B) cat/brand/series/model
+          C) cat/brand/series/model, где series == model (как в data.json: "iPhone 17": {"iPhone 17":[...]})
+        """
+        key = (cat, br, model)
+        if key not in self._paths:
+            blk = self._blocks.get((cat, br))
+            self._paths[key] = blk.path(cat, br, model) if blk is not None else None
+        p = self._paths[key]
+        return list(p) if p is not None else None
+
+
+def _remember(cache: dict, key: Any, value: Any) -> None:
+    if len(cache) >= (_ID_CACHE_MAX if cache is _BY_ID else _INDEX_CACHE_MAX):
+        cache.clear()
+    cache[key] = value
+
+
+def get_index(catalog: Any, version: Optional[str] = None) -> CatalogIndex:
+    """
+    Индекс дерева. version — версия каталога (например, путь@mtime файла поколения):
+    тогда индекс общий для всех каналов и синхронизаций этой версии. Без version — кэш по самому дереву.
+    """
+    if version:
+        idx = _BY_VERSION.get(version)
+        if idx is None:
+            idx = CatalogIndex(catalog)
+            _remember(_BY_VERSION, version, idx)
+        _remember(_BY_ID, id(catalog), (catalog, idx))
+        return idx
+
+    cached = _BY_ID.get(id(catalog))
+    if cached is not None and cached[0] is catalog:
+        return cached[1]
+    idx = CatalogIndex(catalog)
+    _remember(_BY_ID, id(catalog), (catalog, idx))
+    return idx
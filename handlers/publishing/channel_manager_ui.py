@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message  # noqa
@@ -14,9 +14,8 @@ import re
 from pathlib import Path
 import json
 import time
-import hashlib
 
-from storage import load_data, save_data
+from storage import read_data, save_data
 from handlers.publishing.storage import (
     load_managed_channels,
     save_managed_channels,
@@ -25,8 +24,10 @@ from handlers.publishing.storage import (
     purge_channel_storage,
 )
 from handlers.publishing.channel_updater import sync_channel, hide_opt_models
+from handlers.publishing.multi_sync import ChannelJob, MultiSyncReport, sync_channels
 from telethon_manager import get_paid_client
 from handlers.auth_utils import auth_get
+from handlers import path_ids
 
 router = Router()
 
@@ -61,54 +62,20 @@ async def _get_channel_client(ch: dict):
 
 
 # =========================
-# ✅ PATH TOKEN CACHE (fix BUTTON_DATA_INVALID)
+# ✅ PATH TOKENS (fix BUTTON_DATA_INVALID)
 # =========================
 # Telegram ограничивает callback_data (примерно 64 байта), поэтому длинные пути "A|B|C|..."
-# ломают клавиатуру. Делаем короткий токен и держим map token -> raw_path в памяти.
-_PATH_CACHE: dict[str, tuple[str, str, str, float]] = {}
-_PATH_CACHE_TTL_SECS = 6 * 60 * 60      # 6 часов
-_PATH_CACHE_MAX = 50_000                # запас
-
-
-def _prune_path_cache() -> None:
-    if not _PATH_CACHE:
-        return
-
-    now = time.time()
-
-    dead = [k for k, (_, __, ___, ts) in _PATH_CACHE.items() if (now - ts) > _PATH_CACHE_TTL_SECS]
-    for k in dead:
-        _PATH_CACHE.pop(k, None)
-
-    if len(_PATH_CACHE) <= _PATH_CACHE_MAX:
-        return
-
-    items = sorted(_PATH_CACHE.items(), key=lambda kv: kv[1][3])
-    for k, _v in items[: max(0, len(items) - _PATH_CACHE_MAX)]:
-        _PATH_CACHE.pop(k, None)
-
-
-def _make_path_token(kind: str, ch_id: str, raw_path: str) -> str:
-    base = f"{kind}|{ch_id}|{raw_path}"
-    return hashlib.blake2s(base.encode("utf-8"), digest_size=8).hexdigest()  # 16 hex
-
-
+# ломают клавиатуру. Короткий стабильный ID пути — общий сервис handlers/path_ids.py
+# (namespace "<kind>:<канал>": токен одного меню/канала не разрешается в другом).
 def _cache_path(kind: str, ch_id: str, raw_path: str) -> str:
-    tok = _make_path_token(kind, ch_id, raw_path)
-    _PATH_CACHE[tok] = (kind, ch_id, raw_path, time.time())
-    _prune_path_cache()
-    return tok
+    return path_ids.path_id(raw_path.split("|"), f"{kind}:{ch_id}")
 
 
 def _resolve_path_token(tok: str, *, kind: str, ch_id: str) -> Optional[str]:
-    it = _PATH_CACHE.get(tok)
-    if not it:
+    path = path_ids.resolve(tok, f"{kind}:{ch_id}")
+    if path is None:
         return None
-    k, c, raw, _ts = it
-    if k != kind or c != ch_id:
-        return None
-    _PATH_CACHE[tok] = (k, c, raw, time.time())  # продлеваем жизнь
-    return raw
+    return "|".join(path)
 
 
 async def _alert_stale(cb: CallbackQuery):
@@ -422,6 +389,7 @@ def _kb_main(reg: dict):
 def _kb_channel(ch: dict):
     rows = [
         [InlineKeyboardButton(text="🔄 Обновить цены", callback_data=f"cm:update:{ch['id']}")],
+        [InlineKeyboardButton(text="🧮 Оценить обновление", callback_data=f"cm:plan:{ch['id']}")],
         [InlineKeyboardButton(text="📂 Что публиковать", callback_data=f"cm:publish:{ch['id']}")],
         [InlineKeyboardButton(text="🧩 Управление меню", callback_data=f"cm:menu_manage:{ch['id']}")],
         [InlineKeyboardButton(text="💸 Настройки цен", callback_data=f"cm:pricing:{ch['id']}")],
@@ -1530,7 +1498,7 @@ def _get_catalog_tree_for_publish() -> dict:
     """
     Рисуем по db["etalon"] (там порядок и варианты).
     """
-    db = load_data()
+    db = read_data()
     etalon = db.get("etalon")
     if isinstance(etalon, dict) and etalon:
         return etalon
@@ -2298,6 +2266,43 @@ async def cm_update_one(cb: CallbackQuery):
             raise
 
 
+# --- Оценка обновления (dry-run: план без отправки) ---
+@router.callback_query(F.data.startswith("cm:plan:"))
+async def cm_plan_one(cb: CallbackQuery):
+    ch_id = cb.data.split(":")[-1]
+    _u, _reg, ch = await _get_channel_for_cb(cb, ch_id)
+    if not ch:
+        return
+    await cb.answer("Считаю план…")
+
+    mode = "opt" if ch.get("type") == "opt" else "retail"
+    target = _make_channel_ref(ch_id, ch)
+    try:
+        client = await _get_channel_client(ch)
+        result = await sync_channel(client, target, channel_mode=mode, aio_bot=cb.bot, dry_run=True)
+    except Exception as e:
+        await cb.answer(f"Ошибка планирования: {e}", show_alert=True)
+        return
+
+    plan = result.get("plan") or {}
+    reasons = plan.get("delete_reasons") or {}
+    reasons_txt = ", ".join(f"{k}: {v}" for k, v in sorted(reasons.items())) or "—"
+    msg = (
+        f"🧮 План обновления канала\n"
+        f"Создать: {plan.get('creates', 0)}\n"
+        f"Отредактировать: {plan.get('edits', 0)} (картинки: {plan.get('media_edits', 0)})\n"
+        f"Без изменений: {plan.get('skips', 0)}\n"
+        f"Удалить: {plan.get('deletes', 0)} ({reasons_txt})\n"
+        f"Меню: {'перестроить' if plan.get('rebuild_menus') else 'оставить на месте'} ({plan.get('menus', 0)})\n"
+        f"≈ запросов к Telegram: {plan.get('api_calls', 0)} (из них сверка: {plan.get('reconcile_calls', 0)})"
+    )
+    try:
+        await cb.message.edit_text(msg, reply_markup=InlineKeyboardMarkup(inline_keyboard=_kb_channel(ch)))
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            raise
+
+
 # --- Скрыть цены в одном opt-канале ---
 @router.callback_query(F.data.startswith("cm:hide:"))
 async def cm_hide_one(cb: CallbackQuery):
@@ -2455,6 +2460,20 @@ async def cm_pub_time_save(msg: Message, state: FSMContext):
     ))
 
 
+def _channel_job(ch_id: str, ch: dict, *, aio_bot=None) -> ChannelJob:
+    async def _client():
+        return await _get_channel_client(ch)
+
+    return ChannelJob(
+        ch_id=str(ch_id),
+        title=ch.get("title") or ch.get("username") or str(ch_id),
+        target=_make_channel_ref(str(ch_id), ch),
+        mode="opt" if ch.get("type") == "opt" else "retail",
+        get_client=_client,
+        aio_bot=aio_bot,
+    )
+
+
 # --- Обновление всех каналов ---
 @router.callback_query(F.data == "cm:update_all")
 async def cm_update_all(cb: CallbackQuery):
@@ -2463,30 +2482,25 @@ async def cm_update_all(cb: CallbackQuery):
         return
     reg = _get_registry()
     reg = _filter_registry_for_user(reg, cb.from_user.id, u.get("role") == "admin")
-    total_created = total_edited = total_skipped = total_removed = 0
-    total_channels = 0
     skipped_no_markup = 0
-
+    jobs: List[ChannelJob] = []
     for ch_id, ch in list(reg.items()):
         if not _pricing_ready(ch):
             skipped_no_markup += 1
             continue
-        mode = "opt" if ch.get("type") == "opt" else "retail"
+        jobs.append(_channel_job(ch_id, ch, aio_bot=cb.bot))
+
+    async def _show_progress(report: MultiSyncReport) -> None:
         try:
-            target = _make_channel_ref(ch_id, ch)
-            result = await sync_channel(
-                await _get_channel_client(ch),
-                target,
-                channel_mode=mode,
-                aio_bot=cb.bot,
-            )
-            total_created += result["created"]
-            total_edited += result["edited"]
-            total_skipped += result["skipped"]
-            total_removed += result["removed"]
-            total_channels += 1
-        except Exception:
-            continue
+            await cb.message.edit_text("🔄 Обновление каналов:\n" + report.render())
+        except TelegramBadRequest:
+            pass
+
+    report = await sync_channels(jobs, on_progress=_show_progress)
+    totals = report.totals()
+    total_created, total_edited = totals["created"], totals["edited"]
+    total_skipped, total_removed = totals["skipped"], totals["removed"]
+    total_channels = len(report.done())
 
     msg = (
         "📊 Сводка по всем каналам:\n"
@@ -2578,23 +2592,24 @@ async def schedule_daily_publish(client):
         today = now.date().isoformat()
         cur_hm = now.strftime("%H:%M")
 
+        jobs: List[ChannelJob] = []
         for ch_id, ch in list(reg.items()):
-            try:
-                if not _pricing_ready(ch):
-                    continue
-                pt = (ch.get("publish_time") or "").strip()
-                if not pt or pt != cur_hm:
-                    continue
-                if ch.get("last_publish_date") == today:
-                    continue
-                target = _make_channel_ref(str(ch_id), ch)
-                mode = "opt" if ch.get("type") == "opt" else "retail"
-                await sync_channel(
-                    await _get_channel_client(ch),
-                    target,
-                    channel_mode=mode,
-                )
+            if not _pricing_ready(ch):
+                continue
+            pt = (ch.get("publish_time") or "").strip()
+            if not pt or pt != cur_hm:
+                continue
+            if ch.get("last_publish_date") == today:
+                continue
+            jobs.append(_channel_job(str(ch_id), ch))
+        if not jobs:
+            continue
+
+        def _mark_published(job: ChannelJob, _result: dict) -> None:
+            ch = reg.get(job.ch_id)
+            if isinstance(ch, dict):
                 ch["last_publish_date"] = today
                 _save_registry(reg)
-            except Exception:
-                continue
+
+        # все каналы с этим временем — одновременно (общий бюджет запросов — rate_limit)
+        await sync_channels(jobs, on_done=_mark_published)
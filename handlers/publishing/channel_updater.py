@@ -3,15 +3,16 @@ from __future__ import annotations
 
 from typing import Union, Dict, Optional, Tuple, List, Any
 
-import asyncio
 import hashlib
 import html
 import json
+import os
 import re
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 
-from telethon import utils
+from telethon import events, utils
 from telethon.client.telegramclient import TelegramClient
 from telethon.tl.types import Message
 from telethon.errors import FloodWaitError
@@ -19,27 +20,44 @@ from telethon.errors import FloodWaitError
 from aiogram import Bot as AiogramBot
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
-from storage import load_data, save_data
+from storage import data_build_id, load_data, save_data
+from handlers import codec
+from handlers.publishing import catalog_index, media_cache, rate_limit
 from handlers.publishing.storage import (
     load_channel_posts,
     save_channel_posts,
     load_channel_menu_state,
     save_channel_menu_state,
+    load_channel_sync_state,
+    save_channel_sync_state,
     load_status_extra,
     load_managed_channels,
 )
 from handlers.parsing.context import user_data_dir, DEFAULT_BASE_DIR
+from handlers.auth_utils import auth_get_cached
+from handlers.parsing.results import _file_build_id, load_region_index, merge_region_indexes
+from handlers.parsing.overlay import overlay_for_paths
+from handlers.parsing import change_feed
+from handlers.parsing.generations import current_generation_id, generation_file
 from handlers.normalizers.entry_dicts import REGION_FLAG_MAP
 
 
-# ====================== Настройки темпа публикаций (мягкий rate-limit) ======================
-THROTTLE_SECS = 1.4
-GROUP_PAUSE_SECS = 3.5
-
 # Сколько последних сообщений считаем "живыми" без доп. проверки
 RECENT_MESSAGES_LIMIT = 2000
+# Сверка кэша постов: incremental (доверяем posts.json, проверяем хвост и затрагиваемые id) | full
+RECONCILE_MODE = (os.getenv("PUBLISH_RECONCILE") or "incremental").strip().lower()
+# сколько последних сообщений смотрим при incremental-сверке
+RECONCILE_TAIL_LIMIT = int(os.getenv("PUBLISH_RECONCILE_TAIL", "50"))
+# полный скан не реже, чем раз в столько часов
+FULL_RESCAN_EVERY_HOURS = float(os.getenv("PUBLISH_FULL_RESCAN_HOURS", "24"))
+# столько пропавших постов среди проверенных id = расхождение, делаем полный скан
+RECONCILE_DRIFT_MAX = int(os.getenv("PUBLISH_RECONCILE_DRIFT_MAX", "10"))
+# лента изменений цен (parsing/change_feed.py): между полными проходами правим только изменившиеся модели
+CHANGE_FEED_ENABLED = (os.getenv("PUBLISH_CHANGE_FEED") or "1").strip().lower() not in ("0", "false", "no", "off")
 # Размер батча для проверки кэша по ids
 VERIFY_CACHE_CHUNK = 100
+# Сколько сообщений удалять одним запросом (лимит Telegram — 100)
+DELETE_CHUNK = 100
 
 # Лимиты для склейки моделей (больше не используются — 1 сообщение = 1 модель)
 SHORT_MODEL_LINES = 20   # legacy
@@ -86,13 +104,8 @@ def _load_channel_settings(peer_id_short: str, peer_id: str) -> dict:
 def _load_user_settings(user_id: int | None) -> dict:
     if not user_id:
         return {}
-    try:
-        path = DEFAULT_BASE_DIR.parent / "data" / "auth_users.json"
-        raw = json.loads(path.read_text(encoding="utf-8"))
-        u = (raw.get("users") or {}).get(str(int(user_id))) or {}
-        return u if isinstance(u, dict) else {}
-    except Exception:
-        return {}
+    # реестр auth в памяти (перечитывается только при изменении файла)
+    return auth_get_cached(user_id) or {}
 
 
 def _parsed_is_empty(parsed: dict) -> bool:
@@ -102,10 +115,6 @@ def _parsed_is_empty(parsed: dict) -> bool:
     return not (isinstance(cat, dict) and len(cat) > 0)
 
 
-async def _throttle(base: float = THROTTLE_SECS) -> None:
-    await asyncio.sleep(base)
-
-
 # --------------------------- Вспомогательные утилиты ---------------------------
 
 def _first_line(s: str) -> str:
@@ -136,10 +145,12 @@ async def _prune_missing_messages(
     *,
     existing_index: dict[str, dict],
     recent_ids: set[str],
+    calls: Optional[Dict[str, int]] = None,
 ) -> int:
     """
     Удаляем из кэша ТОЛЬКО реально удалённые сообщения.
     recent_ids — ids, которые мы точно видели в свежей выборке.
+    calls — счётчик запросов сверки ("reconcile"), см. sync_channel(dry_run=True).
     """
     if not existing_index:
         return 0
@@ -150,6 +161,7 @@ async def _prune_missing_messages(
 
     removed = 0
     for chunk in _chunked(to_check, VERIFY_CACHE_CHUNK):
+        _count_call(calls)
         try:
             msgs = await client.get_messages(entity, ids=chunk)
         except Exception as ex:
@@ -171,29 +183,13 @@ def _read_json(paths: Tuple[Path, ...]) -> tuple[dict, Optional[str]]:
     for p in paths:
         try:
             if p.exists():
-                with p.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = codec.decode(p.read_bytes())
                 return data, str(p.resolve())
         except Exception:
             pass
     return {}, None
 
 
-def _read_matched_items(path: Path) -> list[dict]:
-    try:
-        if not path.exists():
-            return []
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return []
-    if isinstance(raw, dict):
-        items = raw.get("items") or []
-        return [x for x in items if isinstance(x, dict)]
-    if isinstance(raw, list):
-        return [x for x in raw if isinstance(x, dict)]
-    return []
-
-
 def _norm_key(s: str) -> str:
     s = (s or "").strip().lower()
     s = s.replace("\u00A0", " ")
@@ -203,7 +199,7 @@ def _norm_key(s: str) -> str:
 
 
 def _strip_ram(s: str) -> str:
-    return re.sub(r"\\b\\d{1,2}\\s*/\\s*(\\d{2,4}\\s*(?:gb|tb))\\b", r"\\1", s)
+    return re.sub(r"\b\d{1,2}\s*/\s*(\d{2,4}\s*(?:gb|tb))\b", r"\1", s)
 
 
 def _regions_to_flags(regions: List[str]) -> str:
@@ -217,104 +213,20 @@ def _regions_to_flags(regions: List[str]) -> str:
     return " ".join(out).strip()
 
 
-def _build_region_index_from_items(items: list[dict]) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
-    stripped_bucket: Dict[Tuple[Tuple[str, ...], str], List[Dict[str, Any]]] = {}
-
-    def _regions_for_min_price(item: dict, min_price: Optional[float]) -> List[str]:
-        out: List[str] = []
-        if min_price is None:
-            return out
-        prices = item.get("prices")
-        if isinstance(prices, list):
-            for p in prices:
-                if not isinstance(p, dict):
-                    continue
-                try:
-                    mp = float(str(p.get("price") or "").replace(" ", ""))
-                except Exception:
-                    mp = None
-                if mp is None or mp != min_price:
-                    continue
-                raw = (p.get("raw") or "").strip()
-                try:
-                    from handlers.normalizers.entry import extract_region
-                except Exception:
-                    extract_region = None
-                if extract_region:
-                    reg = (extract_region(raw) or "").strip().lower()
-                    if reg and reg not in out:
-                        out.append(reg)
-        if not out:
-            params = item.get("params") or {}
-            if isinstance(params, dict):
-                reg = (params.get("region") or "").strip().lower()
-                if reg:
-                    out.append(reg)
-        return out
-
-    for it in items:
-        if not isinstance(it, dict):
-            continue
-        path = it.get("path") or []
-        raw = (it.get("raw_parsed") or "").strip()
-        if not isinstance(path, list) or not path:
-            continue
-        if not raw:
-            continue
-        try:
-            mp = float(str(it.get("min_price") or "").replace(" ", ""))
-        except Exception:
-            mp = None
-        regions = _regions_for_min_price(it, mp)
-
-        raw_norm = _norm_key(raw)
-        if not raw_norm:
-            continue
-        info = {"price": mp, "region": regions}
-
-        key = (tuple(path), raw_norm)
-        ex = idx.get(key)
-        if ex is None:
-            idx[key] = info
-        else:
-            ex_mp = ex.get("price")
-            if ex_mp is None or (mp is not None and mp < ex_mp):
-                idx[key] = info
-            elif mp is not None and ex_mp is not None and mp == ex_mp:
-                ex_regs = ex.get("region") or []
-                if not isinstance(ex_regs, list):
-                    ex_regs = [str(ex_regs)]
-                for r in regions:
-                    if r not in ex_regs:
-                        ex_regs.append(r)
-                ex["region"] = ex_regs
-
-        raw_stripped = _strip_ram(raw_norm)
-        if raw_stripped != raw_norm:
-            stripped_bucket.setdefault((tuple(path), raw_stripped), []).append(info)
-
-    for key, bucket in stripped_bucket.items():
-        if key in idx:
-            continue
-        if len(bucket) == 1:
-            idx[key] = bucket[0]
-
-    return idx
-
-
 def _build_region_index_for_user(user_id: Optional[int], sources_mode: str) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    base_path = DEFAULT_BASE_DIR / "parsed_matched.json"
+    """
+    region_index.json пишет пайплайн (results.write_region_index); тут только читаем (с кэшем по версии).
+    """
     if not user_id:
-        return _build_region_index_from_items(_read_matched_items(base_path))
+        return load_region_index(DEFAULT_BASE_DIR)
 
     mode = (sources_mode or "default").strip().lower()
-    user_path = user_data_dir(int(user_id)) / "parsed_matched.json"
+    user_dir = user_data_dir(int(user_id))
     if mode == "own":
-        return _build_region_index_from_items(_read_matched_items(user_path))
+        return load_region_index(user_dir)
     if mode == "custom":
-        return _build_region_index_from_items(_read_matched_items(base_path) + _read_matched_items(user_path))
-    return _build_region_index_from_items(_read_matched_items(base_path))
+        return merge_region_indexes(load_region_index(DEFAULT_BASE_DIR), load_region_index(user_dir))
+    return load_region_index(DEFAULT_BASE_DIR)
 
 
 def _load_parsed_data(preferred_paths: Optional[list[Path]] = None) -> tuple[dict, Optional[str]]:
@@ -376,41 +288,8 @@ def _extract_prices_catalog_from_parsed(parsed: dict) -> Optional[dict]:
     return None
 
 
-def _looks_like_models_map(d: dict) -> bool:
-    """
-    Эвристика: если хотя бы у одного значения есть признаки "узла модели",
-    считаем, что d это map model_name -> model_node.
-    """
-    if not isinstance(d, dict) or not d:
-        return False
-
-    sample_vals = list(d.values())[:5]
-    for v in sample_vals:
-        if isinstance(v, dict):
-            if any(k in v for k in ("variants", "items", "rows", "lines", "min_price", "price", "prices", "best_channels")):
-                return True
-        elif isinstance(v, list):
-            return True
-    return False
-
-
 def _count_models_in_catalog(catalog: dict) -> int:
-    if not isinstance(catalog, dict):
-        return 0
-    cnt = 0
-    for _cat, brands in catalog.items():
-        if not isinstance(brands, dict):
-            continue
-        for _br, block in brands.items():
-            if not isinstance(block, dict):
-                continue
-            if _looks_like_models_map(block):
-                cnt += len(block)
-            else:
-                for _series, models in block.items():
-                    if isinstance(models, dict):
-                        cnt += len(models)
-    return cnt
+    return catalog_index.get_index(catalog).model_count
 
 
 def _is_retail_mode(channel_pricing: Union[str, dict], channel_mode_fallback: str = "opt") -> bool:
@@ -587,6 +466,7 @@ def _apply_publish_spec_filter(
     model_path может быть:
       [cat, brand, model] или [cat, brand, series, model]
     """
+    idx = catalog_index.get_index(prices_tree)
     new_cat_list: list[str] = []
     new_cat_brands: dict[str, list[str]] = {}
     new_brand_models: dict[tuple[str, str], list[str]] = {}
@@ -596,7 +476,7 @@ def _apply_publish_spec_filter(
         for br in (cat_brands_order.get(cat) or []):
             kept_models: list[str] = []
             for m in (brand_models.get((cat, br)) or []):
-                mp = _find_first_model_path_in_catalog(prices_tree, cat, br, m)
+                mp = idx.model_path(cat, br, m)
                 if not mp:
                     continue
                 if _model_path_matches_any(mp, spec):
@@ -630,126 +510,19 @@ def _order_from_prices_catalog(prices_catalog: dict) -> tuple[list[str], dict[st
     - сохраняем insertion-order dict'ов как есть;
     - если модель встречается внутри серии — добавляем в порядке обхода серий;
     - если повтор — игнорируем (берём первое появление).
+    Сам обход — один раз на дерево (catalog_index).
     """
-    cat_list: list[str] = []
-    cat_brands_order: dict[str, list[str]] = {}
-    brand_models: dict[tuple[str, str], list[str]] = {}
-
-    if not isinstance(prices_catalog, dict):
-        return cat_list, cat_brands_order, brand_models
-
-    for cat, brands in prices_catalog.items():
-        if not isinstance(brands, dict):
-            continue
-        cat = str(cat)
-        cat_list.append(cat)
-
-        br_list: list[str] = []
-        for br, maybe_series_or_models in brands.items():
-            if not isinstance(maybe_series_or_models, dict):
-                continue
-            br = str(br)
-            br_list.append(br)
-
-            models_order: list[str] = []
-            seen: set[str] = set()
-
-            # A: cat/brand/model
-            if _looks_like_models_map(maybe_series_or_models):
-                for model_name in maybe_series_or_models.keys():
-                    mn = str(model_name)
-                    if mn not in seen:
-                        seen.add(mn)
-                        models_order.append(mn)
-            else:
-                # B: cat/brand/series/model
-                for _series_name, models in maybe_series_or_models.items():
-                    if not isinstance(models, dict):
-                        continue
-                    for model_name in models.keys():
-                        mn = str(model_name)
-                        if mn not in seen:
-                            seen.add(mn)
-                            models_order.append(mn)
-
-            brand_models[(cat, br)] = models_order
-
-        cat_brands_order[cat] = br_list
-
-    return cat_list, cat_brands_order, brand_models
-
-
-def _is_series_container(node: Any) -> bool:
-    """
-    Серия: dict, где значения преимущественно dict (подмодели),
-    и при этом это НЕ leaf с ценой/вариантами.
-    """
-    if not isinstance(node, dict) or not node:
-        return False
-
-    # если на верхнем уровне есть признаки "модельного" leaf — это НЕ серия
-    if any(k in node for k in ("min_price", "price", "best_channels", "variants", "items", "rows", "lines")):
-        return False
-
-    vals = list(node.values())[:10]
-    dict_vals = sum(1 for v in vals if isinstance(v, dict))
-    list_vals = sum(1 for v in vals if isinstance(v, list))
-
-    # серия обычно почти целиком из dict'ов (подмоделей)
-    return dict_vals >= max(1, (len(vals) * 6) // 10) and list_vals == 0
+    return catalog_index.get_index(prices_catalog).order()
 
 
 def _find_first_model_path_in_catalog(catalog: dict, cat: str, br: str, model: str) -> Optional[List[str]]:
     """
-    Ищем путь модели в дереве catalog:
-      A) cat/brand/model
-      B) cat/brand/series/model
-      C) спецкейс: cat/brand/series/model, где series == model (как в data.json: "iPhone 17": {"iPhone 17":[...]})
+    Путь модели в дереве catalog (A: cat/brand/model, B: cat/brand/series/model,
+    C: cat/brand/series/model, где series == model) — через плоский индекс дерева.
     """
     if not isinstance(catalog, dict):
         return None
-
-    brands = catalog.get(cat)
-    if not isinstance(brands, dict):
-        return None
-
-    block = brands.get(br)
-    if not isinstance(block, dict):
-        return None
-
-    # 0) Спецкейс: модель есть как ключ верхнего уровня, но это серия-контейнер
-    if model in block and isinstance(block.get(model), dict):
-        maybe_series = block.get(model)
-
-        # если внутри серии есть ключ модели (частый случай: series == model)
-        if isinstance(maybe_series, dict) and model in maybe_series:
-            # data.json: ...["iPhone 17"]["iPhone 17"] -> [list]
-            return [cat, br, model, model]
-
-        # если это серия (контейнер подмоделей)
-        if _is_series_container(maybe_series):
-            for m2 in maybe_series.keys():
-                if str(m2) == model:
-                    return [cat, br, model, model]
-            # иначе продолжаем поиск ниже
-
-    # 1) Формат A: cat/brand/model (но только если это НЕ серия)
-    if model in block:
-        node = block.get(model)
-        if not _is_series_container(node):
-            return [cat, br, model]
-
-    # 2) Формат B: cat/brand/series/model
-    for series_name, models in block.items():
-        if not isinstance(models, dict):
-            continue
-        # спецкейс: series == model и внутри series есть dict{model: ...}
-        if str(series_name) == model and model in models:
-            return [cat, br, str(series_name), model]
-        if model in models:
-            return [cat, br, str(series_name), model]
-
-    return None
+    return catalog_index.get_index(catalog).model_path(cat, br, model)
 
 
 # --------------------------- Канальные правила наценки (из parsed_data.json) ---------------------------
@@ -1146,19 +919,8 @@ def _render_model_body_from_prices_and_template(
                     else:
                         reg = _regions_to_flags([str(reg_val)])
             if not reg and region_index is not None:
-                best_price = None
-                best_regions: List[str] = []
-                for (mpath, _raw_key), info2 in region_index.items():
-                    if tuple(mpath) != tuple(prices_path):
-                        continue
-                    if not isinstance(info2, dict):
-                        continue
-                    reg2 = info2.get("region") or []
-                    price2 = info2.get("price")
-                    if reg2:
-                        if best_price is None or (price2 is not None and price2 < best_price):
-                            best_price = price2
-                            best_regions = reg2 if isinstance(reg2, list) else [str(reg2)]
+                # регионы самой дешёвой позиции модели — предпосчитаны в region_index.json
+                best_regions = region_index.model_regions(prices_path) if hasattr(region_index, "model_regions") else []
                 if best_regions:
                     reg = _regions_to_flags(best_regions)
             if reg:
@@ -1204,170 +966,75 @@ def _resolve_pricing_for_path(channel_pricing: Optional[Union[str, dict]], price
     return rule
 
 
-# --------------------------- Brand reorder / reset logic ---------------------------
-
-def _plan_brand_units(
-    models: List[str],
-    *,
-    cat: str,
-    br: str,
-    prices_tree: dict,
-    template_tree: dict,
-    channel_pricing: Union[str, dict],
-) -> List[List[str]]:
-    """
-    Возвращает список "юнитов" публикации: всегда 1 модель = 1 сообщение.
-    """
-    return [[m] for m in models]
-
-
-def _unit_mid(unit: List[str], model_to_mid: Dict[str, str]) -> Optional[int]:
-    """
-    Возвращает mid юнита, если все модели юнита указывают на один mid.
-    """
-    mids: List[int] = []
-    for m in unit:
-        mid = model_to_mid.get(m)
-        if not mid:
-            return None
-        try:
-            mids.append(int(mid))
-        except Exception:
-            return None
-
-    if len(set(mids)) != 1:
-        return None
-    return mids[0]
-
-
-def _brand_needs_reset(units: List[List[str]], model_to_mid: Dict[str, str]) -> bool:
-    """
-    Проверяем, соответствует ли текущий порядок постов в канале нашему units-плану.
+# --------------------------- Порядок постов в канале ---------------------------
 
-    Важно про порядок Telegram:
-      - чем больше message_id, тем НОВЕЕ сообщение;
-      - в истории канала новые сообщения оказываются НИЖЕ старых;
-      - значит корректный "сверху-вниз" порядок для units == mid должны быть строго ВОЗРАСТАЮЩИМИ.
-        (unit[0] — верхний/старый => самый маленький mid)
+def _in_order_prefix_len(mids: List[Optional[int]]) -> int:
     """
-    mids: List[int] = []
-    for u in units:
-        mid = _unit_mid(u, model_to_mid)
-        if mid is None:
-            return True
-        mids.append(mid)
-
-    # Должно быть строго возрастающе: mid0 < mid1 < mid2 < ...
-    for i in range(1, len(mids)):
-        if mids[i - 1] >= mids[i]:
-            return True
-    return False
+    Длина самого длинного префикса желаемого порядка, который уже стоит в канале правильно.
 
-
-def _brand_mid_range(models: List[str], model_to_mid: Dict[str, str]) -> Optional[Tuple[int, int]]:
-    mids: List[int] = []
-    for m in models:
-        mid = model_to_mid.get(m)
-        if not mid:
-            continue
-        try:
-            mids.append(int(mid))
-        except Exception:
-            continue
-    if not mids:
-        return None
-    return min(mids), max(mids)
-
-
-def _find_section_reset_point(
-    cat_list: List[str],
-    cat_brands_order: Dict[str, List[str]],
-    brand_models: Dict[Tuple[str, str], List[str]],
-    model_to_mid: Dict[str, str],
-) -> Optional[Tuple[str, str]]:
+    Порядок Telegram: чем больше message_id, тем ниже (новее) сообщение, а новое сообщение
+    можно добавить только в конец. Поэтому на месте может остаться лишь префикс, чьи mid
+    строго возрастают; всё после первой "дыры" (нет поста) или нарушения порядка пересоздаётся.
     """
-    Находим первую секцию (cat/brand), после которой порядок нарушен
-    или секция новая (нет ни одного опубликованного поста).
-    Тогда нужно удалить всё после этой секции и перепубликовать.
-    """
-    last_max_mid: Optional[int] = None
-    for cat in cat_list:
-        brands = cat_brands_order.get(cat, []) or []
-        for br in brands:
-            models = brand_models.get((cat, br), []) or []
-            rng = _brand_mid_range(models, model_to_mid)
-            if rng is None:
-                return cat, br
-
-            min_mid, max_mid = rng
-            if last_max_mid is not None and min_mid <= last_max_mid:
-                return cat, br
+    last: Optional[int] = None
+    for i, mid in enumerate(mids):
+        if mid is None or (last is not None and mid <= last):
+            return i
+        last = mid
+    return len(mids)
 
-            last_max_mid = max_mid
-    return None
 
+# Кэш готовых текстов постов: ключ — отпечаток всех входов рендера (см. _render_cache_key).
+# Общий для всех каналов и синхронизаций: каналы с одинаковой наценкой делят тексты,
+# неизменившиеся модели не рендерятся повторно.
+_RENDER_CACHE: Dict[str, Optional[str]] = {}
+_RENDER_CACHE_MAX = 20000
+_RENDER_STATS = {"hits": 0, "misses": 0}
 
-def _collect_models_from_section(
-    cat_list: List[str],
-    cat_brands_order: Dict[str, List[str]],
-    brand_models: Dict[Tuple[str, str], List[str]],
-    start_cat: str,
-    start_brand: str,
-) -> List[str]:
-    out: List[str] = []
-    started_cat = False
-    started_brand = False
-    for cat in cat_list:
-        if not started_cat:
-            if cat != start_cat:
-                continue
-            started_cat = True
-        brands = cat_brands_order.get(cat, []) or []
-        for br in brands:
-            if started_cat and not started_brand and cat == start_cat:
-                if br != start_brand:
-                    continue
-                started_brand = True
-            out.extend(brand_models.get((cat, br), []) or [])
-    return out
+# поля правила наценки, которые реально читает _apply_channel_markup
+_MARKUP_RULE_KEYS = ("mode", "base_mode", "pct", "flat", "round_step")
 
 
-async def _reset_brand_posts(
-    client,
-    entity,
-    *,
-    existing_index: Dict[str, dict],
-    model_to_mid: Dict[str, str],
-    models: List[str],
-) -> int:
+def _render_cache_key(
+    model: str,
+    prices_tree: dict,
+    prices_path: List[str],
+    template_list: Optional[List[str]],
+    channel_pricing: Optional[Union[str, dict]],
+    text_mode: str,
+    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]],
+) -> Optional[str]:
     """
-    Удаляет все сообщения (mid) которые связаны с models (у данного бренда),
-    чистит existing_index и model_to_mid.
+    (поддерево цен модели, шаблон, наценка для этого пути, text_mode, версия region_index).
+    None — версию индекса регионов не определить, кэшировать нельзя.
     """
-    mids: List[int] = []
-    for m in models:
-        mid = model_to_mid.get(m)
-        if mid:
-            try:
-                mids.append(int(mid))
-            except Exception:
-                pass
-
-    mids = sorted(set(mids), reverse=True)
-    if not mids:
-        return 0
-
-    _log(f"🧨 BRAND RESET: delete {len(mids)} model posts to rebuild order")
-    await safe_delete(client, entity, mids)
-    await _throttle()
-
-    for mid in mids:
-        existing_index.pop(str(mid), None)
-
-    for m in models:
-        model_to_mid.pop(m, None)
-
-    return len(mids)
+    if region_index is None:
+        region_version = ""
+    else:
+        region_version = getattr(region_index, "version", None)
+        if region_version is None:
+            return None
+    pricing = _resolve_pricing_for_path(channel_pricing, prices_path)
+    if isinstance(pricing, dict):
+        pricing = {k: pricing.get(k) for k in _MARKUP_RULE_KEYS}
+    try:
+        raw = json.dumps(
+            [
+                model,
+                list(prices_path),
+                _get_model_leaf(prices_tree or {}, prices_path),
+                template_list,
+                pricing,
+                text_mode,
+                region_version,
+            ],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+    except Exception:
+        return None
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
 
 def _build_model_text(
@@ -1382,6 +1049,12 @@ def _build_model_text(
     region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
 ) -> Optional[str]:
     template_list = _get_template_list(template_tree, template_path)
+    key = _render_cache_key(model, prices_tree, prices_path, template_list, channel_pricing, text_mode, region_index)
+    if key is not None and key in _RENDER_CACHE:
+        _RENDER_STATS["hits"] += 1
+        return _RENDER_CACHE[key]
+    _RENDER_STATS["misses"] += 1
+
     body = _render_model_body_from_prices_and_template(
         prices_tree=prices_tree,
         prices_path=prices_path,
@@ -1390,43 +1063,66 @@ def _build_model_text(
         region_index=region_index,
     )
     if body is None:
-        return None
-    body = body or "—"
-    if text_mode == "copy":
-        safe = html.escape(f"{model}\n\n{body}")
-        return f"<code>{safe}</code>"
-    return f"<b>{model}</b>\n\n{body}"
+        text = None
+    else:
+        body = body or "—"
+        if text_mode == "copy":
+            safe = html.escape(f"{model}\n\n{body}")
+            text = f"<code>{safe}</code>"
+        else:
+            text = f"<b>{model}</b>\n\n{body}"
+
+    if key is not None:
+        if len(_RENDER_CACHE) >= _RENDER_CACHE_MAX:
+            _RENDER_CACHE.clear()
+        _RENDER_CACHE[key] = text
+    return text
 
 
 # --------------------------- FloodWait-safe wrappers -----------------------------------------
+# Темп задаёт rate_limit (token bucket на аккаунт и канал): отдельных пауз после запросов нет.
 
 async def safe_send(client, entity, *args, **kwargs):
     while True:
         try:
+            await rate_limit.acquire(client, entity)
             msg = await client.send_message(entity, *args, **kwargs)
+            rate_limit.on_success(client, entity)
             return msg
         except FloodWaitError as e:
             _log(f"⏳ FloodWait on send: {e.seconds}s")
-            await asyncio.sleep(e.seconds + 1)
+            rate_limit.on_flood(client, entity, e.seconds + 1)
         except Exception as ex:
             _log(f"[safe_send] Ошибка: {ex}")
             return None
 
 
 async def safe_send_file(client, entity, *, file: Path, caption: str):
+    # уже загруженная картинка (media_cache) отправляется без повторной заливки
+    account = await media_cache.account_id(client)
+    cached = media_cache.get(account, file)
     while True:
         try:
+            await rate_limit.acquire(client, entity)
             msg = await client.send_file(
                 entity,
-                file=str(file),
+                file=cached or str(file),
                 caption=caption,
                 parse_mode="HTML",
             )
+            rate_limit.on_success(client, entity)
+            if cached is None:
+                media_cache.remember(account, file, msg)
             return msg
         except FloodWaitError as e:
             _log(f"⏳ FloodWait on send_file: {e.seconds}s")
-            await asyncio.sleep(e.seconds + 1)
+            rate_limit.on_flood(client, entity, e.seconds + 1)
         except Exception as ex:
+            if cached is not None:
+                _log(f"♻️ cached media rejected ({ex}) → re-upload {file.name}")
+                media_cache.forget(account, file)
+                cached = None
+                continue
             _log(f"[safe_send_file] Ошибка: {ex}")
             return None
 
@@ -1434,11 +1130,13 @@ async def safe_send_file(client, entity, *, file: Path, caption: str):
 async def safe_edit(client, entity, message_id: int, *args, **kwargs):
     while True:
         try:
+            await rate_limit.acquire(client, entity)
             msg = await client.edit_message(entity, int(message_id), *args, **kwargs)
+            rate_limit.on_success(client, entity)
             return msg or True
         except FloodWaitError as e:
             _log(f"⏳ FloodWait on edit: {e.seconds}s")
-            await asyncio.sleep(e.seconds + 1)
+            rate_limit.on_flood(client, entity, e.seconds + 1)
         except Exception as ex:
             s = str(ex).lower()
             if "not modified" in s or "message is not modified" in s:
@@ -1452,42 +1150,60 @@ async def safe_edit_media(client, entity, message_id: int, *, file: Path, captio
     Пытаемся заменить медиа у существующего media-сообщения, сохраняя message_id.
     Если Telegram/Telethon не даст — вернём None, дальше будет fallback delete+recreate.
     """
+    account = await media_cache.account_id(client)
+    cached = media_cache.get(account, file)
     while True:
         try:
+            await rate_limit.acquire(client, entity)
             msg = await client.edit_message(
                 entity,
                 int(message_id),
                 caption,
-                file=str(file),
+                file=cached or str(file),
                 parse_mode="HTML",
             )
+            rate_limit.on_success(client, entity)
+            if cached is None and msg:
+                media_cache.remember(account, file, msg)
             return msg or True
         except FloodWaitError as e:
             _log(f"⏳ FloodWait on edit_media: {e.seconds}s")
-            await asyncio.sleep(e.seconds + 1)
+            rate_limit.on_flood(client, entity, e.seconds + 1)
         except Exception as ex:
             s = str(ex).lower()
             if "not modified" in s or "message is not modified" in s:
                 return True
+            if cached is not None:
+                _log(f"♻️ cached media rejected ({ex}) → re-upload {file.name}")
+                media_cache.forget(account, file)
+                cached = None
+                continue
             _log(f"[safe_edit_media] Ошибка: {ex}")
             return None
 
 
 async def safe_delete(client, entity, ids):
+    """Удаление пачками по DELETE_CHUNK id на запрос (максимум Telegram)."""
     if not ids:
         return None
     if not isinstance(ids, (list, tuple, set)):
         ids = [ids]
     ids = [int(i) for i in ids]
-    while True:
-        try:
-            return await client.delete_messages(entity, ids)
-        except FloodWaitError as e:
-            _log(f"⏳ FloodWait on delete: {e.seconds}s")
-            await asyncio.sleep(e.seconds + 1)
-        except Exception as ex:
-            _log(f"[safe_delete] Ошибка: {ex}")
-            return None
+    res = None
+    for chunk in _chunked(ids, DELETE_CHUNK):
+        while True:
+            try:
+                await rate_limit.acquire(client, entity)
+                res = await client.delete_messages(entity, chunk)
+                rate_limit.on_success(client, entity)
+                break
+            except FloodWaitError as e:
+                _log(f"⏳ FloodWait on delete: {e.seconds}s")
+                rate_limit.on_flood(client, entity, e.seconds + 1)
+            except Exception as ex:
+                _log(f"[safe_delete] Ошибка: {ex}")
+                break
+    return res
 
 
 # --------------------------- Логирование меню --------------------------------------
@@ -1506,8 +1222,17 @@ def _buttons_fingerprint(btns: List[InlineKeyboardButton]) -> str:
     return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
-def _same_menu(prev_text: str, prev_fp: str, new_text: str, new_fp: str) -> bool:
-    return (prev_text or "") == (new_text or "") and (prev_fp or "") == (new_fp or "")
+def _text_fp(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _same_menu(prev: dict, new_text: str, new_fp: str) -> bool:
+    # prev["text"] после обновления кэша — plain-текст из Telegram, поэтому сравниваем отпечаток отправленного HTML
+    if prev.get("text_fp"):
+        same_text = prev.get("text_fp") == _text_fp(new_text)
+    else:
+        same_text = (prev.get("text") or "") == (new_text or "")
+    return same_text and (prev.get("kb_fp") or "") == (new_fp or "")
 
 
 def _aiogram_markup(btns: List[InlineKeyboardButton]) -> InlineKeyboardMarkup:
@@ -1543,18 +1268,22 @@ async def _ensure_menu_message(
     old_mid: Optional[int],
     aio_bot: Optional[AiogramBot],
     chat_ref_for_bot: Union[str, int, None],
+    pending_deletes: Optional[List[int]] = None,
 ) -> Optional[int]:
     """
     Создать/обновить меню.
     Если есть bot_api — используем inline keyboard.
     Иначе — fallback: Telethon + HTML-ссылки в тексте.
+    pending_deletes — куда отложить удаление пустого меню (удалится общей пачкой).
     """
     if not btns:
         if old_mid and str(old_mid) in existing_index:
             _log(f"🗑 DELETE EMPTY MENU mid={old_mid}: {title}")
-            await safe_delete(client, entity, int(old_mid))
+            if pending_deletes is not None:
+                pending_deletes.append(int(old_mid))
+            else:
+                await safe_delete(client, entity, int(old_mid))
             existing_index.pop(str(old_mid), None)
-            await _throttle()
         else:
             _log(f"⏭ SKIP MENU (no buttons): {title}")
         return None
@@ -1569,13 +1298,12 @@ async def _ensure_menu_message(
         try:
             if old_mid and str(old_mid) in existing_index:
                 prev = existing_index[str(old_mid)]
-                prev_text = prev.get("text") or ""
-                prev_fp = prev.get("kb_fp") or ""
-                if _same_menu(prev_text, prev_fp, html_title, new_fp):
+                if _same_menu(prev, html_title, new_fp):
                     _log(f"↔️ SKIP MENU via Bot mid={old_mid}: no changes")
                     return int(old_mid)
 
                 _log(f"✏️ EDIT MENU via Bot mid={old_mid}")
+                await rate_limit.acquire(aio_bot, chat_ref_for_bot)
                 await aio_bot.edit_message_text(
                     chat_id=chat_ref_for_bot,
                     message_id=int(old_mid),
@@ -1583,26 +1311,27 @@ async def _ensure_menu_message(
                     reply_markup=kb,
                     parse_mode="HTML",
                 )
-                await _throttle()
 
                 prev["text"] = html_title
                 prev["kb_fp"] = new_fp
+                prev["text_fp"] = _text_fp(html_title)
                 prev["date"] = datetime.now(timezone.utc).isoformat()
                 _log(f"✅ MENU (bot) updated mid={old_mid}")
                 return int(old_mid)
 
             _log(f"➕ CREATE MENU via Bot: '{_first_line(html_title)}' (buttons={len(btns)})")
+            await rate_limit.acquire(aio_bot, chat_ref_for_bot)
             msg = await aio_bot.send_message(
                 chat_id=chat_ref_for_bot,
                 text=html_title,
                 reply_markup=kb,
                 parse_mode="HTML",
             )
-            await _throttle()
             if msg:
                 existing_index[str(msg.message_id)] = {
                     "text": html_title,
                     "kb_fp": new_fp,
+                    "text_fp": _text_fp(html_title),
                     "date": datetime.now(timezone.utc).isoformat(),
                 }
                 _log(f"✅ MENU (bot) created mid={msg.message_id}")
@@ -1616,6 +1345,7 @@ async def _ensure_menu_message(
                     prev = existing_index[str(old_mid)]
                     prev["text"] = html_title
                     prev["kb_fp"] = new_fp
+                    prev["text_fp"] = _text_fp(html_title)
                     prev["date"] = datetime.now(timezone.utc).isoformat()
                 return int(old_mid) if old_mid else None
 
@@ -1633,18 +1363,16 @@ async def _ensure_menu_message(
 
     if old_mid and str(old_mid) in existing_index:
         prev = existing_index[str(old_mid)]
-        prev_text = prev.get("text") or ""
-        prev_fp = prev.get("kb_fp") or ""
-        if _same_menu(prev_text, prev_fp, html_title, new_fp):
+        if _same_menu(prev, html_title, new_fp):
             _log(f"↔️ SKIP MENU mid={old_mid}: no changes")
             return int(old_mid)
 
         _log(f"✏️ EDIT MENU mid={old_mid}")
         ok = await safe_edit(client, entity, int(old_mid), full_text, parse_mode="HTML")
-        await _throttle()
         if ok:
             prev["text"] = html_title
             prev["kb_fp"] = new_fp
+            prev["text_fp"] = _text_fp(html_title)
             prev["date"] = datetime.now(timezone.utc).isoformat()
             _log(f"✅ MENU updated mid={old_mid}")
             return int(old_mid)
@@ -1653,11 +1381,11 @@ async def _ensure_menu_message(
 
     _log(f"➕ CREATE MENU: '{_first_line(html_title)}' (buttons={len(btns)})")
     msg = await safe_send(client, entity, full_text, parse_mode="HTML")
-    await _throttle()
     if msg:
         existing_index[str(msg.id)] = {
             "text": html_title,
             "kb_fp": new_fp,
+            "text_fp": _text_fp(html_title),
             "date": datetime.now(timezone.utc).isoformat(),
         }
         _log(f"✅ MENU created mid={msg.id}: '{_first_line(html_title)}'")
@@ -1686,489 +1414,23 @@ def _resolve_paths_for_model(
     return prices_path, template_path
 
 
-async def _ensure_model_post(
-    client,
-    entity,
-    *,
-    cat: str,
-    brand: str,
-    model: str,
-    existing_index: dict[str, dict],
-    model_to_mid: dict[str, str],
-    prices_tree: dict,
-    template_tree: dict,
-    channel_pricing: Union[str, dict],
-    cover_cfg: dict,
-    peer_id_short: str,
-    images_enabled: bool,
-    text_mode: str,
-    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
-) -> tuple[bool, Optional[int], bool]:
-    prices_path, template_path = _resolve_paths_for_model(prices_tree, template_tree, cat, brand, model)
-    if not prices_path:
-        _log(f"⚠️ MODEL '{model}' not found in PRICES under {cat}/{brand}")
-        return False, None, False
-
-    new_text = _build_model_text(
-        prices_tree,
-        template_tree,
-        model,
-        prices_path,
-        template_path,
-        channel_pricing,
-        text_mode=text_mode,
-        region_index=region_index,
-    )
-
-    # Нет цен для opt → удаляем старый пост (если был)
-    if not new_text:
-        mid = model_to_mid.get(model)
-        if mid and str(mid) in existing_index:
-            _log(f"🗑 REMOVE MODEL '{model}' mid={mid}: no priced variants for this channel")
-            await safe_delete(client, entity, int(mid))
-            await _throttle()
-            existing_index.pop(str(mid), None)
-            model_to_mid.pop(model, None)
-        else:
-            _log(f"⚠️ MODEL '{model}' has no priced variants for this channel, skip")
-        return False, None, False
-
-    is_retail = _is_retail_mode(channel_pricing)
-    placeholder = _resolve_placeholder_cover(cover_cfg, peer_id_short) if images_enabled and is_retail else None
-    cover_real = _resolve_model_cover(cover_cfg, peer_id_short, prices_path) if images_enabled else None
-
-    # В retail: всегда MEDIA (обложка или placeholder)
-    cover = cover_real or placeholder
-
-    mid = model_to_mid.get(model)
-    prev = existing_index.get(str(mid)) if mid else None
-    prev_has_media = bool(prev and prev.get("has_media"))
-    prev_media_path = (prev.get("media_path") if isinstance(prev, dict) else None) if prev_has_media else None
-
-    # =================== MEDIA PATH (retail always, opt if cover exists) ===================
-    if cover:
-        # если был текстовый пост — удаляем и пересоздаём с картинкой (по месту не конвертнуть)
-        if mid and prev and not prev_has_media:
-            _log(f"🗑 SWITCH TEXT→MEDIA for '{model}' mid={mid}")
-            await safe_delete(client, entity, int(mid))
-            await _throttle()
-            existing_index.pop(str(mid), None)
-            model_to_mid.pop(model, None)
-            mid = None
-            prev = None
-            prev_has_media = False
-            prev_media_path = None
-
-        # если был media и файл поменялся — стараемся заменить media без смены mid
-        if mid and prev_has_media and prev_media_path and str(prev_media_path) != str(cover):
-            _log(f"🖼 REPLACE MEDIA (keep mid) for '{model}' mid={mid}")
-            okm = await safe_edit_media(client, entity, int(mid), file=cover, caption=new_text)
-            await _throttle()
-            if okm:
-                existing_index[str(mid)]["text"] = new_text
-                existing_index[str(mid)]["date"] = datetime.now(timezone.utc).isoformat()
-                existing_index[str(mid)]["has_media"] = True
-                existing_index[str(mid)]["media_path"] = str(cover)
-                existing_index[str(mid)]["model"] = model
-                existing_index[str(mid)]["hidden"] = False
-                return True, int(mid), True
-
-            # fallback: delete+recreate
-            _log(f"🗑 REPLACE MEDIA fallback delete+recreate for '{model}' mid={mid}")
-            await safe_delete(client, entity, int(mid))
-            await _throttle()
-            existing_index.pop(str(mid), None)
-            model_to_mid.pop(model, None)
-            mid = None
-            prev = None
-            prev_has_media = False
-            prev_media_path = None
-
-        if mid and prev_has_media:
-            _log(f"✏️ EDIT MEDIA MODEL '{model}' mid={mid}: caption update")
-            ok = await safe_edit(client, entity, int(mid), new_text, parse_mode="HTML")
-            await _throttle()
-            if ok:
-                existing_index[str(mid)]["text"] = new_text
-                existing_index[str(mid)]["date"] = datetime.now(timezone.utc).isoformat()
-                existing_index[str(mid)]["has_media"] = True
-                existing_index[str(mid)]["media_path"] = str(cover)
-                existing_index[str(mid)]["model"] = model
-                existing_index[str(mid)]["hidden"] = False
-                return True, int(mid), True
-            _log(f"❌ FAILED EDIT MEDIA MODEL '{model}' mid={mid}")
-            return False, int(mid), True
-
-        _log(f"🖼 CREATE MEDIA MODEL '{model}' cover={cover.name}")
-        msg = await safe_send_file(client, entity, file=cover, caption=new_text)
-        await _throttle()
-        if msg:
-            model_to_mid[model] = str(msg.id)
-            existing_index[str(msg.id)] = {
-                "text": new_text,
-                "date": datetime.now(timezone.utc).isoformat(),
-                "has_media": True,
-                "media_path": str(cover),
-                "model": model,
-                "hidden": False,
-            }
-            _log(f"✅ CREATED MEDIA MODEL '{model}' mid={msg.id}")
-            return True, int(msg.id), False
-
-        _log(f"❌ FAILED CREATE MEDIA MODEL '{model}'")
-        return False, None, False
-
-    # =================== TEXT CASE (ТОЛЬКО для opt) ===================
-    # если раньше была картинка, а теперь нет — удаляем медиа и создаём текст
-    if mid and prev_has_media:
-        _log(f"🗑 SWITCH MEDIA→TEXT for '{model}' mid={mid}")
-        await safe_delete(client, entity, int(mid))
-        await _throttle()
-        existing_index.pop(str(mid), None)
-        model_to_mid.pop(model, None)
-        mid = None
-        prev = None
-        prev_has_media = False
-
-    if mid and str(mid) in existing_index:
-        _log(f"✏️ EDIT MODEL '{model}' mid={mid}: force rewrite")
-        ok = await safe_edit(client, entity, int(mid), new_text, parse_mode="HTML")
-        await _throttle()
-        if ok:
-            existing_index[str(mid)]["text"] = new_text
-            existing_index[str(mid)]["date"] = datetime.now(timezone.utc).isoformat()
-            existing_index[str(mid)]["has_media"] = False
-            existing_index[str(mid)].pop("media_path", None)
-            existing_index[str(mid)]["model"] = model
-            existing_index[str(mid)]["hidden"] = False
-            return True, int(mid), True
-        _log(f"❌ FAILED EDIT MODEL '{model}' mid={mid}")
-        return False, int(mid), True
-
-    _log(f"➕ CREATE MODEL '{model}' (no existing mid)")
-    msg = await safe_send(client, entity, new_text, parse_mode="HTML")
-    await _throttle()
-    if msg:
-        model_to_mid[model] = str(msg.id)
-        existing_index[str(msg.id)] = {
-            "text": new_text,
-            "date": datetime.now(timezone.utc).isoformat(),
-            "has_media": False,
-            "model": model,
-            "hidden": False,
-        }
-        _log(f"✅ CREATED MODEL '{model}' mid={msg.id}")
-        return True, int(msg.id), False
+# --------------------------- Определение моделей в существующих постах -----------------------------
 
-    _log(f"❌ FAILED CREATE MODEL '{model}'")
-    return False, None, False
+def _collect_all_model_titles(catalog: dict) -> set[str]:
+    return set(catalog_index.get_index(catalog).titles)
 
 
-async def _ensure_group_post(
-    client,
-    entity,
-    *,
-    cat: str,
-    brand: str,
-    models_group: List[str],
-    existing_index: dict[str, dict],
-    model_to_mid: dict[str, str],
-    prices_tree: dict,
-    template_tree: dict,
-    channel_pricing: Union[str, dict],
-    cover_cfg: dict,
-    peer_id_short: str,
-    images_enabled: bool,
-    text_mode: str,
-    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
-) -> tuple[bool, Optional[int], bool]:
-    segment_texts: List[str] = []
-    actual_models: List[str] = []
+def _extract_models_from_message_text(text: str) -> list[str]:
+    if not text:
+        return []
 
-    for m in models_group:
-        prices_path, template_path = _resolve_paths_for_model(prices_tree, template_tree, cat, brand, m)
-        if not prices_path:
-            _log(f"⚠️ GROUP: MODEL '{m}' not found in PRICES under {cat}/{brand}")
+    titles: list[str] = []
+    for m in re.finditer(r"<b>([^<\n]+)</b>", text):
+        title = m.group(1).strip()
+        if not title:
             continue
-
-        text = _build_model_text(
-            prices_tree,
-            template_tree,
-            m,
-            prices_path,
-            template_path,
-            channel_pricing,
-            text_mode=text_mode,
-            region_index=region_index,
-        )
-        if text:
-            segment_texts.append(text)
-            actual_models.append(m)
-
-    if not actual_models:
-        for m in models_group:
-            mid = model_to_mid.get(m)
-            if mid and str(mid) in existing_index:
-                _log(f"🗑 GROUP: remove stale model '{m}' mid={mid} (no priced variants)")
-                await safe_delete(client, entity, int(mid))
-                await _throttle()
-                existing_index.pop(str(mid), None)
-            model_to_mid.pop(m, None)
-        return False, None, False
-
-    if len(actual_models) == 1:
-        return await _ensure_model_post(
-            client, entity,
-            cat=cat,
-            brand=brand,
-            model=actual_models[0],
-            existing_index=existing_index,
-            model_to_mid=model_to_mid,
-            prices_tree=prices_tree,
-            template_tree=template_tree,
-            channel_pricing=channel_pricing,
-            cover_cfg=cover_cfg,
-            peer_id_short=peer_id_short,
-            images_enabled=images_enabled,
-            text_mode=text_mode,
-            region_index=region_index,
-        )
-
-    group_text = "\n\n".join(segment_texts)
-
-    # retail: групповые посты тоже держим MEDIA (placeholder)
-    is_retail = _is_retail_mode(channel_pricing)
-    placeholder = _resolve_placeholder_cover(cover_cfg, peer_id_short) if images_enabled and is_retail else None
-    group_cover = placeholder  # для группы используем только placeholder (без попыток "угадывать" обложку)
-
-    target_mid: Optional[str] = None
-    extra_mids: List[str] = []
-
-    for m in actual_models:
-        mid = model_to_mid.get(m)
-        if mid and str(mid) in existing_index:
-            if target_mid is None:
-                target_mid = mid
-            elif mid != target_mid:
-                extra_mids.append(mid)
-
-    # если делаем media-группу, и target_mid есть, но он текстовый — проще пересоздать в media
-    if group_cover and target_mid and str(target_mid) in existing_index and not existing_index[str(target_mid)].get("has_media"):
-        _log(f"🗑 GROUP: target_mid={target_mid} is text; delete & rebuild as MEDIA group")
-        await safe_delete(client, entity, int(target_mid))
-        await _throttle()
-        existing_index.pop(str(target_mid), None)
-        target_mid = None
-
-    for mid in extra_mids:
-        _log(f"🗑 GROUP: delete extra mid={mid} while merging models {actual_models}")
-        await safe_delete(client, entity, int(mid))
-        await _throttle()
-        existing_index.pop(str(mid), None)
-
-    changed = False
-    was_existing = False
-    result_mid: Optional[int] = None
-
-    # ========= MEDIA GROUP (retail) =========
-    if group_cover:
-        if target_mid and str(target_mid) in existing_index:
-            was_existing = True
-            prev = existing_index[str(target_mid)]
-            prev_media_path = prev.get("media_path") if prev.get("has_media") else None
-
-            # если медиа уже есть и файл тот же — просто правим caption
-            if prev.get("has_media") and prev_media_path and str(prev_media_path) == str(group_cover):
-                _log(f"✏️ EDIT MEDIA GROUP mid={target_mid}: caption update")
-                ok = await safe_edit(client, entity, int(target_mid), group_text, parse_mode="HTML")
-                await _throttle()
-                if ok:
-                    prev["text"] = group_text
-                    prev["date"] = datetime.now(timezone.utc).isoformat()
-                    prev["has_media"] = True
-                    prev["media_path"] = str(group_cover)
-                    changed = True
-                result_mid = int(target_mid)
-
-            else:
-                # медиа другое/неизвестно — пробуем заменить медиа сохраняя mid
-                _log(f"🖼 REPLACE MEDIA GROUP (keep mid) mid={target_mid}")
-                okm = await safe_edit_media(client, entity, int(target_mid), file=group_cover, caption=group_text)
-                await _throttle()
-                if okm:
-                    prev["text"] = group_text
-                    prev["date"] = datetime.now(timezone.utc).isoformat()
-                    prev["has_media"] = True
-                    prev["media_path"] = str(group_cover)
-                    changed = True
-                    result_mid = int(target_mid)
-                else:
-                    # fallback: delete+recreate
-                    _log(f"🗑 REPLACE MEDIA GROUP fallback delete+recreate mid={target_mid}")
-                    await safe_delete(client, entity, int(target_mid))
-                    await _throttle()
-                    existing_index.pop(str(target_mid), None)
-                    target_mid = None
-
-        if result_mid is None:
-            _log(f"🖼 CREATE MEDIA GROUP for models={actual_models} placeholder={group_cover.name}")
-            msg = await safe_send_file(client, entity, file=group_cover, caption=group_text)
-            await _throttle()
-            if msg:
-                result_mid = int(msg.id)
-                existing_index[str(msg.id)] = {
-                    "text": group_text,
-                    "date": datetime.now(timezone.utc).isoformat(),
-                    "has_media": True,
-                    "media_path": str(group_cover),
-                }
-                changed = True
-                _log(f"✅ CREATED MEDIA GROUP mid={msg.id} for models={actual_models}")
-
-        if result_mid is not None:
-            for m in actual_models:
-                model_to_mid[m] = str(result_mid)
-
-        return changed, result_mid, was_existing
-
-    # ========= TEXT GROUP (opt, как раньше) =========
-    if target_mid and str(target_mid) in existing_index:
-        # если target_mid — это media-пост (картинка модели), мы НЕ хотим превращать его в групповик в opt:
-        if existing_index[str(target_mid)].get("has_media"):
-            _log(f"🗑 GROUP: target_mid={target_mid} is media; delete & rebuild as text group")
-            await safe_delete(client, entity, int(target_mid))
-            await _throttle()
-            existing_index.pop(str(target_mid), None)
-            target_mid = None
-
-    if target_mid and str(target_mid) in existing_index:
-        was_existing = True
-        _log(f"✏️ EDIT GROUP models={actual_models} mid={target_mid}: force rewrite")
-        ok = await safe_edit(client, entity, int(target_mid), group_text, parse_mode="HTML")
-        await _throttle()
-        if ok:
-            prev = existing_index[str(target_mid)]
-            prev["text"] = group_text
-            prev["date"] = datetime.now(timezone.utc).isoformat()
-            prev["has_media"] = False
-            prev.pop("media_path", None)
-            changed = True
-        result_mid = int(target_mid)
-    else:
-        _log(f"➕ CREATE GROUP for models={actual_models}")
-        msg = await safe_send(client, entity, group_text, parse_mode="HTML")
-        await _throttle()
-        if msg:
-            result_mid = int(msg.id)
-            existing_index[str(msg.id)] = {
-                "text": group_text,
-                "date": datetime.now(timezone.utc).isoformat(),
-                "has_media": False,
-            }
-            changed = True
-            _log(f"✅ CREATED GROUP mid={msg.id} for models={actual_models}")
-
-    if result_mid is not None:
-        for m in actual_models:
-            model_to_mid[m] = str(result_mid)
-
-    return changed, result_mid, was_existing
-
-
-async def _ensure_unit_post(
-    client,
-    entity,
-    *,
-    cat: str,
-    brand: str,
-    unit: List[str],
-    existing_index: dict[str, dict],
-    model_to_mid: dict[str, str],
-    prices_tree: dict,
-    template_tree: dict,
-    channel_pricing: Union[str, dict],
-    cover_cfg: dict,
-    peer_id_short: str,
-    images_enabled: bool,
-    text_mode: str,
-    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
-) -> tuple[bool, Optional[int], bool]:
-    """
-    Публикует один unit (одна модель или группа).
-    Возвращает (changed, mid, was_existing)
-    """
-    if not unit:
-        return False, None, False
-
-    if len(unit) == 1:
-        return await _ensure_model_post(
-            client, entity,
-            cat=cat,
-            brand=brand,
-            model=unit[0],
-            existing_index=existing_index,
-            model_to_mid=model_to_mid,
-            prices_tree=prices_tree,
-            template_tree=template_tree,
-            channel_pricing=channel_pricing,
-            cover_cfg=cover_cfg,
-            peer_id_short=peer_id_short,
-            images_enabled=images_enabled,
-            text_mode=text_mode,
-            region_index=region_index,
-        )
-
-    _log(f"📦 GROUP POST for models={unit} in {cat}/{brand}")
-    return await _ensure_group_post(
-        client, entity,
-        cat=cat,
-        brand=brand,
-        models_group=unit,
-        existing_index=existing_index,
-        model_to_mid=model_to_mid,
-        prices_tree=prices_tree,
-        template_tree=template_tree,
-        channel_pricing=channel_pricing,
-        cover_cfg=cover_cfg,
-        peer_id_short=peer_id_short,
-        images_enabled=images_enabled,
-        text_mode=text_mode,
-        region_index=region_index,
-    )
-
-
-# --------------------------- Определение моделей в существующих постах -----------------------------
-
-def _collect_all_model_titles(catalog: dict) -> set[str]:
-    titles: set[str] = set()
-    for _cat, brands in (catalog or {}).items():
-        if not isinstance(brands, dict):
-            continue
-        for _br, block in (brands or {}).items():
-            if not isinstance(block, dict):
-                continue
-            if _looks_like_models_map(block):
-                for m in block.keys():
-                    titles.add(str(m))
-            else:
-                for _sn, models in (block or {}).items():
-                    if isinstance(models, dict):
-                        for m in models.keys():
-                            titles.add(str(m))
-    return titles
-
-
-def _extract_models_from_message_text(text: str) -> list[str]:
-    if not text:
-        return []
-
-    titles: list[str] = []
-    for m in re.finditer(r"<b>([^<\n]+)</b>", text):
-        title = m.group(1).strip()
-        if not title:
-            continue
-        title = re.sub(r"\s+", " ", title)
-        titles.append(title)
+        title = re.sub(r"\s+", " ", title)
+        titles.append(title)
 
     if not titles:
         first = _first_line(text)
@@ -2194,12 +1456,20 @@ def _collect_status_msg_ids(existing: dict[str, dict]) -> List[int]:
     return ids
 
 
-async def _delete_all_status_messages(client, entity, *, existing_index: dict[str, dict]) -> int:
-    ids = _collect_status_msg_ids(existing_index)
+async def _delete_all_status_messages(
+    client,
+    entity,
+    *,
+    existing_index: dict[str, dict],
+    extra_ids: Optional[List[int]] = None,
+) -> int:
+    """Старые статусы + отложенные удаления (extra_ids) — одной пачкой."""
+    ids = sorted(set(_collect_status_msg_ids(existing_index)) | {int(i) for i in (extra_ids or [])}, reverse=True)
     if not ids:
         return 0
-    await safe_delete(client, entity, sorted(ids, reverse=True))
-    await _throttle()
+    if len(ids) > 1:
+        _log(f"🧹 Delete {len(ids)} messages in {-(-len(ids) // DELETE_CHUNK)} request(s)")
+    await safe_delete(client, entity, ids)
     for oid in ids:
         existing_index.pop(str(oid), None)
     return len(ids)
@@ -2240,8 +1510,9 @@ async def _refresh_status_message(
     final_btns: Optional[List[InlineKeyboardButton]] = None,
     aio_bot: Optional[AiogramBot] = None,
     chat_ref_for_bot: Union[str, int, None] = None,
+    pending_deletes: Optional[List[int]] = None,
 ) -> Optional[int]:
-    await _delete_all_status_messages(client, entity, existing_index=existing_index)
+    await _delete_all_status_messages(client, entity, existing_index=existing_index, extra_ids=pending_deletes)
 
     now = datetime.now(tz).astimezone(tz)
     extra_text = _load_status_extra_for_channel(peer_id, username)
@@ -2252,6 +1523,7 @@ async def _refresh_status_message(
         if aio_bot is not None and chat_ref_for_bot:
             kb = _aiogram_markup(final_btns)
             try:
+                await rate_limit.acquire(aio_bot, chat_ref_for_bot)
                 msg = await aio_bot.send_message(
                     chat_id=chat_ref_for_bot,
                     text=text,
@@ -2266,7 +1538,6 @@ async def _refresh_status_message(
             msg = await safe_send(client, entity, full_text, parse_mode="HTML")
     else:
         msg = await safe_send(client, entity, text, parse_mode="HTML")
-    await _throttle()
     if msg:
         existing_index[str(msg.id)] = {
             "text": text,
@@ -2281,6 +1552,617 @@ async def _refresh_status_message(
     return None
 
 
+# --------------------------- Сверка кэша постов с каналом -----------------------------
+# full:        последние RECENT_MESSAGES_LIMIT сообщений + проверка остальных id из кэша (десятки запросов);
+# incremental: posts.json считается верным; смотрим только хвост канала (чужие/удалённые посты),
+#              удаления из events.MessageDeleted и id, которые план собирается трогать.
+#              Расхождение (много пропавших постов, хвост целиком чужой) -> полный скан.
+
+# peer_id -> id сообщений, удалённых в канале (по событиям Telethon), до следующей синхронизации
+_DELETED_JOURNAL: Dict[str, set] = {}
+_WATCHED_CLIENTS: set = set()
+
+
+def _watch_deletions(client) -> None:
+    """Один раз на клиент: запоминаем удаления сообщений в каналах (events.MessageDeleted)."""
+    if id(client) in _WATCHED_CLIENTS or not hasattr(client, "add_event_handler"):
+        return
+
+    async def _on_deleted(event) -> None:
+        chat_id = getattr(event, "chat_id", None)
+        if chat_id is None:
+            return  # удаления в личках/группах без channel id — не наши посты
+        ids = getattr(event, "deleted_ids", None) or []
+        _DELETED_JOURNAL.setdefault(str(chat_id), set()).update(int(i) for i in ids)
+
+    try:
+        client.add_event_handler(_on_deleted, events.MessageDeleted())
+        _WATCHED_CLIENTS.add(id(client))
+    except Exception as ex:
+        _log(f"⚠️ MessageDeleted watcher not attached: {ex}")
+
+
+def _refresh_cached_meta(existing: Dict[str, dict], msgs: list) -> None:
+    # обновляем кеш существующих постов (важно: has_media)
+    for msg in msgs:
+        if isinstance(msg, Message):
+            prev_meta = existing.get(str(msg.id)) if isinstance(existing.get(str(msg.id)), dict) else {}
+            existing[str(msg.id)] = {
+                "text": msg.message or "",
+                "date": msg.date.isoformat() if getattr(msg, "date", None) else None,
+                "kb_fp": (prev_meta.get("kb_fp") if isinstance(prev_meta, dict) else None),
+                "text_fp": (prev_meta.get("text_fp") if isinstance(prev_meta, dict) else None),
+                "has_media": bool(getattr(msg, "media", None)),
+                "media_path": (prev_meta.get("media_path") if isinstance(prev_meta, dict) else None),
+                "model": (prev_meta.get("model") if isinstance(prev_meta, dict) else None),
+                "hidden": bool(prev_meta.get("hidden")) if isinstance(prev_meta, dict) else False,
+            }
+
+
+def _full_scan_due(sync_state: dict) -> bool:
+    raw = (sync_state or {}).get("full_scan_at")
+    if not raw:
+        return True
+    try:
+        ts = datetime.fromisoformat(raw)
+    except Exception:
+        return True
+    return datetime.now(timezone.utc) - ts > timedelta(hours=FULL_RESCAN_EVERY_HOURS)
+
+
+def _count_call(calls: Optional[Dict[str, int]]) -> None:
+    if calls is not None:
+        calls["reconcile"] = calls.get("reconcile", 0) + 1
+
+
+async def _reconcile_full(client, entity, *, existing: Dict[str, dict], calls: Optional[Dict[str, int]] = None) -> int:
+    _count_call(calls)
+    msgs = await client.get_messages(entity, limit=RECENT_MESSAGES_LIMIT)
+    actual_ids = {str(m.id) for m in msgs if isinstance(m, Message)}
+
+    removed = await _prune_missing_messages(client, entity, existing_index=existing, recent_ids=actual_ids, calls=calls)
+    if removed:
+        _log(f"Garbage collected {removed} vanished messages from cache")
+    _refresh_cached_meta(existing, msgs)
+    return removed
+
+
+async def _reconcile_incremental(
+    client,
+    entity,
+    *,
+    peer_id: str,
+    existing: Dict[str, dict],
+    consume_journal: bool = True,
+    calls: Optional[Dict[str, int]] = None,
+) -> Optional[int]:
+    """
+    Возвращает число выкинутых из кэша сообщений или None, если нужен полный скан.
+    consume_journal=False (оценка обновления) — журнал удалений только читается: он нужен настоящей синхронизации.
+    """
+    removed = 0
+    journal = _DELETED_JOURNAL.pop(peer_id, set()) if consume_journal else set(_DELETED_JOURNAL.get(peer_id, ()))
+    for mid in journal:
+        if existing.pop(str(mid), None) is not None:
+            removed += 1
+
+    _count_call(calls)
+    tail = [m for m in await client.get_messages(entity, limit=RECONCILE_TAIL_LIMIT) if isinstance(m, Message)]
+    known = [int(k) for k in existing.keys() if str(k).lstrip("-").isdigit()]
+    known_max = max(known) if known else 0
+    foreign = [m for m in tail if m.id > known_max]
+    if tail and len(foreign) >= RECONCILE_TAIL_LIMIT:
+        _log(f"⚠️ RECONCILE drift: {len(foreign)}+ unknown posts after mid={known_max}")
+        return None
+
+    if tail:
+        # всё, что в кэше попадает в диапазон хвоста, но в хвосте отсутствует, — удалено
+        lo = min(m.id for m in tail)
+        tail_ids = {m.id for m in tail}
+        for mid in [k for k in known if k >= lo and k not in tail_ids]:
+            existing.pop(str(mid), None)
+            removed += 1
+    _refresh_cached_meta(existing, tail)
+    if foreign:
+        _log(f"RECONCILE: {len(foreign)} new foreign posts in tail")
+    return removed
+
+
+async def _missing_mids(client, entity, mids: List[int], calls: Optional[Dict[str, int]] = None) -> List[int]:
+    """Какие из mids в канале уже нет (по VERIFY_CACHE_CHUNK id на запрос)."""
+    missing: List[int] = []
+    for chunk in _chunked(list(mids), VERIFY_CACHE_CHUNK):
+        _count_call(calls)
+        try:
+            msgs = await client.get_messages(entity, ids=chunk)
+        except Exception as ex:
+            _log(f"[verify_ids] Ошибка проверки ids: {ex}")
+            continue
+        if not isinstance(msgs, list):
+            msgs = [msgs]
+        missing.extend(mid for mid, msg in zip(chunk, msgs) if not msg)
+    return missing
+
+
+# --------------------------- План синхронизации (plan / apply) -----------------------------
+# _plan_channel_sync ничего не отправляет: по кэшу постов (load_channel_posts) и желаемому
+# набору постов считает минимальный список операций. _apply_sync_plan его выполняет:
+# все удаления — пачками, затем посты моделей по порядку публикации.
+
+@dataclass
+class PostOp:
+    action: str                 # create | edit | edit_media | skip
+    cat: str
+    brand: str
+    model: str
+    text: str
+    mid: Optional[int] = None
+    cover: Optional[Path] = None
+    reason: str = ""
+
+
+@dataclass
+class SyncPlan:
+    deletes: Dict[int, str] = field(default_factory=dict)   # mid -> причина
+    posts: List[PostOp] = field(default_factory=list)
+    model_to_mid: Dict[str, str] = field(default_factory=dict)
+    rebuild_menus: bool = True
+    menus_total: int = 0
+    kept_menus: List[int] = field(default_factory=list)
+    targeted: bool = False      # план по ленте изменений (только изменившиеся модели)
+
+    def referenced_mids(self) -> List[int]:
+        """Существующие сообщения, на которые опирается план (правки, пропуски, оставляемые меню)."""
+        mids = {int(op.mid) for op in self.posts if op.mid is not None}
+        mids.update(int(m) for m in self.kept_menus)
+        return sorted(mids - set(self.deletes))
+
+    def count(self, action: str) -> int:
+        return sum(1 for op in self.posts if op.action == action)
+
+    def summary(self) -> dict:
+        """Сколько операций и запросов к Telegram будет стоить применение плана."""
+        reasons: Dict[str, int] = {}
+        for why in self.deletes.values():
+            reasons[why] = reasons.get(why, 0) + 1
+        creates = self.count("create")
+        edits = self.count("edit")
+        media_edits = self.count("edit_media")
+        delete_calls = -(-len(self.deletes) // DELETE_CHUNK) if self.deletes else 0
+        # меню: при перестройке — заново каждое, иначе — правка только изменившихся (оценка сверху)
+        menu_calls = self.menus_total
+        status_calls = 1  # статус всегда пересоздаётся (его удаление уже в deletes)
+        return {
+            "creates": creates,
+            "edits": edits,
+            "media_edits": media_edits,
+            "skips": self.count("skip"),
+            "deletes": len(self.deletes),
+            "delete_reasons": reasons,
+            "rebuild_menus": self.rebuild_menus,
+            "menus": self.menus_total,
+            "targeted": self.targeted,
+            "api_calls": delete_calls + creates + edits + media_edits + menu_calls + status_calls,
+        }
+
+
+def _post_meta(text: str, *, model: str, cover: Optional[Path]) -> dict:
+    meta = {
+        "text": text,
+        "text_fp": _text_fp(text),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "has_media": cover is not None,
+        "model": model,
+        "hidden": False,
+    }
+    if cover is not None:
+        meta["media_path"] = str(cover)
+    return meta
+
+
+def _is_hidden(meta: dict) -> bool:
+    return bool(meta.get("hidden")) or (meta.get("text") or "").strip() == "."
+
+
+def _post_op_for(prev: dict, *, cat: str, br: str, model: str, text: str, mid: Any, cover: Optional[Path]) -> PostOp:
+    """
+    Что сделать с живым постом модели. create с reason="media_switch" — старый пост надо удалить.
+    """
+    has_media = bool(prev.get("has_media"))
+    media_path = prev.get("media_path") if has_media else None
+    unchanged_text = prev.get("text_fp") == _text_fp(text) and not _is_hidden(prev)
+
+    if bool(cover) != has_media:
+        # текст <-> картинка по месту не конвертнуть: удалить и создать заново
+        return PostOp("create", cat, br, model, text, cover=cover, reason="media_switch")
+    if cover and media_path and str(media_path) != str(cover):
+        return PostOp("edit_media", cat, br, model, text, mid=int(mid), cover=cover, reason="cover_changed")
+    if unchanged_text and (not cover or str(media_path) == str(cover)):
+        return PostOp("skip", cat, br, model, text, mid=int(mid), cover=cover)
+    return PostOp("edit", cat, br, model, text, mid=int(mid), cover=cover, reason="text_changed")
+
+
+def _plan_channel_sync(
+    *,
+    existing: Dict[str, dict],
+    menu_state: dict,
+    cat_list: List[str],
+    cat_brands_order: Dict[str, List[str]],
+    brand_models: Dict[Tuple[str, str], List[str]],
+    all_model_titles: set[str],
+    prices_tree: dict,
+    template_tree: dict,
+    channel_pricing: Union[str, dict],
+    cover_cfg: dict,
+    peer_id_short: str,
+    images_enabled: bool,
+    text_mode: str,
+    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
+) -> SyncPlan:
+    plan = SyncPlan()
+    deletes = plan.deletes
+
+    def _drop(mid: Any, why: str) -> None:
+        try:
+            deletes.setdefault(int(mid), why)
+        except Exception:
+            pass
+
+    def _alive(mid: Any) -> bool:
+        try:
+            return mid is not None and str(mid) in existing and int(mid) not in deletes
+        except Exception:
+            return False
+
+    desired_models: set[str] = {m for models in brand_models.values() for m in models}
+
+    # ====== желаемые тексты (рендер без обращения к Telegram) ======
+    rendered: Dict[Tuple[str, str, str], Tuple[str, List[str]]] = {}
+    pub_models: Dict[Tuple[str, str], List[str]] = {}
+    unpublishable: set[str] = set()
+    for cat in cat_list:
+        for br in cat_brands_order.get(cat, []) or []:
+            pub: List[str] = []
+            for m in brand_models.get((cat, br), []) or []:
+                prices_path, template_path = _resolve_paths_for_model(prices_tree, template_tree, cat, br, m)
+                if not prices_path:
+                    _log(f"⚠️ MODEL '{m}' not found in PRICES under {cat}/{br}")
+                    unpublishable.add(m)
+                    continue
+                text = _build_model_text(
+                    prices_tree,
+                    template_tree,
+                    m,
+                    prices_path,
+                    template_path,
+                    channel_pricing,
+                    text_mode=text_mode,
+                    region_index=region_index,
+                )
+                if not text:
+                    unpublishable.add(m)
+                    continue
+                rendered[(cat, br, m)] = (text, prices_path)
+                pub.append(m)
+            if pub:
+                pub_models[(cat, br)] = pub
+    pub_brands = {cat: [br for br in (cat_brands_order.get(cat, []) or []) if (cat, br) in pub_models] for cat in cat_list}
+    pub_cats = [cat for cat in cat_list if pub_brands.get(cat)]
+
+    # ====== меню / статус (решение об удалении — ниже, когда известно, нужна ли перестройка) ======
+    menu_mids: List[int] = []
+    status_mids: List[int] = []
+    for mid, meta in existing.items():
+        text = meta.get("text") or ""
+        stripped = _strip_markup_title(_first_line(text))
+        try:
+            if stripped.startswith(MANAGED_TITLES_PREFIXES):
+                menu_mids.append(int(mid))
+            elif STATUS_TITLE in text:
+                status_mids.append(int(mid))
+        except Exception:
+            continue
+    for mid in status_mids:
+        _drop(mid, "status")
+
+    # ====== устаревшие модели (нет в publish-spec) и старые групповые посты ======
+    for mid, meta in existing.items():
+        if not isinstance(meta, dict) or not _alive(mid):
+            continue
+        titles = _extract_models_from_message_text(meta.get("text") or "")
+        if not titles:
+            continue
+        if any(t in all_model_titles for t in titles) and not any(t in desired_models for t in titles):
+            _drop(mid, "obsolete")
+            continue
+        if len([t for t in titles if t in desired_models]) > 1:
+            _drop(mid, "grouped")
+
+    # ====== model_to_mid только по актуальным ======
+    model_to_mid = plan.model_to_mid
+    menu_set = set(menu_mids)
+    for mid, meta in existing.items():
+        if not isinstance(meta, dict) or not _alive(mid) or int(mid) in menu_set:
+            continue
+        model_name = meta.get("model")
+        if model_name in desired_models:
+            model_to_mid[model_name] = mid
+            continue
+        for title in _extract_models_from_message_text(meta.get("text") or ""):
+            if title in desired_models:
+                model_to_mid[title] = mid
+                meta["model"] = title
+                break
+
+    # модели без цен для этого канала — их посты удаляем
+    for m in sorted(unpublishable):
+        mid = model_to_mid.pop(m, None)
+        if mid and _alive(mid):
+            _drop(mid, "no_prices")
+
+    # ====== посты моделей: какие существующие можно оставить как есть ======
+    is_retail = _is_retail_mode(channel_pricing)
+    placeholder = _resolve_placeholder_cover(cover_cfg, peer_id_short) if images_enabled and is_retail else None
+
+    order: List[Tuple[str, str, str]] = [(cat, br, m) for cat in pub_cats for br in pub_brands[cat] for m in pub_models[(cat, br)]]
+    covers: Dict[str, Optional[Path]] = {}
+    reusable: Dict[str, int] = {}   # model -> mid поста, который правится на месте
+    for cat, br, m in order:
+        _text, prices_path = rendered[(cat, br, m)]
+        cover_real = _resolve_model_cover(cover_cfg, peer_id_short, prices_path) if images_enabled else None
+        cover = covers[m] = cover_real or placeholder
+        mid = model_to_mid.get(m)
+        prev = existing.get(str(mid)) if mid and _alive(mid) else None
+        # текст <-> картинка по месту не конвертнуть: такой пост только пересоздать
+        if prev is not None and bool(cover) == bool(prev.get("has_media")):
+            reusable[m] = int(mid)
+
+    # ====== порядок: на месте — самый длинный правильный префикс, остальное уходит в конец ======
+    keep = _in_order_prefix_len([reusable.get(m) for _cat, _br, m in order])
+    if keep < len(order):
+        moved = sum(1 for _cat, _br, m in order[keep:] if m in reusable)
+        first_cat, first_br, _m = order[keep]
+        _log(
+            f"🧹 PLAN: {keep}/{len(order)} posts stay in place; from {first_cat}/{first_br} "
+            f"{len(order) - keep} posts go to the end ({moved} of them moved)"
+        )
+
+    for i, (cat, br, m) in enumerate(order):
+        text, _prices_path = rendered[(cat, br, m)]
+        cover = covers[m]
+        mid = model_to_mid.get(m)
+        if i < keep:
+            plan.posts.append(_post_op_for(existing[str(mid)], cat=cat, br=br, model=m, text=text, mid=mid, cover=cover))
+            continue
+        if mid and _alive(mid):
+            reason = "reorder" if m in reusable else "media_switch"
+            _drop(mid, reason)
+        else:
+            reason = "new"
+        model_to_mid.pop(m, None)
+        plan.posts.append(PostOp("create", cat, br, m, text, cover=cover, reason=reason))
+
+    # ====== меню: перестраиваем (в конец канала), только если посты добавятся или меню не хватает ======
+    required_menus: List[Any] = [menu_state.get("brand_models", {}).get(f"{cat}|{br}") for cat in pub_cats for br in pub_brands[cat]]
+    required_menus += [menu_state.get("brands", {}).get(cat) for cat in pub_cats]
+    if pub_cats:
+        required_menus.append(menu_state.get("categories"))
+    plan.menus_total = len(required_menus)
+    plan.rebuild_menus = plan.count("create") > 0 or not all(_alive(mid) for mid in required_menus)
+
+    keep = set() if plan.rebuild_menus else {int(mid) for mid in required_menus}
+    plan.kept_menus = sorted(keep)
+    for mid in menu_mids:
+        if mid not in keep:
+            _drop(mid, "menu")
+
+    return plan
+
+
+def _plan_targeted_sync(
+    *,
+    changed: set[Tuple[str, ...]],
+    existing: Dict[str, dict],
+    menu_state: dict,
+    brand_models: Dict[Tuple[str, str], List[str]],
+    prices_tree: dict,
+    template_tree: dict,
+    channel_pricing: Union[str, dict],
+    cover_cfg: dict,
+    peer_id_short: str,
+    images_enabled: bool,
+    text_mode: str,
+    region_index: Optional[Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]] = None,
+) -> Optional[SyncPlan]:
+    """
+    План по ленте изменений цен: рендерим и правим только посты моделей из changed.
+    Состав и порядок канала те же, что в прошлую синхронизацию, поэтому меню не перестраиваются
+    (цикл меню в sync_channel всё равно поправит те, что изменились).
+    None — лентой не обойтись (модель без поста или без цен, смена текст <-> картинка, потеряно меню):
+    нужен полный план.
+    """
+    plan = SyncPlan(targeted=True)
+    desired_models: set[str] = {m for models in brand_models.values() for m in models}
+
+    # ====== статус / меню / посты моделей из кэша ======
+    menu_mids: List[int] = []
+    model_to_mid = plan.model_to_mid
+    for mid, meta in existing.items():
+        if not isinstance(meta, dict):
+            continue
+        text = meta.get("text") or ""
+        try:
+            if _strip_markup_title(_first_line(text)).startswith(MANAGED_TITLES_PREFIXES):
+                menu_mids.append(int(mid))
+                continue
+            if STATUS_TITLE in text:
+                plan.deletes[int(mid)] = "status"
+                continue
+        except Exception:
+            continue
+        model_name = meta.get("model")
+        if model_name not in desired_models:
+            model_name = next((t for t in _extract_models_from_message_text(text) if t in desired_models), None)
+        if model_name and model_name not in model_to_mid:
+            model_to_mid[model_name] = mid
+
+    # ====== изменившиеся модели ======
+    is_retail = _is_retail_mode(channel_pricing)
+    placeholder = _resolve_placeholder_cover(cover_cfg, peer_id_short) if images_enabled and is_retail else None
+    seen: set[str] = set()
+    for path in sorted(changed):
+        if len(path) < 3:
+            continue
+        cat, br, m = path[0], path[1], path[-1]
+        if m in seen or m not in (brand_models.get((cat, br)) or []):
+            continue  # модель не публикуется в этом канале
+        prices_path, template_path = _resolve_paths_for_model(prices_tree, template_tree, cat, br, m)
+        if not prices_path:
+            return None
+        if tuple(prices_path) != tuple(path):
+            continue  # пост модели рендерится из другого пути
+        seen.add(m)
+
+        text = _build_model_text(
+            prices_tree,
+            template_tree,
+            m,
+            prices_path,
+            template_path,
+            channel_pricing,
+            text_mode=text_mode,
+            region_index=region_index,
+        )
+        mid = model_to_mid.get(m)
+        prev = existing.get(str(mid)) if mid else None
+        if not text or prev is None:
+            return None
+        cover_real = _resolve_model_cover(cover_cfg, peer_id_short, prices_path) if images_enabled else None
+        op = _post_op_for(prev, cat=cat, br=br, model=m, text=text, mid=mid, cover=cover_real or placeholder)
+        if op.action == "create":
+            return None
+        plan.posts.append(op)
+
+    # ====== меню остаются; все, на которые ссылаемся, должны быть на месте ======
+    linked_brands = {(cat, br) for (cat, br), models in brand_models.items() if any(m in model_to_mid for m in models)}
+    linked_cats = {cat for cat, _br in linked_brands}
+    required_menus: List[Any] = [menu_state.get("brand_models", {}).get(f"{cat}|{br}") for cat, br in linked_brands]
+    required_menus += [menu_state.get("brands", {}).get(cat) for cat in linked_cats]
+    if linked_cats:
+        required_menus.append(menu_state.get("categories"))
+    if not all(mid is not None and str(mid) in existing for mid in required_menus):
+        return None
+    plan.menus_total = len(required_menus)
+    plan.rebuild_menus = False
+    plan.kept_menus = sorted({int(mid) for mid in required_menus})
+    for mid in menu_mids:
+        if mid not in plan.kept_menus:
+            plan.deletes[mid] = "menu"
+    return plan
+
+
+def _sync_inputs_fp(**inputs: Any) -> str:
+    """Отпечаток настроек канала, от которых зависят тексты постов (кроме цен из parsed_data)."""
+    return _text_fp(json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def _format_plan_report(plan: SyncPlan) -> str:
+    s = plan.summary()
+    reasons = ", ".join(f"{k}={v}" for k, v in sorted(s["delete_reasons"].items())) or "—"
+    return (
+        f"📋 PLAN{' (change feed)' if s['targeted'] else ''}: create={s['creates']} edit={s['edits']} edit_media={s['media_edits']} "
+        f"skip={s['skips']} delete={s['deletes']} ({reasons}) "
+        f"menus={'rebuild' if s['rebuild_menus'] else 'keep'}:{s['menus']} → ~{s['api_calls']} API calls"
+    )
+
+
+async def _apply_post_op(
+    client,
+    entity,
+    op: PostOp,
+    *,
+    existing_index: dict[str, dict],
+    model_to_mid: dict[str, str],
+    pending_deletes: List[int],
+) -> bool:
+    if op.action == "edit":
+        _log(f"✏️ EDIT MODEL '{op.model}' mid={op.mid}: {op.reason}")
+        ok = await safe_edit(client, entity, int(op.mid), op.text, parse_mode="HTML")
+        if ok:
+            existing_index[str(op.mid)] = _post_meta(op.text, model=op.model, cover=op.cover)
+            return True
+        _log(f"❌ FAILED EDIT MODEL '{op.model}' mid={op.mid}")
+        return False
+
+    if op.action == "edit_media":
+        _log(f"🖼 REPLACE MEDIA (keep mid) for '{op.model}' mid={op.mid}")
+        okm = await safe_edit_media(client, entity, int(op.mid), file=op.cover, caption=op.text)
+        if okm:
+            existing_index[str(op.mid)] = _post_meta(op.text, model=op.model, cover=op.cover)
+            return True
+        # fallback: delete+recreate
+        _log(f"🗑 REPLACE MEDIA fallback delete+recreate for '{op.model}' mid={op.mid}")
+        pending_deletes.append(int(op.mid))
+        existing_index.pop(str(op.mid), None)
+        model_to_mid.pop(op.model, None)
+
+    if op.cover is not None:
+        _log(f"🖼 CREATE MEDIA MODEL '{op.model}' cover={op.cover.name}")
+        msg = await safe_send_file(client, entity, file=op.cover, caption=op.text)
+    else:
+        _log(f"➕ CREATE MODEL '{op.model}' ({op.reason})")
+        msg = await safe_send(client, entity, op.text, parse_mode="HTML")
+    if msg:
+        model_to_mid[op.model] = str(msg.id)
+        existing_index[str(msg.id)] = _post_meta(op.text, model=op.model, cover=op.cover)
+        _log(f"✅ CREATED MODEL '{op.model}' mid={msg.id}")
+        return True
+    _log(f"❌ FAILED CREATE MODEL '{op.model}'")
+    return False
+
+
+async def _apply_sync_plan(
+    client,
+    entity,
+    plan: SyncPlan,
+    *,
+    existing_index: dict[str, dict],
+    pending_deletes: List[int],
+) -> dict:
+    """
+    Выполняет план: удаления одной пачкой (по DELETE_CHUNK id на запрос), затем посты моделей.
+    Удаления, возникшие по ходу (замена медиа не удалась), копятся в pending_deletes.
+    """
+    mids = sorted(plan.deletes, reverse=True)
+    if mids:
+        _log(f"🧹 Delete {len(mids)} messages in {-(-len(mids) // DELETE_CHUNK)} request(s)")
+        await safe_delete(client, entity, mids)
+        for mid in mids:
+            existing_index.pop(str(mid), None)
+
+    created = edited = skipped = failed = 0
+    for op in plan.posts:
+        if op.action == "skip":
+            skipped += 1
+            continue
+        ok = await _apply_post_op(
+            client,
+            entity,
+            op,
+            existing_index=existing_index,
+            model_to_mid=plan.model_to_mid,
+            pending_deletes=pending_deletes,
+        )
+        if not ok:
+            skipped += 1
+            failed += 1
+        elif op.action == "create":
+            created += 1
+        else:
+            edited += 1
+    return {"created": created, "edited": edited, "skipped": skipped, "removed": len(mids), "failed": failed}
+
+
 # --------------------------- Синхронизация канала -------------------------------------------
 
 async def sync_channel(
@@ -2288,8 +2170,18 @@ async def sync_channel(
     channel_ref: Union[str, int],
     *,
     channel_mode: str = "opt",
-    aio_bot: Optional[AiogramBot] = None
+    aio_bot: Optional[AiogramBot] = None,
+    dry_run: bool = False,
+    use_change_feed: bool = True,
 ) -> dict:
+    """
+    Синхронизация канала: план (_plan_channel_sync) -> применение (_apply_sync_plan) -> меню и статус.
+    dry_run=True — только план: вернёт {"dry_run": True, "plan": {...}} без запросов на запись;
+    журнал удалений (_DELETED_JOURNAL) не расходуется, запросы сверки учтены в plan["api_calls"].
+    use_change_feed=True — если с прошлой синхронизации поменялись только цены (лента parsing/change_feed.py),
+    правим лишь посты изменившихся моделей, статус и изменившиеся меню (_plan_targeted_sync).
+    Полный план — при смене настроек канала, полном скане, пропавших постах и для sources_mode != default.
+    """
     # ====== entity / peer_id ======
     entity = await client.get_entity(channel_ref)
     peer_id = str(utils.get_peer_id(entity))          # "-100123..."
@@ -2320,22 +2212,40 @@ async def sync_channel(
     custom_btns_final = _custom_buttons_from_settings(ch_settings, "final") if ch_settings else []
 
     # ====== parsed_data.json: источник цен + channel_pricing ======
+    # parsed_data.json читаем из текущего опубликованного поколения (parsing/generations.py)
+    # поколение фиксируем до чтения: если оно сменится на ходу, в следующий раз изменения просто применятся ещё раз
+    gen_id = current_generation_id(DEFAULT_BASE_DIR) if sources_mode == "default" else None
+    base_parsed_path = generation_file(DEFAULT_BASE_DIR, "parsed_data.json")
     preferred = []
     if user_id and sources_mode in ("own", "custom"):
-        preferred.append(user_data_dir(int(user_id)) / "parsed_data.json")
-    parsed, _parsed_src = _load_parsed_data(preferred_paths=preferred)
-    if sources_mode == "custom" and _parsed_is_empty(parsed):
-        parsed, _parsed_src = _load_parsed_data(preferred_paths=[DEFAULT_BASE_DIR / "parsed_data.json"])
+        preferred.append(generation_file(user_data_dir(int(user_id)), "parsed_data.json"))
+    price_overlay = None
+    if sources_mode == "custom" and user_id:
+        # base + user: структура и базовые цены из общего parsed_data.json, цены пользователя — overlay
+        parsed, _parsed_src = _load_parsed_data(preferred_paths=[base_parsed_path])
+        price_overlay = overlay_for_paths(base_parsed_path, preferred[0])
+    else:
+        parsed, _parsed_src = _load_parsed_data(preferred_paths=preferred)
     if sources_mode == "default":
-        parsed, _parsed_src = _load_parsed_data(preferred_paths=[DEFAULT_BASE_DIR / "parsed_data.json"])
+        parsed, _parsed_src = _load_parsed_data(preferred_paths=[base_parsed_path])
     _debug_parsed_shape(parsed)
     region_index = _build_region_index_for_user(user_id, sources_mode)
 
     prices_tree = _extract_prices_catalog_from_parsed(parsed)
+    if price_overlay is not None and prices_tree:
+        prices_tree = price_overlay.apply_to_catalog(prices_tree)
     if not prices_tree:
         _log("Nothing to publish: empty catalog(prices) in parsed_data.json")
         return {"created": 0, "edited": 0, "skipped": 0, "removed": 0, "model_to_mid": {}}
 
+    # плоский индекс дерева цен — один на версию источника (общий для каналов с тем же parsed_data)
+    if price_overlay is not None:
+        prices_version = f"overlay:{price_overlay.version}"
+    elif _parsed_src:
+        prices_version = f"{_parsed_src}@{_file_build_id(Path(_parsed_src))}"
+    else:
+        prices_version = None
+    catalog_index.get_index(prices_tree, version=prices_version)
     _log(f"prices(models by count): {_count_models_in_catalog(prices_tree)}")
 
     # ====== data.json: TEMPLATE (разделители/варианты) ======
@@ -2344,6 +2254,7 @@ async def sync_channel(
     if not isinstance(template_tree, dict) or not template_tree:
         _log("Nothing to publish: empty catalog(template) in data.json")
         return {"created": 0, "edited": 0, "skipped": 0, "removed": 0, "model_to_mid": {}}
+    catalog_index.get_index(template_tree, version=f"etalon@{data_build_id()}")
 
     # ====== cover cfg (для картинок моделей) ======
     cover_cfg = _load_cover_images_cfg()
@@ -2378,11 +2289,6 @@ async def sync_channel(
     # модельные заголовки берём из prices_tree (реально публикуемые)
     all_model_titles = _collect_all_model_titles(prices_tree)
 
-    desired_models: set[str] = set()
-    for (_cat, _br), models in brand_models.items():
-        for m in models:
-            desired_models.add(m)
-
     # ====== кеш ======
     channel_posts = load_channel_posts(peer_id)
     menu_state_all = load_channel_menu_state(peer_id)
@@ -2417,156 +2323,126 @@ async def sync_channel(
         "status": None,      # status mid
     }
 
-    # ====== существующие сообщения ======
-    msgs = await client.get_messages(entity, limit=RECENT_MESSAGES_LIMIT)
-
+    # ====== существующие сообщения (сверка кэша с каналом) ======
     existing = channel_posts if isinstance(channel_posts, dict) else {}
-    actual_ids = {str(m.id) for m in msgs if isinstance(m, Message)}
-
-    removed = await _prune_missing_messages(client, entity, existing_index=existing, recent_ids=actual_ids)
-    if removed:
-        _log(f"Garbage collected {removed} vanished messages from cache")
-
-    # обновляем кеш существующих постов (важно: has_media)
-    for msg in msgs:
-        if isinstance(msg, Message):
-            prev_meta = existing.get(str(msg.id)) if isinstance(existing.get(str(msg.id)), dict) else {}
-            existing[str(msg.id)] = {
-                "text": msg.message or "",
-                "date": msg.date.isoformat() if getattr(msg, "date", None) else None,
-                "kb_fp": (prev_meta.get("kb_fp") if isinstance(prev_meta, dict) else None),
-                "has_media": bool(getattr(msg, "media", None)),
-                "media_path": (prev_meta.get("media_path") if isinstance(prev_meta, dict) else None),
-                "model": (prev_meta.get("model") if isinstance(prev_meta, dict) else None),
-                "hidden": bool(prev_meta.get("hidden")) if isinstance(prev_meta, dict) else False,
-            }
-
-    # ====== Очистка: меню/статус ======
-    mids_to_delete: List[int] = []
-    for mid, meta in list(existing.items()):
-        text = meta.get("text") or ""
-        first = _first_line(text)
-        stripped = _strip_markup_title(first)
-
-        if stripped.startswith(MANAGED_TITLES_PREFIXES):
-            try:
-                mids_to_delete.append(int(mid))
-                continue
-            except Exception:
-                continue
-
-        if STATUS_TITLE in text:
-            try:
-                mids_to_delete.append(int(mid))
-            except Exception:
-                pass
-
-    if mids_to_delete:
-        _log(f"🧹 Delete old menus/status: {len(mids_to_delete)} messages")
-        await safe_delete(client, entity, sorted(mids_to_delete, reverse=True))
-        await _throttle()
-        for oid in mids_to_delete:
-            existing.pop(str(oid), None)
-        removed += len(mids_to_delete)
-
-    # ====== Очистка: устаревшие модели (которые были в канале, но теперь не в publish-spec) ======
-    obsolete_mids: List[int] = []
-    for mid, meta in list(existing.items()):
-        text = meta.get("text") or ""
-        if not text:
-            continue
-
-        titles = _extract_models_from_message_text(text)
-        if not titles:
-            continue
-
-        has_known_model = any(t in all_model_titles for t in titles)
-        if not has_known_model:
-            continue
-
-        keep = any(t in desired_models for t in titles)
-        if not keep:
-            try:
-                obsolete_mids.append(int(mid))
-            except Exception:
-                continue
-
-    if obsolete_mids:
-        _log(f"🧹 Delete obsolete model posts (not in publish-spec): {len(obsolete_mids)} messages")
-        await safe_delete(client, entity, sorted(obsolete_mids, reverse=True))
-        await _throttle()
-        for oid in obsolete_mids:
-            existing.pop(str(oid), None)
-        removed += len(obsolete_mids)
-
-    # ====== Очистка: старые групповые посты (несколько моделей в одном сообщении) ======
-    group_mids: List[int] = []
-    for mid, meta in list(existing.items()):
-        if not isinstance(meta, dict):
-            continue
-        text = meta.get("text") or ""
-        titles = [t for t in _extract_models_from_message_text(text) if t in desired_models]
-        if len(titles) > 1:
-            try:
-                group_mids.append(int(mid))
-            except Exception:
-                pass
-    if group_mids:
-        _log(f"🧹 Delete grouped model posts: {len(group_mids)} messages")
-        await safe_delete(client, entity, sorted(set(group_mids), reverse=True))
-        await _throttle()
-        for oid in group_mids:
-            existing.pop(str(oid), None)
-        removed += len(group_mids)
-
-    # ====== model_to_mid только по актуальным ======
-    model_to_mid: Dict[str, str] = {}
-    for mid, meta in existing.items():
-        if not isinstance(meta, dict):
-            continue
-
-        model_name = meta.get("model")
-        if model_name in desired_models:
-            model_to_mid[model_name] = mid
-            continue
-
-        text = meta.get("text") or ""
-        titles = _extract_models_from_message_text(text)
-        for title in titles:
-            if title in desired_models:
-                model_to_mid[title] = mid
-                meta["model"] = title
-                break
-
-    created = edited = skipped = 0
-
-    # ====== Если добавились новые секции (cat/brand) — удаляем всё после них ======
-    reset_point = _find_section_reset_point(cat_list, cat_brands_order, brand_models, model_to_mid)
-    if reset_point:
-        reset_cat, reset_brand = reset_point
-        models_after = _collect_models_from_section(
-            cat_list, cat_brands_order, brand_models, reset_cat, reset_brand
+    sync_state = load_channel_sync_state(peer_id)
+    _watch_deletions(client)
+    full_scan = RECONCILE_MODE == "full" or not existing or _full_scan_due(sync_state)
+    # запросы сверки (get_messages) тоже идут в оценку стоимости dry_run
+    calls: Dict[str, int] = {"reconcile": 0}
+    removed = None
+    if not full_scan:
+        removed = await _reconcile_incremental(
+            client, entity, peer_id=peer_id, existing=existing, consume_journal=not dry_run, calls=calls
         )
-        mids_after: List[int] = []
-        for m in models_after:
-            mid = model_to_mid.get(m)
-            if mid:
-                try:
-                    mids_after.append(int(mid))
-                except Exception:
-                    pass
-        mids_after = sorted(set(mids_after), reverse=True)
-        if mids_after:
-            _log(f"🧹 SECTION RESET from {reset_cat}/{reset_brand}: delete {len(mids_after)} posts")
-            await safe_delete(client, entity, mids_after)
-            await _throttle()
-            for mid in mids_after:
+    if removed is None:
+        full_scan = True
+        if not dry_run:
+            _DELETED_JOURNAL.pop(peer_id, None)
+        removed = await _reconcile_full(client, entity, existing=existing, calls=calls)
+    _log(f"RECONCILE: {'full' if full_scan else 'incremental'}, cached posts={len(existing)}")
+
+    # ====== лента изменений: какие модели поменялись с поколения прошлой синхронизации ======
+    inputs_fp = _sync_inputs_fp(
+        pricing=channel_pricing,
+        text_mode=text_mode,
+        images=images_enabled,
+        spec=publish_spec,
+        covers=cover_cfg.get(peer_id_short),
+        sources=sources_mode,
+    )
+    changed: Optional[set] = None
+    if (
+        use_change_feed
+        and CHANGE_FEED_ENABLED
+        and gen_id
+        and not full_scan
+        and not removed
+        and sync_state.get("inputs_fp") == inputs_fp
+    ):
+        changed = change_feed.changed_paths_since(DEFAULT_BASE_DIR, sync_state.get("gen_id"))
+        if changed is not None:
+            _log(f"CHANGE FEED: {len(changed)} models changed since {sync_state.get('gen_id')}")
+
+    # ====== план: что создать / поправить / удалить ======
+    def _make_plan() -> SyncPlan:
+        if changed is not None:
+            targeted = _plan_targeted_sync(
+                changed=changed,
+                existing=existing,
+                menu_state=menu_state,
+                brand_models=brand_models,
+                prices_tree=prices_tree,
+                template_tree=template_tree,
+                channel_pricing=channel_pricing,
+                cover_cfg=cover_cfg,
+                peer_id_short=peer_id_short,
+                images_enabled=images_enabled,
+                text_mode=text_mode,
+                region_index=region_index,
+            )
+            if targeted is not None:
+                return targeted
+            _log("CHANGE FEED: targeted plan not possible, full plan")
+        return _plan_channel_sync(
+            existing=existing,
+            menu_state=menu_state,
+            cat_list=cat_list,
+            cat_brands_order=cat_brands_order,
+            brand_models=brand_models,
+            all_model_titles=all_model_titles,
+            prices_tree=prices_tree,
+            template_tree=template_tree,
+            channel_pricing=channel_pricing,
+            cover_cfg=cover_cfg,
+            peer_id_short=peer_id_short,
+            images_enabled=images_enabled,
+            text_mode=text_mode,
+            region_index=region_index,
+        )
+
+    plan = _make_plan()
+    if not full_scan:
+        # incremental: убеждаемся, что посты, на которые опирается план, ещё живы
+        missing = await _missing_mids(client, entity, plan.referenced_mids(), calls=calls)
+        if missing:
+            _log(f"RECONCILE: {len(missing)} planned posts vanished from channel")
+            for mid in missing:
                 existing.pop(str(mid), None)
-            for m in models_after:
-                model_to_mid.pop(m, None)
-            removed += len(mids_after)
+            removed += len(missing)
+            changed = None
+            if len(missing) > RECONCILE_DRIFT_MAX:
+                _log("⚠️ RECONCILE drift: fallback to full rescan")
+                full_scan = True
+                removed += await _reconcile_full(client, entity, existing=existing, calls=calls)
+            plan = _make_plan()
+    _log(_format_plan_report(plan))
+    _log(f"RENDER cache: hits={_RENDER_STATS['hits']} misses={_RENDER_STATS['misses']} size={len(_RENDER_CACHE)}")
+    if dry_run:
+        # ничего не отправляем и не сохраняем: только оценка стоимости обновления
+        summary = plan.summary()
+        summary["reconcile_calls"] = calls["reconcile"]
+        summary["api_calls"] += calls["reconcile"]
+        return {
+            "created": 0,
+            "edited": 0,
+            "skipped": 0,
+            "removed": 0,
+            "model_to_mid": dict(plan.model_to_mid),
+            "dry_run": True,
+            "plan": summary,
+        }
 
     # ================= Публикация =================
+    # удаления по ходу публикации (пустые меню, неудачная замена медиа) — одной пачкой вместе со статусом
+    pending_deletes: List[int] = []
+    applied = await _apply_sync_plan(client, entity, plan, existing_index=existing, pending_deletes=pending_deletes)
+    created, edited, skipped = applied["created"], applied["edited"], applied["skipped"]
+    failed = applied["failed"]
+    removed += applied["removed"]
+    model_to_mid = plan.model_to_mid
+
+    # ================= Меню =================
     for cat in cat_list:
         brands = cat_brands_order.get(cat, []) or []
         _log(f"CATEGORY '{cat}' — brands={len(brands)}")
@@ -2575,88 +2451,6 @@ async def sync_channel(
             models = brand_models.get((cat, br), [])
             _log(f"  BRAND '{cat}/{br}' — models={len(models)}")
 
-            # ====== PLAN + ORDER CHECK ======
-            units_plan = _plan_brand_units(
-                models,
-                cat=cat,
-                br=br,
-                prices_tree=prices_tree,
-                template_tree=template_tree,
-                channel_pricing=channel_pricing,
-            )
-
-            did_reset = False
-            if _brand_needs_reset(units_plan, model_to_mid):
-                removed_here = await _reset_brand_posts(
-                    client,
-                    entity,
-                    existing_index=existing,
-                    model_to_mid=model_to_mid,
-                    models=models,
-                )
-                removed += removed_here
-                did_reset = True
-
-            published_here = 0
-
-            if did_reset:
-                # Публикуем в порядке units_plan (m1 затем m2...), чтобы mid шли по возрастанию
-                for unit in units_plan:
-                    changed, mid, was_existing = await _ensure_unit_post(
-                        client, entity,
-                        cat=cat,
-                        brand=br,
-                        unit=unit,
-                        existing_index=existing,
-                        model_to_mid=model_to_mid,
-                        prices_tree=prices_tree,
-                        template_tree=template_tree,
-                        channel_pricing=channel_pricing,
-                        cover_cfg=cover_cfg,
-                        peer_id_short=peer_id_short,
-                        images_enabled=images_enabled,
-                        text_mode=text_mode,
-                        region_index=region_index,
-                    )
-                    if changed and mid is not None:
-                        edited += 1 if was_existing else 0
-                        created += 0 if was_existing else 1
-                        published_here += 1
-                    else:
-                        skipped += 1
-
-            else:
-                # 1 сообщение = 1 модель (без склейки)
-                for unit in units_plan:
-                    changed, mid, was_existing = await _ensure_unit_post(
-                        client, entity,
-                        cat=cat,
-                        brand=br,
-                        unit=unit,
-                        existing_index=existing,
-                        model_to_mid=model_to_mid,
-                        prices_tree=prices_tree,
-                        template_tree=template_tree,
-                        channel_pricing=channel_pricing,
-                        cover_cfg=cover_cfg,
-                        peer_id_short=peer_id_short,
-                        images_enabled=images_enabled,
-                        text_mode=text_mode,
-                        region_index=region_index,
-                    )
-                    if changed and mid is not None:
-                        edited += 1 if was_existing else 0
-                        created += 0 if was_existing else 1
-                        published_here += 1
-                    else:
-                        skipped += 1
-
-            _log(
-                f"    MODELS published_here={published_here}, "
-                f"total_created={created}, total_edited={edited}, total_skipped={skipped}"
-            )
-            await _throttle(GROUP_PAUSE_SECS)
-
             # ====== меню бренда ======
             btns: List[InlineKeyboardButton] = []
             resolved = 0
@@ -2695,6 +2489,7 @@ async def sync_channel(
                 old_mid=int(old_mid) if old_mid else None,
                 aio_bot=aio_bot,
                 chat_ref_for_bot=bot_chat_ref,
+                pending_deletes=pending_deletes,
             )
             if new_mid:
                 menu_state["brand_models"][key] = int(new_mid)
@@ -2703,8 +2498,6 @@ async def sync_channel(
                 menu_state["brand_models"].pop(key, None)
                 _log(f"   MENU '{cat}/{br}' not created (no buttons)")
 
-            await _throttle(GROUP_PAUSE_SECS)
-
         # ====== меню категории ======
         brand_links: List[InlineKeyboardButton] = []
         linked = 0
@@ -2729,6 +2522,7 @@ async def sync_channel(
             old_mid=int(old_mid) if old_mid else None,
             aio_bot=aio_bot,
             chat_ref_for_bot=bot_chat_ref,
+            pending_deletes=pending_deletes,
         )
         if new_mid:
             menu_state["brands"][cat] = int(new_mid)
@@ -2737,8 +2531,6 @@ async def sync_channel(
             menu_state["brands"].pop(cat, None)
             _log(f"  CATEGORY MENU '{cat}' not created (no buttons)")
 
-        await _throttle(GROUP_PAUSE_SECS)
-
     # ====== глобальная навигация ======
     cat_btns: List[InlineKeyboardButton] = []
     linked_cats = 0
@@ -2762,6 +2554,7 @@ async def sync_channel(
         old_mid=int(old_mid) if old_mid else None,
         aio_bot=aio_bot,
         chat_ref_for_bot=bot_chat_ref,
+        pending_deletes=pending_deletes,
     )
     if new_mid:
         menu_state["categories"] = int(new_mid)
@@ -2782,11 +2575,22 @@ async def sync_channel(
         final_btns=custom_btns_final,
         aio_bot=aio_bot,
         chat_ref_for_bot=bot_chat_ref,
+        pending_deletes=pending_deletes,
     )
 
     # ====== save ======
     save_channel_posts(peer_id, existing)
     save_channel_menu_state(peer_id, menu_state)
+    if full_scan:
+        sync_state["full_scan_at"] = datetime.now(timezone.utc).isoformat()
+    sync_state["synced_at"] = datetime.now(timezone.utc).isoformat()
+    if gen_id and not failed:
+        sync_state["gen_id"] = gen_id
+        sync_state["inputs_fp"] = inputs_fp
+    else:
+        # неудачные правки или другой источник цен — в следующий раз полный план
+        sync_state.pop("gen_id", None)
+    save_channel_sync_state(peer_id, sync_state)
 
     _log(f"DONE: created={created}, edited={edited}, skipped={skipped}, removed={removed}")
     return {
@@ -2854,7 +2658,6 @@ async def hide_opt_models(
             continue
 
         ok = await safe_edit(client, entity, int(mid), ".", parse_mode="HTML")
-        await _throttle()
         if ok:
             meta["text"] = "."
             meta["hidden"] = True
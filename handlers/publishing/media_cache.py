@@ -0,0 +1,138 @@
+# handlers/publishing/media_cache.py
+# Кэш уже загруженных в Telegram обложек: (аккаунт, путь картинки, хэш содержимого) -> фото.
+#
+# После первой отправки файла запоминаем id / access_hash / file_reference фото из ответа,
+# дальше send_file / edit_message получают InputPhoto вместо повторной заливки файла.
+# Файл поменялся (другой sha256) — запись не подходит, картинка заливается заново.
+# Telegram отверг ссылку (FILE_REFERENCE_EXPIRED и т.п.) — вызывающий делает forget() и заливает файл.
+# Ключ — id аккаунта из get_me(input_peer=True) (await account_id(client), один раз на клиент):
+# _self_id у Telethon до первого get_me пустой, и разные аккаунты слиплись бы в один ключ.
+
+from __future__ import annotations
+
+import hashlib
+import weakref
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from telethon.tl import types
+
+from handlers import persist_utils
+
+CACHE_FILE = Path(__file__).resolve().parent / "data" / "media_file_ids.json"
+
+# str(path) -> ((mtime_ns, size), sha256): хэшируем файл только после его изменения
+_HASHES: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+_STATE: Dict[str, Any] = {"doc": None}
+
+# клиент -> id аккаунта (клиенты живут весь процесс; weak — чтобы не держать отключённые)
+_ACCOUNTS: "weakref.WeakKeyDictionary[Any, int]" = weakref.WeakKeyDictionary()
+
+
+def _doc() -> Dict[str, dict]:
+    if _STATE["doc"] is None:
+        doc = persist_utils.read_json(CACHE_FILE, {})
+        _STATE["doc"] = doc if isinstance(doc, dict) else {}
+    return _STATE["doc"]
+
+
+def _content_hash(path: Path) -> Optional[str]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    sig = (int(st.st_mtime_ns), int(st.st_size))
+    cached = _HASHES.get(str(path))
+    if cached and cached[0] == sig:
+        return cached[1]
+    try:
+        h = hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+    _HASHES[str(path)] = (sig, h)
+    return h
+
+
+async def account_id(client) -> Optional[int]:
+    """
+    id аккаунта клиента (access_hash фото действителен только для аккаунта, который его получил).
+    None — узнать не удалось: кэш для такого клиента не используется.
+    """
+    try:
+        cached = _ACCOUNTS.get(client)
+    except TypeError:
+        cached = None
+    if cached is not None:
+        return cached
+    try:
+        me = await client.get_me(input_peer=True)
+        uid = int(getattr(me, "user_id", 0) or 0)
+    except Exception:
+        return None
+    if not uid:
+        return None
+    try:
+        _ACCOUNTS[client] = uid
+    except TypeError:
+        pass
+    return uid
+
+
+def _key(account: int, path: Path) -> str:
+    return f"{account}|{Path(path).resolve()}"
+
+
+def get(account: Optional[int], path: Path):
+    """InputPhoto / InputDocument для уже загруженного файла или None (надо заливать)."""
+    if not account:
+        return None
+    rec = _doc().get(_key(account, path))
+    if not isinstance(rec, dict):
+        return None
+    if rec.get("sha256") != _content_hash(Path(path)):
+        return None
+    try:
+        ref = bytes.fromhex(rec.get("file_reference") or "")
+        if rec.get("kind") == "document":
+            return types.InputDocument(id=int(rec["id"]), access_hash=int(rec["access_hash"]), file_reference=ref)
+        return types.InputPhoto(id=int(rec["id"]), access_hash=int(rec["access_hash"]), file_reference=ref)
+    except Exception:
+        return None
+
+
+def remember(account: Optional[int], path: Path, msg) -> None:
+    """Запомнить фото/документ из отправленного (или отредактированного) сообщения."""
+    if not account:
+        return
+    media = getattr(msg, "photo", None)
+    kind = "photo"
+    if media is None:
+        media = getattr(msg, "document", None)
+        kind = "document"
+    if media is None or getattr(media, "id", None) is None:
+        return
+    digest = _content_hash(Path(path))
+    if digest is None:
+        return
+    rec = {
+        "kind": kind,
+        "id": int(media.id),
+        "access_hash": int(media.access_hash),
+        "file_reference": bytes(getattr(media, "file_reference", b"") or b"").hex(),
+        "sha256": digest,
+    }
+    doc = _doc()
+    key = _key(account, path)
+    if doc.get(key) == rec:
+        return
+    doc[key] = rec
+    persist_utils.write_json(CACHE_FILE, doc)
+
+
+def forget(account: Optional[int], path: Path) -> None:
+    if not account:
+        return
+    doc = _doc()
+    if doc.pop(_key(account, path), None) is not None:
+        persist_utils.write_json(CACHE_FILE, doc)
@@ -0,0 +1,139 @@
+# handlers/publishing/multi_sync.py
+# Параллельное обновление нескольких каналов.
+#
+# sync_channel почти всё время ждёт rate-limit, поэтому каналы гоняем одновременно
+# (не больше PUBLISH_CONCURRENCY за раз). Общий бюджет запросов аккаунта держит
+# rate_limit: его token bucket на аккаунт общий для всех каналов, которые этот аккаунт ведёт,
+# а FloodWait аккаунта притормаживает сразу все его каналы.
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from handlers.publishing.channel_updater import sync_channel
+
+PUBLISH_CONCURRENCY = int(os.getenv("PUBLISH_CONCURRENCY", "4"))
+# не чаще, чем раз в столько секунд, дёргаем on_progress (правка сообщения в боте)
+PROGRESS_EVERY_SEC = float(os.getenv("PUBLISH_PROGRESS_SEC", "3"))
+
+
+@dataclass
+class ChannelJob:
+    ch_id: str
+    title: str
+    target: Any
+    mode: str
+    get_client: Callable[[], Awaitable[Any]]
+    aio_bot: Any = None
+
+
+@dataclass
+class JobState:
+    title: str
+    status: str = "queued"          # queued | running | done | error
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+@dataclass
+class MultiSyncReport:
+    states: Dict[str, JobState] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+
+    def done(self) -> List[str]:
+        return [k for k, s in self.states.items() if s.status == "done"]
+
+    def totals(self) -> Dict[str, int]:
+        out = {"created": 0, "edited": 0, "skipped": 0, "removed": 0}
+        for s in self.states.values():
+            if s.status == "done" and isinstance(s.result, dict):
+                for k in out:
+                    out[k] += int(s.result.get(k) or 0)
+        return out
+
+    def render(self) -> str:
+        icons = {"queued": "⏳", "running": "🔄", "done": "✅", "error": "❌"}
+        lines = []
+        for s in self.states.values():
+            line = f"{icons.get(s.status, '•')} {s.title}"
+            if s.status == "done" and isinstance(s.result, dict):
+                r = s.result
+                line += f" — +{r.get('created', 0)} ✏️{r.get('edited', 0)} 🗑{r.get('removed', 0)} ({s.elapsed:.0f}с)"
+            elif s.status == "running":
+                line += f" — {s.elapsed:.0f}с"
+            elif s.status == "error":
+                line += f" — {s.error}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+ProgressFn = Callable[[MultiSyncReport], Awaitable[None]]
+
+
+async def sync_channels(
+    jobs: List[ChannelJob],
+    *,
+    concurrency: int = PUBLISH_CONCURRENCY,
+    on_progress: Optional[ProgressFn] = None,
+    on_done: Optional[Callable[[ChannelJob, dict], None]] = None,
+) -> MultiSyncReport:
+    """
+    Обновляет каналы параллельно. on_done(job, result) — сразу после успешного канала
+    (например, отметить last_publish_date), on_progress(report) — сводка для UI.
+    """
+    report = MultiSyncReport(states={j.ch_id: JobState(title=j.title) for j in jobs})
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+    last_progress = [0.0]
+
+    async def _progress(force: bool = False) -> None:
+        if on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - last_progress[0] < PROGRESS_EVERY_SEC:
+            return
+        last_progress[0] = now
+        try:
+            await on_progress(report)
+        except Exception as e:
+            print(f"[multi_sync] ⚠️ progress: {e}")
+
+    async def _run(job: ChannelJob) -> None:
+        st = report.states[job.ch_id]
+        async with sem:
+            st.status = "running"
+            st.started = time.monotonic()
+            await _progress()
+            try:
+                client = await job.get_client()
+                result = await sync_channel(client, job.target, channel_mode=job.mode, aio_bot=job.aio_bot)
+                st.result = result
+                st.status = "done"
+                if on_done is not None:
+                    on_done(job, result)
+            except Exception as e:
+                st.status = "error"
+                st.error = str(e)[:200]
+                print(f"[multi_sync] ❌ {job.title}: {e}")
+            finally:
+                st.finished = time.monotonic()
+        await _progress()
+
+    await asyncio.gather(*(_run(j) for j in jobs))
+    await _progress(force=True)
+    print(
+        f"[multi_sync] ✅ {len(report.done())}/{len(jobs)} channels in "
+        f"{time.monotonic() - report.started:.0f}s (concurrency={concurrency})"
+    )
+    return report
@@ -0,0 +1,151 @@
+# handlers/publishing/rate_limit.py
+# Адаптивный rate-limit публикаций (вместо фиксированного sleep после каждого запроса).
+#
+# Два token bucket на запрос: на аккаунт (общий бюджет всех каналов, которые он ведёт)
+# и на пару (аккаунт, канал). Пока токены есть — запросы идут пачкой без пауз.
+# FloodWaitError(N): аккаунт замораживается на N секунд, скорость его вёдер падает вдвое;
+# каждый успешный запрос понемногу возвращает скорость к базовой.
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Tuple
+
+from telethon import utils
+
+# запросов в секунду / размер пачки
+ACCOUNT_RATE = float(os.getenv("PUBLISH_ACCOUNT_RATE", "3"))
+ACCOUNT_BURST = float(os.getenv("PUBLISH_ACCOUNT_BURST", "20"))
+PEER_RATE = float(os.getenv("PUBLISH_PEER_RATE", "1"))
+PEER_BURST = float(os.getenv("PUBLISH_PEER_BURST", "10"))
+
+# ниже этой доли базовой скорости не опускаемся
+MIN_RATE_FACTOR = 0.05
+# доля базовой скорости, которую возвращает каждый успешный запрос
+RECOVER_STEP = 0.02
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.base_rate = max(0.01, float(rate))
+        self.rate = self.base_rate
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько ждать до свободного токена (0 — можно сейчас)."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+    def flood(self, seconds: float, now: float) -> None:
+        self.blocked_until = max(self.blocked_until, now + max(0.0, float(seconds)))
+        self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate / 2.0)
+        self.tokens = 0.0
+
+    def success(self) -> None:
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVER_STEP)
+
+
+def _account_key(client: Any) -> str:
+    # Telethon: id аккаунта после авторизации; aiogram Bot: id из токена
+    for attr in ("_self_id", "id"):
+        try:
+            v = getattr(client, attr, None)
+        except Exception:
+            v = None
+        if v:
+            return f"{type(client).__name__}:{v}"
+    return f"{type(client).__name__}@{id(client)}"
+
+
+def _peer_key(peer: Any) -> str:
+    if isinstance(peer, (int, str)):
+        return str(peer)
+    try:
+        return str(utils.get_peer_id(peer))
+    except Exception:
+        return repr(peer)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        *,
+        account_rate: float = ACCOUNT_RATE,
+        account_burst: float = ACCOUNT_BURST,
+        peer_rate: float = PEER_RATE,
+        peer_burst: float = PEER_BURST,
+    ):
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.peer_rate = peer_rate
+        self.peer_burst = peer_burst
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._peers: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = asyncio.Lock()
+
+    def _buckets(self, client: Any, peer: Any) -> Tuple[TokenBucket, TokenBucket]:
+        acc = _account_key(client)
+        a = self._accounts.get(acc)
+        if a is None:
+            a = self._accounts[acc] = TokenBucket(self.account_rate, self.account_burst)
+        key = (acc, _peer_key(peer))
+        p = self._peers.get(key)
+        if p is None:
+            p = self._peers[key] = TokenBucket(self.peer_rate, self.peer_burst)
+        return a, p
+
+    async def acquire(self, client: Any, peer: Any) -> None:
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                a, p = self._buckets(client, peer)
+                wait = max(a.wait_time(now), p.wait_time(now))
+                if wait <= 0:
+                    a.take()
+                    p.take()
+                    return
+            await asyncio.sleep(wait)
+
+    def flood(self, client: Any, peer: Any, seconds: float) -> None:
+        # FloodWait у Telegram — на аккаунт: стоят все каналы этого аккаунта
+        now = time.monotonic()
+        a, p = self._buckets(client, peer)
+        a.flood(seconds, now)
+        p.flood(seconds, now)
+
+    def success(self, client: Any, peer: Any) -> None:
+        a, p = self._buckets(client, peer)
+        a.success()
+        p.success()
+
+
+LIMITER = AdaptiveLimiter()
+
+
+async def acquire(client: Any, peer: Any) -> None:
+    await LIMITER.acquire(client, peer)
+
+
+def on_flood(client: Any, peer: Any, seconds: float) -> None:
+    LIMITER.flood(client, peer, seconds)
+
+
+def on_success(client: Any, peer: Any) -> None:
+    LIMITER.success(client, peer)
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Any
 
 from storage import load_data, save_data
+from handlers import persist_utils
 
 BASE_DIR = Path(__file__).resolve().parent / "data"
 CHANNELS_DIR = BASE_DIR / "channels"
@@ -16,19 +16,12 @@ STATUS_EXTRA_FILE = BASE_DIR / "channel_status_extra.json"
 
 
 def _read_json(path: Path, default: Any):
-    try:
-        if not path.exists():
-            return default
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return default
+    # учитывает ещё не записанные на диск версии (фоновый писатель)
+    return persist_utils.read_json(path, default)
 
 
 def _write_json(path: Path, payload: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(path)
+    persist_utils.write_json(path, payload)
 
 
 def _peer_dir(peer_id: str) -> Path:
@@ -36,7 +29,7 @@ def _peer_dir(peer_id: str) -> Path:
 
 
 def _migrate_managed_channels() -> dict:
-    if MANAGED_CHANNELS_FILE.exists():
+    if persist_utils.exists(MANAGED_CHANNELS_FILE):
         return _read_json(MANAGED_CHANNELS_FILE, {})
     db = load_data()
     reg = db.get("managed_channels") or {}
@@ -57,7 +50,7 @@ def save_managed_channels(reg: dict) -> None:
 
 
 def _migrate_status_extra() -> dict:
-    if STATUS_EXTRA_FILE.exists():
+    if persist_utils.exists(STATUS_EXTRA_FILE):
         return _read_json(STATUS_EXTRA_FILE, {})
     db = load_data()
     cfg = db.get("channel_status_extra") or {}
@@ -158,9 +151,19 @@ def save_channel_group_nav(peer_id: str, nav: dict, *, migrate: bool = True) ->
     _write_json(_channel_file(peer_id, "group_nav.json"), nav if isinstance(nav, dict) else {})
 
 
+def load_channel_sync_state(peer_id: str) -> dict:
+    # служебное состояние сверки канала (время последнего полного скана и т.п.)
+    return _read_json(_channel_file(peer_id, "sync_state.json"), {})
+
+
+def save_channel_sync_state(peer_id: str, state: dict) -> None:
+    _write_json(_channel_file(peer_id, "sync_state.json"), state if isinstance(state, dict) else {})
+
+
 def purge_channel_storage(peer_id: str) -> None:
     _migrate_peer(peer_id)
     ch_dir = _peer_dir(peer_id)
+    persist_utils.discard(ch_dir)
     if not ch_dir.exists():
         return
     for p in ch_dir.glob("*"):
@@ -3,15 +3,18 @@
 # parsed_data.json (+ data.json etalon separators) -> tree navigation + "👀 Посмотреть цены" (per-branch, per-model pagination)
 from __future__ import annotations
 
-import json
 from collections import OrderedDict
 import shutil
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from aiogram import Router, F
+from handlers import codec, path_ids
 from handlers.auth_utils import auth_get
 from handlers.parsing.context import DEFAULT_BASE_DIR, user_data_dir
+from handlers.parsing.results import load_region_index, merge_region_indexes
+from handlers.parsing.overlay import PriceOverlay, overlay_for_paths
+from handlers.parsing.generations import generation_file, is_generation_path
 from aiogram.filters import Command
 from aiogram.types import (
     CallbackQuery,
@@ -39,31 +42,19 @@ PARSED_DATA_JSON = PARSED_DIR / "parsed_data.json"
 PAGE_CHILDREN = 14
 
 # ---------------------------------------------------------------------
-# Path token cache (callback_data limit safety)
+# Path tokens (callback_data limit safety): стабильные ID путей, см. handlers/path_ids.py
 # ---------------------------------------------------------------------
-_PATH_CACHE: Dict[str, List[str]] = {}
-_PATH_ORDER: List[str] = []
-_PATH_MAX = 8000
-_PATH_SEQ = 0
+_PATH_NS = "vp"
 
-_REGION_INDEX_CACHE: Dict[str, Tuple[float, Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]]] = {}
 _REGION_FLAG_REVERSE = {v: k for k, v in REGION_FLAG_MAP.items()}
 
 
 def _cache_put(path: List[str]) -> str:
-    global _PATH_SEQ
-    _PATH_SEQ += 1
-    token = f"{_PATH_SEQ:x}"
-    _PATH_CACHE[token] = list(path)
-    _PATH_ORDER.append(token)
-    if len(_PATH_ORDER) > _PATH_MAX:
-        old = _PATH_ORDER.pop(0)
-        _PATH_CACHE.pop(old, None)
-    return token
+    return path_ids.path_id(path, _PATH_NS)
 
 
 def _cache_get(token: str) -> List[str]:
-    return list(_PATH_CACHE.get(token) or [])
+    return path_ids.resolve(token, _PATH_NS) or []
 
 
 # ---------------------------------------------------------------------
@@ -73,7 +64,7 @@ def _read_json(path: Path, default):
     try:
         if not path.exists():
             return default
-        return json.loads(path.read_text(encoding="utf-8"), object_pairs_hook=OrderedDict)
+        return codec.decode(path.read_bytes(), object_pairs_hook=OrderedDict)
     except Exception:
         return default
 
@@ -83,6 +74,22 @@ def _read_json(path: Path, default):
 # ---------------------------------------------------------------------
 _ETALON_CACHE: Optional[Dict[str, Any]] = None
 
+# str(path) -> ((mtime_ns, size), data): разобранный parsed_data.json, общий для всех пользователей
+# одного файла. Данные только читаются — снимок отдаётся без копирования.
+_PARSED_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_PARSED_CACHE_MAX = 16
+
+# str(user_path) -> (mtime_ns, size) базового файла, с которым копия уже сверена
+_USER_COPY_SYNCED: Dict[str, Tuple[int, int]] = {}
+
+
+def _stat_sig(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return int(st.st_mtime_ns), int(st.st_size)
+
 
 def _load_etalon_tree() -> Dict[str, Any]:
     global _ETALON_CACHE
@@ -101,47 +108,53 @@ def _ensure_parsed_data(path: Path) -> Dict[str, Any]:
     """
     UI НЕ пересобирает данные.
     parsed_data.json должен строиться пайплайном (results.py / main.py).
+    Разбираем файл один раз на версию (mtime+size), дальше — снимок из памяти.
     """
-    data = _read_json(path, None)
+    key = str(path)
+    sig = _stat_sig(path)
+    cached = _PARSED_CACHE.get(key)
+    if sig is not None and cached and cached[0] == sig:
+        return cached[1]
+
+    data = _read_json(path, None) if sig is not None else None
     if not isinstance(data, dict) or not isinstance(data.get("catalog"), dict):
+        _PARSED_CACHE.pop(key, None)
         return {"catalog": _load_etalon_tree(), "timestamp": "", "stats": {}}
+    if len(_PARSED_CACHE) >= _PARSED_CACHE_MAX:
+        _PARSED_CACHE.clear()
+    _PARSED_CACHE[key] = (sig, data)
     return data
 
 
+def _parsed_data_file(data_dir: Path) -> Path:
+    """
+    parsed_data.json из текущего поколения (пайплайн публикует их атомарно, см. parsing/generations.py).
+    """
+    return generation_file(data_dir, "parsed_data.json")
+
+
 def _parsed_data_path_for_user(u: dict | None) -> Path:
     if not u or u.get("role") == "admin":
-        return DEFAULT_BASE_DIR / "parsed_data.json"
-    if u.get("role") == "paid_user" and u.get("sources_mode") in ("own", "custom"):
-        return user_data_dir(u["id"]) / "parsed_data.json"
-    return DEFAULT_BASE_DIR / "parsed_data.json"
+        return _parsed_data_file(DEFAULT_BASE_DIR)
+    # custom: навигация по базовому parsed_data.json, цены пользователя — через overlay
+    if u.get("role") == "paid_user" and u.get("sources_mode") == "own":
+        return _parsed_data_file(user_data_dir(u["id"]))
+    return _parsed_data_file(DEFAULT_BASE_DIR)
 
 
 def _sync_user_parsed_copy(base_path: Path, user_path: Path) -> None:
+    base_sig = _stat_sig(base_path)
+    if base_sig is None or _USER_COPY_SYNCED.get(str(user_path)) == base_sig:
+        return
     try:
-        if not base_path.exists():
-            return
         if not user_path.exists() or base_path.stat().st_mtime > user_path.stat().st_mtime:
             user_path.parent.mkdir(parents=True, exist_ok=True)
             shutil.copy2(base_path, user_path)
+        _USER_COPY_SYNCED[str(user_path)] = base_sig
     except Exception:
         return
 
 
-def _read_matched_items(path: Path) -> list[dict]:
-    try:
-        if not path.exists():
-            return []
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return []
-    if isinstance(raw, dict):
-        items = raw.get("items") or []
-        return [x for x in items if isinstance(x, dict)]
-    if isinstance(raw, list):
-        return [x for x in raw if isinstance(x, dict)]
-    return []
-
-
 def _regions_to_flags(regions: List[str]) -> str:
     out: List[str] = []
     for r in regions:
@@ -161,201 +174,55 @@ def _matched_path_for_user(u: dict | None) -> Path:
     return DEFAULT_BASE_DIR / "parsed_matched.json"
 
 
-def _build_region_index_from_items(items: list[dict]) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    idx: Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]] = {}
-    stripped_bucket: Dict[Tuple[Tuple[str, ...], str], List[Dict[str, Any]]] = {}
-
-    def _regions_for_min_price(item: dict, min_price: Optional[float]) -> List[str]:
-        out: List[str] = []
-        if min_price is None:
-            return out
-        prices = item.get("prices")
-        if isinstance(prices, list):
-            for p in prices:
-                if not isinstance(p, dict):
-                    continue
-                try:
-                    mp = float(str(p.get("price") or "").replace(" ", ""))
-                except Exception:
-                    mp = None
-                if mp is None or mp != min_price:
-                    continue
-                raw = (p.get("raw") or "").strip()
-                try:
-                    from handlers.normalizers.entry import extract_region
-                except Exception:
-                    extract_region = None
-                if extract_region:
-                    reg = (extract_region(raw) or "").strip().lower()
-                    if reg and reg not in out:
-                        out.append(reg)
-        if not out:
-            params = item.get("params") or {}
-            if isinstance(params, dict):
-                reg = (params.get("region") or "").strip().lower()
-                if reg:
-                    out.append(reg)
-        return out
-
-    for it in items:
-        if not isinstance(it, dict):
-            continue
-        path = it.get("path") or []
-        raw = (it.get("raw_parsed") or "").strip()
-        if not isinstance(path, list) or not path:
-            continue
-        if not raw:
-            continue
-        try:
-            mp = float(str(it.get("min_price") or "").replace(" ", ""))
-        except Exception:
-            mp = None
-        regions = _regions_for_min_price(it, mp)
-
-        raw_norm = _norm_key(raw)
-        if not raw_norm:
-            continue
-        info = {"price": mp, "region": regions}
-
-        key = (tuple(path), raw_norm)
-        ex = idx.get(key)
-        if ex is None:
-            idx[key] = info
-        else:
-            ex_mp = ex.get("price")
-            if ex_mp is None or (mp is not None and mp < ex_mp):
-                idx[key] = info
-            elif mp is not None and ex_mp is not None and mp == ex_mp:
-                ex_regs = ex.get("region") or []
-                if not isinstance(ex_regs, list):
-                    ex_regs = [str(ex_regs)]
-                for r in regions:
-                    if r not in ex_regs:
-                        ex_regs.append(r)
-                ex["region"] = ex_regs
-
-        raw_stripped = _strip_ram(raw_norm)
-        if raw_stripped != raw_norm:
-            stripped_bucket.setdefault((tuple(path), raw_stripped), []).append(info)
-
-    for key, bucket in stripped_bucket.items():
-        if key in idx:
-            continue
-        if len(bucket) == 1:
-            idx[key] = bucket[0]
-
-    return idx
-
-
-def _build_region_index(matched_path: Path) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    try:
-        mtime = matched_path.stat().st_mtime
-    except Exception:
-        return {}
-
-    cache_key = str(matched_path)
-    cached = _REGION_INDEX_CACHE.get(cache_key)
-    if cached and cached[0] == mtime:
-        return cached[1]
-
-    items = _read_matched_items(matched_path)
-    idx = _build_region_index_from_items(items)
-    _REGION_INDEX_CACHE[cache_key] = (mtime, idx)
-    return idx
-
-
 def _get_region_index_for_user(u: dict | None) -> Dict[Tuple[Tuple[str, ...], str], Dict[str, Any]]:
-    base_path = DEFAULT_BASE_DIR / "parsed_matched.json"
+    """
+    region_index.json пишет пайплайн (results.write_region_index); тут только читаем (с кэшем по версии).
+    """
     if not u or u.get("role") == "admin":
-        return _build_region_index(base_path)
+        return load_region_index(DEFAULT_BASE_DIR)
 
     if u.get("role") == "paid_user":
         mode = (u.get("sources_mode") or "default").strip().lower()
-        user_path = user_data_dir(u["id"]) / "parsed_matched.json"
+        user_dir = user_data_dir(u["id"])
         if mode == "own":
-            return _build_region_index(user_path)
+            return load_region_index(user_dir)
         if mode == "custom":
-            base_items = _read_matched_items(base_path)
-            user_items = _read_matched_items(user_path)
-            return _build_region_index_from_items(base_items + user_items)
-        return _build_region_index(base_path)
+            return merge_region_indexes(load_region_index(DEFAULT_BASE_DIR), load_region_index(user_dir))
+        return load_region_index(DEFAULT_BASE_DIR)
 
-    return _build_region_index(base_path)
+    return load_region_index(DEFAULT_BASE_DIR)
 
 
-def _ensure_custom_merge(u: dict) -> Path | None:
-    try:
-        from handlers.parsing.context import set_parsing_data_dir, user_data_dir, DEFAULT_BASE_DIR
-        from handlers.parsing import results as results_mod
-    except Exception:
+def _get_price_overlay_for_user(u: dict | None) -> Optional[PriceOverlay]:
+    """
+    custom: цены base + user считаются при чтении (overlay), без склейки файлов и пересборки.
+    """
+    if not u or u.get("role") != "paid_user":
         return None
-
-    user_dir = user_data_dir(u["id"])
-    user_parsed = user_dir / "parsed_data.json"
-    user_matched = user_dir / "parsed_matched.json"
-    base_matched = DEFAULT_BASE_DIR / "parsed_matched.json"
-
-    if not base_matched.exists():
-        return user_parsed if user_parsed.exists() else None
-
-    need_merge = False
-    if not user_parsed.exists():
-        need_merge = True
-    else:
-        try:
-            user_parsed_m = user_parsed.stat().st_mtime
-            if base_matched.stat().st_mtime > user_parsed_m:
-                need_merge = True
-            if user_matched.exists() and user_matched.stat().st_mtime > user_parsed_m:
-                need_merge = True
-        except Exception:
-            need_merge = True
-
-    if not need_merge:
-        return user_parsed
-
-    merged_items = _read_matched_items(base_matched) + _read_matched_items(user_matched)
-    try:
-        user_dir.mkdir(parents=True, exist_ok=True)
-        user_matched.write_text(
-            json.dumps({"items": merged_items, "items_count": len(merged_items)}, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
-    except Exception:
-        return user_parsed if user_parsed.exists() else None
-
-    try:
-        set_parsing_data_dir(user_dir)
-        results_mod.rebuild_parsed_data_all()
-    except Exception:
-        pass
-    finally:
-        try:
-            set_parsing_data_dir(DEFAULT_BASE_DIR)
-        except Exception:
-            pass
-
-    return user_parsed if user_parsed.exists() else None
+    if (u.get("sources_mode") or "default") != "custom":
+        return None
+    return overlay_for_paths(
+        _parsed_data_file(DEFAULT_BASE_DIR),
+        _parsed_data_file(user_data_dir(u["id"])),
+    )
 
 
 def _get_data_for_user(u: dict | None) -> Dict[str, Any]:
     if not u or u.get("role") == "admin":
-        return _ensure_parsed_data(DEFAULT_BASE_DIR / "parsed_data.json")
+        return _ensure_parsed_data(_parsed_data_file(DEFAULT_BASE_DIR))
     if u.get("role") == "paid_user":
         mode = u.get("sources_mode", "default")
-        base_path = DEFAULT_BASE_DIR / "parsed_data.json"
-        user_path = user_data_dir(u["id"]) / "parsed_data.json"
+        base_path = _parsed_data_file(DEFAULT_BASE_DIR)
+        user_path = _parsed_data_file(user_data_dir(u["id"]))
         if mode == "default":
-            _sync_user_parsed_copy(base_path, user_path)
+            _sync_user_parsed_copy(base_path, user_data_dir(u["id"]) / "parsed_data.json")
             return _ensure_parsed_data(base_path)
         if mode == "custom":
-            merged_path = _ensure_custom_merge(u)
-            if merged_path:
-                return _ensure_parsed_data(merged_path)
+            # структура — базовая, цены пользователя подмешиваются overlay'ем при рендере
             return _ensure_parsed_data(base_path)
         # own
         return _ensure_parsed_data(user_path)
-    return _ensure_parsed_data(DEFAULT_BASE_DIR / "parsed_data.json")
+    return _ensure_parsed_data(_parsed_data_file(DEFAULT_BASE_DIR))
 
 def _get_catalog_root(data: Dict[str, Any]) -> Dict[str, Any]:
     cat = data.get("catalog")
@@ -519,19 +386,8 @@ def _render_variant_line(
                 else:
                     reg = _regions_to_flags([str(reg_val)])
         if not reg and region_index is not None and model_path:
-            best_price = None
-            best_regions: List[str] = []
-            for (mpath, _raw_key), info2 in region_index.items():
-                if tuple(mpath) != tuple(model_path):
-                    continue
-                if not isinstance(info2, dict):
-                    continue
-                reg2 = info2.get("region") or []
-                price2 = info2.get("price")
-                if reg2:
-                    if best_price is None or (price2 is not None and price2 < best_price):
-                        best_price = price2
-                        best_regions = reg2 if isinstance(reg2, list) else [str(reg2)]
+            # регионы самой дешёвой позиции модели — предпосчитаны в region_index.json
+            best_regions = region_index.model_regions(model_path) if hasattr(region_index, "model_regions") else []
             if best_regions:
                 reg = _regions_to_flags(best_regions)
         if not reg:
@@ -649,6 +505,91 @@ def _render_model_message(
     return txt
 
 
+# ---------------------------------------------------------------------
+# Page cache: готовые сообщения моделей на версию данных
+# ---------------------------------------------------------------------
+# view -> {"slot", "branches": {ветка: [(путь модели, варианты)]}, "texts": {путь модели: текст}}
+# view = (файл parsed_data поколения, его (mtime, size), версия region_index, версия overlay):
+# сообщения зависят только от них, поэтому ветка рендерится один раз на всех пользователей
+# с тем же представлением цен. Новое поколение = новый файл -> старые view этого data_dir сбрасываются.
+_PAGE_CACHE: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+_PAGE_VIEWS_MAX = 64
+_PAGE_TEXTS_MAX = 5000
+
+
+def _page_view(
+    parsed_path: Path,
+    region_index: Any,
+    overlay: Optional[PriceOverlay],
+) -> Optional[Dict[str, Any]]:
+    """
+    Кэш страниц для (поколение parsed_data, представление цен пользователя).
+    None — версию данных не определить (индекс регионов без версии): рендерим без кэша.
+    """
+    key = str(parsed_path)
+    cached = _PARSED_CACHE.get(key)
+    sig = cached[0] if cached else None  # None — fallback на эталон (он не меняется)
+    rver = getattr(region_index, "version", "") or ""
+    if not rver and region_index:
+        return None
+    over = overlay.version if overlay is not None else ""
+
+    view_key = (key, sig, rver, over)
+    view = _PAGE_CACHE.get(view_key)
+    if view is not None:
+        return view
+
+    p = Path(parsed_path)
+    slot = str(p.parent.parent if is_generation_path(p) else p.parent)
+    # прошлые поколения (или старая версия файла) того же data_dir больше не понадобятся
+    for k in [k for k, v in _PAGE_CACHE.items() if v["slot"] == slot and k[:2] != view_key[:2]]:
+        _PAGE_CACHE.pop(k, None)
+    if len(_PAGE_CACHE) >= _PAGE_VIEWS_MAX:
+        _PAGE_CACHE.clear()
+    view = {"slot": slot, "branches": {}, "texts": {}}
+    _PAGE_CACHE[view_key] = view
+    return view
+
+
+def _branch_models_cached(
+    view: Optional[Dict[str, Any]],
+    subtree: Any,
+    branch_path: List[str],
+) -> List[Tuple[List[str], Dict[str, Any]]]:
+    if view is None:
+        return _collect_models_in_subtree(subtree, base_path=branch_path)
+    key = tuple(branch_path)
+    models = view["branches"].get(key)
+    if models is None:
+        models = _collect_models_in_subtree(subtree, base_path=branch_path)
+        view["branches"][key] = models
+    return models
+
+
+def _model_message_cached(
+    view: Optional[Dict[str, Any]],
+    path_to_model: List[str],
+    variants: Any,
+    *,
+    region_index: Any,
+    overlay: Optional[PriceOverlay],
+) -> str:
+    key = tuple(path_to_model)
+    if view is not None:
+        txt = view["texts"].get(key)
+        if txt is not None:
+            return txt
+    if overlay is not None:
+        variants = overlay.model_variants(path_to_model, variants)
+    txt = _render_model_message(path_to_model, variants, region_index=region_index)
+    if view is not None:
+        texts = view["texts"]
+        if len(texts) >= _PAGE_TEXTS_MAX:
+            texts.clear()
+        texts[key] = txt
+    return txt
+
+
 # ---------------------------------------------------------------------
 # Keyboards
 # ---------------------------------------------------------------------
@@ -820,7 +761,8 @@ async def cb_go(callback: CallbackQuery):
     path = _cache_get(token)
 
     u = await auth_get(callback.from_user.id)
-    data = _ensure_parsed_data(_parsed_data_path_for_user(u))
+    parsed_path = _parsed_data_path_for_user(u)
+    data = _ensure_parsed_data(parsed_path)
     region_index = _get_region_index_for_user(u)
     root = _get_catalog_root(data)
 
@@ -833,8 +775,10 @@ async def cb_go(callback: CallbackQuery):
 
     # leaf -> варианты модели (как 1 модель)
     if _is_model_leaf(node):
+        overlay = _get_price_overlay_for_user(u)
+        view = _page_view(parsed_path, region_index, overlay)
         # leaf paging: обычно 1 страница, но оставим навигацию "vp:leaf" на всякий
-        msg = _render_model_message(path, node, region_index=region_index)
+        msg = _model_message_cached(view, path, node, region_index=region_index, overlay=overlay)
         await callback.message.edit_text(msg, reply_markup=_kb_leaf(path, page=0, has_prev=False, has_next=False))
         await callback.answer()
         return
@@ -869,8 +813,11 @@ async def cb_all_prices(callback: CallbackQuery):
     branch_path = _cache_get(token)
 
     u = await auth_get(callback.from_user.id)
-    data = _ensure_parsed_data(_parsed_data_path_for_user(u))
+    parsed_path = _parsed_data_path_for_user(u)
+    data = _ensure_parsed_data(parsed_path)
     region_index = _get_region_index_for_user(u)
+    overlay = _get_price_overlay_for_user(u)
+    view = _page_view(parsed_path, region_index, overlay)
     root = _get_catalog_root(data)
     subtree = _dig(root, branch_path)
 
@@ -888,8 +835,8 @@ async def cb_all_prices(callback: CallbackQuery):
         await callback.answer()
         return
 
-    # Собираем модели (в порядке JSON)
-    models = _collect_models_in_subtree(subtree, base_path=branch_path)
+    # Собираем модели (в порядке JSON) — один раз на ветку и версию данных
+    models = _branch_models_cached(view, subtree, branch_path)
 
     if not models:
         tok = _cache_put(branch_path)
@@ -912,8 +859,7 @@ async def cb_all_prices(callback: CallbackQuery):
         page = total_pages - 1
 
     model_path, variants = models[page]
-
-    msg = _render_model_message(model_path, variants, region_index=region_index)
+    msg = _model_message_cached(view, model_path, variants, region_index=region_index, overlay=overlay)
     await callback.message.edit_text(
         msg,
         reply_markup=_kb_all_prices(branch_path, page=page, total_pages=total_pages),
@@ -3,7 +3,6 @@ import signal
 import multiprocessing
 import uvicorn
 import asyncio
-import json
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -32,7 +31,8 @@ from handlers.catalog.crud import categories as cat_crud
 from handlers.catalog.crud import brands as brand_crud
 from handlers.catalog.crud import series as series_crud
 from handlers.catalog.crud import models as model_crud
-from handlers import accounts, sources, monitoring, view_prices, chat_request, paid_registration
+from handlers import accounts, sources, monitoring, view_prices, price_search, chat_request, paid_registration
+from handlers import codec, persist_utils
 from handlers.auto_replies import ui as auto_replies
 from handlers.auto_replies.listener import register_auto_replies
 from handlers.publishing import channel_manager_ui
@@ -100,8 +100,10 @@ def load_known_users() -> dict[int, dict]:
         return KNOWN_USERS
 
     try:
-        with USERS_FILE.open("r", encoding="utf-8") as f:
-            data = json.load(f)
+        # codec понимает и json, и старые файлы, записанные при ARTIFACT_CODEC=msgpack/zstd
+        data = codec.read_file(USERS_FILE, None)
+        if data is None:
+            raise ValueError("файл пуст или не разбирается")
 
         users: dict[int, dict] = {}
 
@@ -173,8 +175,7 @@ def remember_user(user: User) -> None:
     try:
         # Сохраняем как список словарей
         to_dump = sorted(KNOWN_USERS.values(), key=lambda x: x["id"])
-        with USERS_FILE.open("w", encoding="utf-8") as f:
-            json.dump(to_dump, f, ensure_ascii=False, indent=2)
+        persist_utils.write_json(USERS_FILE, to_dump)
 
         uname = f"@{user.username}" if user.username else ""
         name = (user.first_name or "") + ((" " + user.last_name) if user.last_name else "")
@@ -929,6 +930,7 @@ def run_bot():
         dp.include_router(monitoring.router)
         dp.include_router(parser.router)
         dp.include_router(view_prices.router)
+        dp.include_router(price_search.router)
         dp.include_router(cat_crud.router)
         dp.include_router(brand_crud.router)
         dp.include_router(series_crud.router)
@@ -986,6 +988,12 @@ def run_bot():
             except Exception:
                 pass
 
+            # ✅ дописываем отложенные JSON-файлы (auth, bot_users, каналы, кэш цен)
+            try:
+                await persist_utils.aflush()
+            except Exception:
+                pass
+
             print("🛑 Polling остановлен")
 
 
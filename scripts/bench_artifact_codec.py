@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark artifact codecs: size, encode and decode time per format.
+
+    python scripts/bench_artifact_codec.py [handlers/parsing/data/parsed_matched.json ...]
+
+Formats whose optional package (msgpack / zstandard) is missing are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from handlers import codec  # noqa: E402
+
+
+DEFAULT_FILES = [
+    ROOT / "handlers" / "parsing" / "data" / "parsed_matched.json",
+    ROOT / "handlers" / "parsing" / "data" / "parsed_data.json",
+]
+
+FORMATS = [
+    "json",
+    "json-compact",
+    "json-compact+gzip",
+    "json-compact+zstd",
+    "msgpack",
+    "msgpack+gzip",
+    "msgpack+zstd",
+]
+
+
+def _available(fmt: str) -> bool:
+    if "msgpack" in fmt and codec._msgpack() is None:
+        return False
+    if fmt.endswith("+zstd") and codec._zstd() is None:
+        return False
+    return True
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def bench_file(path: Path, repeat: int) -> None:
+    obj = codec.read_file(path)
+    if obj is None:
+        print(f"⚠️ {path}: не найден или не читается")
+        return
+
+    print(f"\n{path} ({path.stat().st_size / 1024:.0f} KiB на диске)")
+    print(f"{'format':<20}{'size KiB':>10}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+    base_size = None
+    for fmt in FORMATS:
+        if not _available(fmt):
+            print(f"{fmt:<20}{'—':>10}  (нет пакета)")
+            continue
+        data = codec.encode(obj, fmt)
+        if codec.decode(data) != obj:
+            print(f"{fmt:<20}  ❌ round-trip mismatch")
+            continue
+        enc = _best_ms(lambda: codec.encode(obj, fmt), repeat)
+        dec = _best_ms(lambda: codec.decode(data), repeat)
+        if base_size is None:
+            base_size = len(data)
+        ratio = len(data) / base_size if base_size else 0.0
+        print(f"{fmt:<20}{len(data) / 1024:>10.0f}{ratio:>8.2f}{enc:>12.1f}{dec:>12.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="Artifacts to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] or [p for p in DEFAULT_FILES if p.exists()]
+    if not files:
+        raise SystemExit("no artifacts found (pass file paths explicitly)")
+    for path in files:
+        bench_file(path, max(1, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
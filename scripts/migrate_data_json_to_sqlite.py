@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+One-time migration: data.json -> data.db (SQLite storage engine).
+
+After migration storage picks data.db automatically (STORAGE_ENGINE=auto);
+data.json is left untouched as a backup.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage_sqlite import SqliteStore  # noqa: E402
+
+
+DATA_FILE = Path("data.json")
+DB_FILE = Path("data.db")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_FILE), help="Source data.json")
+    parser.add_argument("--db", default=str(DB_FILE), help="Target SQLite file")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing data.db")
+    args = parser.parse_args()
+
+    data_path = Path(args.data)
+    db_path = Path(args.db)
+
+    if not data_path.exists():
+        raise SystemExit(f"{data_path} not found")
+    if db_path.exists() and not args.force:
+        raise SystemExit(f"{db_path} already exists (use --force to overwrite)")
+
+    data = json.loads(data_path.read_text(encoding="utf-8") or "{}")
+    if not isinstance(data, dict):
+        raise SystemExit("data.json root is not a dict")
+
+    for p in (db_path, db_path.with_name(db_path.name + "-wal"), db_path.with_name(db_path.name + "-shm")):
+        if p.exists():
+            p.unlink()
+
+    store = SqliteStore(db_path)
+    store.save_all(data)
+    rev, loaded = store.load_all()
+    store.close()
+
+    if loaded != data:
+        db_path.unlink()
+        raise SystemExit("verification failed: data.db differs from data.json")
+
+    print(f"OK: {data_path} -> {db_path} (keys={len(data)}, revision={rev})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,40 @@
 # storage.py
+# data.json с кэшем в памяти:
+#   - чтение обслуживается из памяти, актуальность проверяется одним stat() (mtime_ns + size);
+#   - load_data()  -> приватная изменяемая копия (старый контракт: загрузил / поменял / save_data);
+#   - read_data()  -> общий read-only снимок без копирования (для меню, листенера, сборки цен);
+#   - save_data()  -> единственный писатель: атомарная запись (tmp + replace) и обновление кэша.
+#
+# Движок: STORAGE_ENGINE=json | sqlite | auto (по умолчанию auto — sqlite, если есть data.db).
+# SQLite (storage_sqlite.py, WAL) пишет только изменённые строки; data.json -> data.db
+# переносится один раз скриптом scripts/migrate_data_json_to_sqlite.py.
+# Точечные правки (update_key / set_node / delete_node / move_node / append_monitoring_history)
+# разбирают и обновляют в кэше только затронутый ключ верхнего уровня (остальные снимки не трогаются);
+# на SQLite пишут O(1) строк, на json файл по-прежнему перезаписывается целиком.
+import hashlib
 import json
+import os
+import pickle
+import threading
 from pathlib import Path
 
 DATA_FILE = Path("data.json")
+DB_FILE = Path("data.db")
 
-def load_data():
-    if DATA_FILE.exists():
-        try:
-            content = DATA_FILE.read_text(encoding="utf-8").strip()
-            if content:
-                return json.loads(content)
-        except json.JSONDecodeError:
-            print("⚠️ data.json поврежден, пересоздаю...")
-    # если файл пустой или битый
+STORAGE_ENGINE = (os.getenv("STORAGE_ENGINE") or "auto").strip().lower()
+
+_LOCK = threading.RLock()
+
+# кэш одного источника: путь, версия (stat / revision), pickle-снимки по ключам верхнего уровня
+# (для копий) и read-only вид. blobs и view не меняются на месте — правка подставляет новые объекты.
+# digests — отпечатки содержимого ключей (key_build_id), считаются лениво и сбрасываются вместе с ключом.
+_CACHE = {"path": None, "sig": None, "blobs": None, "view": None, "digests": {}}
+
+# str(DB_FILE) -> SqliteStore
+_STORES = {}
+
+
+def _default_data():
     return {
         "catalog": {},
         "etalon": {},
@@ -22,8 +44,303 @@ def load_data():
         "prices": {}
     }
 
+
+class ReadOnlyError(TypeError):
+    pass
+
+
+def _read_only(*_a, **_kw):
+    raise ReadOnlyError("read_data() вернул read-only снимок — для изменений используйте load_data()")
+
+
+class FrozenDict(dict):
+    """dict, который нельзя изменить (isinstance(x, dict) у читателей продолжает работать)."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    setdefault = pop = popitem = clear = update = _read_only
+
+    def __reduce__(self):
+        # copy / deepcopy / pickle дают обычный изменяемый dict
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(_freeze(v) for v in obj)
+    return obj
+
+
+def _stat_sig(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (int(st.st_mtime_ns), int(st.st_size))
+
+
+def _parse_file(path: Path):
+    if path.exists():
+        try:
+            content = path.read_text(encoding="utf-8").strip()
+            if content:
+                return json.loads(content)
+        except json.JSONDecodeError:
+            print("⚠️ data.json поврежден, пересоздаю...")
+    # если файл пустой или битый
+    return _default_data()
+
+
+def _put_cache(path: Path, sig, data) -> None:
+    _CACHE["path"] = str(path)
+    _CACHE["sig"] = sig
+    _CACHE["blobs"] = {k: pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL) for k, v in data.items()}
+    _CACHE["view"] = _freeze(data)
+    _CACHE["digests"] = {}
+
+
+def _patch_cache(sig, part, keys) -> None:
+    """
+    Подменить в кэше только ключи keys значениями из part (нет в part — ключ удалён).
+    Порядок ключей сохраняется, новые — в конец (как у dict).
+    """
+    blobs = dict(_CACHE["blobs"])
+    view = dict(_CACHE["view"])
+    digests = dict(_CACHE.get("digests") or {})
+    for k in keys:
+        if k in part:
+            blobs[k] = pickle.dumps(part[k], protocol=pickle.HIGHEST_PROTOCOL)
+            view[k] = _freeze(part[k])
+        else:
+            blobs.pop(k, None)
+            view.pop(k, None)
+        digests.pop(k, None)
+    _CACHE["sig"] = sig
+    _CACHE["digests"] = digests
+    _CACHE["blobs"] = blobs
+    _CACHE["view"] = FrozenDict(view)
+
+
+def _sqlite_store():
+    """
+    SqliteStore, если активен движок sqlite (иначе None — работаем с data.json).
+    """
+    if STORAGE_ENGINE == "json":
+        return None
+    if STORAGE_ENGINE != "sqlite" and not DB_FILE.exists():
+        return None
+    store = _STORES.get(str(DB_FILE))
+    if store is None:
+        from storage_sqlite import SqliteStore
+        store = SqliteStore(DB_FILE)
+        _STORES[str(DB_FILE)] = store
+    return store
+
+
+def _refresh_locked() -> None:
+    store = _sqlite_store()
+    if store is not None:
+        path, sig = DB_FILE, ("sqlite", store.revision())
+        if _CACHE["blobs"] is not None and _CACHE["path"] == str(path) and _CACHE["sig"] == sig:
+            return
+        rev, data = store.load_all()
+        _put_cache(path, ("sqlite", rev), data)
+        return
+
+    path = DATA_FILE
+    sig = _stat_sig(path)
+    if _CACHE["blobs"] is not None and _CACHE["path"] == str(path) and _CACHE["sig"] == sig and sig is not None:
+        return
+    _put_cache(path, sig, _parse_file(path))
+
+
+def load_data():
+    """
+    Изменяемая копия data.json (из кэша, без повторного парсинга файла).
+    """
+    with _LOCK:
+        _refresh_locked()
+        blobs = _CACHE["blobs"]
+    return {k: pickle.loads(b) for k, b in blobs.items()}
+
+
+def read_data():
+    """
+    Общий read-only снимок data.json. Менять нельзя (ReadOnlyError) — только читать.
+    """
+    with _LOCK:
+        _refresh_locked()
+        return _CACHE["view"]
+
+
+def _write_file_locked(data):
+    """Атомарная запись data.json; возвращает новый stat-sig файла."""
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    path = DATA_FILE
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+    return _stat_sig(path)
+
+
+def _write_json_locked(data) -> None:
+    sig = _write_file_locked(data)
+    # вызывающий может продолжать менять свой dict: pickle-снимки и _freeze копируют контейнеры
+    _put_cache(DATA_FILE, sig, data)
+
+
 def save_data(data):
-    DATA_FILE.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    with _LOCK:
+        store = _sqlite_store()
+        if store is None:
+            _write_json_locked(data)
+            return
+        rev = store.save_all(data)
+        _put_cache(DB_FILE, ("sqlite", rev), data)
+
+
+def data_build_id() -> str:
+    """
+    Версия данных (каталог/эталон могли измениться, если она другая).
+    """
+    store = _sqlite_store()
+    if store is not None:
+        return f"sqlite:{store.revision()}"
+    sig = _stat_sig(DATA_FILE)
+    return f"{sig[0]}:{sig[1]}" if sig else "0:0"
+
+
+def key_build_id(*keys) -> str:
+    """
+    Версия только ключей верхнего уровня keys (например "etalon", "catalog"): отпечаток их содержимого.
+    В отличие от data_build_id() не меняется от записей в другие ключи (monitoring, auto_replies_*, ...)
+    и одинакова в разных процессах и движках.
+    """
+    with _LOCK:
+        _refresh_locked()
+        view = _CACHE["view"]
+        digests = _CACHE.setdefault("digests", {})
+        parts = []
+        for k in keys:
+            d = digests.get(k)
+            if d is None:
+                raw = json.dumps(view.get(k), ensure_ascii=False, separators=(",", ":"), default=str)
+                d = hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest()
+                digests[k] = d
+            parts.append(d)
+    return "k:" + ":".join(parts)
+
+
+# ---------- точечные правки ----------
+
+def _mutate(keys, apply_fn, fast_fn=None):
+    """
+    apply_fn(part) меняет копию только ключей верхнего уровня keys (part — dict из них);
+    в кэше подменяются только они, остальной снимок не разбирается и не копируется.
+    fast_fn(store) — та же правка строками SQLite (False -> полный diff-save).
+    """
+    with _LOCK:
+        _refresh_locked()
+        blobs = _CACHE["blobs"]
+        part = {k: pickle.loads(blobs[k]) for k in keys if k in blobs}
+        result = apply_fn(part)
+        store = _sqlite_store()
+        if store is None:
+            _patch_cache(_CACHE["sig"], part, keys)
+            # файл пишем из read-only вида: FrozenDict/FrozenList — обычные dict/list для json
+            sig = _write_file_locked(_CACHE["view"])
+            _CACHE["sig"] = sig
+            return result
+        if fast_fn is not None:
+            from storage_sqlite import run_fast
+            done = run_fast(fast_fn, store)
+        else:
+            done = False
+        if done:
+            _patch_cache(("sqlite", store.revision()), part, keys)
+        else:
+            _patch_cache(_CACHE["sig"], part, keys)
+            _CACHE["sig"] = ("sqlite", store.save_all(_CACHE["view"]))
+        return result
+
+
+def _tree_parent(data, tree, path, create):
+    node = data.setdefault(tree, {}) if create else data.get(tree)
+    for key in path[:-1]:
+        if not isinstance(node, dict):
+            return None
+        node = node.setdefault(key, {}) if create else node.get(key)
+    return node if isinstance(node, dict) else None
+
+
+def update_key(key, value):
+    """data[key] = value для ключа верхнего уровня (monitoring, auto_replies_*, ...)."""
+    def apply(part):
+        part[key] = value
+    _mutate([key], apply, lambda store: store.set_setting(key, value))
+
+
+def set_node(tree, path, value):
+    """data[tree][path...] = value (промежуточные узлы создаются)."""
+    path = [str(p) for p in path]
+
+    def apply(data):
+        parent = _tree_parent(data, tree, path, create=True)
+        if parent is None:
+            raise TypeError(f"{tree}/{'/'.join(path)}: родитель не является узлом")
+        parent[path[-1]] = value
+
+    _mutate([tree], apply, lambda store: store.set_node(tree, path, value))
+
+
+def delete_node(tree, path):
+    path = [str(p) for p in path]
+
+    def apply(data):
+        parent = _tree_parent(data, tree, path, create=False)
+        if parent is not None:
+            parent.pop(path[-1], None)
+
+    _mutate([tree], apply, lambda store: store.delete_node(tree, path))
+
+
+def move_node(tree, path, delta):
+    """Сдвиг узла среди соседей на delta позиций (сортировка ⬆️/⬇️ в меню каталога)."""
+    path = [str(p) for p in path]
+
+    def apply(data):
+        parent = _tree_parent(data, tree, path, create=False)
+        if parent is None or path[-1] not in parent:
+            return
+        keys = list(parent.keys())
+        i = keys.index(path[-1])
+        j = i + int(delta)
+        if j < 0 or j >= len(keys) or j == i:
+            return
+        keys[i], keys[j] = keys[j], keys[i]
+        items = {k: parent[k] for k in keys}
+        parent.clear()
+        parent.update(items)
+
+    _mutate([tree], apply, lambda store: store.move_node(tree, path, delta))
+
+
+def append_monitoring_history(entry, keep=None):
+    def apply(data):
+        mon = data.setdefault("monitoring", {})
+        hist = mon.setdefault("history", [])
+        hist.append(entry)
+        if keep is not None:
+            mon["history"] = hist[-keep:] if keep > 0 else []
+
+    _mutate(["monitoring"], apply, lambda store: store.append_history(entry, keep))
@@ -0,0 +1,466 @@
+# storage_sqlite.py
+# SQLite (WAL) движок для storage.load_data / save_data.
+#
+# Таблицы:
+#   settings(key, pos, kind, value)            — ключи верхнего уровня data.json (kind: json | tree | monitoring)
+#   tree_nodes(tree, path, parent, name, pos, kind, value)
+#                                              — деревья catalog / etalon, по строке на узел
+#   tree_lines(tree, path, pos, line)          — строки эталона (списки в листьях дерева)
+#   monitoring_history(id, entry)              — история мониторинга, по строке на запись
+#   meta(key, value)                           — revision: растёт на каждую запись (версия для кэшей)
+#
+# save_data(db) пишет только разницу с последним снимком (O(изменений) строк),
+# точечные операции (move/set/delete узла, ключ верхнего уровня, запись истории) — O(1) строк.
+# WAL: читатели не блокируют писателя и наоборот.
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SEP = "\x1f"  # разделитель пути узла (в названиях каталога не встречается)
+
+TREE_KEYS = ("catalog", "etalon")
+MONITORING_KEY = "monitoring"
+HISTORY_KEY = "history"
+
+NodeRow = Tuple[str, str, int, str, Optional[str]]  # parent, name, pos, kind, value
+TreeFlat = Tuple[Dict[str, NodeRow], Dict[str, List[str]]]  # nodes, lines
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key   TEXT PRIMARY KEY,
+    pos   INTEGER NOT NULL,
+    kind  TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tree_nodes (
+    tree   TEXT NOT NULL,
+    path   TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    name   TEXT NOT NULL,
+    pos    INTEGER NOT NULL,
+    kind   TEXT NOT NULL,
+    value  TEXT,
+    PRIMARY KEY (tree, path)
+);
+CREATE INDEX IF NOT EXISTS tree_nodes_parent ON tree_nodes (tree, parent, pos);
+CREATE TABLE IF NOT EXISTS tree_lines (
+    tree TEXT NOT NULL,
+    path TEXT NOT NULL,
+    pos  INTEGER NOT NULL,
+    line TEXT NOT NULL,
+    PRIMARY KEY (tree, path, pos)
+);
+CREATE TABLE IF NOT EXISTS monitoring_history (
+    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+
+
+def path_key(path) -> str:
+    return SEP.join(str(p) for p in path)
+
+
+def _flatten_into(nodes: Dict[str, NodeRow], lines: Dict[str, List[str]], value: Any, path: List[str], pos: int) -> None:
+    key = path_key(path)
+    parent = path_key(path[:-1])
+    name = str(path[-1])
+    if isinstance(value, dict):
+        nodes[key] = (parent, name, pos, "node", None)
+        for i, (k, v) in enumerate(value.items()):
+            _flatten_into(nodes, lines, v, path + [str(k)], i)
+    elif isinstance(value, list):
+        nodes[key] = (parent, name, pos, "lines", None)
+        lines[key] = [_dumps(x) for x in value]
+    else:
+        nodes[key] = (parent, name, pos, "value", _dumps(value))
+
+
+def flatten_tree(tree: Dict[str, Any]) -> TreeFlat:
+    nodes: Dict[str, NodeRow] = {}
+    lines: Dict[str, List[str]] = {}
+    for i, (k, v) in enumerate((tree or {}).items()):
+        _flatten_into(nodes, lines, v, [str(k)], i)
+    return nodes, lines
+
+
+def build_tree(nodes: Dict[str, NodeRow], lines: Dict[str, List[str]]) -> Dict[str, Any]:
+    children: Dict[str, List[Tuple[int, str, str, str, Optional[str]]]] = {}
+    for path, (parent, name, pos, kind, value) in nodes.items():
+        children.setdefault(parent, []).append((pos, name, path, kind, value))
+
+    def build(parent: str) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for pos, name, path, kind, value in sorted(children.get(parent, ()), key=lambda r: (r[0], r[1])):
+            if kind == "node":
+                out[name] = build(path)
+            elif kind == "lines":
+                out[name] = [json.loads(x) for x in lines.get(path, ())]
+            else:
+                out[name] = json.loads(value) if value is not None else None
+        return out
+
+    return build("")
+
+
+def flatten_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    data.json -> {"settings": {key: (pos, kind, value)}, "trees": {key: TreeFlat}, "history": [entry_json]}
+    """
+    settings: Dict[str, Tuple[int, str, Optional[str]]] = {}
+    trees: Dict[str, TreeFlat] = {}
+    history: List[str] = []
+    for pos, (key, v) in enumerate((data or {}).items()):
+        key = str(key)
+        if key in TREE_KEYS and isinstance(v, dict):
+            settings[key] = (pos, "tree", None)
+            trees[key] = flatten_tree(v)
+        elif key == MONITORING_KEY and isinstance(v, dict) and isinstance(v.get(HISTORY_KEY), list):
+            # history хранится отдельной таблицей, в settings — место ключа
+            settings[key] = (pos, "monitoring", _dumps({**v, HISTORY_KEY: None}))
+            history = [_dumps(e) for e in v[HISTORY_KEY]]
+        else:
+            settings[key] = (pos, "json", _dumps(v))
+    return {"settings": settings, "trees": trees, "history": history}
+
+
+class SqliteStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        # последний снимок БД (как flatten_data + rev и id записей истории) — база для diff в save_all
+        self._snap: Optional[Dict[str, Any]] = None
+
+    # ---------- соединение / транзакции ----------
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('revision', 1) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def revision(self) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._snap = None
+
+    # ---------- чтение целиком ----------
+    def load_all(self) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")  # один согласованный снимок WAL на все таблицы
+            try:
+                rev_row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+                settings_rows = conn.execute("SELECT key, pos, kind, value FROM settings ORDER BY pos").fetchall()
+                node_rows = conn.execute("SELECT tree, path, parent, name, pos, kind, value FROM tree_nodes").fetchall()
+                line_rows = conn.execute("SELECT tree, path, line FROM tree_lines ORDER BY tree, path, pos").fetchall()
+                hist_rows = conn.execute("SELECT id, entry FROM monitoring_history ORDER BY id").fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+            rev = int(rev_row[0]) if rev_row else 0
+            trees: Dict[str, TreeFlat] = {}
+            for tree, path, parent, name, pos, kind, value in node_rows:
+                trees.setdefault(tree, ({}, {}))[0][path] = (parent, name, int(pos), kind, value)
+            for tree, path, line in line_rows:
+                trees.setdefault(tree, ({}, {}))[1].setdefault(path, []).append(line)
+
+            data: Dict[str, Any] = {}
+            settings: Dict[str, Tuple[int, str, Optional[str]]] = {}
+            for key, pos, kind, value in settings_rows:
+                settings[key] = (int(pos), kind, value)
+                if kind == "tree":
+                    nodes, lines = trees.get(key) or ({}, {})
+                    data[key] = build_tree(nodes, lines)
+                elif kind == "monitoring":
+                    mon = json.loads(value) if value else {}
+                    mon = mon if isinstance(mon, dict) else {}
+                    mon[HISTORY_KEY] = [json.loads(e) for _id, e in hist_rows]
+                    data[key] = mon
+                else:
+                    data[key] = json.loads(value) if value is not None else None
+
+            self._snap = {
+                "rev": rev,
+                "settings": settings,
+                "trees": {k: v for k, v in trees.items() if settings.get(k, (0, ""))[1] == "tree"},
+                "history_ids": [int(i) for i, _e in hist_rows],
+                "history": [e for _i, e in hist_rows],
+            }
+            return rev, data
+
+    def _fresh_snapshot(self) -> Dict[str, Any]:
+        if self._snap is None or self._snap["rev"] != self.revision():
+            self.load_all()
+        return self._snap
+
+    # ---------- запись целиком (diff со снимком) ----------
+    def save_all(self, data: Dict[str, Any]) -> int:
+        with self._lock:
+            old = self._fresh_snapshot()
+            new = flatten_data(data)
+            with self._tx() as conn:
+                self._diff_settings(conn, old["settings"], new["settings"])
+                for tree in set(old["trees"]) | set(new["trees"]):
+                    self._diff_tree(conn, tree, old["trees"].get(tree), new["trees"].get(tree))
+                self._diff_history(conn, old["history_ids"], old["history"], new["history"])
+            self._snap = None
+            return self.revision()
+
+    @staticmethod
+    def _diff_settings(conn, old: Dict[str, tuple], new: Dict[str, tuple]) -> None:
+        gone = [(k,) for k in old if k not in new]
+        if gone:
+            conn.executemany("DELETE FROM settings WHERE key = ?", gone)
+        changed = [(k, pos, kind, value) for k, (pos, kind, value) in new.items() if old.get(k) != (pos, kind, value)]
+        if changed:
+            conn.executemany(
+                "INSERT INTO settings (key, pos, kind, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET pos = excluded.pos, kind = excluded.kind, value = excluded.value",
+                changed,
+            )
+
+    @staticmethod
+    def _diff_tree(conn, tree: str, old: Optional[TreeFlat], new: Optional[TreeFlat]) -> None:
+        old_nodes, old_lines = old or ({}, {})
+        new_nodes, new_lines = new or ({}, {})
+
+        gone = [(tree, p) for p in old_nodes if p not in new_nodes]
+        if gone:
+            conn.executemany("DELETE FROM tree_nodes WHERE tree = ? AND path = ?", gone)
+        changed = [(tree, p) + row for p, row in new_nodes.items() if old_nodes.get(p) != row]
+        if changed:
+            conn.executemany(
+                "INSERT INTO tree_nodes (tree, path, parent, name, pos, kind, value) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(tree, path) DO UPDATE SET parent = excluded.parent, name = excluded.name, "
+                "pos = excluded.pos, kind = excluded.kind, value = excluded.value",
+                changed,
+            )
+
+        for p in set(old_lines) | set(new_lines):
+            if old_lines.get(p) == new_lines.get(p):
+                continue
+            conn.execute("DELETE FROM tree_lines WHERE tree = ? AND path = ?", (tree, p))
+            rows = [(tree, p, i, ln) for i, ln in enumerate(new_lines.get(p) or ())]
+            if rows:
+                conn.executemany("INSERT INTO tree_lines (tree, path, pos, line) VALUES (?, ?, ?, ?)", rows)
+
+    @staticmethod
+    def _diff_history(conn, old_ids: List[int], old: List[str], new: List[str]) -> None:
+        if old == new:
+            return
+        # типичный случай: дописали в конец и/или срезали голову (history[-20:])
+        for drop in range(len(old) + 1):
+            keep = old[drop:]
+            if new[: len(keep)] == keep:
+                if drop:
+                    conn.executemany("DELETE FROM monitoring_history WHERE id = ?", [(i,) for i in old_ids[:drop]])
+                tail = new[len(keep):]
+                if tail:
+                    conn.executemany("INSERT INTO monitoring_history (entry) VALUES (?)", [(e,) for e in tail])
+                return
+
+    # ---------- точечные операции ----------
+    @staticmethod
+    def _subtree_where() -> str:
+        return "tree = ? AND (path = ? OR substr(path, 1, ?) = ?)"
+
+    @staticmethod
+    def _subtree_args(tree: str, key: str) -> tuple:
+        return (tree, key, len(key) + 1, key + SEP)
+
+    def _is_tree_setting(self, conn, tree: str) -> bool:
+        row = conn.execute("SELECT kind FROM settings WHERE key = ?", (tree,)).fetchone()
+        return bool(row and row[0] == "tree")
+
+    def _node_kind(self, conn, tree: str, key: str) -> Optional[str]:
+        row = conn.execute("SELECT kind FROM tree_nodes WHERE tree = ? AND path = ?", (tree, key)).fetchone()
+        return row[0] if row else None
+
+    def _next_pos(self, conn, tree: str, parent: str) -> int:
+        row = conn.execute("SELECT MAX(pos) FROM tree_nodes WHERE tree = ? AND parent = ?", (tree, parent)).fetchone()
+        return (int(row[0]) + 1) if row and row[0] is not None else 0
+
+    def set_node(self, tree: str, path: List[str], value: Any) -> bool:
+        """
+        tree[path...] = value (промежуточные узлы создаются). False — нужен полный save_all.
+        """
+        path = [str(p) for p in path]
+        if not path:
+            return False
+        with self._tx() as conn:
+            if not self._is_tree_setting(conn, tree):
+                raise _Fallback()
+            for i in range(1, len(path)):
+                anc = path_key(path[:i])
+                kind = self._node_kind(conn, tree, anc)
+                if kind is None:
+                    parent = path_key(path[: i - 1])
+                    conn.execute(
+                        "INSERT INTO tree_nodes (tree, path, parent, name, pos, kind, value) VALUES (?, ?, ?, ?, ?, 'node', NULL)",
+                        (tree, anc, parent, path[i - 1], self._next_pos(conn, tree, parent)),
+                    )
+                elif kind != "node":
+                    raise _Fallback()
+
+            key = path_key(path)
+            row = conn.execute("SELECT pos FROM tree_nodes WHERE tree = ? AND path = ?", (tree, key)).fetchone()
+            pos = int(row[0]) if row else self._next_pos(conn, tree, path_key(path[:-1]))
+
+            args = self._subtree_args(tree, key)
+            conn.execute(f"DELETE FROM tree_nodes WHERE {self._subtree_where()}", args)
+            conn.execute(f"DELETE FROM tree_lines WHERE {self._subtree_where()}", args)
+
+            nodes: Dict[str, NodeRow] = {}
+            lines: Dict[str, List[str]] = {}
+            _flatten_into(nodes, lines, value, path, pos)
+            conn.executemany(
+                "INSERT INTO tree_nodes (tree, path, parent, name, pos, kind, value) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(tree, p) + r for p, r in nodes.items()],
+            )
+            conn.executemany(
+                "INSERT INTO tree_lines (tree, path, pos, line) VALUES (?, ?, ?, ?)",
+                [(tree, p, i, ln) for p, lst in lines.items() for i, ln in enumerate(lst)],
+            )
+        self._snap = None
+        return True
+
+    def delete_node(self, tree: str, path: List[str]) -> bool:
+        key = path_key(path)
+        with self._tx() as conn:
+            if not self._is_tree_setting(conn, tree):
+                raise _Fallback()
+            args = self._subtree_args(tree, key)
+            conn.execute(f"DELETE FROM tree_nodes WHERE {self._subtree_where()}", args)
+            conn.execute(f"DELETE FROM tree_lines WHERE {self._subtree_where()}", args)
+        self._snap = None
+        return True
+
+    def move_node(self, tree: str, path: List[str], delta: int) -> bool:
+        """
+        Сдвиг узла среди соседей: обмен pos двух строк.
+        """
+        key = path_key(path)
+        parent = path_key(list(path)[:-1])
+        with self._tx() as conn:
+            sibs = conn.execute(
+                "SELECT path, pos FROM tree_nodes WHERE tree = ? AND parent = ? ORDER BY pos, name",
+                (tree, parent),
+            ).fetchall()
+            idx = next((i for i, (p, _pos) in enumerate(sibs) if p == key), None)
+            if idx is None:
+                return True
+            j = idx + int(delta)
+            if j < 0 or j >= len(sibs) or j == idx:
+                return True
+            (p1, pos1), (p2, pos2) = sibs[idx], sibs[j]
+            if pos1 == pos2:
+                raise _Fallback()
+            conn.execute("UPDATE tree_nodes SET pos = ? WHERE tree = ? AND path = ?", (pos2, tree, p1))
+            conn.execute("UPDATE tree_nodes SET pos = ? WHERE tree = ? AND path = ?", (pos1, tree, p2))
+        self._snap = None
+        return True
+
+    def set_setting(self, key: str, value: Any) -> bool:
+        """
+        data[key] = value для ключа верхнего уровня, кроме деревьев: одна строка settings
+        (+ дельта истории, если это monitoring с history).
+        """
+        key = str(key)
+        with self._tx() as conn:
+            row = conn.execute("SELECT pos, kind FROM settings WHERE key = ?", (key,)).fetchone()
+            if (row and row[1] == "tree") or (key in TREE_KEYS and isinstance(value, dict)):
+                raise _Fallback()
+            if row:
+                pos = int(row[0])
+            else:
+                top = conn.execute("SELECT MAX(pos) FROM settings").fetchone()
+                pos = (int(top[0]) + 1) if top and top[0] is not None else 0
+
+            if key == MONITORING_KEY and isinstance(value, dict) and isinstance(value.get(HISTORY_KEY), list):
+                kind, stored = "monitoring", _dumps({**value, HISTORY_KEY: None})
+                hist = conn.execute("SELECT id, entry FROM monitoring_history ORDER BY id").fetchall()
+                self._diff_history(
+                    conn,
+                    [int(i) for i, _e in hist],
+                    [e for _i, e in hist],
+                    [_dumps(e) for e in value[HISTORY_KEY]],
+                )
+            else:
+                if row and row[1] == "monitoring":
+                    conn.execute("DELETE FROM monitoring_history")
+                kind, stored = "json", _dumps(value)
+            conn.execute(
+                "INSERT INTO settings (key, pos, kind, value) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET pos = excluded.pos, kind = excluded.kind, value = excluded.value",
+                (key, pos, kind, stored),
+            )
+        self._snap = None
+        return True
+
+    def append_history(self, entry: Any, keep: Optional[int] = None) -> bool:
+        with self._tx() as conn:
+            row = conn.execute("SELECT kind FROM settings WHERE key = ?", (MONITORING_KEY,)).fetchone()
+            if not row or row[0] != "monitoring":
+                raise _Fallback()
+            conn.execute("INSERT INTO monitoring_history (entry) VALUES (?)", (_dumps(entry),))
+            if keep is not None:
+                conn.execute(
+                    "DELETE FROM monitoring_history WHERE id NOT IN "
+                    "(SELECT id FROM monitoring_history ORDER BY id DESC LIMIT ?)",
+                    (max(0, int(keep)),),
+                )
+        self._snap = None
+        return True
+
+
+class _Fallback(Exception):
+    """Точечная операция неприменима к текущей раскладке — откат и полный save_all."""
+
+
+def run_fast(op, *args, **kwargs) -> bool:
+    try:
+        return bool(op(*args, **kwargs))
+    except _Fallback:
+        return False
@@ -1,7 +1,6 @@
 # telethon_manager.py
 import os
 import asyncio
-import json
 from pathlib import Path
 from telethon import TelegramClient
 
@@ -10,7 +9,6 @@ SESSIONS_DIR = Path("sessions")
 SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 
 SOURCES_FILE = Path("sources.json")
-PAID_AUTH_FILE = Path("data") / "auth_users.json"
 
 # --- Тонкая настройка (через ENV) ---
 # Сколько диалогов подгружать при вынужденном прогреве (когда numeric id не резолвится)
@@ -299,13 +297,9 @@ def get_all_clients() -> dict[str, TelegramClient]:
 
 
 def _load_paid_account(user_id: int) -> dict | None:
-    if not PAID_AUTH_FILE.exists():
-        return None
-    try:
-        data = json.loads(PAID_AUTH_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-    u = (data.get("users") or {}).get(str(int(user_id))) or {}
+    from handlers.auth_utils import auth_get_cached  # реестр auth в памяти
+
+    u = auth_get_cached(user_id) or {}
     paid = u.get("paid_account") or {}
     if paid.get("status") != "ready":
         return None
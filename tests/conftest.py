@@ -0,0 +1,9 @@
+# tests/conftest.py
+# Тесты запускаются из корня репозитория: python -m pytest -q
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,56 @@
+# Реестр пользователей: правки под AUTH_LOCK, наружу — копии записей.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from handlers import auth_utils
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth_utils, "AUTH_FILE", tmp_path / "auth_users.json")
+    monkeypatch.setattr(auth_utils, "_REGISTRY", {"doc": None, "sig": None})
+    monkeypatch.setattr(auth_utils.persist_utils, "write_json", lambda *a, **kw: None)
+    monkeypatch.setattr(auth_utils.persist_utils, "has_pending", lambda path: True)
+    tg = SimpleNamespace(id=42, username="u42", first_name="A", last_name=None)
+    asyncio.run(auth_utils.auth_upsert_user(tg, role_if_new="user"))
+    return tg
+
+
+def test_returned_records_are_copies(registry):
+    u = asyncio.run(auth_utils.auth_get(42))
+    u["role"] = "admin"
+    u["access"]["settings.auth"] = False
+    assert auth_utils.auth_get_cached(42)["role"] == "user"
+    assert auth_utils.auth_get_cached(42)["access"]["settings.auth"] is True
+
+    listed = asyncio.run(auth_utils.auth_list_by_role("user"))
+    listed[0]["role"] = "rejected"
+    assert auth_utils.auth_get_cached(42)["role"] == "user"
+
+
+def test_concurrent_updates_are_not_lost(registry):
+    keys = auth_utils._ACCESS_KEYS
+
+    async def _run():
+        await asyncio.gather(
+            *(auth_utils.auth_toggle_access(42, k) for k in keys),
+            auth_utils.auth_set_sources_mode(42, "own"),
+            auth_utils.auth_upsert_user(registry),
+        )
+
+    asyncio.run(_run())
+    u = auth_utils.auth_get_cached(42)
+    assert u["sources_mode"] == "own"
+    assert not any(u["access"][k] for k in keys)
+
+
+def test_update_unknown_user(registry):
+    assert asyncio.run(auth_utils.auth_set_role(7, "admin")) is None
+    paid = {"api_id": 1}
+    u = asyncio.run(auth_utils.auth_set_paid_account(42, paid))
+    paid["api_id"] = 2
+    assert u["paid_account"] == {"api_id": 1}
+    assert auth_utils.auth_get_cached(42)["paid_account"] == {"api_id": 1}
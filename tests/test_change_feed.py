@@ -0,0 +1,74 @@
+# Лента изменений цен: какие модели поменялись с поколения прошлой синхронизации канала.
+
+from handlers.parsing import change_feed, generations
+
+A = ("Phones", "Apple", "iPhone 15")
+B = ("Phones", "Apple", "iPhone 15 Pro")
+C = ("Phones", "Samsung", "Galaxy S24")
+
+
+def _fps(**by_model):
+    keys = {"a": A, "b": B, "c": C}
+    return {change_feed.path_key(keys[k]): fp for k, fp in by_model.items()}
+
+
+def _publish(data_dir, fps, etalon="e1"):
+    change_feed.write_change_feed(data_dir, fps, etalon_build_id=etalon)
+    return generations.publish_generation(data_dir)
+
+
+def test_changed_paths_accumulate_along_the_chain(tmp_path):
+    assert change_feed.changed_paths_since(tmp_path, "g0") is None  # поколений ещё нет
+
+    g1 = _publish(tmp_path, _fps(a="1", b="1", c="1"))
+    assert change_feed.changed_paths_since(tmp_path, g1) == set()
+    assert change_feed.changed_paths_since(tmp_path, None) is None
+
+    g2 = _publish(tmp_path, _fps(a="2", b="1", c="1"))
+    _publish(tmp_path, _fps(a="2", b="1"))  # модель C пропала из каталога
+
+    assert change_feed.changed_paths_since(tmp_path, g2) == {C}
+    assert change_feed.changed_paths_since(tmp_path, g1) == {A, C}
+
+
+def test_full_feed_or_pruned_generation_needs_full_pass(tmp_path):
+    g1 = _publish(tmp_path, _fps(a="1"))
+    _publish(tmp_path, _fps(a="1"), etalon="e2")  # поменялся эталон — лента full
+    assert change_feed.changed_paths_since(tmp_path, g1) is None
+
+    g3 = _publish(tmp_path, _fps(a="1"), etalon="e2")
+    for i in range(generations.GENERATIONS_KEEP + 1):
+        _publish(tmp_path, _fps(a=str(i)), etalon="e2")
+    assert change_feed.changed_paths_since(tmp_path, g3) is None  # g3 уже удалён
+    assert change_feed.changed_paths_since(tmp_path, "g-unknown") is None
+
+
+def test_unrelated_storage_write_keeps_feed_targeted(tmp_path, monkeypatch):
+    import storage
+    from handlers.parsing import results
+    from handlers.parsing.context import pipeline_context
+
+    monkeypatch.setattr(storage, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "data.db")
+    monkeypatch.setattr(storage, "STORAGE_ENGINE", "json")
+    monkeypatch.setattr(storage, "_CACHE", {"path": None, "sig": None, "blobs": None, "view": None, "digests": {}})
+    monkeypatch.setattr(storage, "_STORES", {})
+    etalon = {"Phones": {"Apple": {"iPhone 15": ["128gb black"], "iPhone 15 Pro": ["256gb natural"]}}}
+    storage.save_data({"etalon": etalon, "catalog": etalon, "monitoring": {"history": []}})
+
+    def _item(path, variant, price):
+        return {"path": list(path), "raw_parsed": variant, "min_price": price, "best_channel": ["@shop"]}
+
+    v1 = [_item(A, "128gb black", 70000), _item(B, "256gb natural", 100000)]
+    v2 = [_item(A, "128gb black", 68000), _item(B, "256gb natural", 100000)]
+    pipe = tmp_path / "pipe"
+    with pipeline_context(pipe) as ctx:
+        results._write_json(ctx.parsed_matched, {"items": v1})
+        results.rebuild_parsed_data_all()
+        g1 = generations.current_generation_id(pipe)
+
+        storage.update_key("monitoring", {"history": [{"ts": 1}]})  # тик мониторинга между поколениями
+        results._write_json(ctx.parsed_matched, {"items": v2})
+        results.rebuild_parsed_data_incremental([A], matched=v2, previous_matched=v1)
+
+    assert change_feed.changed_paths_since(pipe, g1) == {A}
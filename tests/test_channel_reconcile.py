@@ -0,0 +1,52 @@
+# Инкрементальная сверка кэша постов: журнал удалений и счётчик запросов (dry_run).
+
+import asyncio
+
+from telethon.tl.types import Message
+
+from handlers.publishing import channel_updater as cu
+
+
+class _Client:
+    def __init__(self, tail_ids):
+        self.tail_ids = tail_ids
+        self.calls = 0
+
+    async def get_messages(self, entity, limit=None, ids=None):
+        self.calls += 1
+        if ids is not None:
+            return [Message(id=i, peer_id=None, date=None, message="") if i in self.tail_ids else None for i in ids]
+        return [Message(id=i, peer_id=None, date=None, message="") for i in sorted(self.tail_ids, reverse=True)][:limit]
+
+
+def _existing(*mids):
+    return {str(m): {"text": "", "model": f"m{m}"} for m in mids}
+
+
+def test_dry_run_keeps_deletion_journal(monkeypatch):
+    monkeypatch.setitem(cu._DELETED_JOURNAL, "-1001", {11})
+    client = _Client({10, 12})
+    calls = {"reconcile": 0}
+
+    existing = _existing(10, 11, 12)
+    removed = asyncio.run(cu._reconcile_incremental(
+        client, None, peer_id="-1001", existing=existing, consume_journal=False, calls=calls
+    ))
+    assert removed == 1 and "11" not in existing
+    assert cu._DELETED_JOURNAL["-1001"] == {11}
+    assert calls == {"reconcile": client.calls} == {"reconcile": 1}
+
+    # настоящая синхронизация журнал расходует
+    asyncio.run(cu._reconcile_incremental(client, None, peer_id="-1001", existing=_existing(10, 11, 12)))
+    assert "-1001" not in cu._DELETED_JOURNAL
+
+
+def test_verify_and_full_scan_calls_are_counted():
+    client = _Client({10})
+    calls = {"reconcile": 0}
+    missing = asyncio.run(cu._missing_mids(client, None, [10, 11], calls=calls))
+    assert missing == [11]
+
+    removed = asyncio.run(cu._reconcile_full(client, None, existing=_existing(10, 11), calls=calls))
+    assert removed == 1
+    assert calls["reconcile"] == client.calls == 3
@@ -0,0 +1,50 @@
+# Кодек артефактов: round-trip всех форматов и выбор формата по имени файла.
+
+import pytest
+
+from handlers import codec
+
+PAYLOAD = {
+    "items": [{"path": ["Apple", "iPhone 15"], "min_price": 70000.5, "best_channel": ["@shop"]}],
+    "items_count": 1,
+    "ru": "Цена 🇺🇸",
+    "empty": None,
+}
+
+FORMATS = ["json", "json-compact", "msgpack", "json+gzip", "json-compact+zstd", "msgpack+gzip", "msgpack+zstd"]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip(fmt, tmp_path):
+    assert codec.decode(codec.encode(PAYLOAD, fmt)) == PAYLOAD
+
+    path = tmp_path / "parsed_matched.json"
+    codec.write_file(path, PAYLOAD, fmt)
+    assert codec.read_file(path) == PAYLOAD
+
+
+def test_read_file_default_for_missing_empty_and_broken(tmp_path):
+    assert codec.read_file(tmp_path / "nope.json", {}) == {}
+    (tmp_path / "empty.json").write_bytes(b"  \n")
+    assert codec.read_file(tmp_path / "empty.json", []) == []
+    (tmp_path / "broken.json").write_bytes(b"{not json")
+    assert codec.read_file(tmp_path / "broken.json", None) is None
+
+
+def test_format_for_artifacts(monkeypatch):
+    monkeypatch.setattr(codec, "DEFAULT_FORMAT", "")
+    monkeypatch.delenv("ARTIFACT_CODEC_PARSED_MATCHED", raising=False)
+    assert codec.format_for("data/parsed_matched.json") == "json-compact"
+
+    monkeypatch.setattr(codec, "DEFAULT_FORMAT", "msgpack+zstd")
+    assert codec.format_for("data/parsed_matched.json") == "msgpack+zstd"
+
+    monkeypatch.setenv("ARTIFACT_CODEC_PARSED_MATCHED", "json")
+    assert codec.format_for("data/parsed_matched.json") == "json"
+
+
+@pytest.mark.parametrize("name", ["auth_users.json", "bot_users.json", "sync_state.json", "media_file_ids.json"])
+def test_state_files_stay_plain_json(name, monkeypatch):
+    monkeypatch.setattr(codec, "DEFAULT_FORMAT", "msgpack+zstd")
+    monkeypatch.setenv("ARTIFACT_CODEC_" + name[:-5].upper(), "msgpack")
+    assert codec.format_for(name) == "json"
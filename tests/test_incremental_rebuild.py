@@ -0,0 +1,174 @@
+# Инкрементальная пересборка parsed_data.json: база — опубликованное поколение,
+# а не рабочие файлы, которые parser._reset_data_dir_files() обнуляет перед прогоном.
+
+import copy
+
+import pytest
+
+import storage
+from handlers.parsing import matcher, results
+from handlers.parsing.context import pipeline_context
+from handlers.parsing.generations import current_generation_dir
+
+ETALON = {
+    "Apple": {
+        "iPhone 15": ["128gb black", "256gb black"],
+        "iPhone 15 Pro": ["256gb natural"],
+    },
+    "Samsung": {
+        "Galaxy S24": ["256gb black"],
+    },
+}
+
+
+def _item(path, variant, price, channel):
+    return {
+        "path": list(path),
+        "raw_parsed": variant,
+        "min_price": price,
+        "best_channel": [channel],
+        "prices": [{"price": price, "raw": f"{variant} {price}"}],
+        "params": {},
+    }
+
+
+MATCHED_V1 = [
+    _item(("Apple", "iPhone 15"), "128gb black", 70000, "@shop_a"),
+    _item(("Apple", "iPhone 15"), "256gb black", 80000, "@shop_a"),
+    _item(("Apple", "iPhone 15 Pro"), "256gb natural", 100000, "@shop_b"),
+    _item(("Samsung", "Galaxy S24"), "256gb black", 65000, "@shop_c"),
+]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(results, "_get_catalog_and_etalon", lambda: (ETALON, ETALON))
+    monkeypatch.setattr(results, "_etalon_build_id", lambda: "etalon-1")
+    with pipeline_context(tmp_path) as ctx:
+        yield ctx
+
+
+def _run_matcher(monkeypatch, ctx, matched):
+    monkeypatch.setattr(matcher, "match_etalon_with_parsed", lambda *_a: (copy.deepcopy(matched), {}, [], []))
+    return matcher.run_matcher()
+
+
+def _reset_working_files(ctx):
+    # то же, что parser._reset_data_dir_files() перед прогоном
+    for p in (ctx.parsed_matched, ctx.parsed_data):
+        p.write_text("[]", encoding="utf-8")
+
+
+def _published_catalog(ctx):
+    return results._read_json(current_generation_dir(ctx.base_dir) / "parsed_data.json", {})["catalog"]
+
+
+def test_one_model_price_change_rebuilds_only_its_subtree(pipeline, monkeypatch):
+    ctx = pipeline
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)  # поколений нет -> полная сборка + публикация
+    before = _published_catalog(ctx)
+    assert before["Apple"]["iPhone 15"]["128gb black"]["min_price"] == 70000
+
+    merged_paths = []
+    real_merge = results._merge_catalog_with_prices
+
+    def _spy(node, idx, cur_path, etalon):
+        merged_paths.extend(tuple(cur_path) + (str(k),) for k in node)
+        return real_merge(node, idx, cur_path, etalon)
+
+    monkeypatch.setattr(results, "_merge_catalog_with_prices", _spy)
+    monkeypatch.setattr(results, "rebuild_parsed_data_all", lambda: pytest.fail("full rebuild"))
+
+    _reset_working_files(ctx)
+    matched_v2 = copy.deepcopy(MATCHED_V1)
+    matched_v2[0] = _item(("Apple", "iPhone 15"), "128gb black", 68000, "@shop_d")
+    _run_matcher(monkeypatch, ctx, matched_v2)
+
+    assert merged_paths == [("Apple", "iPhone 15")]
+
+    after = _published_catalog(ctx)
+    assert after["Apple"]["iPhone 15"]["128gb black"] == {
+        "min_price": 68000.0,
+        "best_channels": ["@shop_d"],
+        "region_min": [],
+    }
+    assert after["Apple"]["iPhone 15"]["256gb black"] == before["Apple"]["iPhone 15"]["256gb black"]
+    assert after["Apple"]["iPhone 15 Pro"] == before["Apple"]["iPhone 15 Pro"]
+    assert after["Samsung"] == before["Samsung"]
+
+    stats = results._read_json(current_generation_dir(ctx.base_dir) / "parsed_data.json", {})["stats"]
+    assert stats == {"matched_items": 4, "priced_variants": 4}
+
+
+def test_previous_matched_comes_from_published_generation(pipeline, monkeypatch):
+    ctx = pipeline
+    assert matcher._load_previous_matched(ctx.parsed_matched) is None
+
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)
+    _reset_working_files(ctx)
+
+    prev = matcher._load_previous_matched(ctx.parsed_matched)
+    assert results.changed_model_paths(prev, MATCHED_V1) == set()
+
+
+def test_region_index_is_patched_for_changed_models_only(pipeline, monkeypatch):
+    ctx = pipeline
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)
+    _reset_working_files(ctx)
+
+    indexed = []
+    real_build = results._build_variant_index
+    monkeypatch.setattr(results, "_build_variant_index", lambda items: indexed.append(len(items)) or real_build(items))
+    monkeypatch.setattr(results, "rebuild_parsed_data_all", lambda: pytest.fail("full rebuild"))
+
+    matched_v2 = copy.deepcopy(MATCHED_V1)
+    matched_v2[3] = _item(("Samsung", "Galaxy S24"), "256gb black", 61000, "@shop_c")
+    _run_matcher(monkeypatch, ctx, matched_v2)
+
+    assert max(indexed) == 1  # индексируется только Galaxy S24, не весь matched
+    published = results.load_region_index(ctx.base_dir)
+    assert dict(published) == dict(results.build_region_index(matched_v2))
+    assert published.models == results.build_region_index(matched_v2).models
+
+
+@pytest.fixture
+def real_storage(tmp_path, monkeypatch):
+    # версия эталона — из настоящего storage, а не подменённая
+    monkeypatch.setattr(storage, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "data.db")
+    monkeypatch.setattr(storage, "STORAGE_ENGINE", "json")
+    monkeypatch.setattr(storage, "_CACHE", {"path": None, "sig": None, "blobs": None, "view": None, "digests": {}})
+    monkeypatch.setattr(storage, "_STORES", {})
+    storage.save_data({"etalon": copy.deepcopy(ETALON), "catalog": copy.deepcopy(ETALON), "monitoring": {"history": []}})
+    with pipeline_context(tmp_path / "pipe") as ctx:
+        yield ctx
+
+
+def test_unrelated_storage_write_keeps_incremental_path(real_storage, monkeypatch):
+    ctx = real_storage
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)
+    _reset_working_files(ctx)
+
+    storage.update_key("monitoring", {"history": [{"ts": 1}]})  # тик мониторинга между прогонами
+    monkeypatch.setattr(results, "rebuild_parsed_data_all", lambda: pytest.fail("full rebuild"))
+
+    matched_v2 = copy.deepcopy(MATCHED_V1)
+    matched_v2[0] = _item(("Apple", "iPhone 15"), "128gb black", 68000, "@shop_d")
+    _run_matcher(monkeypatch, ctx, matched_v2)
+    assert _published_catalog(ctx)["Apple"]["iPhone 15"]["128gb black"]["min_price"] == 68000
+
+
+def test_etalon_write_forces_full_rebuild(real_storage, monkeypatch):
+    ctx = real_storage
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)
+    _reset_working_files(ctx)
+
+    etalon = copy.deepcopy(ETALON)
+    etalon["Apple"]["iPhone 15"].append("512gb black")
+    storage.update_key("etalon", etalon)
+
+    full = []
+    real_all = results.rebuild_parsed_data_all
+    monkeypatch.setattr(results, "rebuild_parsed_data_all", lambda: full.append(1) or real_all())
+    _run_matcher(monkeypatch, ctx, MATCHED_V1)
+    assert full == [1]
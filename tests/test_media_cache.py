@@ -0,0 +1,65 @@
+# Кэш обложек: записи разных аккаунтов не смешиваются, даже если _self_id у клиента ещё не известен.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.publishing import media_cache
+
+
+class _Client:
+    _self_id = None
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.calls = 0
+
+    async def get_me(self, input_peer=False):
+        assert input_peer
+        self.calls += 1
+        if self.uid is None:
+            raise ConnectionError("not connected")
+        return SimpleNamespace(user_id=self.uid)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, "CACHE_FILE", tmp_path / "media_file_ids.json")
+    monkeypatch.setitem(media_cache._STATE, "doc", {})
+    monkeypatch.setattr(media_cache.persist_utils, "write_json", lambda *a, **kw: None)
+    cover = tmp_path / "cover.jpg"
+    cover.write_bytes(b"jpeg")
+    return cover
+
+
+def _msg(photo_id):
+    return SimpleNamespace(photo=SimpleNamespace(id=photo_id, access_hash=photo_id * 10, file_reference=b"\x01"))
+
+
+def test_accounts_do_not_share_entries(cache):
+    a, b = _Client(111), _Client(222)
+    acc_a = asyncio.run(media_cache.account_id(a))
+    acc_b = asyncio.run(media_cache.account_id(b))
+    assert (acc_a, acc_b) == (111, 222)
+
+    media_cache.remember(acc_a, cache, _msg(5))
+    assert media_cache.get(acc_a, cache).id == 5
+    assert media_cache.get(acc_b, cache) is None
+
+    asyncio.run(media_cache.account_id(a))
+    assert a.calls == 1  # id аккаунта запрашивается один раз на клиент
+
+
+def test_unknown_account_skips_cache(cache):
+    acc = asyncio.run(media_cache.account_id(_Client(None)))
+    assert acc is None
+    media_cache.remember(acc, cache, _msg(7))
+    assert media_cache._doc() == {}
+    assert media_cache.get(acc, cache) is None
+
+
+def test_changed_file_is_reuploaded(cache):
+    media_cache.remember(111, cache, _msg(5))
+    cache.write_bytes(b"another jpeg")
+    assert media_cache.get(111, cache) is None
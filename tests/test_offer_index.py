@@ -0,0 +1,121 @@
+# Автоответы: _match_best_offer по индексу офферов (_OfferIndex) даёт тот же результат,
+# что и прежний полный перебор списка.
+
+import random
+
+import pytest
+
+from handlers.auto_replies import listener as L
+from handlers.parsing.matcher import match_product
+
+
+def _full_scan(parsed_item, offers):
+    """Прежняя реализация _match_best_offer: перебор всех офферов."""
+    best = None
+    best_price = None
+    reasons = {}
+    for e in offers:
+        ok, reason = match_product(e, parsed_item)
+        if not ok:
+            reasons[reason or "no_match"] = reasons.get(reason or "no_match", 0) + 1
+            continue
+        ok2, r2 = L._hard_attribute_guards(parsed_item, e)
+        if not ok2:
+            reasons[r2] = reasons.get(r2, 0) + 1
+            continue
+        try:
+            price = int(e.get("price", 0))
+        except Exception:
+            price = 0
+        if price <= 0:
+            continue
+        if best is None or best_price is None or price < best_price:
+            best = e
+            best_price = price
+    if best:
+        return best, ""
+    if reasons:
+        return None, sorted(reasons.items(), key=lambda kv: kv[1], reverse=True)[0][0]
+    return None, "no_match"
+
+
+PATH = ["Смартфоны", "Apple"]
+
+
+def _offer(model, storage, color, price, **kw):
+    return {"model": model, "storage": storage, "color": color, "price": price, "path": PATH, **kw}
+
+
+# коды, цена <= 0 / нечисловая, равные цены у разных офферов, модели с разным регистром/пробелами
+FIXTURE = [
+    _offer("iPhone 15 Pro", "256GB", "Black", 0),
+    _offer("iPhone 15 Pro", "256GB", "Black", 120000),
+    _offer("iphone 15 pro ", "256GB", "Black", 110000),
+    _offer("iPhone 15 Pro", "256GB", "Black", 110000),
+    _offer("iPhone 15 Pro", "256GB", "White", 105000),
+    _offer("iPhone 15 Pro", "128GB", "Black", 95000),
+    _offer("iPhone 15 Pro", "256GB", "Black", -1),
+    _offer("iPhone 15 Pro", "256GB", "Black", "x"),
+    _offer("iPhone 15", "128GB", "Black", 70000),
+    _offer("", "256GB", "Black", 90000, code="MTQA3ZA"),
+    _offer("iPhone 15 Pro", "256GB", "Black", 0, code="MTQA3ZA"),
+    _offer("Galaxy S24", "256GB", "Black", 65000),
+]
+
+QUERIES = [
+    {"model": "iPhone 15 Pro", "storage": "256GB", "color": "Black", "path": PATH},
+    {"model": "iPhone 15 Pro", "storage": "256GB", "color": "", "path": PATH},
+    {"model": "iPhone 15 Pro", "storage": "512GB", "color": "Black", "path": PATH},
+    {"model": "iPhone 15", "storage": "", "color": "", "path": PATH},
+    {"model": "iPhone 16", "storage": "256GB", "color": "Black", "path": PATH},
+    {"model": "", "storage": "256GB", "color": "Black", "path": PATH, "code": "MTQA3ZA"},
+    {"model": "iPhone 15 Pro", "storage": "256GB", "color": "Black", "path": PATH, "code": "MTQA3ZA"},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_fixture_matches_full_scan(query):
+    expected = _full_scan(query, FIXTURE)
+    got = L._match_best_offer(query, FIXTURE)
+    assert got[0] is expected[0]
+    assert got[1] == expected[1]
+
+
+def test_equal_prices_keep_first_offer():
+    best, reason = L._match_best_offer(QUERIES[0], FIXTURE)
+    assert reason == ""
+    assert best is FIXTURE[2]  # 110000 у двух офферов — берётся первый по списку
+
+
+def test_random_offer_lists_match_full_scan():
+    rnd = random.Random(1)
+    models = ["iPhone 15 Pro", "iphone 15 pro ", "iPhone 15", "Galaxy S24", ""]
+    for _ in range(300):
+        offers = []
+        for _ in range(rnd.randint(0, 40)):
+            e = {
+                "model": rnd.choice(models),
+                "storage": rnd.choice(["128GB", "256GB", ""]),
+                "color": rnd.choice(["Black", "White", ""]),
+                "sim": rnd.choice(["esim", "2sim", None]),
+                "region": rnd.choice([None, "us"]),
+                "price": rnd.choice([0, -5, 100, 150, 200, 300, "x"]),
+                "path": PATH,
+            }
+            if rnd.random() < 0.1:
+                e["code"] = rnd.choice(["MTQA3ZA", "ABCDEF1"])
+            offers.append(e)
+        for _ in range(5):
+            q = {
+                "model": rnd.choice(models),
+                "storage": rnd.choice(["128GB", "256GB", ""]),
+                "color": rnd.choice(["Black", ""]),
+                "sim": rnd.choice([None, "esim"]),
+                "region": rnd.choice([None, "us"]),
+                "path": PATH,
+            }
+            if rnd.random() < 0.15:
+                q["code"] = "MTQA3ZA"
+            expected = _full_scan(q, offers)
+            got = L._match_best_offer(q, offers)
+            assert got[0] is expected[0] and got[1] == expected[1], (q, offers)
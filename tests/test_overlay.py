@@ -0,0 +1,74 @@
+# Цены custom-режима: base + user слои объединяются при чтении.
+
+import os
+
+from handlers import codec
+from handlers.parsing.overlay import PriceOverlay, load_price_layer, overlay_for_paths
+
+MODEL = ("Phones", "Apple", "iPhone 15")
+
+
+def _v(price, channels, regions=None):
+    return {"min_price": price, "best_channels": channels, "region_min": regions or []}
+
+
+BASE = {
+    MODEL: {
+        "128gb black": _v(70000, ["@base"], ["us"]),
+        "256gb black": _v(80000, ["@base"]),
+        "512gb black": {},
+    }
+}
+USER = {
+    MODEL: {
+        "128gb black": _v(70000, ["@mine", "@base"], ["hk"]),
+        "256gb black": _v(82000, ["@mine"]),
+        "512gb black": _v(99000, ["@mine"]),
+        "1tb black": _v(120000, ["@mine"]),
+    }
+}
+
+
+def test_variant_takes_min_and_merges_ties():
+    ov = PriceOverlay([BASE, USER])
+    assert ov.variant(MODEL, "128gb black") == _v(70000, ["@base", "@mine"], ["us", "hk"])
+    assert ov.variant(MODEL, "256gb black") == _v(80000, ["@base"])
+    assert ov.variant(MODEL, "512gb black") == _v(99000, ["@mine"])
+    assert ov.variant(MODEL, "2tb black") == {}
+    assert ov.variant(("Phones", "Apple", "nope"), "128gb black") == {}
+
+
+def test_model_variants_keep_base_order_and_append_user_titles():
+    ov = PriceOverlay([BASE, USER])
+    merged = ov.model_variants(MODEL, BASE[MODEL])
+    assert list(merged) == ["128gb black", "256gb black", "512gb black", "1tb black"]
+    # слои не меняются
+    assert BASE[MODEL]["128gb black"]["best_channels"] == ["@base"]
+
+
+def test_apply_to_catalog_replaces_model_leaves():
+    ov = PriceOverlay([BASE, USER])
+    catalog = {"Phones": {"Apple": {"iPhone 15": BASE[MODEL]}}, "note": "x"}
+    out = ov.apply_to_catalog(catalog)
+    assert out["note"] == "x"
+    assert out["Phones"]["Apple"]["iPhone 15"]["1tb black"] == _v(120000, ["@mine"])
+
+
+def test_layers_from_files_are_cached_by_version(tmp_path):
+    base_p, user_p = tmp_path / "base.json", tmp_path / "user.json"
+    catalog = {"Phones": {"Apple": {"iPhone 15": BASE[MODEL]}}}
+    codec.write_file(base_p, {"catalog": catalog}, "json-compact")
+    codec.write_file(user_p, {"catalog": {"Phones": {"Apple": {"iPhone 15": USER[MODEL]}}}}, "msgpack")
+
+    assert load_price_layer(base_p)[MODEL]["256gb black"]["min_price"] == 80000
+    ov = overlay_for_paths(base_p, user_p)
+    assert overlay_for_paths(base_p, user_p) is ov
+    assert ov.variant(MODEL, "512gb black")["min_price"] == 99000
+
+    catalog["Phones"]["Apple"]["iPhone 15"] = {"256gb black": _v(60000, ["@new"])}
+    codec.write_file(base_p, {"catalog": catalog}, "json-compact")
+    st = os.stat(base_p)
+    os.utime(base_p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    ov2 = overlay_for_paths(base_p, user_p)
+    assert ov2 is not ov
+    assert ov2.variant(MODEL, "256gb black") == _v(60000, ["@new"])
@@ -0,0 +1,114 @@
+# Короткие ID путей для callback_data: стабильность, namespace, вытеснение, перезагрузка, коллизии.
+
+import re
+
+import pytest
+
+from handlers import codec, path_ids
+from handlers.parsing import parser
+from handlers.parsing.context import DEFAULT_BASE_DIR, pipeline_context
+
+PATH = ["Phones", "Apple", "iPhone 15 Pro Max", "256gb natural titanium"]
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(path_ids, "PATH_IDS_FILE", tmp_path / "path_ids.json")
+    monkeypatch.setattr(path_ids, "_LEGACY_FILE", tmp_path / "legacy" / "path_ids.json")
+    monkeypatch.setattr(path_ids, "_TABLE", path_ids.OrderedDict())
+    monkeypatch.setattr(path_ids, "_STATE", {"loaded": False, "dirty": False, "saved_at": 0.0})
+    # пишем сразу, мимо фонового писателя
+    monkeypatch.setattr(path_ids.persist_utils, "write_json", lambda p, payload: codec.write_file(p, payload))
+    return tmp_path / "path_ids.json"
+
+
+def _restart(monkeypatch):
+    monkeypatch.setattr(path_ids, "_TABLE", path_ids.OrderedDict())
+    monkeypatch.setattr(path_ids, "_STATE", {"loaded": False, "dirty": False, "saved_at": 0.0})
+
+
+def test_id_is_short_stable_and_namespaced(table):
+    pid = path_ids.path_id(PATH, "vp")
+    assert re.fullmatch(r"[a-z2-7]{10}", pid)
+    assert len(f"vp:go:{pid}".encode()) <= 64
+    assert path_ids.path_id(PATH, "vp") == pid
+    assert path_ids.path_id(PATH, "ar") != pid
+    assert path_ids.resolve(pid, "vp") == PATH
+    assert path_ids.resolve(pid, "ar") is None
+    assert path_ids.resolve("unknown", "vp") is None
+
+
+def test_ids_survive_restart(table, monkeypatch):
+    pid = path_ids.path_id(PATH, "vp")
+    path_ids.flush()
+    _restart(monkeypatch)
+    assert path_ids.resolve(pid, "vp") == PATH
+    assert path_ids.path_id(PATH, "vp") == pid
+
+
+def test_lru_eviction(table, monkeypatch):
+    monkeypatch.setattr(path_ids, "PATH_IDS_MAX", 3)
+    ids = [path_ids.path_id(["m", str(i)], "vp") for i in range(3)]
+    path_ids.resolve(ids[0], "vp")          # ids[0] стал свежим
+    path_ids.path_id(["m", "3"], "vp")       # вытесняется ids[1]
+    assert path_ids.resolve(ids[1], "vp") is None
+    assert path_ids.resolve(ids[0], "vp") == ["m", "0"]
+    assert path_ids.resolve(ids[2], "vp") == ["m", "2"]
+
+
+def test_collision_takes_salted_id(table, monkeypatch):
+    real = path_ids._digest
+    # оба пути без соли дают один и тот же ID
+    monkeypatch.setattr(path_ids, "_digest", lambda ns, path, salt: "same" if salt == 0 else real(ns, path, salt))
+    a = path_ids.path_id(["a"], "vp")
+    b = path_ids.path_id(["b"], "vp")
+    assert a == "same" and b != a
+    assert path_ids.resolve(a, "vp") == ["a"]
+    assert path_ids.resolve(b, "vp") == ["b"]
+    assert path_ids.path_id(["b"], "vp") == b
+
+
+def test_table_lives_outside_pipeline_dir():
+    assert DEFAULT_BASE_DIR.resolve() not in path_ids.PATH_IDS_FILE.resolve().parents
+
+
+def test_ids_survive_collection_reset(table, tmp_path, monkeypatch):
+    pid = path_ids.path_id(PATH, "vp")
+    path_ids.flush()
+
+    # сбор в общей папке пайплайна обнуляет все её *.json
+    pipe = tmp_path / "pipeline"
+    monkeypatch.setattr(parser, "DEFAULT_BASE_DIR", pipe)
+    with pipeline_context(pipe):
+        parser._reset_data_dir_files()
+    assert (pipe / "parsed_data.json").read_text(encoding="utf-8") == "[]"
+
+    _restart(monkeypatch)
+    assert path_ids.resolve(pid, "vp") == PATH
+
+
+def test_resolve_recency_is_persisted(table, monkeypatch):
+    monkeypatch.setattr(path_ids, "PATH_IDS_MAX", 2)
+    old = path_ids.path_id(["m", "old"], "vp")
+    new = path_ids.path_id(["m", "new"], "vp")
+    path_ids.flush()
+    path_ids.resolve(old, "vp")      # только чтение: кнопка нажата
+    path_ids.flush()
+
+    _restart(monkeypatch)
+    path_ids.path_id(["m", "third"], "vp")
+    assert path_ids.resolve(old, "vp") == ["m", "old"]
+    assert path_ids.resolve(new, "vp") is None
+
+
+def test_legacy_table_is_migrated(table, monkeypatch):
+    pid = path_ids.path_id(PATH, "vp")
+    path_ids.flush()
+    legacy = path_ids._LEGACY_FILE
+    legacy.parent.mkdir(parents=True)
+    table.replace(legacy)
+
+    _restart(monkeypatch)
+    assert path_ids.resolve(pid, "vp") == PATH
+    path_ids.flush()
+    assert table.exists()
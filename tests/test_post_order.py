@@ -0,0 +1,21 @@
+# Порядок постов канала: на месте остаётся только префикс со строго возрастающими mid.
+
+import pytest
+
+from handlers.publishing.channel_updater import _in_order_prefix_len
+
+
+@pytest.mark.parametrize(
+    "mids, keep",
+    [
+        ([], 0),
+        ([10, 11, 15], 3),            # всё на месте
+        ([None, 11, 12], 0),          # первого поста нет — пересоздаётся всё
+        ([10, None, 12], 1),          # дыра: после неё новый пост встанет только в конец
+        ([10, 12, 11, 13], 2),        # 11 ниже 12 — с него порядок нарушен
+        ([10, 10], 1),                # один mid дважды — второй не на месте
+        ([30, 20, 40], 1),
+    ],
+)
+def test_in_order_prefix_len(mids, keep):
+    assert _in_order_prefix_len(mids) == keep
@@ -0,0 +1,115 @@
+# Inline-поиск цен: фильтр по атрибутам, ранжирование моделей, кэш ответов по поколению.
+
+import copy
+from pathlib import Path
+
+import pytest
+
+from handlers import price_search as ps
+from handlers import view_prices as vp
+from handlers.parsing.results import RegionIndex
+
+
+def _v(price, channel="@shop"):
+    return {"min_price": price, "best_channels": [channel], "region_min": []}
+
+
+ROOT = {
+    "Phones": {
+        "Apple": {
+            "iPhone 15 Pro Max": {"256gb natural": _v(120000), "256gb black": _v(118000)},
+            "iPhone 15 Pro": {"256gb natural": _v(100000), "256gb black": _v(99000), "128gb black": _v(90000)},
+            "iPhone 15": {"128gb black": _v(70000), "256gb blue": _v(80000)},
+        },
+        "Samsung": {
+            "Galaxy S24": {"256gb black": _v(65000)},
+        },
+    },
+}
+
+
+def _titles(found):
+    return [line.split(" — ")[0] for _rid, line, _crumb in found]
+
+
+def _crumbs(found):
+    return [crumb for _rid, _line, crumb in found]
+
+
+def _search(query, root=ROOT, view=None, model_index=None):
+    return ps._search(query, root=root, view=view, region_index=None, overlay=None, model_index=model_index)
+
+
+def test_attribute_filter_keeps_only_matching_variants():
+    found = _search("15 pro 256 black")
+    assert _crumbs(found) == ["Apple / iPhone 15 Pro", "Apple / iPhone 15 Pro Max"]
+    assert all("256gb black" in t for t in _titles(found))
+
+    assert _search("15 pro 512") == []  # такой памяти нет ни у одной модели
+
+    found = _search("iphone 15 blue")
+    assert _titles(found) == ["256gb blue"]
+
+
+def test_variant_matches_checks_each_attribute():
+    q = ps._attrs("256 black")
+    assert ps._variant_matches(q, "256gb black", {})
+    assert not ps._variant_matches(q, "128gb black", {})
+    assert not ps._variant_matches(q, "256gb natural", {})
+    assert ps._variant_matches(ps._attrs("iphone"), "256gb natural", {})  # без атрибутов — всё подходит
+
+
+def test_model_words_rank_exact_model_before_longer_names():
+    words = ps._ModelWords(ROOT)
+    found = words.find(ps._tokens("15 pro"))
+    assert found[0] == ("Phones", "Apple", "iPhone 15 Pro")
+    assert found[1] == ("Phones", "Apple", "iPhone 15 Pro Max")
+    assert ("Phones", "Apple", "iPhone 15") not in found  # нет слова "pro"
+    assert words.find(ps._tokens("nokia")) == []
+
+
+def test_alias_index_match_wins_over_word_search(monkeypatch):
+    meta = {"path": ["Phones", "Apple", "iPhone 15 Pro Max"]}
+    monkeypatch.setattr(ps.entry_mod, "match_model_from_text", lambda q, idx: meta if idx else None)
+    found = _search("15 pro 256 black", model_index={"15 pro max": meta})
+    assert _crumbs(found) == ["Apple / iPhone 15 Pro Max"]
+
+
+def test_results_are_cached_per_generation(monkeypatch):
+    monkeypatch.setattr(vp, "_PAGE_CACHE", {})
+    parsed = Path("/tmp/price-search-test/parsed_data.json")
+
+    view1 = vp._page_view(parsed, RegionIndex(version="r:1"), None)
+    first = _search("15 256 blue", view=view1)
+    assert first and "80 000" in first[0][1]
+
+    root2 = copy.deepcopy(ROOT)
+    root2["Phones"]["Apple"]["iPhone 15"]["256gb blue"] = _v(76000)
+    # то же поколение — ответ из кэша, новые данные не читаются
+    assert _search("15  256 BLUE", root=root2, view=view1) is first
+
+    view2 = vp._page_view(parsed, RegionIndex(version="r:2"), None)
+    assert view2 is not view1
+    second = _search("15 256 blue", root=root2, view=view2)
+    assert "76 000" in second[0][1]
+
+
+def test_model_index_is_reloaded_only_when_file_changes(tmp_path, monkeypatch):
+    from handlers import codec
+
+    path = tmp_path / "model_index.json"
+    monkeypatch.setattr(ps.entry_mod, "MODEL_INDEX_JSON", path)
+    monkeypatch.setattr(ps, "_MODEL_INDEX_CACHE", {})
+    monkeypatch.setattr(ps.entry_mod, "_load_model_index", lambda: pytest.fail("rebuild on the event loop"))
+
+    assert ps._model_index_live() == {}  # файла нет — без пересборки
+
+    codec.write_file(path, {"index": {"iphone 15": {"path": ["Phones", "Apple", "iPhone 15"]}}})
+    idx = ps._model_index_live()
+    assert set(idx) == {"iphone 15"}
+
+    loads = []
+    real_load = ps.entry_mod._load_json
+    monkeypatch.setattr(ps.entry_mod, "_load_json", lambda p, d: loads.append(p) or real_load(p, d))
+    assert ps._model_index_live() is idx
+    assert loads == []
@@ -0,0 +1,53 @@
+# parsed_data.json и region_index.json строятся из одного индекса вариантов.
+
+from handlers.parsing import results
+from handlers.parsing.results import RegionIndex
+
+
+def _item(path, variant, price, raw, channel="@shop"):
+    return {
+        "path": list(path),
+        "raw_parsed": variant,
+        "min_price": price,
+        "best_channel": [channel, channel],
+        "prices": [{"price": price, "raw": raw}],
+        "params": {},
+    }
+
+
+MATCHED = [
+    _item(("Apple", "iPhone 15"), "8/128gb black", "70 000", "iPhone 15 128 black (HK) 70 000"),
+    _item(("Apple", "iPhone 15"), "256gb black", 80000, "iPhone 15 256 black 🇺🇸 80000"),
+]
+ETALON = {"Apple": {"iPhone 15": ["128gb black", "256gb black"]}}
+
+
+def test_parsed_data_and_region_index_agree():
+    idx = results._build_variant_index(MATCHED)
+    catalog = results._merge_catalog_with_prices(ETALON, idx, [], ETALON)
+    ridx = results.build_region_index(MATCHED, index=idx)
+
+    variants = catalog["Apple"]["iPhone 15"]
+    # цена строкой с пробелами и текстовый регион — одинаково в обоих артефактах
+    assert variants["128gb black"] == {"min_price": 70000.0, "best_channels": ["@shop"], "region_min": ["hk"]}
+    assert variants["256gb black"] == {"min_price": 80000.0, "best_channels": ["@shop"], "region_min": ["us"]}
+    for title, v in variants.items():
+        info = ridx[(("Apple", "iPhone 15"), title)]
+        assert (info["price"], info["region"], info["channels"]) == (v["min_price"], v["region_min"], v["best_channels"])
+    assert results._count_priced(idx) == 3  # + алиас без RAM "128gb black"
+
+
+def test_merge_region_indexes_caches_only_versioned_inputs():
+    key = (("Apple", "iPhone 15"), "256gb black")
+    a = RegionIndex({key: {"price": 80000.0, "region": ["us"], "channels": ["@a"]}}, version="1:a")
+    b = RegionIndex({key: {"price": 80000.0, "region": ["hk"], "channels": ["@b"]}}, version="1:b")
+    merged = results.merge_region_indexes(a, b)
+    assert merged[key]["region"] == ["us", "hk"]
+    assert results.merge_region_indexes(a, b) is merged
+
+    c = RegionIndex({key: {"price": 1.0, "region": ["kz"], "channels": []}})
+    first = results.merge_region_indexes(a, c)
+    assert first[key]["price"] == 1.0
+    c2 = RegionIndex({key: {"price": 2.0, "region": ["ae"], "channels": []}})
+    second = results.merge_region_indexes(a, c2)
+    assert second is not first and second[key]["price"] == 2.0
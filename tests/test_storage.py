@@ -0,0 +1,96 @@
+# storage: точечные правки обновляют в кэше только свой ключ верхнего уровня.
+
+import json
+import pickle
+
+import pytest
+
+import storage
+
+DATA = {
+    "catalog": {"Phones": {"Apple": {"iPhone 15": ["128gb black"]}}},
+    "etalon": {"Phones": {"Apple": {"iPhone 15": ["128gb black"]}}},
+    "brands": ["Apple"],
+    "monitoring": {"enabled": True, "history": [{"ts": 1}]},
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def engine(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "data.db")
+    monkeypatch.setattr(storage, "STORAGE_ENGINE", request.param)
+    monkeypatch.setattr(storage, "_CACHE", {"path": None, "sig": None, "blobs": None, "view": None, "digests": {}})
+    monkeypatch.setattr(storage, "_STORES", {})
+    storage.save_data(json.loads(json.dumps(DATA)))
+    yield request.param
+    for store in storage._STORES.values():
+        store.close()
+
+
+def _reload():
+    # читаем заново из файла / БД, мимо кэша
+    storage._CACHE.update({"path": None, "sig": None, "blobs": None, "view": None, "digests": {}})
+    for store in storage._STORES.values():
+        store.close()
+    return storage.load_data()
+
+
+def test_update_key_only_unpickles_its_key(engine, monkeypatch):
+    storage.read_data()
+    view_before = storage.read_data()
+    loads = []
+    real_loads = pickle.loads
+    monkeypatch.setattr(storage.pickle, "loads", lambda b: loads.append(b) or real_loads(b))
+
+    if engine == "sqlite":
+        store = storage._sqlite_store()
+        monkeypatch.setattr(store, "save_all", lambda data: pytest.fail("full save instead of set_setting"))
+
+    mon = {"enabled": False, "history": [{"ts": 1}, {"ts": 2}]}
+    storage.update_key("monitoring", mon)
+    mon["history"].append({"ts": 3})  # правка снаружи уже не влияет на кэш
+
+    assert len(loads) == 1
+    view = storage.read_data()
+    assert view["monitoring"] == {"enabled": False, "history": [{"ts": 1}, {"ts": 2}]}
+    assert view["catalog"] is view_before["catalog"]          # остальные снимки не пересобирались
+    assert view_before["monitoring"]["enabled"] is True       # старый снимок у читателей не меняется
+    with pytest.raises(storage.ReadOnlyError):
+        view["monitoring"]["enabled"] = True
+
+    monkeypatch.setattr(storage.pickle, "loads", real_loads)
+    assert list(_reload()) == list(DATA)
+    assert storage.load_data()["monitoring"] == {"enabled": False, "history": [{"ts": 1}, {"ts": 2}]}
+
+
+def test_point_edits_round_trip(engine):
+    storage.update_key("auto_replies_enabled", True)
+    storage.set_node("catalog", ["Phones", "Samsung", "S24"], ["256gb black"])
+    storage.move_node("catalog", ["Phones", "Samsung"], -1)
+    storage.delete_node("etalon", ["Phones", "Apple"])
+    storage.append_monitoring_history({"ts": 2}, keep=1)
+
+    expected = json.loads(json.dumps(DATA))
+    expected["catalog"]["Phones"] = {"Samsung": {"S24": ["256gb black"]}, "Apple": DATA["catalog"]["Phones"]["Apple"]}
+    expected["etalon"]["Phones"] = {}
+    expected["monitoring"]["history"] = [{"ts": 2}]
+    expected["auto_replies_enabled"] = True
+
+    cached = storage.load_data()
+    assert cached == expected
+    assert list(cached["catalog"]["Phones"]) == ["Samsung", "Apple"]
+    assert _reload() == expected
+    assert list(storage.load_data()["catalog"]["Phones"]) == ["Samsung", "Apple"]
+
+
+def test_key_build_id_ignores_other_keys(engine):
+    before = storage.key_build_id("etalon", "catalog")
+    storage.update_key("monitoring", {"enabled": False, "history": []})
+    assert storage.key_build_id("etalon", "catalog") == before
+
+    storage.update_key("etalon", {"Phones": {}})
+    after = storage.key_build_id("etalon", "catalog")
+    assert after != before
+    _reload()
+    assert storage.key_build_id("etalon", "catalog") == after  # тот же отпечаток после перечитывания